@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Signature Verification Benchmark
+
+This benchmark signs messages in the format of option and opinion signatures and
+measures how many signatures per second each available signature backend verifies,
+and how many verify_many verifies with a process pool, for example:
+
+    python benchmarks/bench_signatures.py --signatures 2000 --processes 4
+
+Install the optional coincurve package to include the libsecp256k1 backend.
+"""
+
+import argparse
+import time
+from typing import List, Tuple
+
+from hivemind import signatures, utils
+from hivemind.signatures import BitcoinlibBackend, CoincurveBackend, SignatureBackend
+from hivemind.utils import generate_bitcoin_keypair, verify_many
+
+
+def sign_messages(n_signatures: int) -> List[Tuple[str, str, str]]:
+    """Create signed messages, every message signed by a new address.
+
+    :param n_signatures: The number of signed messages
+    :type n_signatures: int
+    :return: The (message, address, signature) tuples
+    :rtype: List[Tuple[str, str, str]]
+    """
+    backend = signatures.get_backend()
+    items = []
+    for i in range(n_signatures):
+        private_key, address = generate_bitcoin_keypair()
+        message = '%sQmOption%s' % (1700000000 + i, i)
+        items.append((message, address, backend.sign(message, private_key)))
+    return items
+
+
+def backends() -> List[SignatureBackend]:
+    """Create all signature backends that can be used here.
+
+    :return: The backends
+    :rtype: List[SignatureBackend]
+    """
+    available: List[SignatureBackend] = [BitcoinlibBackend()]
+    if signatures.coincurve is not None:
+        available.append(CoincurveBackend())
+    return available
+
+
+def main() -> None:
+    """Run the benchmark with the options given on the command line."""
+    parser = argparse.ArgumentParser(description='Benchmark verifying signed messages')
+    parser.add_argument('--signatures', type=int, default=1000, help='The number of signed messages (default: 1000)')
+    parser.add_argument('--processes', type=int, default=None, help='The number of processes of verify_many (default: the number of CPUs)')
+    args = parser.parse_args()
+
+    items = sign_messages(n_signatures=args.signatures)
+    print(f'Signatures: {len(items)}, default backend: {signatures.get_backend().name}')
+
+    for backend in backends():
+        start = time.perf_counter()
+        assert all(backend.verify(message, address, signature) for message, address, signature in items)
+        seconds = time.perf_counter() - start
+        print(f'  {backend.name:<20} {len(items) / seconds:10.0f} verifications/s')
+
+    utils.verifications.clear()
+    start = time.perf_counter()
+    assert all(verify_many(items, processes=args.processes))
+    seconds = time.perf_counter() - start
+    print(f'  {"verify_many":<20} {len(items) / seconds:10.0f} verifications/s')
+
+    start = time.perf_counter()
+    assert all(verify_many(items, processes=args.processes))
+    seconds = time.perf_counter() - start
+    print(f'  {"verify_many (cached)":<20} {len(items) / seconds:10.0f} verifications/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Hivemind State Benchmark
+
+This benchmark builds a hivemind state with many options and opinions and measures
+how long it takes to save it, to load it again with an empty cache and to calculate
+the results. It runs on a local storage backend by default, so it does not need an
+IPFS daemon:
+
+    python benchmarks/bench_state.py --options 100 --opinions 1000
+    python benchmarks/bench_state.py --backend filesystem --directory /tmp/hivemind-bench
+    python benchmarks/bench_state.py --backend ipfs
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple, TypeVar
+
+from hivemind import HivemindIssue, HivemindOption, HivemindOpinion, HivemindState, storage
+from hivemind.backends import BACKENDS, create_backend
+from hivemind.ranking import Ranking
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+
+T = TypeVar('T')
+
+
+def timed(timings: Dict[str, float], name: str, fn: Callable[[], T]) -> T:
+    """Call a function and record how long it took.
+
+    :param timings: The recorded timings in seconds
+    :type timings: Dict[str, float]
+    :param name: The name of the timing
+    :type name: str
+    :param fn: The function to call
+    :type fn: Callable[[], T]
+    :return: The result of the function
+    :rtype: T
+    """
+    start = time.perf_counter()
+    result = fn()
+    timings[name] = time.perf_counter() - start
+    return result
+
+
+def build_state(n_options: int, n_opinions: int, seed: int) -> HivemindState:
+    """Build and save a state with random fixed and auto rankings.
+
+    :param n_options: The number of options
+    :type n_options: int
+    :param n_opinions: The number of opinions
+    :type n_opinions: int
+    :param seed: The seed of the random rankings
+    :type seed: int
+    :return: The saved state
+    :rtype: HivemindState
+    """
+    rng = random.Random(seed)
+
+    issue = HivemindIssue()
+    issue.name = 'Benchmark Issue'
+    issue.add_question('What is the best number?')
+    issue.answer_type = 'Integer'
+    issue_cid = issue.save()
+
+    state = HivemindState()
+    state.set_hivemind_issue(issue_cid=issue_cid)
+
+    private_key, address = generate_bitcoin_keypair()
+    option_cids: List[str] = []
+    for value in range(n_options):
+        option = HivemindOption()
+        option.set_issue(hivemind_issue_cid=issue_cid)
+        option.set(value=value)
+        option.text = 'Option %s' % value
+        option_cid = option.save()
+        timestamp = int(time.time())
+        state.add_option(timestamp=timestamp, option_hash=option_cid, address=address,
+                         signature=sign_message('%s%s' % (timestamp, option_cid), private_key))
+        option_cids.append(option_cid)
+
+    for i in range(n_opinions):
+        private_key, address = generate_bitcoin_keypair()
+        ranking = Ranking()
+        if i % 2 == 0:
+            ranking.set_fixed(rng.sample(option_cids, len(option_cids)))
+        else:
+            ranking.set_auto_high(rng.choice(option_cids))
+
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = issue_cid
+        opinion.set_question_index(0)
+        opinion.ranking = ranking
+        opinion_cid = opinion.save()
+        timestamp = int(time.time())
+        state.add_opinion(timestamp=timestamp, opinion_hash=opinion_cid, address=address,
+                          signature=sign_message('%s%s' % (timestamp, opinion_cid), private_key))
+
+    return state
+
+
+def run_benchmark(n_options: int, n_opinions: int, seed: int) -> Tuple[str, Dict[str, float]]:
+    """Build, save, load and calculate the results of a state.
+
+    :param n_options: The number of options
+    :type n_options: int
+    :param n_opinions: The number of opinions
+    :type n_opinions: int
+    :param seed: The seed of the random rankings
+    :type seed: int
+    :return: The CID of the state and the timings in seconds
+    :rtype: Tuple[str, Dict[str, float]]
+    """
+    timings: Dict[str, float] = {}
+    state = timed(timings, 'build', lambda: build_state(n_options=n_options, n_opinions=n_opinions, seed=seed))
+    state_cid = timed(timings, 'save', state.save)
+
+    storage.cache.clear()
+    loaded = timed(timings, 'load (cold)', lambda: HivemindState(cid=state_cid))
+    timed(timings, 'load (cached)', lambda: HivemindState(cid=state_cid))
+    timed(timings, 'calculate_results', loaded.calculate_results)
+    timed(timings, 'consensus', loaded.consensus)
+
+    return state_cid, timings
+
+
+def main() -> None:
+    """Run the benchmark with the options given on the command line."""
+    parser = argparse.ArgumentParser(description='Benchmark loading a hivemind state and calculating its results')
+    parser.add_argument('--backend', choices=BACKENDS, default='memory', help='The storage backend (default: memory)')
+    parser.add_argument('--directory', help='The directory of the filesystem backend (default: a temporary directory)')
+    parser.add_argument('--options', type=int, default=20, help='The number of options (default: 20)')
+    parser.add_argument('--opinions', type=int, default=200, help='The number of opinions (default: 200)')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the random rankings (default: 0)')
+    args = parser.parse_args()
+
+    directory = args.directory
+    if args.backend == 'filesystem' and directory is None:
+        directory = tempfile.mkdtemp(prefix='hivemind-bench-')
+    storage.set_transport(create_backend(args.backend, directory=directory))
+
+    state_cid, timings = run_benchmark(n_options=args.options, n_opinions=args.opinions, seed=args.seed)
+
+    print(f'Backend: {args.backend}, options: {args.options}, opinions: {args.opinions}')
+    print(f'State: {state_cid}')
+    for name, seconds in timings.items():
+        print(f'  {name:<20} {seconds * 1000:10.1f} ms')
+    print(f'Storage: {storage.stats()}')
+
+
+if __name__ == '__main__':
+    main()
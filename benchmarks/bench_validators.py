@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Address Validation Benchmark
+
+This benchmark generates distinct legacy and Bech32 addresses, some of them invalid,
+and measures how long it takes to validate them one by one with valid_address and
+all at once with validate_addresses, for example to check the address restrictions
+of a hivemind issue:
+
+    python benchmarks/bench_validators.py --addresses 100000
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+from hivemind.validators import CHARSET, bech32_hrp_expand, bech32_polymod, valid_address, validate_addresses
+
+BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+def bech32_address(rng: random.Random, hrp: str = 'bc') -> str:
+    """Create a random Bech32 address with a valid checksum.
+
+    :param rng: The random generator
+    :type rng: random.Random
+    :param hrp: The human-readable part of the address
+    :type hrp: str
+    :return: The address
+    :rtype: str
+    """
+    data = [0] + [rng.randrange(32) for _ in range(32)]
+    polymod = bech32_polymod(bech32_hrp_expand(hrp) + data + [0] * 6) ^ 1
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + '1' + ''.join(CHARSET[value] for value in data + checksum)
+
+
+def generate_addresses(n_addresses: int, seed: int) -> List[str]:
+    """Generate a mix of legacy, Bech32 and invalid addresses.
+
+    :param n_addresses: The number of addresses
+    :type n_addresses: int
+    :param seed: The seed of the random generator
+    :type seed: int
+    :return: The addresses
+    :rtype: List[str]
+    """
+    rng = random.Random(seed)
+    addresses = []
+    for i in range(n_addresses):
+        if i % 4 == 0:
+            addresses.append('1' + ''.join(rng.choice(BASE58) for _ in range(33)))
+        elif i % 4 == 3:
+            # A Bech32 address with a broken checksum
+            address = bech32_address(rng)
+            addresses.append(address[:-1] + ('q' if address[-1] != 'q' else 'p'))
+        else:
+            addresses.append(bech32_address(rng))
+    return addresses
+
+
+def main() -> None:
+    """Run the benchmark with the options given on the command line."""
+    parser = argparse.ArgumentParser(description='Benchmark validating Bitcoin addresses')
+    parser.add_argument('--addresses', type=int, default=20000, help='The number of addresses (default: 20000)')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the random addresses (default: 0)')
+    args = parser.parse_args()
+
+    addresses = generate_addresses(n_addresses=args.addresses, seed=args.seed)
+
+    start = time.perf_counter()
+    single = [valid_address(address) for address in addresses]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bulk = validate_addresses(addresses)
+    bulk_seconds = time.perf_counter() - start
+
+    assert single == bulk
+    print(f'Addresses: {len(addresses)}, valid: {sum(bulk)}')
+    print(f'  {"valid_address":<20} {single_seconds * 1000:10.1f} ms')
+    print(f'  {"validate_addresses":<20} {bulk_seconds * 1000:10.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
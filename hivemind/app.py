@@ -16,18 +16,20 @@ from datetime import datetime
 from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
-from ipfs_dict_chain.IPFSDict import IPFSDict
-from ipfs_dict_chain.IPFS import connect
 
 from websocket_handlers import active_connections, register_websocket_routes, name_update_connections, notify_author_signature
 
-from hivemind import HivemindState, HivemindIssue, HivemindOption, HivemindOpinion, Ranking
-from hivemind.utils import verify_message
+from hivemind import CID, HivemindState, HivemindIssue, HivemindOption, HivemindOpinion, Ranking
+from hivemind import storage
+from hivemind.chain_index import ChainIndex
+from hivemind.timeline import Timeline
+from hivemind.storage import StorageDict
+from hivemind.utils import verifications, verify_message
 
 
 class StateLoadingStats:
@@ -172,6 +174,50 @@ def save_state_mapping(mapping: Dict[str, Dict[str, Any]]) -> None:
         logger.error(f"Failed to save state mapping: {str(e)}")
 
 
+_chain_indexes: Dict[Path, ChainIndex] = {}
+
+
+def get_chain_index() -> ChainIndex:
+    """Get the index of the saved states, stored in the history directory of STATES_DIR.
+
+    Returns:
+        ChainIndex: The chain index
+    """
+    directory = STATES_DIR / "history"
+    if directory not in _chain_indexes:
+        _chain_indexes[directory] = ChainIndex(directory=directory)
+    return _chain_indexes[directory]
+
+
+def record_state(hivemind_id: str, state_cid: str, operation: str, address: Optional[str] = None, state: Optional[HivemindState] = None) -> None:
+    """Record a state that was saved in the chain index, failures are only logged.
+
+    Args:
+        hivemind_id: The hivemind ID
+        state_cid: The CID of the saved state
+        operation: The operation that created the state
+        address: The address of the participant who made the change
+        state: The saved state, its chain keys are retrieved from IPFS if not given
+    """
+    try:
+        get_chain_index().record(hivemind_id, state_cid, operation=operation, address=address, link=state)
+    except Exception as e:
+        logger.error(f"Failed to record state {state_cid} in the chain index: {str(e)}")
+
+
+async def arecord_state(hivemind_id: str, state_cid: str, operation: str, address: Optional[str] = None, state: Optional[HivemindState] = None) -> None:
+    """Record a state that was saved in the chain index without blocking the event loop, see record_state.
+
+    Args:
+        hivemind_id: The hivemind ID
+        state_cid: The CID of the saved state
+        operation: The operation that created the state
+        address: The address of the participant who made the change
+        state: The saved state, its chain keys are retrieved from IPFS if not given
+    """
+    await asyncio.to_thread(record_state, hivemind_id, state_cid, operation, address, state)
+
+
 class StateHashUpdate(BaseModel):
     """Pydantic model for updating state hash."""
     hivemind_id: str
@@ -239,7 +285,7 @@ class HivemindIssueCreate(BaseModel):
     tags: List[str]
     answer_type: str
     constraints: Optional[Dict[str, Union[str, int, float, list, dict]]] = None
-    restrictions: Optional[Dict[str, Union[List[str], int]]] = None
+    restrictions: Optional[Dict[str, Union[List[str], int, str]]] = None
     on_selection: Optional[str] = None
     author: Optional[str] = None
 
@@ -359,9 +405,9 @@ async def fetch_state(request: IPFSHashRequest):
         stats.state_cid = cid
         logger.info(f"Attempting to load state from IPFS with CID: {cid}")
 
-        # Load the state in a thread
+        # Load the state, its issue, options and opinions are fetched concurrently
         state_start = time.time()
-        state = await asyncio.to_thread(lambda: HivemindState(cid=cid))
+        state = await HivemindState.aload(cid=cid)
         stats.state_load_time = time.time() - state_start
 
         # Get basic info that doesn't require IPFS calls
@@ -446,11 +492,7 @@ async def fetch_state(request: IPFSHashRequest):
                 # Format full results for the frontend
                 formatted_results = []
                 for option in sorted_options:
-                    # Remove '/ipfs/' prefix if present when looking up the score
-                    cid = option.cid()
-                    if cid.startswith('/ipfs/'):
-                        cid = cid[6:]  # Remove '/ipfs/' prefix
-                    score = question_results.get(cid, {}).get('score', 0)
+                    score = question_results.get(CID(option.cid()), {}).get('score', 0)
                     formatted_results.append({
                         'cid': option.cid(),
                         'value': option.value if hasattr(option, 'value') else None,
@@ -535,7 +577,7 @@ def process_winning_option(sorted_options, question_results):
     """
     if sorted_options:
         winning_option = sorted_options[0]
-        cid = winning_option.cid().replace('/ipfs/', '')
+        cid = CID(winning_option.cid())
         score = question_results.get(cid, {}).get('score', 0)
         if score is None:
             score = 0
@@ -691,6 +733,7 @@ async def create_issue(issue: HivemindIssueCreate):
 
                 state_cid = initial_state.save()
                 logger.info(f"Saved state to IPFS with CID: {state_cid}")
+                record_state(issue_cid, state_cid, operation="create_issue", state=initial_state)
 
                 # Save state mapping
                 mapping = load_state_mapping()
@@ -726,7 +769,7 @@ async def add_option_page(request: Request, hivemind_id: str):
     """Render the add option page."""
     try:
         # Load the hivemind issue to get answer type and constraints
-        issue = await asyncio.to_thread(lambda: HivemindIssue(cid=hivemind_id))
+        issue = await HivemindIssue.aload(cid=hivemind_id)
 
         return templates.TemplateResponse(
             request,
@@ -771,7 +814,7 @@ async def create_option(option: OptionCreate):
             logger.info(f"Option value set successfully, answer_type: {new_option.get_answer_type()}")
 
         # Save the option to IPFS
-        option_cid = await asyncio.to_thread(lambda: new_option.save())
+        option_cid = await new_option.asave()
         logger.info(f"Option saved with CID: {option_cid}")
 
         # Get the latest state hash from hivemind_states.json
@@ -783,7 +826,7 @@ async def create_option(option: OptionCreate):
         logger.info(f"Using latest state hash: {latest_state_hash}")
 
         # Load the state
-        state = await asyncio.to_thread(lambda: HivemindState(cid=latest_state_hash))
+        state = await HivemindState.aload(cid=latest_state_hash)
         logger.info(f"Loaded state with CID: {latest_state_hash}")
 
         # Check if this hivemind has address restrictions for options
@@ -794,6 +837,9 @@ async def create_option(option: OptionCreate):
             if 'addresses' in issue.restrictions:
                 has_address_restrictions = True
                 logger.info(f"Hivemind has address restrictions: {issue.restrictions['addresses']}")
+            elif 'address_set' in issue.restrictions:
+                has_address_restrictions = True
+                logger.info(f"Hivemind has address restrictions in address set: {issue.restrictions['address_set']}")
 
         # If there are address restrictions, we'll need a signature
         needs_signature = has_address_restrictions
@@ -807,8 +853,9 @@ async def create_option(option: OptionCreate):
                 logger.info(f"Option added to state")
 
                 # Save the updated state
-                new_state_cid = await asyncio.to_thread(lambda: state.save())
+                new_state_cid = await state.asave()
                 logger.info(f"Updated state saved with CID: {new_state_cid}")
+                await arecord_state(option.hivemind_id, new_state_cid, operation="add_option", state=state)
 
                 # Update the state mapping
                 await update_state(StateHashUpdate(
@@ -850,7 +897,7 @@ async def add_opinion_page(request: Request, cid: str):
     """Render the add opinion page."""
     try:
         # Load the state to get issue details
-        state = await asyncio.to_thread(lambda: HivemindState(cid=cid))
+        state = await HivemindState.aload(cid=cid)
         issue = state.hivemind_issue()
 
         # Load options
@@ -889,6 +936,18 @@ async def add_opinion_page(request: Request, cid: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/storage_stats")
+async def get_storage_stats():
+    """Get the IPFS access statistics, including connection reuse and latency."""
+    return storage.stats()
+
+
+@app.get("/api/signature_stats")
+async def get_signature_stats():
+    """Get the statistics of the cache of verified signatures."""
+    return verifications.stats()
+
+
 @app.get("/api/latest_state/{hivemind_id}")
 async def get_latest_state(hivemind_id: str):
     """Get the latest state hash for a given hivemind ID."""
@@ -924,6 +983,68 @@ async def update_state(state_update: StateHashUpdate):
     return {"status": "success", "hivemind_id": state_update.hivemind_id, **state_data}
 
 
+@app.get("/api/history/{hivemind_id}")
+async def get_history(hivemind_id: str, start: Optional[int] = None, end: Optional[int] = None):
+    """Get the recorded states of a hivemind, optionally only those saved between start and end (Unix timestamps)."""
+    states = await asyncio.to_thread(get_chain_index().history, hivemind_id, start=start, end=end)
+    if not states and hivemind_id not in load_state_mapping():
+        raise HTTPException(status_code=404, detail="Hivemind ID not found")
+    return {"hivemind_id": hivemind_id, "states": states}
+
+
+@app.get("/api/history/{hivemind_id}/{state_cid}")
+async def get_history_entry(hivemind_id: str, state_cid: str):
+    """Get the recorded sequence number, timestamp, operation and address of a state."""
+    entry = await asyncio.to_thread(get_chain_index().get, hivemind_id, state_cid)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="State not found in the history of this hivemind")
+    return {"hivemind_id": hivemind_id, **entry}
+
+
+@app.get("/api/timeline/{hivemind_id}")
+async def get_timeline(hivemind_id: str, bucket: Optional[int] = None):
+    """Stream the scores of the options after each state of a hivemind as NDJSON, one line per state or per bucket of seconds."""
+    mapping = load_state_mapping()
+    if hivemind_id not in mapping:
+        raise HTTPException(status_code=404, detail="Hivemind ID not found")
+    if bucket is not None and bucket <= 0:
+        raise HTTPException(status_code=400, detail="Bucket must be a positive number of seconds")
+
+    snapshots = Timeline(mapping[hivemind_id]["state_hash"]).snapshots(bucket=bucket)
+    try:
+        # Loads the head state, so a state that can not be loaded fails the request instead of the stream
+        first = await asyncio.to_thread(next, snapshots, None)
+    except Exception as e:
+        logger.error(f"Failed to build the timeline of {hivemind_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to build timeline: {str(e)}")
+
+    def stream():
+        # A sync generator, so the states are loaded in a worker thread
+        if first is None:
+            return
+        yield json.dumps(first) + "\n"
+        try:
+            for snapshot in snapshots:
+                yield json.dumps(snapshot) + "\n"
+        except Exception as e:
+            # The response has started, so the error is the last line
+            logger.error(f"Failed to build the timeline of {hivemind_id}: {str(e)}")
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/api/diff/{state_cid}/{other_cid}")
+async def get_state_diff(state_cid: str, other_cid: str):
+    """Get the added and removed options, changed opinions, signatures and participant names between two states."""
+    try:
+        diff = await asyncio.to_thread(lambda: HivemindState.diff_cids(state_cid, other_cid))
+    except Exception as e:
+        logger.error(f"Failed to diff states {state_cid} and {other_cid}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to diff states: {str(e)}")
+    return {"state_cid": state_cid, "other_cid": other_cid, **diff}
+
+
 @app.get("/api/all_states")
 async def get_all_states():
     """Get all tracked hivemind states."""
@@ -1030,7 +1151,7 @@ async def sign_opinion(request: Request):
         # Get hivemind state from the opinion data
         try:
             # First load the opinion to get its hivemind_id
-            opinion = await asyncio.to_thread(lambda: HivemindOpinion(cid=opinion_hash))
+            opinion = await HivemindOpinion.aload(cid=opinion_hash)
 
             if not opinion.hivemind_id:
                 raise HTTPException(status_code=400, detail="Opinion does not have an associated hivemind state")
@@ -1043,8 +1164,7 @@ async def sign_opinion(request: Request):
             latest_state_hash = state_data["state_hash"]
             logger.info(f"Using latest state hash: {latest_state_hash}")
 
-            # Use to_thread to run the synchronous HivemindState operations
-            state = await asyncio.to_thread(lambda: HivemindState(cid=latest_state_hash))
+            state = await HivemindState.aload(cid=latest_state_hash)
             logger.info(f"Loaded state with CID: {opinion.hivemind_id}")
 
             # Verify the message signature before adding the opinion
@@ -1053,7 +1173,7 @@ async def sign_opinion(request: Request):
                 raise HTTPException(status_code=400, detail="Signature is invalid")
             logger.info(f"signature ok")
 
-            # Add the opinion using to_thread as well
+            # Adding verifies the signature and validates the opinion, which is CPU bound
             await asyncio.to_thread(
                 lambda: state.add_opinion(
                     timestamp=timestamp,
@@ -1065,9 +1185,9 @@ async def sign_opinion(request: Request):
 
             logger.info(f"Added opinion successfully")
 
-            # Save the state using to_thread
-            new_cid = await asyncio.to_thread(lambda: state.save())
+            new_cid = await state.asave()
             logger.info(f"Latest state CID: {new_cid}")
+            await arecord_state(opinion.hivemind_id, new_cid, operation="add_opinion", address=address, state=state)
 
             # Calculate new results for the specific question
             logger.info("Calculating updated results...")
@@ -1081,7 +1201,7 @@ async def sign_opinion(request: Request):
             formatted_results = []
             if sorted_options:
                 winner = sorted_options[0]
-                score = results.get(winner.cid().replace('/ipfs/', ''), {}).get('score', 0) or 0
+                score = results.get(CID(winner.cid()), {}).get('score', 0) or 0
                 formatted_results.append({
                     'text': winner.text if hasattr(winner, 'text') else str(winner.value) if hasattr(winner, 'value') else '',
                     'value': winner.value if hasattr(winner, 'value') else '',
@@ -1177,7 +1297,7 @@ async def sign_option(request: Request):
         # Get hivemind state from the option data
         try:
             # First load the option to get its hivemind_id
-            option = await asyncio.to_thread(lambda: HivemindOption(cid=option_hash))
+            option = await HivemindOption.aload(cid=option_hash)
             logger.info(f"Loaded option with value: {option.value} (type: {type(option.value).__name__}), answer_type: {option.get_answer_type()}")
 
             if not option.hivemind_id:
@@ -1191,8 +1311,7 @@ async def sign_option(request: Request):
             latest_state_hash = state_data["state_hash"]
             logger.info(f"Using latest state hash: {latest_state_hash}")
 
-            # Use to_thread to run the synchronous HivemindState operations
-            state = await asyncio.to_thread(lambda: HivemindState(cid=latest_state_hash))
+            state = await HivemindState.aload(cid=latest_state_hash)
             logger.info(f"Loaded state with CID: {option.hivemind_id}")
 
             # Verify the message signature before adding the option
@@ -1201,7 +1320,7 @@ async def sign_option(request: Request):
                 raise HTTPException(status_code=400, detail="Signature is invalid")
             logger.info(f"signature ok")
 
-            # Add the option using to_thread as well
+            # Adding verifies the signature and validates the option, which is CPU bound
             await asyncio.to_thread(
                 lambda: state.add_option(
                     timestamp=timestamp,
@@ -1213,9 +1332,9 @@ async def sign_option(request: Request):
 
             logger.info(f"Added option successfully")
 
-            # Save the state using to_thread
-            new_cid = await asyncio.to_thread(lambda: state.save())
+            new_cid = await state.asave()
             logger.info(f"Latest state CID: {new_cid}")
+            await arecord_state(option.hivemind_id, new_cid, operation="add_option", address=address, state=state)
 
             # Update the state mapping with new state hash and metadata
             issue = state.hivemind_issue()
@@ -1321,8 +1440,7 @@ async def prepare_name_update(request: Request):
             )
 
         # Get the hivemind issue to generate identification CID
-        # Use to_thread to run the synchronous operations
-        issue = await asyncio.to_thread(lambda: HivemindIssue(cid=hivemind_id))
+        issue = await HivemindIssue.aload(cid=hivemind_id)
 
         # Generate identification CID
         identification_cid = await asyncio.to_thread(lambda: issue.get_identification_cid(name))
@@ -1377,15 +1495,9 @@ async def sign_name_update(request: Request):
             timestamp = int(timestamp_str)
             logger.info(f"Parsed timestamp: {timestamp}, identification_cid: {identification_cid}")
 
-            # Load the IPFSDict with the identification_cid to get hivemind_id and name
+            # Load the identification data to get hivemind_id and name
             try:
-                # Define a function to handle IPFS connection and data loading
-                def load_ipfs_data():
-                    connect(host='127.0.0.1', port=5001)
-                    return IPFSDict(cid=identification_cid)
-
-                # Load the identification data
-                identification_data = await asyncio.to_thread(load_ipfs_data)
+                identification_data = await StorageDict.aload(cid=identification_cid)
                 hivemind_id = identification_data['hivemind_id']
                 name = identification_data['name']
 
@@ -1414,8 +1526,7 @@ async def sign_name_update(request: Request):
                 if not state_cid:
                     raise HTTPException(status_code=404, detail=f"No state hash found for hivemind ID: {hivemind_id}")
 
-                # Use to_thread to run the synchronous HivemindState operations
-                state = await asyncio.to_thread(lambda: HivemindState(cid=state_cid))
+                state = await HivemindState.aload(cid=state_cid)
 
                 # Update the participant name
                 await asyncio.to_thread(
@@ -1429,7 +1540,8 @@ async def sign_name_update(request: Request):
                 )
 
                 # Save the state
-                new_cid = await asyncio.to_thread(lambda: state.save())
+                new_cid = await state.asave()
+                await arecord_state(hivemind_id, new_cid, operation="update_name", address=address, state=state)
 
                 # Update the state mapping
                 issue = state.hivemind_issue()
@@ -1569,7 +1681,7 @@ async def select_consensus(request: Request):
             logger.info(f"Using latest state hash: {latest_state_hash}")
 
             # Load the state with the correct CID
-            state = await asyncio.to_thread(lambda: HivemindState(cid=latest_state_hash))
+            state = await HivemindState.aload(cid=latest_state_hash)
             logger.info(f"Successfully loaded state for hivemind_id: {hivemind_id}")
 
             # Load the hivemind issue
@@ -1614,8 +1726,9 @@ async def select_consensus(request: Request):
                 logger.info(f"Successfully selected consensus: {selected_options}")
 
                 # Save the state
-                new_cid = await asyncio.to_thread(lambda: state.save())
+                new_cid = await state.asave()
                 logger.info(f"Saved state with new CID: {new_cid}")
+                await arecord_state(hivemind_id, new_cid, operation="select_consensus", address=address, state=state)
 
                 # Update the state mapping with the new CID
                 state_mapping[hivemind_id]["state_hash"] = new_cid
@@ -28,8 +28,12 @@ setup(
     install_requires=[
         "ipfs-dict-chain>=1.1.0",
         "python-bitcoinlib>=0.12.2",
+        "httpx>=0.27.0",
     ],
     extras_require={
+        'fast': [
+            'coincurve>=18.0.0',
+        ],
         'dev': [
             'pytest>=7.0.0',
             'pytest-cov>=4.0.0',
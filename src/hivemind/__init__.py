@@ -4,16 +4,20 @@ Hivemind Protocol - A Condorcet-style Ranked Choice Voting System that stores al
 
 __version__ = "0.2.0"
 
+from .cid import CID
 from .issue import HivemindIssue
 from .option import HivemindOption
 from .opinion import HivemindOpinion
 from .state import HivemindState
+from .address_set import HivemindAddressSet
 from .ranking import Ranking
 
 __all__ = [
+    'CID',
     'HivemindIssue',
     'HivemindOption',
     'HivemindOpinion',
     'HivemindState',
+    'HivemindAddressSet',
     'Ranking',
 ]
@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Sharded address sets for the address restrictions of large hiveminds.
+
+A hivemind issue can list its allowed addresses inline in restrictions['addresses'],
+but then every load of the issue downloads the whole list. For large lists the issue
+can instead reference a HivemindAddressSet by CID in restrictions['address_set'].
+
+The address set object itself only contains the number of addresses, the CIDs of the
+shards and a Bloom filter of all addresses. Every shard is a separate JSON object that
+maps the addresses of that shard to their weight. To check an address only the Bloom
+filter is needed when the address is not in the set, and a single shard when it is.
+"""
+import base64
+import hashlib
+import logging
+import math
+from typing import Any, Dict, List
+
+from .storage import StorageDict, get_json, get_many, put_many
+from .validators import validate_addresses
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 4096
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+
+
+def parse_address_weights(entries: List[str]) -> Dict[str, float]:
+    """Get the weights of a list of restricted addresses.
+
+    Restricted addresses can have a weight, for example '1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa@2.5'.
+    Addresses without a valid non-negative weight get a weight of 1.0, the first entry of an address is used.
+
+    :param entries: The restricted addresses, optionally with a weight
+    :type entries: List[str]
+    :return: Dictionary of the addresses without their weight and their weights
+    :rtype: Dict[str, float]
+    """
+    weights: Dict[str, float] = {}
+    for entry in entries:
+        address, _, weight = entry.partition('@')
+        if address not in weights:
+            try:
+                value = float(weight.strip())
+            except ValueError:
+                value = 1.0
+            weights[address] = value if value >= 0 else 1.0
+
+    return weights
+
+
+def check_addresses(entries: List[str]) -> None:
+    """Check that a list of restricted addresses only contains valid mainnet or testnet Bitcoin addresses.
+
+    :param entries: The restricted addresses, optionally with a weight
+    :type entries: List[str]
+    :return: None
+    :raises Exception: If an address is not a string or not a valid Bitcoin address
+    """
+    for entry in entries:
+        if not isinstance(entry, str):
+            raise Exception('Address %s in restrictions is not a string!' % entry)
+
+    addresses = [entry.split('@')[0] for entry in entries]
+    not_mainnet = [address for address, valid in zip(addresses, validate_addresses(addresses)) if not valid]
+    testnet = validate_addresses(not_mainnet, testnet=True)
+    if not all(testnet):
+        raise Exception('Address %s in restrictions is not a valid Bitcoin address!' % not_mainnet[testnet.index(False)])
+
+
+def _address_hash(address: str) -> bytes:
+    """Hash an address for the Bloom filter and the shard assignment.
+
+    :param address: The address
+    :type address: str
+    :return: The SHA-256 digest of the address
+    :rtype: bytes
+    """
+    return hashlib.sha256(address.encode('utf-8')).digest()
+
+
+def _shard_index(digest: bytes, n_shards: int) -> int:
+    """Get the shard of an address.
+
+    :param digest: The hash of the address
+    :type digest: bytes
+    :param n_shards: The number of shards
+    :type n_shards: int
+    :return: The index of the shard
+    :rtype: int
+    """
+    return int.from_bytes(digest[16:24], 'big') % n_shards
+
+
+class BloomFilter:
+    """A Bloom filter of addresses.
+
+    The bit positions are derived from the SHA-256 hash of an address with double hashing.
+
+    :ivar size: The number of bits
+    :vartype size: int
+    :ivar hashes: The number of bit positions per address
+    :vartype hashes: int
+    """
+
+    def __init__(self, size: int, hashes: int, data: bytes | None = None) -> None:
+        """Initialize a new BloomFilter.
+
+        :param size: The number of bits
+        :type size: int
+        :param hashes: The number of bit positions per address
+        :type hashes: int
+        :param data: The bits of an existing filter
+        :type data: bytes | None
+        :return: None
+        :raises Exception: If the data does not match the size
+        """
+        if size < 1 or hashes < 1:
+            raise Exception('Invalid Bloom filter: size and hashes must be positive')
+
+        self.size = size
+        self.hashes = hashes
+        self._bits = bytearray(data) if data is not None else bytearray((size + 7) // 8)
+        if len(self._bits) != (size + 7) // 8:
+            raise Exception('Invalid Bloom filter: expected %s bytes, got %s' % ((size + 7) // 8, len(self._bits)))
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE) -> 'BloomFilter':
+        """Create an empty filter with the optimal size for a number of addresses.
+
+        :param capacity: The number of addresses
+        :type capacity: int
+        :param false_positive_rate: The wanted false positive rate
+        :type false_positive_rate: float
+        :return: The filter
+        :rtype: BloomFilter
+        """
+        capacity = max(capacity, 1)
+        size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size=size, hashes=hashes)
+
+    def _positions(self, digest: bytes) -> List[int]:
+        """Get the bit positions of a hashed address.
+
+        :param digest: The hash of the address
+        :type digest: bytes
+        :return: The bit positions
+        :rtype: List[int]
+        """
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add_digest(self, digest: bytes) -> None:
+        """Add a hashed address to the filter.
+
+        :param digest: The hash of the address
+        :type digest: bytes
+        :return: None
+        """
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def contains_digest(self, digest: bytes) -> bool:
+        """Check if a hashed address might be in the filter.
+
+        :param digest: The hash of the address
+        :type digest: bytes
+        :return: False if the address is certainly not in the filter
+        :rtype: bool
+        """
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    def add(self, address: str) -> None:
+        """Add an address to the filter.
+
+        :param address: The address
+        :type address: str
+        :return: None
+        """
+        self.add_digest(_address_hash(address))
+
+    def __contains__(self, address: str) -> bool:
+        """Check if an address might be in the filter.
+
+        :param address: The address
+        :type address: str
+        :return: False if the address is certainly not in the filter
+        :rtype: bool
+        """
+        return self.contains_digest(_address_hash(address))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the filter as JSON data.
+
+        :return: The size, the number of hashes and the base64 encoded bits
+        :rtype: Dict[str, Any]
+        """
+        return {'size': self.size, 'hashes': self.hashes, 'data': base64.b64encode(bytes(self._bits)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BloomFilter':
+        """Create a filter from JSON data.
+
+        :param data: The data returned by to_dict
+        :type data: Dict[str, Any]
+        :return: The filter
+        :rtype: BloomFilter
+        :raises Exception: If the data is not a valid filter
+        """
+        try:
+            return cls(size=data['size'], hashes=data['hashes'], data=base64.b64decode(data['data']))
+        except (KeyError, TypeError, ValueError) as ex:
+            raise Exception('Invalid Bloom filter: %s' % ex)
+
+
+class HivemindAddressSet(StorageDict):
+    """A sharded set of allowed addresses and their weights.
+
+    :ivar count: The number of addresses
+    :vartype count: int
+    :ivar shards: The CIDs of the shards
+    :vartype shards: List[str]
+    :ivar bloom: The Bloom filter of all addresses, see BloomFilter.to_dict
+    :vartype bloom: Dict[str, Any] | None
+    """
+
+    def __init__(self, cid: str | None = None) -> None:
+        """Initialize a new HivemindAddressSet.
+
+        :param cid: The IPFS multihash of the address set
+        :type cid: str | None
+        :return: None
+        """
+        self.count: int = 0
+        self.shards: List[str] = []
+        self.bloom: Dict[str, Any] | None = None
+
+        self._bloom: BloomFilter | None = None
+        self._shards: Dict[int, Dict[str, float]] = {}
+
+        super().__init__(cid=cid)
+
+    def _populate(self, cid: str, data: Dict[str, Any]) -> None:
+        """Replace the data of this address set and forget the loaded shards.
+
+        :param cid: The IPFS multihash of the data
+        :type cid: str
+        :param data: The data
+        :type data: Dict[str, Any]
+        :return: None
+        """
+        super()._populate(cid, data)
+        self._bloom = None
+        self._shards = {}
+
+    def set_addresses(self, entries: List[str], shard_size: int = DEFAULT_SHARD_SIZE,
+                      false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE) -> None:
+        """Set the addresses of the set and store its shards.
+
+        The shards are stored right away, the address set itself still needs to be saved.
+
+        :param entries: The allowed addresses, optionally with a weight like 'address@2.5'
+        :type entries: List[str]
+        :param shard_size: The average number of addresses per shard
+        :type shard_size: int
+        :param false_positive_rate: The false positive rate of the Bloom filter
+        :type false_positive_rate: float
+        :return: None
+        :raises Exception: If an address is invalid
+        """
+        if not isinstance(entries, list):
+            raise Exception('addresses must be a list, got %s instead' % type(entries))
+        if shard_size < 1:
+            raise Exception('shard_size must be a positive integer')
+
+        check_addresses(entries)
+        weights = parse_address_weights(entries)
+
+        n_shards = max(1, math.ceil(len(weights) / shard_size))
+        shards: List[Dict[str, float]] = [{} for _ in range(n_shards)]
+        bloom = BloomFilter.for_capacity(len(weights), false_positive_rate=false_positive_rate)
+        for address, weight in weights.items():
+            digest = _address_hash(address)
+            bloom.add_digest(digest)
+            shards[_shard_index(digest, n_shards)][address] = weight
+
+        self.shards = put_many(shards)
+        self.count = len(weights)
+        self.bloom = bloom.to_dict()
+        self._bloom = bloom
+        self._shards = dict(enumerate(shards))
+        LOG.info('Stored address set of %s addresses in %s shards' % (self.count, n_shards))
+
+    def _bloom_filter(self) -> BloomFilter:
+        """Get the decoded Bloom filter.
+
+        :return: The Bloom filter
+        :rtype: BloomFilter
+        :raises Exception: If the address set has no addresses set
+        """
+        if self._bloom is None:
+            if self.bloom is None:
+                raise Exception('Address set has no Bloom filter')
+            self._bloom = BloomFilter.from_dict(self.bloom)
+
+        return self._bloom
+
+    def _shard(self, index: int) -> Dict[str, float]:
+        """Get a shard, loading it if needed.
+
+        :param index: The index of the shard
+        :type index: int
+        :return: The addresses of the shard and their weights
+        :rtype: Dict[str, float]
+        """
+        if index not in self._shards:
+            self._shards[index] = get_json(self.shards[index])
+
+        return self._shards[index]
+
+    def weight(self, address: str) -> float | None:
+        """Get the weight of an address.
+
+        :param address: The address
+        :type address: str
+        :return: The weight, or None if the address is not in the set
+        :rtype: float | None
+        """
+        if not isinstance(address, str) or len(self.shards) == 0:
+            return None
+
+        digest = _address_hash(address)
+        if not self._bloom_filter().contains_digest(digest):
+            return None
+
+        return self._shard(_shard_index(digest, len(self.shards))).get(address)
+
+    def contains(self, address: str) -> bool:
+        """Check if an address is in the set.
+
+        :param address: The address
+        :type address: str
+        :return: True if the address is in the set
+        :rtype: bool
+        """
+        return self.weight(address) is not None
+
+    def address_weights(self) -> Dict[str, float]:
+        """Get all addresses of the set and their weights, loading all shards.
+
+        :return: Dictionary of the addresses and their weights
+        :rtype: Dict[str, float]
+        """
+        missing = [index for index in range(len(self.shards)) if index not in self._shards]
+        for index, shard in zip(missing, get_many([self.shards[index] for index in missing])):
+            self._shards[index] = shard
+
+        weights: Dict[str, float] = {}
+        for index in range(len(self.shards)):
+            weights.update(self._shards[index])
+
+        return weights
@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Local content-addressed storage backends.
+
+The backends in this module implement the same interface as the IPFS transports (see
+hivemind.transport), but keep the content in memory or in a local directory instead
+of sending it to an IPFS daemon. The CIDs are computed locally exactly like
+'ipfs add' does with its default settings (CIDv0 of a UnixFS file with 256 KiB chunks
+in a balanced DAG), so data stored in a local backend has the same CID as the same
+data stored on IPFS. This makes it possible to run the tests and benchmarks without
+an IPFS daemon:
+
+    from hivemind import storage
+    from hivemind.backends import MemoryBackend
+
+    storage.set_transport(MemoryBackend())
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+from bitcoin.base58 import decode as b58decode, encode as b58encode
+from ipfs_dict_chain.IPFS import IPFSError
+
+from .transport import KuboTransport, Transport
+
+LOG = logging.getLogger(__name__)
+
+CHUNK_SIZE = 262144
+MAX_LINKS = 174
+
+BACKENDS = ('ipfs', 'memory', 'filesystem')
+
+
+def _varint(value: int) -> bytes:
+    """Encode an unsigned integer as a protobuf varint.
+
+    :param value: The integer
+    :type value: int
+    :return: The encoded integer
+    :rtype: bytes
+    """
+    result = bytearray()
+    while value > 0x7f:
+        result.append((value & 0x7f) | 0x80)
+        value >>= 7
+    result.append(value)
+    return bytes(result)
+
+
+def _field(number: int, value: bytes) -> bytes:
+    """Encode a length-delimited protobuf field.
+
+    :param number: The field number
+    :type number: int
+    :param value: The value of the field
+    :type value: bytes
+    :return: The encoded field
+    :rtype: bytes
+    """
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _unixfs_file(data: bytes, filesize: int, blocksizes: List[int], raw: bool = False) -> bytes:
+    """Encode the UnixFS metadata of a file node.
+
+    :param data: The content of a leaf node, empty for an inner node
+    :type data: bytes
+    :param filesize: The size of the content below this node
+    :type filesize: int
+    :param blocksizes: The content size of every child node
+    :type blocksizes: List[int]
+    :param raw: True to encode the node with the Raw type instead of the File type
+    :type raw: bool
+    :return: The encoded UnixFS Data message
+    :rtype: bytes
+    """
+    result = b'\x08\x00' if raw else b'\x08\x02'
+    if data:
+        result += _field(2, data)
+    result += b'\x18' + _varint(filesize)
+    for size in blocksizes:
+        result += b'\x20' + _varint(size)
+    return result
+
+
+def _dag_node(links: List[Tuple[bytes, int]], data: bytes) -> Tuple[bytes, bytes]:
+    """Encode a dag-pb node and compute its multihash.
+
+    :param links: The multihash and the cumulative size of every child node
+    :type links: List[Tuple[bytes, int]]
+    :param data: The UnixFS Data message
+    :type data: bytes
+    :return: The multihash and the encoded node
+    :rtype: Tuple[bytes, bytes]
+    """
+    block = b''.join(_field(2, _field(1, multihash) + _field(2, b'') + b'\x18' + _varint(tsize)) for multihash, tsize in links)
+    block += _field(1, data)
+    return b'\x12\x20' + hashlib.sha256(block).digest(), block
+
+
+def compute_cid(content: bytes) -> str:
+    """Compute the CID that 'ipfs add' assigns to the given content.
+
+    :param content: The content
+    :type content: bytes
+    :return: The CIDv0 of the content
+    :rtype: str
+    """
+    # Every node is (multihash, cumulative size of the encoded blocks, size of the content)
+    nodes = []
+    for offset in range(0, max(len(content), 1), CHUNK_SIZE):
+        chunk = content[offset:offset + CHUNK_SIZE]
+        # The balanced layout of go-unixfs makes the first leaf a File node and the other leaves Raw nodes
+        multihash, block = _dag_node(links=[], data=_unixfs_file(data=chunk, filesize=len(chunk), blocksizes=[], raw=offset > 0))
+        nodes.append((multihash, len(block), len(chunk)))
+
+    while len(nodes) > 1:
+        parents = []
+        for i in range(0, len(nodes), MAX_LINKS):
+            children = nodes[i:i + MAX_LINKS]
+            sizes = [size for _, _, size in children]
+            multihash, block = _dag_node(links=[(multihash, tsize) for multihash, tsize, _ in children],
+                                         data=_unixfs_file(data=b'', filesize=sum(sizes), blocksizes=sizes))
+            parents.append((multihash, len(block) + sum(tsize for _, tsize, _ in children), sum(sizes)))
+        nodes = parents
+
+    return b58encode(nodes[0][0])
+
+
+def valid_cid(cid: str) -> bool:
+    """Check if a string is a CIDv0 that a local backend can have stored.
+
+    :param cid: The CID
+    :type cid: str
+    :return: True if the CID is a base58 encoded sha2-256 multihash
+    :rtype: bool
+    """
+    try:
+        multihash = b58decode(cid)
+    except Exception:
+        return False
+    return len(multihash) == 34 and multihash[:2] == b'\x12\x20'
+
+
+class BackendStats:
+    """Thread-safe read and write statistics of a local backend."""
+
+    def __init__(self) -> None:
+        """Initialize new statistics.
+
+        :return: None
+        """
+        self._lock = threading.Lock()
+        self.reads: int = 0
+        self.writes: int = 0
+        self.errors: int = 0
+
+    def record(self, write: bool = False, error: bool = False) -> None:
+        """Record a read or write.
+
+        :param write: Whether the request was a write
+        :type write: bool
+        :param error: Whether the request failed
+        :type error: bool
+        :return: None
+        """
+        with self._lock:
+            if write:
+                self.writes += 1
+            else:
+                self.reads += 1
+            if error:
+                self.errors += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        """Get the statistics as a dict.
+
+        :return: Dictionary with the number of requests, reads, writes and errors
+        :rtype: Dict[str, int]
+        """
+        with self._lock:
+            return {'requests': self.reads + self.writes, 'reads': self.reads, 'writes': self.writes, 'errors': self.errors}
+
+
+class MemoryBackend(Transport):
+    """Backend that keeps all content in a dict in memory.
+
+    :ivar data: The stored content by CID
+    :vartype data: Dict[str, bytes]
+    """
+
+    def __init__(self) -> None:
+        """Initialize a new, empty MemoryBackend.
+
+        :return: None
+        """
+        self.data: Dict[str, bytes] = {}
+        self._stats = BackendStats()
+
+    async def cat(self, cid: str) -> bytes:
+        """Get the content of a CID.
+
+        :param cid: The CID, without the '/ipfs/' prefix
+        :type cid: str
+        :return: The content
+        :rtype: bytes
+        :raises IPFSError: If the CID is not stored
+        """
+        content = self.data.get(cid)
+        self._stats.record(error=content is None)
+        if content is None:
+            raise IPFSError('block not found: %s' % cid)
+
+        return content
+
+    async def add(self, content: bytes) -> str:
+        """Store content and return its CID.
+
+        :param content: The content
+        :type content: bytes
+        :return: The CID of the content
+        :rtype: str
+        """
+        cid = compute_cid(content)
+        self.data[cid] = bytes(content)
+        self._stats.record(write=True)
+        return cid
+
+    def clear(self) -> None:
+        """Remove all stored content.
+
+        :return: None
+        """
+        self.data.clear()
+
+    def __len__(self) -> int:
+        """Get the number of stored CIDs.
+
+        :return: The number of stored CIDs
+        :rtype: int
+        """
+        return len(self.data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the request statistics of this backend.
+
+        :return: Dictionary with the number of requests, reads, writes and errors
+        :rtype: Dict[str, Any]
+        """
+        return self._stats.as_dict()
+
+
+class FileSystemBackend(Transport):
+    """Backend that stores every CID as a file in a local directory.
+
+    The files are spread over subdirectories named after the last two characters of
+    the CID, so a directory never holds too many files. The content is written to a
+    temporary file first and then renamed, so a reader never sees a partial file.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Initialize a new FileSystemBackend.
+
+        :param directory: The directory to store the content in, it is created if needed
+        :type directory: str
+        :return: None
+        """
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self._stats = BackendStats()
+
+    def path(self, cid: str) -> str:
+        """Get the path of the file of a CID.
+
+        :param cid: The CID, without the '/ipfs/' prefix
+        :type cid: str
+        :return: The path of the file
+        :rtype: str
+        """
+        return os.path.join(self.directory, cid[-2:], cid)
+
+    def _read(self, cid: str) -> bytes:
+        """Read the content of a CID from its file.
+
+        :param cid: The CID, without the '/ipfs/' prefix
+        :type cid: str
+        :return: The content
+        :rtype: bytes
+        :raises IPFSError: If the CID is not stored
+        """
+        if not valid_cid(cid):
+            raise IPFSError('invalid cid: %s' % cid)
+
+        try:
+            with open(self.path(cid), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise IPFSError('block not found: %s' % cid)
+
+    def _write(self, content: bytes) -> str:
+        """Write content to the file of its CID.
+
+        :param content: The content
+        :type content: bytes
+        :return: The CID of the content
+        :rtype: str
+        """
+        cid = compute_cid(content)
+        path = self.path(cid)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = '%s.%s.%s.tmp' % (path, os.getpid(), threading.get_ident())
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        return cid
+
+    async def cat(self, cid: str) -> bytes:
+        """Get the content of a CID.
+
+        :param cid: The CID, without the '/ipfs/' prefix
+        :type cid: str
+        :return: The content
+        :rtype: bytes
+        :raises IPFSError: If the CID is not stored
+        """
+        try:
+            content = await asyncio.to_thread(self._read, cid)
+        except IPFSError:
+            self._stats.record(error=True)
+            raise
+
+        self._stats.record()
+        return content
+
+    async def add(self, content: bytes) -> str:
+        """Store content and return its CID.
+
+        :param content: The content
+        :type content: bytes
+        :return: The CID of the content
+        :rtype: str
+        :raises IPFSError: If the content can not be written
+        """
+        try:
+            cid = await asyncio.to_thread(self._write, content)
+        except OSError as ex:
+            self._stats.record(write=True, error=True)
+            raise IPFSError('%s: %s' % (type(ex).__name__, ex))
+
+        self._stats.record(write=True)
+        return cid
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the request statistics of this backend.
+
+        :return: Dictionary with the number of requests, reads, writes and errors
+        :rtype: Dict[str, Any]
+        """
+        return self._stats.as_dict()
+
+
+def create_backend(name: str, directory: str | None = None) -> Transport:
+    """Create a storage backend by name.
+
+    :param name: The name of the backend: 'ipfs', 'memory' or 'filesystem'
+    :type name: str
+    :param directory: The directory of the 'filesystem' backend
+    :type directory: str | None
+    :return: The backend
+    :rtype: Transport
+    :raises Exception: If the name is unknown or the 'filesystem' backend has no directory
+    """
+    if name == 'ipfs':
+        return KuboTransport()
+    elif name == 'memory':
+        return MemoryBackend()
+    elif name == 'filesystem':
+        if directory is None:
+            raise Exception('The filesystem backend needs a directory')
+        return FileSystemBackend(directory=directory)
+
+    raise Exception('Unknown storage backend %s, must be one of %s' % (name, ', '.join(BACKENDS)))
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""A local index of the saved states of hiveminds.
+
+Questions about the history of a hivemind, like which states were saved in a time
+range or who made a change, otherwise need a walk over the previous_cid links of its
+state chain on IPFS. A ChainIndex records every state that is saved locally in an
+append-only JSON Lines file per hivemind, one line per state:
+
+    {"cid": ..., "previous_cid": ..., "sequence": ..., "timestamp": ...,
+     "operation": ..., "address": ...}
+
+The sequence number, timestamp and previous_cid are read from the saved state (see
+StorageDictChain.skip_links), the operation and address are given by the caller.
+"""
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .cid import CID
+from .storage import get_json
+
+LOG = logging.getLogger(__name__)
+
+
+class ChainIndex:
+    """An append-only index of the saved states of hiveminds, see the module docstring."""
+
+    def __init__(self, directory: str | Path) -> None:
+        """Initialize a new ChainIndex.
+
+        :param directory: The directory of the index files, it is created if it does not exist
+        :type directory: str | Path
+        :return: None
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_cid: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def _path(self, hivemind_id: str) -> Path:
+        """Get the index file of a hivemind.
+
+        :param hivemind_id: The CID of the hivemind issue
+        :type hivemind_id: str
+        :return: The path of the file
+        :rtype: Path
+        """
+        return self.directory / ('%s.jsonl' % CID(hivemind_id))
+
+    def _load(self, hivemind_id: str) -> List[Dict[str, Any]]:
+        """Get the entries of a hivemind, reading its index file the first time.
+
+        Hiveminds without an index file are not cached, so queries for unknown
+        hiveminds do not grow the cache.
+
+        Must be called with the lock held.
+
+        :param hivemind_id: The CID of the hivemind issue
+        :type hivemind_id: str
+        :return: The entries, in the order they were recorded
+        :rtype: List[Dict[str, Any]]
+        """
+        hivemind_id = CID(hivemind_id)
+        if hivemind_id in self._entries:
+            return self._entries[hivemind_id]
+
+        path = self._path(hivemind_id)
+        if not path.exists():
+            return []
+
+        entries = []
+        with open(path, 'r') as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    LOG.warning('Skipping invalid line %s of chain index %s' % (line_number, path))
+
+        self._entries[hivemind_id] = entries
+        self._by_cid[hivemind_id] = {entry['cid']: entry for entry in entries}
+        return entries
+
+    def record(self, hivemind_id: str, cid: str, operation: str | None = None, address: str | None = None,
+               link: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        """Record a saved state of a hivemind, a state that is already recorded is not recorded again.
+
+        :param hivemind_id: The CID of the hivemind issue
+        :type hivemind_id: str
+        :param cid: The CID of the state
+        :type cid: str
+        :param operation: The operation that created the state, for example 'add_opinion'
+        :type operation: str | None
+        :param address: The address of the participant who made the change
+        :type address: str | None
+        :param link: The stored data of the state, it is retrieved if not given
+        :type link: Dict[str, Any] | None
+        :return: The entry of the state
+        :rtype: Dict[str, Any]
+        """
+        hivemind_id, cid = CID(hivemind_id), CID(cid)
+        if link is None:
+            link = get_json(cid=cid)
+
+        previous_cid = link.get('previous_cid')
+        timestamp = link.get('timestamp')
+        entry = {
+            'cid': cid,
+            'previous_cid': CID(previous_cid) if previous_cid is not None else None,
+            'sequence': link.get('sequence'),
+            'timestamp': timestamp if isinstance(timestamp, int) else int(time.time()),
+            'operation': operation,
+            'address': address,
+        }
+
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            entries = self._load(hivemind_id)
+            by_cid = self._by_cid.get(hivemind_id, {})
+            if cid in by_cid:
+                return by_cid[cid]
+
+            with open(self._path(hivemind_id), 'a') as f:
+                f.write(line)
+            entries.append(entry)
+            by_cid[cid] = entry
+            self._entries[hivemind_id], self._by_cid[hivemind_id] = entries, by_cid
+
+        return entry
+
+    def get(self, hivemind_id: str, cid: str) -> Dict[str, Any] | None:
+        """Get the entry of a state.
+
+        :param hivemind_id: The CID of the hivemind issue
+        :type hivemind_id: str
+        :param cid: The CID of the state
+        :type cid: str
+        :return: The entry, or None if the state is not recorded
+        :rtype: Dict[str, Any] | None
+        """
+        with self._lock:
+            self._load(hivemind_id)
+            return self._by_cid.get(CID(hivemind_id), {}).get(CID(cid))
+
+    def history(self, hivemind_id: str, start: int | None = None, end: int | None = None) -> List[Dict[str, Any]]:
+        """Get the recorded states of a hivemind, optionally only those saved in a time range.
+
+        :param hivemind_id: The CID of the hivemind issue
+        :type hivemind_id: str
+        :param start: Only states saved at or after this Unix timestamp
+        :type start: int | None
+        :param end: Only states saved at or before this Unix timestamp
+        :type end: int | None
+        :return: The entries, in the order they were recorded
+        :rtype: List[Dict[str, Any]]
+        """
+        with self._lock:
+            entries = list(self._load(hivemind_id))
+
+        # Concurrent saves and clock skew can record states out of timestamp order, so every entry is checked
+        return [entry for entry in entries
+                if (start is None or entry['timestamp'] >= start) and (end is None or entry['timestamp'] <= end)]
+
+    def hivemind_ids(self) -> List[str]:
+        """Get the hiveminds that have recorded states.
+
+        :return: The CIDs of the hivemind issues
+        :rtype: List[str]
+        """
+        return sorted(path.stem for path in self.directory.glob('*.jsonl'))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Canonical, interned IPFS CIDs.
+
+CIDs reach the hivemind classes in two forms, with and without the '/ipfs/' prefix.
+CID is a str subclass that always holds the form without the prefix. CIDs are interned
+per process: every spelling of a CID maps to the same CID object, so normalizing a CID
+that was seen before is a single dict lookup without allocating a new string, and
+comparing two CIDs usually only compares their identity.
+
+A CID is a str, it is stored in JSON and used as a dict key exactly like the plain
+CID string, so the stored format of the hivemind objects does not change.
+"""
+from typing import Dict
+
+IPFS_PREFIX = '/ipfs/'
+
+# Interned CIDs, by every spelling that was normalized. When the table grows beyond
+# MAX_INTERNED it is cleared, existing CID objects stay valid and equal to new ones.
+MAX_INTERNED = 1000000
+_interned: Dict[str, 'CID'] = {}
+
+
+class CID(str):
+    """An IPFS CID without the '/ipfs/' prefix.
+
+    CID(value) accepts a CID with or without the '/ipfs/' prefix and returns the
+    interned CID object, a CID is returned as is.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, value: str) -> 'CID':
+        """Get the canonical CID of a value.
+
+        :param value: The CID, with or without the '/ipfs/' prefix
+        :type value: str
+        :return: The interned CID
+        :rtype: CID
+        :raises Exception: If the value is not a string
+        """
+        if type(value) is cls:
+            return value
+
+        cid = _interned.get(value)
+        if cid is not None:
+            return cid
+
+        if not isinstance(value, str):
+            raise Exception('CID must be a string, got %s instead' % type(value))
+
+        key = str(value)
+        normalized = key[len(IPFS_PREFIX):] if key.startswith(IPFS_PREFIX) else key
+        cid = _interned.get(normalized)
+        if cid is None:
+            if len(_interned) >= MAX_INTERNED:
+                _interned.clear()
+            cid = super().__new__(cls, normalized)
+            _interned[normalized] = cid
+
+        _interned[key] = cid
+        return cid
+
+    @property
+    def path(self) -> str:
+        """Get the CID with the '/ipfs/' prefix.
+
+        :return: The IPFS path of the CID
+        :rtype: str
+        """
+        return IPFS_PREFIX + self
+
+    def __reduce__(self):
+        """Unpickle CIDs as interned CIDs.
+
+        :return: The constructor and its arguments
+        :rtype: tuple
+        """
+        return CID, (str(self),)
+
+
+def clear_interned() -> None:
+    """Forget all interned CIDs.
+
+    :return: None
+    """
+    _interned.clear()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Structural deltas between versions of JSON data.
+
+A chain of states (see hivemind.storage.StorageDictChain) can store most of its links
+as the delta to the previous link instead of the full data, with a full checkpoint
+every few links. A delta describes the difference between two JSON values as a tree
+of nodes:
+
+    {'value': value}
+        The new value replaces the old value.
+    {'keys': {key: node, ...}, 'removed': [key, ...]}
+        The old value is a dict: the listed keys are changed by their node, or added
+        when the key is new, and the removed keys are deleted.
+    {'items': {'index': node, ...}, 'append': [value, ...]}
+        The old value is a list: the items at the given indexes are changed by their
+        node and the appended values are added at the end.
+
+Adding an opinion to a state therefore only stores the new opinion entry and
+signature, instead of all options, opinions, signatures and participants.
+"""
+from typing import Any, Dict
+
+DEFAULT_CHECKPOINT_INTERVAL = 16
+
+
+def make_delta(old: Any, new: Any) -> Dict[str, Any] | None:
+    """Get the delta that turns one JSON value into another.
+
+    :param old: The old value
+    :type old: Any
+    :param new: The new value
+    :type new: Any
+    :return: The delta, or None if the values are equal
+    :rtype: Dict[str, Any] | None
+    """
+    if type(old) is dict and type(new) is dict:
+        keys = {}
+        for key, value in new.items():
+            if key not in old:
+                keys[key] = {'value': value}
+            else:
+                node = make_delta(old[key], value)
+                if node is not None:
+                    keys[key] = node
+
+        removed = [key for key in old if key not in new]
+        if not keys and not removed:
+            return None
+
+        node = {'keys': keys}
+        if removed:
+            node['removed'] = removed
+        return node
+
+    if type(old) is list and type(new) is list and len(new) >= len(old):
+        items = {}
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            node = make_delta(old_item, new_item)
+            if node is not None:
+                items[str(index)] = node
+
+        appended = new[len(old):]
+        if not items and not appended:
+            return None
+
+        node = {}
+        if items:
+            node['items'] = items
+        if appended:
+            node['append'] = appended
+        return node
+
+    if type(old) is type(new) and old == new:
+        return None
+
+    return {'value': new}
+
+
+def apply_delta(value: Any, delta: Dict[str, Any]) -> Any:
+    """Apply a delta to a JSON value.
+
+    Dicts and lists of the value are changed in place, pass a copy to keep the value.
+
+    :param value: The old value
+    :type value: Any
+    :param delta: The delta, as returned by make_delta
+    :type delta: Dict[str, Any]
+    :return: The new value
+    :rtype: Any
+    :raises Exception: If the delta does not fit the value
+    """
+    if 'value' in delta:
+        return delta['value']
+
+    if 'keys' in delta:
+        if not isinstance(value, dict):
+            raise Exception('Invalid delta: expected a dict, got %s' % type(value))
+
+        for key in delta.get('removed', []):
+            value.pop(key, None)
+        for key, node in delta['keys'].items():
+            if 'value' in node:
+                value[key] = node['value']
+            elif key in value:
+                value[key] = apply_delta(value[key], node)
+            else:
+                raise Exception('Invalid delta: no key %s in the dict' % key)
+        return value
+
+    if not isinstance(value, list):
+        raise Exception('Invalid delta: expected a list, got %s' % type(value))
+
+    for index, node in delta.get('items', {}).items():
+        try:
+            value[int(index)] = apply_delta(value[int(index)], node)
+        except (IndexError, ValueError):
+            raise Exception('Invalid delta: no item %s in a list of %s items' % (index, len(value)))
+    value.extend(delta.get('append', []))
+    return value
@@ -1,10 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from typing import List, Dict
-from ipfs_dict_chain.IPFSDict import IPFSDict
+from typing import Any, List, Dict, Tuple
+from .cid import CID
+from .address_set import HivemindAddressSet, check_addresses, parse_address_weights
+from .storage import StorageDict
 
 
-class HivemindIssue(IPFSDict):
+class HivemindIssue(StorageDict):
     """A class representing a voting issue in the Hivemind protocol.
 
     This class handles the creation and management of voting issues, including
@@ -23,7 +25,7 @@ class HivemindIssue(IPFSDict):
     :ivar constraints: Constraints on voting
     :vartype constraints: Dict[str, str | int | float | list] | None
     :ivar restrictions: Restrictions on who can vote
-    :vartype restrictions: Dict[str, List[str] | int] | None
+    :vartype restrictions: Dict[str, List[str] | int | str] | None
     :ivar on_selection: Action to take when an option is selected
     :vartype on_selection: str | None
     :ivar author: Bitcoin address of the author who can finalize the hivemind
@@ -43,7 +45,7 @@ class HivemindIssue(IPFSDict):
         self.tags: List[str] = []
         self.answer_type: str = 'String'
         self.constraints: Dict[str, str | int | float | list] | None = None
-        self.restrictions: Dict[str, List[str] | int] | None = None
+        self.restrictions: Dict[str, List[str] | int | str] | None = None
 
         # What happens when an option is selected: valid values are None, Finalize, Exclude, Reset
         # None : nothing happens
@@ -55,6 +57,10 @@ class HivemindIssue(IPFSDict):
         # Bitcoin address of the author who can finalize the hivemind
         self.author: str | None = None
 
+        # The address weights of the address restrictions and the list of addresses they were built from
+        self._address_weights: Tuple[List[str], int, Dict[str, float]] | None = None
+        self._address_set: HivemindAddressSet | None = None
+
         super().__init__(cid=cid)
 
     def add_question(self, question: str) -> None:
@@ -131,15 +137,16 @@ class HivemindIssue(IPFSDict):
         else:
             raise Exception('constraints contain an invalid key: %s' % constraints)
 
-    def set_restrictions(self, restrictions: Dict[str, List[str] | int] | None) -> None:
+    def set_restrictions(self, restrictions: Dict[str, List[str] | int | str] | None) -> None:
         """Set voting restrictions for the hivemind issue.
 
         Restrictions can include:
-        - addresses: List of Bitcoin addresses allowed to vote
+        - addresses: List of Bitcoin addresses allowed to vote, mainnet or testnet
+        - address_set: CID of a HivemindAddressSet with the addresses allowed to vote, for large lists
         - options_per_address: Maximum number of options each address can submit
 
         :param restrictions: Dictionary of restrictions
-        :type restrictions: Dict[str, List[str] | int] | None
+        :type restrictions: Dict[str, List[str] | int | str] | None
         :return: None
         :raises Exception: If restrictions are invalid
         """
@@ -151,16 +158,21 @@ class HivemindIssue(IPFSDict):
             raise Exception('Restrictions is not a dict or None, got %s instead' % type(restrictions))
 
         for key in restrictions.keys():
-            if key not in ['addresses', 'options_per_address']:
+            if key not in ['addresses', 'address_set', 'options_per_address']:
                 raise Exception('Invalid key in restrictions: %s' % key)
 
+        if 'addresses' in restrictions and 'address_set' in restrictions:
+            raise Exception('Restrictions can not contain both addresses and address_set')
+
         if 'addresses' in restrictions:
             if not isinstance(restrictions['addresses'], list):
                 raise Exception('addresses in restrictions must be a list, got %s instead' % type(restrictions['addresses']))
 
-            for address in restrictions['addresses']:
-                if not isinstance(address, str):
-                    raise Exception('Address %s in restrictions is not a string!' % address)
+            check_addresses(restrictions['addresses'])
+
+        if 'address_set' in restrictions:
+            if not isinstance(restrictions['address_set'], str) or len(restrictions['address_set']) == 0:
+                raise Exception('address_set in restrictions must be the CID of an address set, got %s instead' % restrictions['address_set'])
 
         if 'options_per_address' in restrictions:
             if not isinstance(restrictions['options_per_address'], int) or restrictions['options_per_address'] < 1:
@@ -168,21 +180,85 @@ class HivemindIssue(IPFSDict):
 
         self.restrictions = restrictions
 
-    def save(self) -> str:
-        """Save the hivemind issue to IPFS.
+    def has_address_restrictions(self) -> bool:
+        """Check if only some addresses are allowed to add options and opinions.
+
+        :return: True if the restrictions contain addresses or an address set
+        :rtype: bool
+        """
+        return self.restrictions is not None and ('addresses' in self.restrictions or 'address_set' in self.restrictions)
+
+    def address_weights(self) -> Dict[str, float] | None:
+        """Get the weights of the addresses in the address restrictions.
+
+        Restricted addresses can have a weight, for example '1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa@2.5'.
+        The map of addresses without their weight to their weight is built once and rebuilt
+        when a different or longer list of addresses is set. Addresses without a valid
+        non-negative weight get a weight of 1.0, the first entry of an address is used.
+        An address set is not loaded, use address_weight to look up its addresses.
+
+        :return: Dictionary of allowed addresses and their weights, or None if there is no list of restricted addresses
+        :rtype: Dict[str, float] | None
+        """
+        if self.restrictions is None or 'addresses' not in self.restrictions:
+            return None
+
+        addresses = self.restrictions['addresses']
+        if self._address_weights is None or self._address_weights[0] is not addresses or self._address_weights[1] != len(addresses):
+            self._address_weights = (addresses, len(addresses), parse_address_weights(addresses))
+
+        return self._address_weights[2]
+
+    def address_set(self) -> HivemindAddressSet | None:
+        """Get the address set of the address restrictions.
+
+        The address set is loaded once, its shards are only loaded when an address is looked up.
+
+        :return: The address set, or None if the restrictions do not reference an address set
+        :rtype: HivemindAddressSet | None
+        """
+        if self.restrictions is None or 'address_set' not in self.restrictions:
+            return None
+
+        cid = CID(self.restrictions['address_set'])
+        if self._address_set is None or CID(self._address_set.cid()) != cid:
+            self._address_set = HivemindAddressSet(cid=cid)
+
+        return self._address_set
+
+    def address_weight(self, address: str) -> float | None:
+        """Get the weight of an address in the address restrictions.
+
+        :param address: The address
+        :type address: str
+        :return: The weight, or None if the address is not in the address restrictions
+        :rtype: float | None
+        """
+        address_weights = self.address_weights()
+        if address_weights is not None:
+            return address_weights.get(address)
+
+        address_set = self.address_set()
+        if address_set is not None:
+            return address_set.weight(address)
+
+        return None
+
+    def _save_data(self) -> Dict[str, Any]:
+        """Get the data to store when the hivemind issue is saved.
 
         Validates the issue before saving to ensure it meets all requirements.
 
-        :return: The IPFS hash of the saved issue
-        :rtype: str
+        :return: The data of the issue
+        :rtype: Dict[str, Any]
         :raises Exception: If the issue is invalid
         """
         try:
             self.valid()
         except Exception as ex:
             raise Exception('Error: %s' % ex)
-        else:
-            return super(HivemindIssue, self).save()
+
+        return super(HivemindIssue, self)._save_data()
 
     def valid(self) -> bool:
         """Check if the hivemind issue is valid.
@@ -239,8 +315,8 @@ class HivemindIssue(IPFSDict):
         :return: The identification CID
         :rtype: str
         """
-        data = IPFSDict()
-        data['hivemind_id'] = self.cid().replace('/ipfs/', '')
+        data = StorageDict()
+        data['hivemind_id'] = CID(self.cid())
         data['name'] = name
         cid = data.save()
 
@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from typing import Dict, Any
-from ipfs_dict_chain.IPFSDict import IPFSDict
+from .cid import CID
+from .storage import StorageDict
 from .ranking import Ranking
 
 
-class HivemindOpinion(IPFSDict):
+class HivemindOpinion(StorageDict):
     """A class representing a voter's opinion in the Hivemind protocol.
 
     This class handles the storage and management of a voter's ranked choices
@@ -63,34 +64,28 @@ class HivemindOpinion(IPFSDict):
 
         return ret
 
-    def load(self, cid: str) -> None:
-        """Load the opinion from IPFS.
+    def _populate(self, cid: str, data: Dict[str, Any]) -> None:
+        """Replace the data of this opinion with data that was already retrieved.
 
         This method handles the conversion of the stored ranking dictionary
         back into a Ranking object.
 
-        :param cid: The IPFS hash to load
+        :param cid: The IPFS hash of the data
         :type cid: str
+        :param data: The data
+        :type data: Dict[str, Any]
         :return: None
         """
-        super(HivemindOpinion, self).load(cid=cid)
+        super(HivemindOpinion, self)._populate(cid=cid, data=data)
 
         # Initialize a new Ranking object if ranking is None
-        if self.ranking is None:
+        if self.get('ranking') is None:
             self.ranking = Ranking()
             return
 
         # ipfs will store ranking as a dict, but we need to convert it back to a Ranking() object
         if isinstance(self.ranking, dict):
-            ranking_dict = self.ranking  # Store the dict temporarily
-            self.ranking = Ranking()  # Create new Ranking object
-
-            if 'fixed' in ranking_dict:
-                self.ranking.set_fixed(ranked_choice=ranking_dict['fixed'])
-            elif 'auto_high' in ranking_dict:
-                self.ranking.set_auto_high(choice=ranking_dict['auto_high'])
-            elif 'auto_low' in ranking_dict:
-                self.ranking.set_auto_low(choice=ranking_dict['auto_low'])
+            self.ranking = Ranking.from_dict(self.ranking)
 
     def __repr__(self) -> str:
         """Return a string representation of the opinion.
@@ -98,23 +93,17 @@ class HivemindOpinion(IPFSDict):
         :return: The IPFS CID of the opinion without the '/ipfs/' prefix
         :rtype: str
         """
-        return self._cid.replace('/ipfs/', '')
+        return CID(self._cid)
 
-    def save(self) -> str:
-        """Save the opinion to IPFS.
+    def _save_data(self) -> Dict[str, Any]:
+        """Get the data to store when the opinion is saved.
 
-        This method handles the conversion of the Ranking object into a JSON-serializable
-        dictionary before saving the opinion to IPFS.
+        This method converts the Ranking object into a JSON-serializable dictionary.
 
-        :return: The IPFS hash of the saved opinion
-        :rtype: str
+        :return: The data of the opinion
+        :rtype: Dict[str, Any]
         """
-        # Convert the ranking object to a dict before saving
-        tmp_ranking = self.ranking if self.ranking is not None else Ranking()
-        if isinstance(self.ranking, Ranking):
-            self.ranking = self.ranking.to_dict()
-        opinion_cid = super(HivemindOpinion, self).save()
-        # Restore the ranking object
-        self.ranking = tmp_ranking
-
-        return opinion_cid
+        data = super(HivemindOpinion, self)._save_data()
+        if isinstance(data.get('ranking'), Ranking):
+            data['ranking'] = data['ranking'].to_dict()
+        return data
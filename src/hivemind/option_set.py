@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Hashed lookups of the options of a hivemind state.
+
+A HivemindState must reject options that are already in the state and options with
+the same value as an existing option. OptionSet keeps the CIDs of the options and the
+canonical values of their values in dicts, so both checks take constant time instead
+of a scan over all options. The same CID set validates the options in the ranking of
+every opinion. ParticipantOptions does the same for the options that each
+participant signed, which the options_per_address restriction needs on every insert.
+"""
+import logging
+from typing import Any, Dict, KeysView, List
+
+from .cid import CID
+from .option import HivemindOption
+
+LOG = logging.getLogger(__name__)
+
+
+def canonical_value(value: Any) -> Any:
+    """Get a hashable key for an option value.
+
+    Dicts and lists, the values of Complex options, are converted to tuples with their
+    dict keys sorted. Two values get the same key exactly when they are equal, so
+    {'a': 1, 'b': 2} and {'b': 2, 'a': 1} get the same key, like 1 and 1.0 do.
+
+    :param value: The option value
+    :type value: Any
+    :return: The key
+    :rtype: Any
+    """
+    if isinstance(value, dict):
+        return ('dict', tuple(sorted(((key, canonical_value(item)) for key, item in value.items()), key=lambda entry: str(entry[0]))))
+    elif isinstance(value, list):
+        return ('list', tuple(canonical_value(item) for item in value))
+
+    return value
+
+
+class OptionSet:
+    """The CIDs and values of the options of a hivemind state.
+
+    The set describes the option CIDs and loaded options it was built from while options
+    are only added through add, use is_current to check if it needs to be rebuilt.
+    """
+
+    def __init__(self, option_cids: List[str], options: List[HivemindOption]) -> None:
+        """Build the set of the options of a state.
+
+        :param option_cids: The CIDs of the options of the state
+        :type option_cids: List[str]
+        :param options: The loaded options of the state
+        :type options: List[HivemindOption]
+        :return: None
+        """
+        self._option_cids = option_cids
+        self._options = options
+        self._sizes = (len(option_cids), len(options))
+        self._by_cid: Dict[CID, HivemindOption | None] = {}
+        self._by_value: Dict[Any, CID] = {}
+
+        for option in options:
+            if isinstance(option, HivemindOption) and option.cid() is not None:
+                self._by_cid.setdefault(CID(option.cid()), option)
+
+        self._unloaded = [cid for cid in map(CID, option_cids) if cid not in self._by_cid]
+        for cid in self._unloaded:
+            self._by_cid[cid] = None
+
+        for cid, option in self._by_cid.items():
+            if option is not None:
+                self._add_value(cid, option)
+
+    def _add_value(self, cid: str, option: HivemindOption) -> None:
+        """Add the value of an option to the value index.
+
+        :param cid: The CID of the option, without the '/ipfs/' prefix
+        :type cid: str
+        :param option: The option
+        :type option: HivemindOption
+        :return: None
+        """
+        try:
+            self._by_value.setdefault(canonical_value(option.get('value')), cid)
+        except TypeError:
+            LOG.warning('Value of option %s can not be indexed' % cid)
+
+    def is_current(self, option_cids: List[str], options: List[HivemindOption]) -> bool:
+        """Check if the set still describes the given option lists.
+
+        :param option_cids: The CIDs of the options of the state
+        :type option_cids: List[str]
+        :param options: The loaded options of the state
+        :type options: List[HivemindOption]
+        :return: True if the set was built from these lists and they only changed through add
+        :rtype: bool
+        """
+        return option_cids is self._option_cids and options is self._options and (len(option_cids), len(options)) == self._sizes
+
+    def contains(self, cid: str) -> bool:
+        """Check if an option is in the set.
+
+        :param cid: The CID of the option, with or without the '/ipfs/' prefix
+        :type cid: str
+        :return: True if the option is in the set
+        :rtype: bool
+        """
+        return CID(cid) in self._by_cid
+
+    def cids(self) -> KeysView[CID]:
+        """Get the CIDs of the options, without the '/ipfs/' prefix.
+
+        :return: A read-only view of the CIDs
+        :rtype: KeysView[CID]
+        """
+        return self._by_cid.keys()
+
+    def missing(self, cids: List[str]) -> List[str]:
+        """Get the CIDs that are not in the set, for example the options of a ranking that do not exist.
+
+        :param cids: The CIDs, with or without the '/ipfs/' prefix
+        :type cids: List[str]
+        :return: The CIDs that are not in the set, without the '/ipfs/' prefix
+        :rtype: List[str]
+        """
+        return [cid for cid in map(CID, cids) if cid not in self._by_cid]
+
+    def get(self, cid: str) -> HivemindOption | None:
+        """Get a loaded option by its CID.
+
+        :param cid: The CID of the option, with or without the '/ipfs/' prefix
+        :type cid: str
+        :return: The option, or None if it is not in the set or not loaded
+        :rtype: HivemindOption | None
+        """
+        return self._by_cid.get(CID(cid))
+
+    def find_value(self, value: Any) -> str | None:
+        """Find the option with a value.
+
+        Options of the state that were not loaded yet are loaded the first time.
+
+        :param value: The value
+        :type value: Any
+        :return: The CID of the option with an equal value, or None
+        :rtype: str | None
+        """
+        if self._unloaded:
+            for cid in self._unloaded:
+                self._add_value(cid, HivemindOption(cid=cid))
+            self._unloaded = []
+
+        try:
+            return self._by_value.get(canonical_value(value))
+        except TypeError:
+            return None
+
+    def add(self, cid: str, option: HivemindOption) -> None:
+        """Add an option that was appended to the option lists of the state.
+
+        :param cid: The CID of the option
+        :type cid: str
+        :param option: The option
+        :type option: HivemindOption
+        :return: None
+        """
+        cid = CID(cid)
+        self._by_cid[cid] = option
+        self._add_value(cid, option)
+        self._sizes = (len(self._option_cids), len(self._options))
+
+
+class ParticipantOptions:
+    """The options that each participant signed, in the order of the options of a state.
+
+    The index is built from the option CIDs and signatures of a state. It describes
+    them while options are only added through add_option and signatures through
+    add_signature, use is_current to check if it needs to be rebuilt.
+    """
+
+    def __init__(self, option_cids: List[str], signatures: Dict[str, Dict[str, Any]]) -> None:
+        """Build the index of the options signed by each participant.
+
+        :param option_cids: The CIDs of the options of the state
+        :type option_cids: List[str]
+        :param signatures: The signatures of the state, by address and message
+        :type signatures: Dict[str, Dict[str, Any]]
+        :return: None
+        """
+        self._option_cids = option_cids
+        self._signatures = signatures
+        self._size = len(option_cids)
+        self._positions: Dict[str, int] = {}
+        self._signers: Dict[str, List[str]] = {}
+        self._by_address: Dict[str, List[str]] = {}
+
+        for position, cid in enumerate(option_cids):
+            self._positions.setdefault(cid, position)
+
+        for address, messages in signatures.items():
+            for message in messages:
+                self._signers.setdefault(message, []).append(address)
+            signed = [cid for cid in messages if cid in self._positions]
+            if signed:
+                self._by_address[address] = sorted(signed, key=self._positions.__getitem__)
+
+    def is_current(self, option_cids: List[str], signatures: Dict[str, Dict[str, Any]]) -> bool:
+        """Check if the index still describes the given option CIDs and signatures.
+
+        :param option_cids: The CIDs of the options of the state
+        :type option_cids: List[str]
+        :param signatures: The signatures of the state
+        :type signatures: Dict[str, Dict[str, Any]]
+        :return: True if the index was built from these objects and no options were added since
+        :rtype: bool
+        """
+        return option_cids is self._option_cids and signatures is self._signatures and len(option_cids) == self._size
+
+    def options(self, address: str) -> List[str]:
+        """Get the options signed by a participant.
+
+        :param address: The address of the participant
+        :type address: str
+        :return: The option CIDs, in the order of the options of the state
+        :rtype: List[str]
+        """
+        return list(self._by_address.get(address, []))
+
+    def count(self, address: str) -> int:
+        """Get the number of options signed by a participant.
+
+        :param address: The address of the participant
+        :type address: str
+        :return: The number of options
+        :rtype: int
+        """
+        return len(self._by_address.get(address, []))
+
+    def add_signature(self, address: str, message: str) -> None:
+        """Add a message that a participant signed for the first time.
+
+        :param address: The address of the participant
+        :type address: str
+        :param message: The message
+        :type message: str
+        :return: None
+        """
+        self._signers.setdefault(message, []).append(address)
+        if message in self._positions:
+            self._insert(address, message)
+
+    def add_option(self, cid: str) -> None:
+        """Add an option that was appended to the option CIDs of the state.
+
+        :param cid: The CID of the option
+        :type cid: str
+        :return: None
+        """
+        self._size = len(self._option_cids)
+        if cid in self._positions:
+            return
+
+        self._positions[cid] = self._size - 1
+        for address in self._signers.get(cid, []):
+            self._insert(address, cid)
+
+    def _insert(self, address: str, cid: str) -> None:
+        """Insert an option in the options of a participant, keeping the order of the options.
+
+        :param address: The address of the participant
+        :type address: str
+        :param cid: The CID of the option
+        :type cid: str
+        :return: None
+        """
+        signed = self._by_address.setdefault(address, [])
+        position = self._positions[cid]
+        index = len(signed)
+        while index > 0 and self._positions[signed[index - 1]] > position:
+            index -= 1
+        signed.insert(index, cid)
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compiled validators for the options of a hivemind issue.
+
+A HivemindIssue describes the valid options with its answer_type and constraints.
+Instead of interpreting the constraints again for every option, compile_validator
+turns them into an OptionValidator once per issue CID: regexes are compiled, the
+allowed choices are put in a set and the check of the answer type is looked up once.
+The validators are kept in a small LRU cache keyed on the issue CID, the answer type
+and a fingerprint of the constraints, so an issue that is changed in memory after it
+was loaded or saved gets a new validator instead of the one of its stored version.
+"""
+import copy
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+from .cid import CID
+from .issue import HivemindIssue
+from .validators import valid_address, valid_bech32_address
+
+LOG = logging.getLogger(__name__)
+
+MAX_VALIDATORS = 256
+
+CIDV0_REGEX = re.compile('[1-9A-HJ-NP-Za-km-z]*')
+CIDV1_REGEX = re.compile('[A-Z2-7a-z]*')
+
+
+def is_valid_ipfs_hash(hash_str: str) -> bool:
+    """Check if a string is a valid IPFS hash.
+
+    :param hash_str: The string to check
+    :type hash_str: str
+    :return: True if valid, False otherwise
+    :rtype: bool
+    """
+    # IPFS CIDv0 starts with "Qm", is 46 characters long and only contains base58 characters
+    if hash_str.startswith('Qm') and len(hash_str) == 46:
+        return CIDV0_REGEX.fullmatch(hash_str) is not None
+
+    # Simplified check for IPFS CIDv1: 'b' or 'B' followed by base32 characters
+    elif hash_str.startswith(('b', 'B')) and len(hash_str) > 1:
+        return CIDV1_REGEX.fullmatch(hash_str, 1) is not None
+
+    return False
+
+
+def is_valid_hivemind(value: Any) -> bool:
+    """Check if a value is the CID of a hivemind issue.
+
+    :param value: The value to check
+    :type value: Any
+    :return: True if the hivemind issue can be loaded, False otherwise
+    :rtype: bool
+    """
+    try:
+        isinstance(HivemindIssue(cid=value), HivemindIssue)
+    except Exception as ex:
+        LOG.error('IPFS hash %s is not a valid hivemind: %s' % (value, ex))
+        return False
+
+    return True
+
+
+class OptionValidator:
+    """The answer type and constraints of a hivemind issue, compiled into a validator.
+
+    :ivar answer_type: The answer type of the issue
+    :vartype answer_type: str
+    """
+
+    def __init__(self, answer_type: str, constraints: Dict[str, Any] | None) -> None:
+        """Compile a validator.
+
+        :param answer_type: The answer type of the issue
+        :type answer_type: str
+        :param constraints: The constraints of the issue
+        :type constraints: Dict[str, Any] | None
+        :return: None
+        """
+        self.answer_type = answer_type
+        self._constraints = copy.deepcopy(constraints)
+        constraints = self._constraints
+        has = (lambda key: key in constraints) if constraints is not None else (lambda key: False)
+
+        self._min_length = constraints['min_length'] if has('min_length') else None
+        self._max_length = constraints['max_length'] if has('max_length') else None
+        self._min_value = constraints['min_value'] if has('min_value') else None
+        self._max_value = constraints['max_value'] if has('max_value') else None
+        self._decimals_format = '.%sf' % constraints['decimals'] if has('decimals') else None
+        self._true_value = constraints['true_value'] if has('true_value') else None
+        self._false_value = constraints['false_value'] if has('false_value') else None
+        self._has_specs = has('specs')
+        self._specs = constraints['specs'] if self._has_specs else None
+
+        self._regex: Any = None
+        if has('regex'):
+            try:
+                self._regex = re.compile(constraints['regex'])
+            except re.error:
+                # Keep the pattern, so the error is raised when an option is validated, like before
+                self._regex = constraints['regex']
+
+        self._choices: List[Any] | None = None
+        self._choice_set: set | None = None
+        if has('choices'):
+            self._choices = constraints['choices']
+            if all(isinstance(choice, dict) for choice in self._choices):
+                values = [choice.get('value', None) for choice in self._choices]
+                self._choice_set = {value for value in values if _hashable(value)}
+                self._unhashable_choices = [value for value in values if not _hashable(value)]
+
+        checks: Dict[str, Callable[[Any, str], bool]] = {
+            'String': lambda value, text: self.is_valid_string(value),
+            'Bool': self.is_valid_bool,
+            'Integer': lambda value, text: self.is_valid_integer(value),
+            'Float': lambda value, text: self.is_valid_float(value),
+            'Hivemind': lambda value, text: is_valid_hivemind(value),
+            'File': lambda value, text: self.is_valid_file(value),
+            'Complex': lambda value, text: self.is_valid_complex(value),
+            'Address': lambda value, text: valid_address(value) or valid_bech32_address(value),
+        }
+        self._check = checks.get(answer_type, lambda value, text: False)
+
+    def __call__(self, value: Any, text: str = '') -> bool:
+        """Validate an option.
+
+        :param value: The value of the option
+        :type value: Any
+        :param text: The text of the option
+        :type text: str
+        :return: True if valid, False otherwise
+        :rtype: bool
+        :raises Exception: If the value is not one of the allowed choices
+        """
+        if self._choices is not None and not self.is_valid_choice(value):
+            LOG.error('Option %s is not valid because this it is not in the allowed choices of this hiveminds constraints!' % value)
+            raise Exception('Option %s is not valid because this it is not in the allowed choices of this hiveminds constraints!' % value)
+
+        return bool(self._check(value, text))
+
+    def is_valid_choice(self, value: Any) -> bool:
+        """Check if a value is one of the allowed choices.
+
+        :param value: The value
+        :type value: Any
+        :return: True if the value is allowed
+        :rtype: bool
+        """
+        if self._choice_set is None:
+            # Choices that are not dicts are not compiled, so they fail exactly like before
+            return any([choice.get('value', None) == value for choice in self._choices])
+
+        if _hashable(value) and value in self._choice_set:
+            return True
+        return any(choice == value for choice in self._unhashable_choices)
+
+    def is_valid_string(self, value: Any) -> bool:
+        """Check if a value is a valid string option.
+
+        :param value: The value
+        :type value: Any
+        :return: True if valid, False otherwise
+        :rtype: bool
+        """
+        if not isinstance(value, str):
+            return False
+
+        if self._min_length is not None and len(value) < self._min_length:
+            return False
+        elif self._max_length is not None and len(value) > self._max_length:
+            return False
+        elif self._regex is not None:
+            match = self._regex.match(value) if not isinstance(self._regex, str) else re.match(pattern=self._regex, string=value)
+            if match is None:
+                return False
+
+        return True
+
+    def is_valid_float(self, value: Any) -> bool:
+        """Check if a value is a valid float option.
+
+        :param value: The value
+        :type value: Any
+        :return: True if valid, False otherwise
+        :rtype: bool
+        """
+        if not isinstance(value, float):
+            LOG.error('Option value %s is not a floating number value but instead is a %s' % (value, type(value)))
+            return False
+
+        if self._min_value is not None and value < self._min_value:
+            LOG.error('Option value is below minimum value: %s < %s' % (value, self._min_value))
+            return False
+        elif self._max_value is not None and value > self._max_value:
+            LOG.error('Option value is above maximum value: %s > %s' % (value, self._max_value))
+            return False
+        elif self._decimals_format is not None and float(format(value, self._decimals_format)) != value:
+            # The value is formatted with the required number of decimals in case the number has trailing zeros
+            LOG.error('Option value does not have the correct number of decimals (%s): %s' % (self._constraints['decimals'], value))
+            return False
+
+        return True
+
+    def is_valid_integer(self, value: Any) -> bool:
+        """Check if a value is a valid integer option.
+
+        :param value: The value
+        :type value: Any
+        :return: True if valid, False otherwise
+        :rtype: bool
+        """
+        if not isinstance(value, int):
+            LOG.error('Option value %s is not a integer value but instead is a %s' % (value, type(value)))
+            return False
+
+        if self._min_value is not None and value < self._min_value:
+            LOG.error('Option value is below minimum value: %s < %s' % (value, self._min_value))
+            return False
+        elif self._max_value is not None and value > self._max_value:
+            LOG.error('Option value is above maximum value: %s > %s' % (value, self._max_value))
+            return False
+
+        return True
+
+    def is_valid_bool(self, value: Any, text: str) -> bool:
+        """Check if a value is a valid boolean option.
+
+        :param value: The value
+        :type value: Any
+        :param text: The text of the option, which must match the true_value or false_value constraint
+        :type text: str
+        :return: True if valid, False otherwise
+        :rtype: bool
+        """
+        if not isinstance(value, bool):
+            LOG.error('Option value %s is not a boolean value but instead is a %s' % (value, type(value)))
+            return False
+
+        constraints = self._constraints
+        if constraints is not None:
+            if 'true_value' in constraints and value is True:
+                if text != self._true_value:
+                    LOG.error('Bool option text for True value must match the true_value constraint: %s, got: %s' % (self._true_value, text))
+                    return False
+            elif 'false_value' in constraints and value is False:
+                if text != self._false_value:
+                    LOG.error('Bool option text for False value must match the false_value constraint: %s, got: %s' % (self._false_value, text))
+                    return False
+
+        return True
+
+    def is_valid_file(self, value: Any) -> bool:
+        """Check if a value is a valid file option.
+
+        :param value: The value
+        :type value: Any
+        :return: True if valid, False otherwise
+        :rtype: bool
+        """
+        if not isinstance(value, str):
+            LOG.error('Option value %s is not a string value but instead is a %s' % (value, type(value)))
+            return False
+
+        if not is_valid_ipfs_hash(value):
+            LOG.error('Option value %s is not a valid IPFS hash' % value)
+            return False
+
+        return True
+
+    def is_valid_complex(self, value: Any) -> bool:
+        """Check if a value is a valid complex option according to the specs in the constraints.
+
+        :param value: The value
+        :type value: Any
+        :return: True if valid, False otherwise
+        :rtype: bool
+        """
+        if not isinstance(value, dict):
+            LOG.error('Option value %s is not a dictionary but instead is a %s' % (value, type(value)))
+            return False
+
+        # If there are no specs in the constraints, any dictionary is valid
+        if not self._has_specs:
+            return True
+
+        specs = self._specs
+        for spec_key in specs:
+            if spec_key not in value:
+                LOG.error('Required field %s missing from option value' % spec_key)
+                return False
+
+        for value_key in value:
+            if value_key not in specs:
+                LOG.error('Unexpected field %s in option value' % value_key)
+                return False
+
+        for spec_key, spec_value in value.items():
+            spec_type = _SPEC_TYPES.get(specs[spec_key])
+            if spec_type is not None and not isinstance(spec_value, spec_type):
+                LOG.error('Field %s should be %s but is %s' % (spec_key, specs[spec_key], type(spec_value).__name__))
+                return False
+
+        return True
+
+
+_SPEC_TYPES = {'String': str, 'Integer': int, 'Float': float, 'Bool': bool}
+
+_validators: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def _hashable(value: Any) -> bool:
+    """Check if a value can be put in a set.
+
+    :param value: The value
+    :type value: Any
+    :return: True if the value is hashable
+    :rtype: bool
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _cache_key(issue: HivemindIssue) -> Tuple[str, Any, str] | None:
+    """Get the key of the cached validator of a hivemind issue.
+
+    :param issue: The hivemind issue
+    :type issue: HivemindIssue
+    :return: The CID, answer type and a fingerprint of the constraints, or None if the issue has no CID
+    :rtype: Tuple[str, Any, str] | None
+    """
+    cid = issue.cid()
+    if not isinstance(cid, str):
+        return None
+
+    return CID(cid), issue.answer_type, json.dumps(issue.constraints, sort_keys=True, default=repr)
+
+
+def compile_validator(issue: HivemindIssue) -> OptionValidator:
+    """Get the compiled option validator of a hivemind issue.
+
+    Validators of saved issues are cached, see the module docstring.
+
+    :param issue: The hivemind issue
+    :type issue: HivemindIssue
+    :return: The validator
+    :rtype: OptionValidator
+    """
+    key = _cache_key(issue)
+
+    if key is not None:
+        with _lock:
+            validator = _validators.get(key)
+            if validator is not None:
+                _validators.move_to_end(key)
+
+        if validator is not None:
+            return validator
+
+    validator = OptionValidator(answer_type=issue.answer_type, constraints=issue.constraints)
+    if key is not None:
+        with _lock:
+            _validators[key] = validator
+            _validators.move_to_end(key)
+            while len(_validators) > MAX_VALIDATORS:
+                _validators.popitem(last=False)
+
+    return validator
+
+
+def clear_validators() -> None:
+    """Remove all cached validators.
+
+    :return: None
+    """
+    with _lock:
+        _validators.clear()
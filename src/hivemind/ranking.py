@@ -1,12 +1,126 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from typing import List, Dict, Any
+from bisect import bisect_left
+from typing import List, Dict, Any, Tuple
+from .cid import CID
 from .option import HivemindOption
 import logging
 
 LOG = logging.getLogger(__name__)
 
 
+class OptionIndex:
+    """A value-sorted index of a list of options, used to expand auto rankings.
+
+    The options are grouped by value and the groups are sorted by value, so an auto
+    ranking is produced by walking outward from the preferred value instead of sorting
+    all options again for every opinion. Options with the same value keep the order of
+    the option list, exactly like the stable sort of Ranking.get. Expanded rankings are
+    memoized per preferred option and ranking type.
+
+    The index only describes the option list it was built from while options are only
+    appended to it, use is_current to check if it needs to be rebuilt.
+
+    :ivar numeric: Whether all options have a numeric value and a CID, only then auto rankings can use the index
+    :vartype numeric: bool
+    """
+
+    def __init__(self, options: List[HivemindOption]) -> None:
+        """Build the index of a list of options.
+
+        :param options: The options
+        :type options: List[HivemindOption]
+        :return: None
+        """
+        self._options = options
+        self._size = len(options)
+        self._by_cid: Dict[str, HivemindOption] = {}
+        self._memo: Dict[Tuple[str, str], List[str]] = {}
+        self.values: List[int | float] = []
+        self.groups: List[List[str]] = []
+        self.numeric = all(isinstance(option, HivemindOption) and option.cid() is not None and isinstance(option.get('value'), (int, float))
+                           for option in options)
+
+        for option in options:
+            if isinstance(option, HivemindOption) and option.cid() is not None:
+                self._by_cid.setdefault(CID(option.cid()), option)
+
+        if self.numeric:
+            groups: Dict[int | float, List[str]] = {}
+            for option in options:
+                groups.setdefault(option.value, []).append(CID(option.cid()))
+            self.values = sorted(groups)
+            self.groups = [groups[value] for value in self.values]
+
+    def is_current(self, options: List[HivemindOption]) -> bool:
+        """Check if the index still describes the given option list.
+
+        :param options: The option list
+        :type options: List[HivemindOption]
+        :return: True if the index was built from this list and no options were added since
+        :rtype: bool
+        """
+        return options is self._options and len(options) == self._size
+
+    def find(self, cid: str) -> HivemindOption | None:
+        """Find an option by its CID.
+
+        :param cid: The CID of the option, with or without the '/ipfs/' prefix
+        :type cid: str
+        :return: The option, or None if it is not in the index
+        :rtype: HivemindOption | None
+        """
+        return self._by_cid.get(CID(cid))
+
+    def get_memo(self, choice_cid: str, ranking_type: str) -> List[str] | None:
+        """Get a memoized auto ranking.
+
+        :param choice_cid: The CID of the preferred option
+        :type choice_cid: str
+        :param ranking_type: The ranking type, 'auto_high' or 'auto_low'
+        :type ranking_type: str
+        :return: A copy of the memoized ranking, or None if it was not memoized
+        :rtype: List[str] | None
+        """
+        ranking = self._memo.get((CID(choice_cid), ranking_type))
+        return list(ranking) if ranking is not None else None
+
+    def rank(self, choice_cid: str, choice_value: int | float, ranking_type: str) -> List[str]:
+        """Expand an auto ranking by walking outward from the preferred value.
+
+        :param choice_cid: The CID of the preferred option
+        :type choice_cid: str
+        :param choice_value: The value of the preferred option
+        :type choice_value: int | float
+        :param ranking_type: The ranking type, 'auto_high' or 'auto_low'
+        :type ranking_type: str
+        :return: The option CIDs ordered by distance to the preferred value
+        :rtype: List[str]
+        """
+        ranking = []
+        low = bisect_left(self.values, choice_value) - 1
+        high = low + 1
+        while low >= 0 or high < len(self.values):
+            if low < 0:
+                take_high = True
+            elif high >= len(self.values):
+                take_high = False
+            else:
+                distance_low = abs(self.values[low] - choice_value)
+                distance_high = abs(self.values[high] - choice_value)
+                take_high = distance_high < distance_low or (distance_high == distance_low and ranking_type == 'auto_high')
+
+            if take_high:
+                ranking.extend(self.groups[high])
+                high += 1
+            else:
+                ranking.extend(self.groups[low])
+                low -= 1
+
+        self._memo[(CID(choice_cid), ranking_type)] = ranking
+        return list(ranking)
+
+
 class Ranking:
     """A class for managing ranked choice voting.
 
@@ -84,11 +198,13 @@ class Ranking:
         self.type = 'auto_low'
         self.fixed = None
 
-    def get(self, options: List[HivemindOption] | None = None) -> List[str]:
+    def get(self, options: List[HivemindOption] | None = None, index: OptionIndex | None = None) -> List[str]:
         """Get the ranked choices.
 
         :param options: List of HivemindOptions, required for auto ranking
         :type options: List[HivemindOption] | None
+        :param index: Optional index of the options, to expand auto rankings without sorting
+        :type index: OptionIndex | None
         :return: A list of option cids in ranked order
         :rtype: List[str]
         :raises Exception: If ranking is not set or options are invalid for auto ranking
@@ -108,13 +224,23 @@ class Ranking:
                 LOG.error(f'Invalid list of options given for auto ranking: {options}')
                 raise Exception('Invalid list of options given for auto ranking')
 
+            if index is not None and index.numeric and index.is_current(options):
+                ranking = index.get_memo(choice_cid=self.auto, ranking_type=self.type)
+                if ranking is not None:
+                    return ranking
+
             try:
-                choice = HivemindOption(cid=self.auto)
+                # The preferred option is normally one of the given options, only load it if it is not
+                choice = index.find(self.auto) if index is not None and index.is_current(options) else self.find_choice(options=options)
+                if choice is None:
+                    choice = HivemindOption(cid=self.auto)
 
-                if self.type == 'auto_high':
-                    ranking = [option.cid().replace('/ipfs/', '') for option in sorted(options, key=lambda x: (abs(x.value - choice.value), -x.value))]
+                if index is not None and index.numeric and index.is_current(options) and isinstance(choice.get('value'), (int, float)):
+                    ranking = index.rank(choice_cid=self.auto, choice_value=choice.value, ranking_type=self.type)
+                elif self.type == 'auto_high':
+                    ranking = [CID(option.cid()) for option in sorted(options, key=lambda x: (abs(x.value - choice.value), -x.value))]
                 elif self.type == 'auto_low':
-                    ranking = [option.cid().replace('/ipfs/', '') for option in sorted(options, key=lambda x: (abs(x.value - choice.value), x.value))]
+                    ranking = [CID(option.cid()) for option in sorted(options, key=lambda x: (abs(x.value - choice.value), x.value))]
 
                 LOG.info(f"Calculated ranking {self.type}: {ranking}")
             except Exception as e:
@@ -123,6 +249,40 @@ class Ranking:
 
         return ranking
 
+    def find_choice(self, options: List[HivemindOption]) -> HivemindOption | None:
+        """Find the preferred option of an auto ranking in a list of options.
+
+        :param options: List of options
+        :type options: List[HivemindOption]
+        :return: The preferred option, or None if it is not in the list
+        :rtype: HivemindOption | None
+        """
+        choice_cid = CID(self.auto) if self.auto is not None else None
+        for option in options:
+            if option.cid() is not None and CID(option.cid()) == choice_cid:
+                return option
+
+        return None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Ranking':
+        """Create a ranking from its dict representation.
+
+        :param data: Ranking settings as returned by to_dict
+        :type data: Dict[str, Any]
+        :return: The ranking
+        :rtype: Ranking
+        """
+        ranking = cls()
+        if 'fixed' in data:
+            ranking.set_fixed(ranked_choice=data['fixed'])
+        elif 'auto_high' in data:
+            ranking.set_auto_high(choice=data['auto_high'])
+        elif 'auto_low' in data:
+            ranking.set_auto_low(choice=data['auto_low'])
+
+        return ranking
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert ranking settings to dict for IPFS storage.
 
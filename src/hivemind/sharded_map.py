@@ -0,0 +1,500 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Content-addressed sharded maps for the large maps of a hivemind state.
+
+The opinions and signatures of a state are maps keyed by address, so they grow with the
+number of participants. A ShardedMap stores such a map as a tree of JSON objects, like
+a HAMT: a leaf node holds up to bucket_size entries and a leaf that grows beyond that
+is split into an inner node with up to 16 children, chosen by the next hex digit of the
+SHA-256 hash of the key.
+
+    {'entries': {key: value, ...}}
+        A leaf node.
+    {'children': {'0': cid, ..., 'f': cid}}
+        An inner node, the children are the CIDs of the nodes below it.
+
+The state itself only stores a reference {'hamt': root_cid, 'count': number_of_entries}.
+Nodes are loaded when a lookup or iteration needs them, and saving the map only stores
+the leaves that changed and the inner nodes on their path, all other nodes are reused
+by CID.
+"""
+import hashlib
+import json
+import logging
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .storage import aget_many, aput_many, get_json, get_many, put_many
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_BUCKET_SIZE = 128
+DEFAULT_SHARD_THRESHOLD = 1024
+
+# A SHA-256 hash has 64 hex digits, leaves at the maximum depth are never split
+MAX_DEPTH = 64
+
+
+def _digit(key: str, depth: int) -> str:
+    """Get the child of a key at a depth of the tree.
+
+    :param key: The key
+    :type key: str
+    :param depth: The depth of the inner node
+    :type depth: int
+    :return: The hex digit of the hash of the key at that depth
+    :rtype: str
+    """
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[depth]
+
+
+class _Node:
+    """A node of a sharded map, a leaf if it has entries and an inner node if it has children.
+
+    A node that has neither is not loaded yet.
+    """
+
+    __slots__ = ('cid', 'entries', 'children', 'stored')
+
+    def __init__(self, cid: str | None = None, entries: Dict[str, Any] | None = None) -> None:
+        """Initialize a new node.
+
+        :param cid: The CID of the stored node
+        :type cid: str | None
+        :param entries: The entries of a new leaf
+        :type entries: Dict[str, Any] | None
+        :return: None
+        """
+        self.cid = cid
+        self.entries = entries
+        self.children: Dict[str, '_Node'] | None = None
+        # The stored JSON of a leaf, to find the leaves that changed
+        self.stored: str | None = None
+
+    def is_loaded(self) -> bool:
+        """Check if the node is loaded.
+
+        :return: True if the node is a leaf or an inner node
+        :rtype: bool
+        """
+        return self.entries is not None or self.children is not None
+
+    def decode(self, data: Any) -> None:
+        """Load the stored data of the node.
+
+        :param data: The stored data
+        :type data: Any
+        :return: None
+        :raises Exception: If the data is not a node of a sharded map
+        """
+        if isinstance(data, dict) and isinstance(data.get('entries'), dict):
+            self.entries = data['entries']
+            self.stored = json.dumps(data)
+        elif isinstance(data, dict) and isinstance(data.get('children'), dict):
+            self.children = {digit: _Node(cid=cid) for digit, cid in data['children'].items()}
+        else:
+            raise Exception('Invalid sharded map node %s' % self.cid)
+
+    def encode(self) -> Dict[str, Any]:
+        """Get the data to store for the node.
+
+        :return: The data
+        :rtype: Dict[str, Any]
+        """
+        if self.entries is not None:
+            return {'entries': self.entries}
+
+        return {'children': {digit: self.children[digit].cid for digit in sorted(self.children)}}
+
+
+class ShardedMap(MutableMapping):
+    """A map that is stored as a tree of shards and loaded lazily, see the module docstring."""
+
+    def __init__(self, entries: Dict[str, Any] | None = None, bucket_size: int = DEFAULT_BUCKET_SIZE) -> None:
+        """Initialize a new ShardedMap.
+
+        :param entries: The initial entries
+        :type entries: Dict[str, Any] | None
+        :param bucket_size: The maximum number of entries of a leaf
+        :type bucket_size: int
+        :return: None
+        :raises Exception: If the bucket size is not positive
+        """
+        if bucket_size < 1:
+            raise Exception('bucket_size must be a positive integer')
+
+        self.bucket_size = bucket_size
+        self._root = _Node(entries={})
+        self._count = 0
+        for key, value in (entries or {}).items():
+            self[key] = value
+
+    @staticmethod
+    def is_reference(value: Any) -> bool:
+        """Check if a stored value is the reference to a sharded map.
+
+        :param value: The stored value
+        :type value: Any
+        :return: True if the value is a reference
+        :rtype: bool
+        """
+        return isinstance(value, dict) and set(value) == {'hamt', 'count'}
+
+    @classmethod
+    def from_reference(cls, reference: Dict[str, Any], bucket_size: int = DEFAULT_BUCKET_SIZE) -> 'ShardedMap':
+        """Create a map from its reference without loading any nodes.
+
+        :param reference: The reference, as returned by reference
+        :type reference: Dict[str, Any]
+        :param bucket_size: The maximum number of entries of a leaf
+        :type bucket_size: int
+        :return: The map
+        :rtype: ShardedMap
+        """
+        sharded_map = cls(bucket_size=bucket_size)
+        sharded_map._root = _Node(cid=reference['hamt'])
+        sharded_map._count = reference['count']
+        return sharded_map
+
+    def reference(self) -> Dict[str, Any]:
+        """Get the reference to store for the map, the map must be stored with store or astore first.
+
+        :return: The CID of the root node and the number of entries
+        :rtype: Dict[str, Any]
+        :raises Exception: If the map was never stored
+        """
+        if self._root.cid is None:
+            raise Exception('Sharded map is not stored')
+
+        return {'hamt': self._root.cid, 'count': self._count}
+
+    def _load(self, node: _Node) -> None:
+        """Load a node if it is not loaded yet.
+
+        :param node: The node
+        :type node: _Node
+        :return: None
+        """
+        if not node.is_loaded():
+            node.decode(get_json(cid=node.cid))
+
+    def _leaf(self, key: str, create: bool = False) -> Tuple[_Node | None, int]:
+        """Find the leaf of a key, loading the nodes on its path.
+
+        :param key: The key
+        :type key: str
+        :param create: Create the leaf if it does not exist
+        :type create: bool
+        :return: The leaf, or None if it does not exist, and its depth
+        :rtype: Tuple[_Node | None, int]
+        """
+        node, depth = self._root, 0
+        while True:
+            self._load(node)
+            if node.entries is not None:
+                return node, depth
+
+            digit = _digit(key, depth)
+            if digit not in node.children:
+                if not create:
+                    return None, depth
+                node.children[digit] = _Node(entries={})
+                node.cid = None
+
+            node, depth = node.children[digit], depth + 1
+
+    def _split(self, node: _Node, depth: int) -> None:
+        """Split a leaf that has too many entries into an inner node.
+
+        :param node: The leaf
+        :type node: _Node
+        :param depth: The depth of the leaf
+        :type depth: int
+        :return: None
+        """
+        entries = node.entries
+        node.entries, node.stored, node.cid = None, None, None
+        node.children = {}
+        for key, value in entries.items():
+            node.children.setdefault(_digit(key, depth), _Node(entries={})).entries[key] = value
+
+        for child in node.children.values():
+            if len(child.entries) > self.bucket_size and depth + 1 < MAX_DEPTH:
+                self._split(child, depth + 1)
+
+    def __getitem__(self, key: str) -> Any:
+        """Get the value of a key.
+
+        :param key: The key
+        :type key: str
+        :return: The value
+        :rtype: Any
+        :raises KeyError: If the key is not in the map
+        """
+        leaf, _ = self._leaf(key)
+        if leaf is None or key not in leaf.entries:
+            raise KeyError(key)
+
+        return leaf.entries[key]
+
+    def __contains__(self, key: Any) -> bool:
+        """Check if a key is in the map, loading only the nodes on its path.
+
+        :param key: The key
+        :type key: Any
+        :return: True if the key is in the map
+        :rtype: bool
+        """
+        if not isinstance(key, str):
+            return False
+
+        leaf, _ = self._leaf(key)
+        return leaf is not None and key in leaf.entries
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        """Set the value of a key.
+
+        :param key: The key
+        :type key: str
+        :param value: The value, it must be JSON serializable
+        :type value: Any
+        :return: None
+        :raises Exception: If the key is not a string
+        """
+        if not isinstance(key, str):
+            raise Exception('Keys of a sharded map must be strings, got %s instead' % type(key))
+
+        leaf, depth = self._leaf(key, create=True)
+        if key not in leaf.entries:
+            self._count += 1
+        leaf.entries[key] = value
+        if len(leaf.entries) > self.bucket_size and depth < MAX_DEPTH:
+            self._split(leaf, depth)
+
+    def __delitem__(self, key: str) -> None:
+        """Remove a key.
+
+        :param key: The key
+        :type key: str
+        :return: None
+        :raises KeyError: If the key is not in the map
+        """
+        leaf, _ = self._leaf(key)
+        if leaf is None or key not in leaf.entries:
+            raise KeyError(key)
+
+        del leaf.entries[key]
+        self._count -= 1
+
+    def __len__(self) -> int:
+        """Get the number of entries without loading any nodes.
+
+        :return: The number of entries
+        :rtype: int
+        """
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the keys, loading all nodes.
+
+        :return: An iterator over the keys
+        :rtype: Iterator[str]
+        """
+        self.load_all()
+        nodes = [self._root]
+        while nodes:
+            node = nodes.pop()
+            if node.entries is not None:
+                yield from list(node.entries)
+            else:
+                nodes.extend(node.children[digit] for digit in sorted(node.children, reverse=True))
+
+    def __repr__(self) -> str:
+        """Get a short description of the map.
+
+        :return: The number of entries and the CID of the root node
+        :rtype: str
+        """
+        return 'ShardedMap(%s entries, root %s)' % (self._count, self._root.cid)
+
+    def _unloaded(self) -> List[_Node]:
+        """Get the nodes that are not loaded yet and whose parents are loaded.
+
+        :return: The nodes
+        :rtype: List[_Node]
+        """
+        unloaded, nodes = [], [self._root]
+        while nodes:
+            node = nodes.pop()
+            if not node.is_loaded():
+                unloaded.append(node)
+            elif node.children is not None:
+                nodes.extend(node.children.values())
+
+        return unloaded
+
+    def load_all(self) -> None:
+        """Load all nodes, fetching the nodes of each level of the tree together.
+
+        :return: None
+        """
+        unloaded = self._unloaded()
+        while unloaded:
+            for node, data in zip(unloaded, get_many(cids=[node.cid for node in unloaded])):
+                node.decode(data)
+            unloaded = self._unloaded()
+
+    async def aload_all(self) -> None:
+        """Load all nodes without blocking the event loop, see load_all.
+
+        :return: None
+        """
+        unloaded = self._unloaded()
+        while unloaded:
+            for node, data in zip(unloaded, await aget_many(cids=[node.cid for node in unloaded])):
+                node.decode(data)
+            unloaded = self._unloaded()
+
+    def _changed(self) -> List[List[_Node]]:
+        """Get the nodes that need to be stored, deepest level first.
+
+        A leaf needs to be stored when it is new or its entries changed, an inner node
+        when it is new or one of its children needs to be stored. Nodes that are not
+        loaded did not change.
+
+        :return: The nodes to store, per level of the tree
+        :rtype: List[List[_Node]]
+        """
+        levels: Dict[int, List[_Node]] = {}
+
+        def visit(node: _Node, depth: int) -> bool:
+            if not node.is_loaded():
+                return False
+            if node.entries is not None:
+                changed = node.cid is None or json.dumps(node.encode()) != node.stored
+            else:
+                changed = any([visit(child, depth + 1) for child in node.children.values()]) or node.cid is None
+            if changed:
+                levels.setdefault(depth, []).append(node)
+            return changed
+
+        visit(self._root, 0)
+        return [levels[depth] for depth in sorted(levels, reverse=True)]
+
+    @staticmethod
+    def _stored(nodes: List[_Node], cids: List[str]) -> None:
+        """Remember the CIDs of nodes that were stored.
+
+        :param nodes: The nodes
+        :type nodes: List[_Node]
+        :param cids: The CIDs of the nodes, in the same order
+        :type cids: List[str]
+        :return: None
+        """
+        for node, cid in zip(nodes, cids):
+            node.cid = cid
+            if node.entries is not None:
+                node.stored = json.dumps(node.encode())
+
+    def store(self) -> Dict[str, Any]:
+        """Store the nodes that changed since the map was loaded or stored.
+
+        :return: The reference to the map
+        :rtype: Dict[str, Any]
+        """
+        changed = self._changed()
+        for nodes in changed:
+            self._stored(nodes, put_many(objects=[node.encode() for node in nodes]))
+
+        LOG.debug('Stored %s nodes of sharded map %s' % (sum(len(nodes) for nodes in changed), self._root.cid))
+        return self.reference()
+
+    async def astore(self) -> Dict[str, Any]:
+        """Store the nodes that changed without blocking the event loop, see store.
+
+        :return: The reference to the map
+        :rtype: Dict[str, Any]
+        """
+        changed = self._changed()
+        for nodes in changed:
+            self._stored(nodes, await aput_many(objects=[node.encode() for node in nodes]))
+
+        LOG.debug('Stored %s nodes of sharded map %s' % (sum(len(nodes) for nodes in changed), self._root.cid))
+        return self.reference()
+
+
+def _check_node(cid: str, data: Any) -> Dict[str, Any]:
+    """Check that the stored data of a node is a leaf or an inner node.
+
+    :param cid: The CID of the node
+    :type cid: str
+    :param data: The stored data
+    :type data: Any
+    :return: The data
+    :rtype: Dict[str, Any]
+    :raises Exception: If the data is not a node of a sharded map
+    """
+    if not isinstance(data, dict) or not (isinstance(data.get('entries'), dict) or isinstance(data.get('children'), dict)):
+        raise Exception('Invalid sharded map node %s' % cid)
+
+    return data
+
+
+def _subtree_entries(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Get all entries below a node, fetching the nodes of each level together.
+
+    :param node: The stored data of the node
+    :type node: Dict[str, Any]
+    :return: The entries
+    :rtype: Dict[str, Any]
+    """
+    entries = {}
+    level = [node]
+    while level:
+        children = []
+        for data in level:
+            if 'entries' in data:
+                entries.update(data['entries'])
+            else:
+                children.extend(data['children'].values())
+        level = [_check_node(cid, data) for cid, data in zip(children, get_many(cids=children))] if children else []
+
+    return entries
+
+
+def diff_sharded_maps(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Tuple[Any, Any]]:
+    """Get the entries that differ between two stored sharded maps.
+
+    Both trees are walked together and subtrees with the same CID are skipped, so only
+    the nodes on the paths to the changed leaves are fetched.
+
+    :param old: The reference to the old map
+    :type old: Dict[str, Any]
+    :param new: The reference to the new map
+    :type new: Dict[str, Any]
+    :return: The old and new value of every key that was added, removed or changed, None for a missing key
+    :rtype: Dict[str, Tuple[Any, Any]]
+    """
+    differences = {}
+    pending = [(old['hamt'], new['hamt'])]
+    while pending:
+        pairs = [(old_cid, new_cid) for old_cid, new_cid in pending if old_cid != new_cid]
+        cids = list(dict.fromkeys(cid for pair in pairs for cid in pair if cid is not None))
+        nodes = {cid: _check_node(cid, data) for cid, data in zip(cids, get_many(cids=cids))} if cids else {}
+
+        pending = []
+        for old_cid, new_cid in pairs:
+            # A missing child is an empty leaf
+            old_node = nodes[old_cid] if old_cid is not None else {'entries': {}}
+            new_node = nodes[new_cid] if new_cid is not None else {'entries': {}}
+            if 'children' in old_node and 'children' in new_node:
+                for digit in sorted(set(old_node['children']) | set(new_node['children'])):
+                    pending.append((old_node['children'].get(digit), new_node['children'].get(digit)))
+                continue
+
+            old_entries, new_entries = _subtree_entries(old_node), _subtree_entries(new_node)
+            for key in list(old_entries) + [key for key in new_entries if key not in old_entries]:
+                if old_entries.get(key) != new_entries.get(key):
+                    differences[key] = (old_entries.get(key), new_entries.get(key))
+
+    return differences
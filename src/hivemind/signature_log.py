@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""An append-only log of the signatures of a hivemind state.
+
+The signatures of a state map every address to the messages it signed and every
+message to its signatures and their timestamps. Stored inline, that map is part of
+every saved state and only ever grows. A SignatureLog stores the signatures outside
+the state instead, as a chain of content-addressed segments:
+
+    {'previous': cid | None, 'entries': [[address, message, signature, timestamp], ...]}
+
+Saving a state only stores a segment with the signatures that were added since the
+previous save, and the state stores a reference {'log': head_cid, 'count':
+number_of_entries, 'segments': number_of_segments}. Loading replays the segments
+from the oldest to the newest.
+
+Replay protection only needs the newest signature of each address and message, so
+compact rewrites the log as a single segment with only those signatures.
+"""
+import logging
+from typing import Any, Dict, List
+
+from .storage import aadd_json, add_json, aget_json, get_json
+
+LOG = logging.getLogger(__name__)
+
+Signatures = Dict[str, Dict[str, Dict[str, int]]]
+
+
+def compact_signatures(signatures: Signatures) -> int:
+    """Remove all but the newest signature of each address and message, in place.
+
+    :param signatures: The signatures, by address and message
+    :type signatures: Dict[str, Dict[str, Dict[str, int]]]
+    :return: The number of removed signatures
+    :rtype: int
+    """
+    removed = 0
+    for messages in signatures.values():
+        for message, message_signatures in list(messages.items()):
+            if len(message_signatures) > 1:
+                signature = max(message_signatures, key=lambda key: int(message_signatures[key]))
+                removed += len(message_signatures) - 1
+                messages[message] = {signature: message_signatures[signature]}
+
+    return removed
+
+
+class SignatureLog:
+    """The signatures of a hivemind state, stored as an append-only log, see the module docstring.
+
+    The log keeps the signatures it describes, the dict that the state uses, and the
+    entries that were appended since it was last stored.
+    """
+
+    def __init__(self, signatures: Signatures | None = None) -> None:
+        """Initialize a new log with the given signatures, which are stored as its first segment.
+
+        :param signatures: The signatures, by address and message
+        :type signatures: Dict[str, Dict[str, Dict[str, int]]] | None
+        :return: None
+        """
+        self._signatures: Signatures = signatures if signatures is not None else {}
+        self._head: str | None = None
+        self._count = 0
+        self._segments = 0
+        self._pending: List[List[Any]] = [[address, message, signature, timestamp]
+                                          for address, messages in self._signatures.items()
+                                          for message, message_signatures in messages.items()
+                                          for signature, timestamp in message_signatures.items()]
+
+    @staticmethod
+    def is_reference(value: Any) -> bool:
+        """Check if a stored value is the reference to a signature log.
+
+        :param value: The stored value
+        :type value: Any
+        :return: True if the value is a reference
+        :rtype: bool
+        """
+        return isinstance(value, dict) and set(value) == {'log', 'count', 'segments'}
+
+    @classmethod
+    async def aload(cls, reference: Dict[str, Any]) -> 'SignatureLog':
+        """Load a log by replaying its segments.
+
+        :param reference: The reference, as returned by reference
+        :type reference: Dict[str, Any]
+        :return: The log
+        :rtype: SignatureLog
+        :raises Exception: If a segment is invalid
+        """
+        segments = []
+        cid = reference['log']
+        while cid is not None:
+            segment = await aget_json(cid=cid)
+            if not isinstance(segment, dict) or not isinstance(segment.get('entries'), list):
+                raise Exception('Invalid signature log segment %s' % cid)
+            segments.append(segment['entries'])
+            cid = segment.get('previous')
+
+        log = cls()
+        for entries in reversed(segments):
+            for address, message, signature, timestamp in entries:
+                log._signatures.setdefault(address, {}).setdefault(message, {})[signature] = timestamp
+
+        log._head = reference['log']
+        log._count = reference['count']
+        log._segments = reference['segments']
+        return log
+
+    @staticmethod
+    def entries_since(reference: Dict[str, Any], since: Dict[str, Any]) -> List[List[Any]] | None:
+        """Get the entries that were appended to a log after an earlier reference to the same log.
+
+        Only the segments after the earlier head are fetched.
+
+        :param reference: The reference to the log
+        :type reference: Dict[str, Any]
+        :param since: An earlier reference
+        :type since: Dict[str, Any]
+        :return: The entries, oldest first, or None if the earlier head is not in the log, for example because it was compacted
+        :rtype: List[List[Any]] | None
+        :raises Exception: If a segment is invalid
+        """
+        segments = []
+        cid = reference['log']
+        while cid != since['log']:
+            if cid is None:
+                return None
+            segment = get_json(cid=cid)
+            if not isinstance(segment, dict) or not isinstance(segment.get('entries'), list):
+                raise Exception('Invalid signature log segment %s' % cid)
+            segments.append(segment['entries'])
+            cid = segment.get('previous')
+
+        return [entry for entries in reversed(segments) for entry in entries]
+
+    @property
+    def signatures(self) -> Signatures:
+        """Get the signatures of the log.
+
+        :return: The signatures, by address and message
+        :rtype: Dict[str, Dict[str, Dict[str, int]]]
+        """
+        return self._signatures
+
+    @property
+    def segments(self) -> int:
+        """Get the number of stored segments.
+
+        :return: The number of segments
+        :rtype: int
+        """
+        return self._segments
+
+    def describes(self, signatures: Signatures) -> bool:
+        """Check if the log describes the given signatures.
+
+        :param signatures: The signatures of a state
+        :type signatures: Dict[str, Dict[str, Dict[str, int]]]
+        :return: True if the signatures are the dict of the log, which is only changed through append
+        :rtype: bool
+        """
+        return signatures is self._signatures
+
+    def append(self, address: str, message: str, signature: str, timestamp: int) -> None:
+        """Append a signature that was added to the signatures of the log.
+
+        :param address: The address of the participant
+        :type address: str
+        :param message: The message that was signed
+        :type message: str
+        :param signature: The signature
+        :type signature: str
+        :param timestamp: Unix timestamp
+        :type timestamp: int
+        :return: None
+        """
+        self._pending.append([address, message, signature, timestamp])
+
+    def compact(self) -> int:
+        """Keep only the newest signature of each address and message, see compact_signatures.
+
+        The log is rewritten as a single segment the next time it is stored.
+
+        :return: The number of removed signatures
+        :rtype: int
+        """
+        removed = compact_signatures(self._signatures)
+        pending = SignatureLog(self._signatures)._pending
+        self._head, self._count, self._segments, self._pending = None, 0, 0, pending
+        LOG.info('Compacted signature log: removed %s signatures, %s left' % (removed, len(pending)))
+        return removed
+
+    def reference(self) -> Dict[str, Any]:
+        """Get the reference to store in the state, the log must be stored with store or astore first.
+
+        :return: The CID of the newest segment, the number of entries and the number of segments
+        :rtype: Dict[str, Any]
+        :raises Exception: If the log has entries that are not stored
+        """
+        if self._pending:
+            raise Exception('Signature log has %s entries that are not stored' % len(self._pending))
+
+        return {'log': self._head, 'count': self._count, 'segments': self._segments}
+
+    def _segment(self) -> Dict[str, Any] | None:
+        """Get the segment with the entries that are not stored yet.
+
+        :return: The segment, or None if there are no new entries
+        :rtype: Dict[str, Any] | None
+        """
+        if not self._pending:
+            return None
+
+        return {'previous': self._head, 'entries': self._pending}
+
+    def _stored(self, cid: str) -> None:
+        """Remember that the pending entries were stored as a segment.
+
+        :param cid: The CID of the segment
+        :type cid: str
+        :return: None
+        """
+        self._head = cid
+        self._count += len(self._pending)
+        self._segments += 1
+        self._pending = []
+
+    def store(self) -> Dict[str, Any]:
+        """Store the entries that were appended since the log was loaded or stored.
+
+        :return: The reference to the log
+        :rtype: Dict[str, Any]
+        """
+        segment = self._segment()
+        if segment is not None:
+            self._stored(add_json(data=segment))
+
+        return self.reference()
+
+    async def astore(self) -> Dict[str, Any]:
+        """Store the entries that were appended without blocking the event loop, see store.
+
+        :return: The reference to the log
+        :rtype: Dict[str, Any]
+        """
+        segment = self._segment()
+        if segment is not None:
+            self._stored(await aadd_json(data=segment))
+
+        return self.reference()
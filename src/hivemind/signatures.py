@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Backends for signing and verifying Bitcoin signed messages.
+
+Every option, opinion and name update of a hivemind is signed with a Bitcoin message
+signature. hivemind.utils.sign_message and verify_message hand the actual ECDSA work to
+a signature backend. The default BitcoinlibBackend uses python-bitcoinlib. When the
+optional coincurve package (libsecp256k1) is installed, CoincurveBackend is selected
+automatically, it creates and accepts exactly the same signatures. Another backend can
+be plugged in with set_backend.
+"""
+import base64
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Type
+
+from bitcoin.core import Hash160
+from bitcoin.signmessage import BitcoinMessage, SignMessage, VerifyMessage
+from bitcoin.wallet import CBitcoinSecret, P2PKHBitcoinAddress
+
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+LOG = logging.getLogger(__name__)
+
+
+class SignatureBackend(ABC):
+    """Base class of the signature backends.
+
+    :ivar name: The name of the backend
+    :vartype name: str
+    """
+
+    name: str = ''
+
+    @abstractmethod
+    def sign(self, message: str, private_key: CBitcoinSecret) -> str:
+        """Sign a message with a Bitcoin private key.
+
+        :param message: The message to sign
+        :type message: str
+        :param private_key: Bitcoin private key
+        :type private_key: CBitcoinSecret
+        :return: The signature in base64 format
+        :rtype: str
+        """
+
+    @abstractmethod
+    def verify(self, message: str, address: str, signature: str) -> bool:
+        """Verify a signed message.
+
+        :param message: The message that was signed
+        :type message: str
+        :param address: The Bitcoin address that signed the message
+        :type address: str
+        :param signature: The base64-encoded signature
+        :type signature: str
+        :return: Whether the signature is valid
+        :rtype: bool
+        :raises Exception: If the signature can not be decoded
+        """
+
+
+class BitcoinlibBackend(SignatureBackend):
+    """Sign and verify messages with python-bitcoinlib."""
+
+    name = 'bitcoinlib'
+
+    def sign(self, message: str, private_key: CBitcoinSecret) -> str:
+        """Sign a message with a Bitcoin private key, see SignatureBackend.sign.
+
+        :param message: The message to sign
+        :type message: str
+        :param private_key: Bitcoin private key
+        :type private_key: CBitcoinSecret
+        :return: The signature in base64 format
+        :rtype: str
+        """
+        return SignMessage(key=private_key, message=BitcoinMessage(message)).decode()
+
+    def verify(self, message: str, address: str, signature: str) -> bool:
+        """Verify a signed message, see SignatureBackend.verify.
+
+        :param message: The message that was signed
+        :type message: str
+        :param address: The Bitcoin address that signed the message
+        :type address: str
+        :param signature: The base64-encoded signature
+        :type signature: str
+        :return: Whether the signature is valid
+        :rtype: bool
+        """
+        return VerifyMessage(address, BitcoinMessage(message), signature)
+
+
+class CoincurveBackend(BitcoinlibBackend):
+    """Sign and verify messages with libsecp256k1 through the optional coincurve package.
+
+    The message hash, the compact signature format and the address derivation are the
+    same as those of python-bitcoinlib, only the elliptic curve operations differ.
+    Keys that are not a CBitcoinSecret are handed to python-bitcoinlib, which raises
+    the same errors as the default backend.
+    """
+
+    name = 'coincurve'
+
+    def __init__(self) -> None:
+        """Initialize a new CoincurveBackend.
+
+        :return: None
+        :raises Exception: If coincurve is not installed
+        """
+        if coincurve is None:
+            raise Exception('The coincurve signature backend needs the coincurve package')
+
+    def sign(self, message: str, private_key: CBitcoinSecret) -> str:
+        """Sign a message with a Bitcoin private key, see SignatureBackend.sign.
+
+        :param message: The message to sign
+        :type message: str
+        :param private_key: Bitcoin private key
+        :type private_key: CBitcoinSecret
+        :return: The signature in base64 format
+        :rtype: str
+        """
+        if not isinstance(private_key, CBitcoinSecret):
+            return super().sign(message=message, private_key=private_key)
+
+        digest = BitcoinMessage(message).GetHash()
+        signature = coincurve.PrivateKey(bytes(private_key[:32])).sign_recoverable(digest, hasher=None)
+        header = 27 + signature[64] + (4 if private_key.is_compressed else 0)
+        return base64.b64encode(bytes([header]) + signature[:64]).decode()
+
+    def verify(self, message: str, address: str, signature: str) -> bool:
+        """Verify a signed message, see SignatureBackend.verify.
+
+        :param message: The message that was signed
+        :type message: str
+        :param address: The Bitcoin address that signed the message
+        :type address: str
+        :param signature: The base64-encoded signature
+        :type signature: str
+        :return: Whether the signature is valid
+        :rtype: bool
+        :raises Exception: If the signature can not be decoded
+        """
+        data = base64.b64decode(signature)
+        if len(data) != 65 or not 27 <= data[0] <= 34:
+            raise Exception('Invalid compact signature')
+
+        digest = BitcoinMessage(message).GetHash()
+        public_key = coincurve.PublicKey.from_signature_and_message(data[1:] + bytes([(data[0] - 27) & 3]), digest, hasher=None)
+        public_key_bytes = public_key.format(compressed=data[0] >= 31)
+        return str(P2PKHBitcoinAddress.from_bytes(Hash160(public_key_bytes))) == str(address)
+
+
+BACKENDS: Dict[str, Type[SignatureBackend]] = {
+    BitcoinlibBackend.name: BitcoinlibBackend,
+    CoincurveBackend.name: CoincurveBackend,
+}
+
+
+def create_backend(name: str) -> SignatureBackend:
+    """Create a signature backend by name.
+
+    :param name: The name of the backend: 'bitcoinlib' or 'coincurve'
+    :type name: str
+    :return: The backend
+    :rtype: SignatureBackend
+    :raises Exception: If the name is unknown or the backend is not available
+    """
+    if name not in BACKENDS:
+        raise Exception('Unknown signature backend %s, must be one of %s' % (name, ', '.join(BACKENDS)))
+
+    return BACKENDS[name]()
+
+
+def default_backend() -> SignatureBackend:
+    """Create the fastest available signature backend.
+
+    :return: A CoincurveBackend if coincurve is installed, a BitcoinlibBackend otherwise
+    :rtype: SignatureBackend
+    """
+    return CoincurveBackend() if coincurve is not None else BitcoinlibBackend()
+
+
+_backend: SignatureBackend = default_backend()
+
+
+def set_backend(backend: SignatureBackend) -> None:
+    """Use a signature backend for all signing and verification.
+
+    :param backend: The backend
+    :type backend: SignatureBackend
+    :return: None
+    """
+    global _backend
+    LOG.info('Using the %s signature backend' % backend.name)
+    _backend = backend
+
+
+def get_backend() -> SignatureBackend:
+    """Get the signature backend that is used.
+
+    :return: The backend
+    :rtype: SignatureBackend
+    """
+    return _backend
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compact materialized snapshots of a HivemindState.
+
+Loading a state from its object graph costs one fetch for the state, one for the issue,
+one for every option (plus its issue) and one for every opinion. A snapshot contains
+everything that is needed to rebuild the state and its child objects, so it can be
+loaded with a single read.
+
+All CIDs in a snapshot are interned: they are stored once in the 'cids' table and
+referenced everywhere else by their index in that table.
+
+Snapshot layout::
+
+    {
+        'snapshot_version': 1,
+        'cids': [cid, ...],
+        'hivemind_id': index,
+        'issue': {issue fields},
+        'options': [[cid, hivemind_id, value, text], ...],
+        'opinions': [[[address, cid, hivemind_id, timestamp, ranking_type, ranking, resolved], ...], ...],
+        'participants': {...},
+        'selected': [...],
+        'final': bool,
+        'previous_cid': index | None
+    }
+
+For a fixed ranking, 'ranking' is the list of ranked option indexes and 'resolved' is
+None. For auto rankings, 'ranking' is the index of the preferred option and 'resolved'
+is the list of option indexes as they were ranked when the snapshot was taken.
+"""
+from typing import Any, Dict, List
+
+from .ranking import OptionIndex
+
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    """Exception raised when a snapshot is invalid or does not match its state."""
+
+
+class _CIDTable:
+    """Table of interned CIDs."""
+
+    def __init__(self) -> None:
+        self.cids: List[str] = []
+        self._indexes: Dict[str, int] = {}
+
+    def intern(self, cid: str | None) -> int | None:
+        """Get the index of a CID, adding it to the table if needed.
+
+        :param cid: The CID
+        :type cid: str | None
+        :return: The index of the CID in the table, or None if the CID is None
+        :rtype: int | None
+        """
+        if cid is None:
+            return None
+
+        if cid not in self._indexes:
+            self._indexes[cid] = len(self.cids)
+            self.cids.append(cid)
+
+        return self._indexes[cid]
+
+
+def create_snapshot(state: Any) -> Dict[str, Any]:
+    """Create a snapshot of a HivemindState.
+
+    :param state: The hivemind state
+    :type state: HivemindState
+    :return: The snapshot data, ready to be stored
+    :rtype: Dict[str, Any]
+    """
+    table = _CIDTable()
+    hivemind_id = table.intern(state.hivemind_id)
+
+    all_options = [state.get_option(cid=option_cid) for option_cid in state.option_cids]
+    options = []
+    for option_cid, option in zip(state.option_cids, all_options):
+        options.append([table.intern(option_cid), table.intern(option.hivemind_id), option.value, option.text])
+
+    index = OptionIndex(all_options)
+    opinions = []
+    for question_opinions in state.opinion_cids:
+        entries = []
+        for address, opinion_data in question_opinions.items():
+            opinion = state.get_opinion(cid=opinion_data['opinion_cid'])
+            ranking = opinion.ranking
+            if ranking.type == 'fixed':
+                ranked = [table.intern(option_cid) for option_cid in ranking.fixed]
+                resolved = None
+            else:
+                ranked = table.intern(ranking.auto)
+                resolved = [table.intern(option_cid) for option_cid in ranking.get(options=all_options, index=index)]
+
+            entries.append([address, table.intern(opinion_data['opinion_cid']), table.intern(opinion.hivemind_id),
+                            opinion_data['timestamp'], ranking.type, ranked, resolved])
+        opinions.append(entries)
+
+    return {
+        'snapshot_version': SNAPSHOT_VERSION,
+        'cids': table.cids,
+        'hivemind_id': hivemind_id,
+        'issue': dict(state.hivemind_issue().items()),
+        'options': options,
+        'opinions': opinions,
+        'participants': state.participants,
+        'selected': state.selected,
+        'final': state.final,
+        'previous_cid': table.intern(state.previous_cid),
+    }
+
+
+def read_snapshot(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand the interned data of a snapshot.
+
+    :param data: The snapshot data as stored
+    :type data: Dict[str, Any]
+    :return: Dictionary with the hivemind_id, issue, options, opinions, participants, selected, final and previous_cid
+    :rtype: Dict[str, Any]
+    :raises SnapshotError: If the data is not a valid snapshot
+    """
+    if not isinstance(data, dict) or data.get('snapshot_version') != SNAPSHOT_VERSION:
+        raise SnapshotError('Unsupported snapshot version: %s' % (data.get('snapshot_version') if isinstance(data, dict) else None))
+
+    try:
+        cids = data['cids']
+
+        def cid(index: int | None) -> str | None:
+            return cids[index] if index is not None else None
+
+        options = [{'cid': cid(option_index), 'hivemind_id': cid(hivemind_index), 'value': value, 'text': text}
+                   for option_index, hivemind_index, value, text in data['options']]
+
+        opinions = []
+        for entries in data['opinions']:
+            question_opinions = []
+            for address, opinion_index, hivemind_index, timestamp, ranking_type, ranked, resolved in entries:
+                if ranking_type == 'fixed':
+                    ranking = {'fixed': [cid(index) for index in ranked]}
+                    resolved_ranking = ranking['fixed']
+                else:
+                    ranking = {ranking_type: cid(ranked)}
+                    resolved_ranking = [cid(index) for index in resolved]
+
+                question_opinions.append({
+                    'address': address,
+                    'opinion_cid': cid(opinion_index),
+                    'hivemind_id': cid(hivemind_index),
+                    'timestamp': timestamp,
+                    'ranking': ranking,
+                    'resolved': resolved_ranking,
+                })
+            opinions.append(question_opinions)
+
+        return {
+            'hivemind_id': cid(data['hivemind_id']),
+            'issue': data['issue'],
+            'options': options,
+            'opinions': opinions,
+            'participants': data['participants'],
+            'selected': data['selected'],
+            'final': data['final'],
+            'previous_cid': cid(data['previous_cid']),
+        }
+    except (KeyError, IndexError, TypeError, ValueError) as ex:
+        raise SnapshotError('Invalid snapshot: %s' % ex)
+
+
+def snapshot_matches(snapshot: Dict[str, Any], option_cids: List[str], opinion_cids: List[Dict[str, Any]]) -> bool:
+    """Check that an expanded snapshot describes the given options and opinions.
+
+    :param snapshot: The expanded snapshot, as returned by read_snapshot
+    :type snapshot: Dict[str, Any]
+    :param option_cids: The option CIDs of the state
+    :type option_cids: List[str]
+    :param opinion_cids: The opinion CIDs of the state, per question
+    :type opinion_cids: List[Dict[str, Any]]
+    :return: True if the snapshot matches
+    :rtype: bool
+    """
+    if [option['cid'] for option in snapshot['options']] != list(option_cids):
+        return False
+
+    if len(snapshot['opinions']) != len(opinion_cids):
+        return False
+
+    for question_opinions, state_opinions in zip(snapshot['opinions'], opinion_cids):
+        snapshot_entries = {opinion['address']: (opinion['opinion_cid'], opinion['timestamp']) for opinion in question_opinions}
+        state_entries = {address: (data['opinion_cid'], data['timestamp']) for address, data in state_opinions.items()}
+        if snapshot_entries != state_entries:
+            return False
+
+    return True
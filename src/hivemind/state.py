@@ -1,19 +1,72 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from typing import List, Dict, Any
-from ipfs_dict_chain.IPFSDictChain import IPFSDictChain
+import asyncio
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
 from itertools import combinations
 import logging
+import re
+import threading
 
+from .cid import CID
 from .issue import HivemindIssue
 from .option import HivemindOption
 from .opinion import HivemindOpinion
-from .utils import verify_message
+from .option_set import OptionSet, ParticipantOptions
+from .option_validator import is_valid_ipfs_hash
+from .ranking import OptionIndex
+from .delta import DEFAULT_CHECKPOINT_INTERVAL
+from .sharded_map import DEFAULT_SHARD_THRESHOLD, ShardedMap
+from .signature_log import SignatureLog, compact_signatures
+from .snapshot import create_snapshot, read_snapshot, snapshot_matches
+from .state_diff import diff_state_data
+from .storage import StorageDictChain, aadd_json, add_json, aget_json, run
+from .utils import verify_many, verify_message
 
 LOG = logging.getLogger(__name__)
 
+# The message signed by the author of an issue to select the consensus
+SELECT_CONSENSUS_MESSAGE = re.compile(r'\d+:select_consensus:.*')
 
-class HivemindState(IPFSDictChain):
+# The number of snapshots saved by this process that are remembered as trusted
+MAX_TRUSTED_SNAPSHOTS = 4096
+
+_trusted_snapshots: OrderedDict[str, None] = OrderedDict()
+_trusted_snapshots_lock = threading.Lock()
+
+
+def trust_snapshot(snapshot_cid: str) -> None:
+    """Trust a snapshot, so states that reference it are loaded from it.
+
+    The content of a snapshot is not signed: the issue, option values and rankings in
+    it are not checked against the objects it describes. Only snapshots saved by this
+    process are trusted automatically, use this for snapshots that were saved by this
+    node earlier.
+
+    :param snapshot_cid: The IPFS multihash of the snapshot
+    :type snapshot_cid: str
+    :return: None
+    """
+    with _trusted_snapshots_lock:
+        _trusted_snapshots[CID(snapshot_cid)] = None
+        _trusted_snapshots.move_to_end(CID(snapshot_cid))
+        while len(_trusted_snapshots) > MAX_TRUSTED_SNAPSHOTS:
+            _trusted_snapshots.popitem(last=False)
+
+
+def is_trusted_snapshot(snapshot_cid: str) -> bool:
+    """Check if a snapshot is trusted, see trust_snapshot.
+
+    :param snapshot_cid: The IPFS multihash of the snapshot
+    :type snapshot_cid: str
+    :return: True if the snapshot is trusted
+    :rtype: bool
+    """
+    with _trusted_snapshots_lock:
+        return CID(snapshot_cid) in _trusted_snapshots
+
+
+class HivemindState(StorageDictChain):
     """A class representing the current state of a Hivemind voting issue.
 
     This class manages the state of a voting issue, including options, opinions,
@@ -36,8 +89,27 @@ class HivemindState(IPFSDictChain):
     :vartype selected: List[str]
     :ivar final: Whether the hivemind is finalized
     :vartype final: bool
+    :cvar checkpoint_interval: The number of states per full checkpoint, the others are stored as deltas
+    :vartype checkpoint_interval: int
+    :cvar skip_links: Store the sequence number, timestamp and skip links of every saved state, see StorageDictChain
+    :vartype skip_links: bool
+    :cvar shard_threshold: The number of entries above which the opinions of a question or the signatures are stored as a ShardedMap
+    :vartype shard_threshold: int
+    :cvar log_signatures: Store the signatures in a SignatureLog instead of in the state
+    :vartype log_signatures: bool
+    :cvar signature_log_compaction: Compact the signature log when it has this many segments, 0 keeps every signature
+    :vartype signature_log_compaction: int
+    :cvar save_snapshots: Save a snapshot with every saved state, see save
+    :vartype save_snapshots: bool
     """
 
+    checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL
+    skip_links: bool = True
+    shard_threshold: int = DEFAULT_SHARD_THRESHOLD
+    log_signatures: bool = False
+    signature_log_compaction: int = 0
+    save_snapshots: bool = False
+
     def __init__(self, cid: str = None) -> None:
         """Initialize a new HivemindState.
 
@@ -52,24 +124,65 @@ class HivemindState(IPFSDictChain):
         self.participants: Dict[str, Any] = {}
         self.selected: List[str] = []
         self.final: bool = False
+        self.snapshot_cid: str | None = None
+
+        self._options: List[HivemindOption] = []
+        self._opinions: List = [[]]
+        self._rankings: List = [{}]
+        self._option_index: OptionIndex | None = None
+        self._option_set: OptionSet | None = None
+        self._participant_options: ParticipantOptions | None = None
+        self._signature_log: SignatureLog | None = None
+        self._read_only: bool = False
 
         super(HivemindState, self).__init__(cid=cid)
-        self._options: List[HivemindOption] = [HivemindOption(cid=option_cid) for option_cid in self.option_cids]
 
-        self._opinions: List = []
-        self._rankings: List = []
-        for question_index in range(len(self.opinion_cids)):
-            opinions = []
-            rankings = {}
-            for participant, opinion_data in self.opinion_cids[question_index].items():
-                opinion = HivemindOpinion(cid=opinion_data['opinion_cid'])
-                opinions.append(opinion)
-                rankings[opinion_data['opinion_cid']] = opinion.ranking.get(options=self._options)
+        self._results = None
 
-            self._opinions.append(opinions)
-            self._rankings.append(rankings)
+    @classmethod
+    def from_snapshot(cls, snapshot_cid: str) -> 'HivemindState':
+        """Load a read-only hivemind state from a snapshot with a single read.
+
+        The returned state has its issue, options, opinions and rankings fully loaded,
+        so results can be calculated without any further IPFS access. The signatures
+        are not part of a snapshot, so the state can not be modified or saved. The
+        content of the snapshot is trusted as is, only use this for snapshots from a
+        trusted source.
+
+        :param snapshot_cid: The IPFS multihash of the snapshot
+        :type snapshot_cid: str
+        :return: The read-only hivemind state
+        :rtype: HivemindState
+        :raises SnapshotError: If the snapshot is invalid
+        """
+        return run(cls.afrom_snapshot(snapshot_cid=snapshot_cid))
 
-        self._results = None
+    @classmethod
+    async def afrom_snapshot(cls, snapshot_cid: str) -> 'HivemindState':
+        """Load a read-only hivemind state from a snapshot without blocking the event loop.
+
+        :param snapshot_cid: The IPFS multihash of the snapshot
+        :type snapshot_cid: str
+        :return: The read-only hivemind state
+        :rtype: HivemindState
+        :raises SnapshotError: If the snapshot is invalid
+        """
+        snapshot = read_snapshot(await aget_json(cid=snapshot_cid))
+
+        state = cls()
+        state.hivemind_id = snapshot['hivemind_id']
+        state.option_cids = [option['cid'] for option in snapshot['options']]
+        state.opinion_cids = [{opinion['address']: {'opinion_cid': opinion['opinion_cid'], 'timestamp': opinion['timestamp']} for opinion in question_opinions}
+                              for question_opinions in snapshot['opinions']]
+        state.participants = snapshot['participants']
+        state.selected = snapshot['selected']
+        state.final = snapshot['final']
+        state.previous_cid = snapshot['previous_cid']
+        state.snapshot_cid = CID(snapshot_cid)
+        state._restore_snapshot(snapshot=snapshot)
+        state._read_only = True
+
+        return state
 
     def hivemind_issue(self) -> HivemindIssue:
         """Get the associated hivemind issue.
@@ -87,6 +200,39 @@ class HivemindState(IPFSDictChain):
         """
         return self._options
 
+    def option_index(self) -> OptionIndex:
+        """Get the value-sorted index of the options, rebuilding it if options were added.
+
+        :return: The index of the current options
+        :rtype: OptionIndex
+        """
+        if self._option_index is None or not self._option_index.is_current(self._options):
+            self._option_index = OptionIndex(self._options)
+
+        return self._option_index
+
+    def option_set(self) -> OptionSet:
+        """Get the hashed lookup of the option CIDs and values, rebuilding it if the options were changed.
+
+        :return: The set of the current options
+        :rtype: OptionSet
+        """
+        if self._option_set is None or not self._option_set.is_current(self.option_cids, self._options):
+            self._option_set = OptionSet(self.option_cids, self._options)
+
+        return self._option_set
+
+    def participant_options(self) -> ParticipantOptions:
+        """Get the index of the options signed by each participant, rebuilding it if the options or signatures were replaced.
+
+        :return: The index of the current options and signatures
+        :rtype: ParticipantOptions
+        """
+        if self._participant_options is None or not self._participant_options.is_current(self.option_cids, self.signatures):
+            self._participant_options = ParticipantOptions(self.option_cids, self.signatures)
+
+        return self._participant_options
+
     def set_hivemind_issue(self, issue_cid: str) -> None:
         """Set the associated hivemind issue.
 
@@ -105,27 +251,15 @@ class HivemindState(IPFSDictChain):
         :rtype: Dict[str, Dict[str, Any]]
         """
         options = {}
+        new_options = []
 
         if self._issue.answer_type == 'Bool':
-            true_option = HivemindOption()
-            true_option.set_issue(self.hivemind_id)
-            true_option.text = self._issue.constraints['true_value']
-            true_option.set(value=True)
-            true_option_hash = true_option.save()
-            if isinstance(true_option, HivemindOption) and true_option.valid():
-                if true_option_hash not in self.option_cids:
-                    self.option_cids.append(true_option_hash)
-                    options[true_option_hash] = {'value': true_option.value, 'text': true_option.text}
-
-            false_option = HivemindOption()
-            false_option.set_issue(self.hivemind_id)
-            false_option.text = self._issue.constraints['false_value']
-            false_option.set(value=False)
-            false_option_hash = false_option.save()
-            if isinstance(false_option, HivemindOption) and false_option.valid():
-                if false_option_hash not in self.option_cids:
-                    self.option_cids.append(false_option_hash)
-                    options[false_option_hash] = {'value': false_option.value, 'text': false_option.text}
+            for value, text in [(True, self._issue.constraints['true_value']), (False, self._issue.constraints['false_value'])]:
+                option = HivemindOption()
+                option.set_issue(self.hivemind_id)
+                option.text = text
+                option.set(value=value)
+                new_options.append(option)
 
         elif 'choices' in self._issue.constraints:
             for choice in self._issue.constraints['choices']:
@@ -134,28 +268,334 @@ class HivemindState(IPFSDictChain):
                     option.set_issue(self.hivemind_id)
                     option.text = choice['text']
                     option.set(value=choice['value'])
-                    option_hash = option.save()
-                    if isinstance(option, HivemindOption) and option.valid():
-                        if option_hash not in self.option_cids:
-                            self.option_cids.append(option_hash)
-                            options[option_hash] = {'value': option.value, 'text': option.text}
+                    new_options.append(option)
+
+        # Save all options with a single batched write
+        new_options = [option for option in new_options if option.valid()]
+        option_set = self.option_set()
+        for option, option_hash in zip(new_options, HivemindOption.save_many(new_options)):
+            if not option_set.contains(option_hash):
+                self.option_cids.append(option_hash)
+                self._options.append(option)
+                option_set.add(option_hash, option)
+                options[option_hash] = {'value': option.value, 'text': option.text}
 
         return options
 
-    def load(self, cid: str) -> None:
-        """Load the hivemind state from IPFS.
+    async def _aload_data(self, cid: str, data: Any) -> None:
+        """Load the retrieved data of the hivemind state and the objects it refers to.
+
+        If the state has a trusted snapshot, the issue, options and opinions are rebuilt
+        from the snapshot, otherwise the issue, options and opinions are loaded with
+        batched concurrent fetches.
 
         :param cid: The IPFS multihash of the state
         :type cid: str
+        :param data: The data of the state
+        :type data: Any
         :return: None
         """
-        super(HivemindState, self).load(cid=cid)
-        self._issue = HivemindIssue(cid=self.hivemind_id)
+        await super(HivemindState, self)._aload_data(cid=cid, data=data)
+
+        # Signatures are loaded lazily, the opinions are all needed to load the state
+        self._signature_log = None
+        if SignatureLog.is_reference(self.get('signatures')):
+            self._signature_log = await SignatureLog.aload(self.signatures)
+            self.signatures = self._signature_log.signatures
+        elif ShardedMap.is_reference(self.get('signatures')):
+            self.signatures = ShardedMap.from_reference(self.signatures)
+        if isinstance(self.get('opinion_cids'), list):
+            self.opinion_cids = [ShardedMap.from_reference(question_opinions) if ShardedMap.is_reference(question_opinions) else question_opinions
+                                 for question_opinions in self.opinion_cids]
+
+        snapshot = await self._aload_snapshot()
+        if snapshot is not None:
+            self._restore_snapshot(snapshot=snapshot)
+            return
 
-        # Only initialize opinions if they don't exist
-        if not hasattr(self, 'opinion_cids') or self.opinion_cids is None:
+        # The opinion maps are loaded together with the issue and options
+        issue, options, all_opinions = await asyncio.gather(
+            self._aload_issue(),
+            HivemindOption.aload_many(cids=self.option_cids),
+            self._aload_opinions()
+        )
+        opinion_cids = self.get('opinion_cids') or []
+        self._issue = issue
+        # States that were saved without opinions get an empty opinion map per question
+        if self.opinion_cids is None:
             self.opinion_cids = [{} for _ in range(len(self._issue.questions))]
 
+        opinions = []
+        offset = 0
+        for question_opinions in opinion_cids:
+            opinions.append(all_opinions[offset:offset + len(question_opinions)])
+            offset += len(question_opinions)
+
+        self._options = list(options)
+        self._opinions = [list(question_opinions) for question_opinions in opinions]
+        self._rankings = []
+        for question_opinions, question_loaded in zip(opinion_cids, opinions):
+            rankings = {}
+            for opinion_data, opinion in zip(question_opinions.values(), question_loaded):
+                rankings[opinion_data['opinion_cid']] = await self._aget_ranking(opinion=opinion)
+
+            self._rankings.append(rankings)
+
+    async def _aget_ranking(self, opinion: HivemindOpinion) -> List[str]:
+        """Get the ranked option CIDs of an opinion.
+
+        An auto ranking whose preferred option is not one of the options of this state
+        needs to load that option, which is done in a worker thread.
+
+        :param opinion: The opinion
+        :type opinion: HivemindOpinion
+        :return: The ranked option CIDs
+        :rtype: List[str]
+        """
+        ranking = opinion.ranking
+        index = self.option_index()
+        if ranking.type in ['auto_high', 'auto_low'] and index.find(ranking.auto) is None and index.get_memo(ranking.auto, ranking.type) is None:
+            return await asyncio.to_thread(ranking.get, options=self._options, index=index)
+
+        return ranking.get(options=self._options, index=index)
+
+    async def _aload_opinion_maps(self) -> None:
+        """Load all nodes of the opinion maps that are stored as a ShardedMap.
+
+        :return: None
+        """
+        await asyncio.gather(*[question_opinions.aload_all() for question_opinions in self.get('opinion_cids') or []
+                               if isinstance(question_opinions, ShardedMap)])
+
+    async def _aload_opinions(self) -> List[HivemindOpinion]:
+        """Load the opinion maps and then the opinions of every question.
+
+        :return: The opinions, question by question in the order of the opinion maps
+        :rtype: List[HivemindOpinion]
+        """
+        await self._aload_opinion_maps()
+        return await HivemindOpinion.aload_many(cids=[opinion_data['opinion_cid'] for question_opinions in self.get('opinion_cids') or []
+                                                      for opinion_data in question_opinions.values()])
+
+    async def _aload_issue(self) -> HivemindIssue:
+        """Load the hivemind issue of this state.
+
+        :return: The hivemind issue, or an empty issue if the state has no hivemind_id
+        :rtype: HivemindIssue
+        """
+        if self.hivemind_id is None:
+            return HivemindIssue()
+
+        return await HivemindIssue.aload(cid=self.hivemind_id)
+
+    async def _aload_snapshot(self) -> Dict[str, Any] | None:
+        """Load the snapshot of this state, if it has a valid and trusted one.
+
+        The snapshot is only used if it is trusted (see trust_snapshot), because the
+        issue, option values and rankings in it are not checked against the signed
+        objects that it describes.
+
+        :return: The expanded snapshot, or None if the state has no valid and trusted snapshot
+        :rtype: Dict[str, Any] | None
+        """
+        snapshot_cid = self.get('snapshot_cid')
+        if snapshot_cid is None:
+            return None
+
+        if not is_trusted_snapshot(snapshot_cid):
+            LOG.debug('Snapshot %s of state %s is not trusted, loading from the object graph instead' % (snapshot_cid, self.cid()))
+            return None
+
+        try:
+            snapshot = read_snapshot(await aget_json(cid=snapshot_cid))
+        except Exception as ex:
+            LOG.warning('Unable to load snapshot %s of state %s, loading from the object graph instead: %s' % (snapshot_cid, self.cid(), ex))
+            return None
+
+        await self._aload_opinion_maps()
+        if snapshot['hivemind_id'] != self.hivemind_id or not snapshot_matches(snapshot, self.option_cids, self.opinion_cids or []):
+            LOG.warning('Snapshot %s does not match state %s, loading from the object graph instead' % (snapshot_cid, self.cid()))
+            return None
+
+        return snapshot
+
+    def _restore_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """Rebuild the issue, options, opinions and rankings from an expanded snapshot.
+
+        :param snapshot: The expanded snapshot, as returned by read_snapshot
+        :type snapshot: Dict[str, Any]
+        :return: None
+        """
+        self._issue = HivemindIssue()
+        self._issue._populate(cid=snapshot['hivemind_id'], data=snapshot['issue'])
+
+        self._options = []
+        for option_data in snapshot['options']:
+            option = HivemindOption()
+            option._populate(cid=option_data['cid'], data={'value': option_data['value'], 'text': option_data['text'], 'hivemind_id': option_data['hivemind_id']})
+            option._hivemind_issue = self._issue
+            option._answer_type = self._issue.answer_type
+            self._options.append(option)
+
+        self._opinions = []
+        self._rankings = []
+        for question_index, question_opinions in enumerate(snapshot['opinions']):
+            opinions = []
+            rankings = {}
+            for opinion_data in question_opinions:
+                opinion = HivemindOpinion()
+                opinion._populate(cid=opinion_data['opinion_cid'], data={'hivemind_id': opinion_data['hivemind_id'], 'question_index': question_index, 'ranking': opinion_data['ranking']})
+                opinions.append(opinion)
+                rankings[opinion_data['opinion_cid']] = opinion_data['resolved']
+
+            self._opinions.append(opinions)
+            self._rankings.append(rankings)
+
+    def _sharded_maps(self) -> List[ShardedMap]:
+        """Get the maps of the state that are stored as a ShardedMap.
+
+        Opinion and signature maps that grew beyond shard_threshold entries are converted first.
+
+        :return: The sharded maps
+        :rtype: List[ShardedMap]
+        """
+        if self._signature_log is None and isinstance(self.signatures, dict) and len(self.signatures) > self.shard_threshold:
+            self.signatures = ShardedMap(self.signatures)
+
+        for question_index, question_opinions in enumerate(self.opinion_cids or []):
+            if isinstance(question_opinions, dict) and len(question_opinions) > self.shard_threshold:
+                self.opinion_cids[question_index] = ShardedMap(question_opinions)
+
+        return [value for value in [self.signatures] + list(self.opinion_cids or []) if isinstance(value, ShardedMap)]
+
+    def _prepare_signature_log(self) -> SignatureLog | None:
+        """Get the signature log to store, if the signatures of the state are stored in a log.
+
+        A new log is started when log_signatures is set or when the signatures were
+        replaced, and the log is compacted when it reached signature_log_compaction segments.
+
+        :return: The signature log, or None if the signatures are stored in the state
+        :rtype: SignatureLog | None
+        """
+        if not self.log_signatures and self._signature_log is None:
+            return None
+
+        if self._signature_log is None or not self._signature_log.describes(self.signatures):
+            signatures = self.signatures if isinstance(self.signatures, dict) else {address: messages for address, messages in self.signatures.items()}
+            self._signature_log = SignatureLog(signatures)
+            self.signatures = signatures
+
+        if 0 < self.signature_log_compaction <= self._signature_log.segments:
+            self._signature_log.compact()
+
+        return self._signature_log
+
+    def compact_signatures(self) -> int:
+        """Remove all but the newest signature of each address and message.
+
+        Replay protection only compares new signatures to the newest one, so older
+        signatures of the same message are not needed. A signature log is rewritten as a
+        single segment the next time the state is saved.
+
+        :return: The number of removed signatures
+        :rtype: int
+        :raises Exception: If the state is read-only
+        """
+        if self._read_only is True:
+            raise Exception('Can not compact signatures: hivemind state is read-only')
+
+        if self._signature_log is not None and self._signature_log.describes(self.signatures):
+            return self._signature_log.compact()
+
+        return compact_signatures(self.signatures)
+
+    def _full_data(self) -> Dict[str, Any]:
+        """Get the data of the state with references to its sharded maps and signature log, which must be stored already.
+
+        :return: The data
+        :rtype: Dict[str, Any]
+        """
+        data = super(HivemindState, self)._full_data()
+        if self._signature_log is not None and self._signature_log.describes(data.get('signatures')):
+            data['signatures'] = self._signature_log.reference()
+        elif isinstance(data.get('signatures'), ShardedMap):
+            data['signatures'] = data['signatures'].reference()
+        if isinstance(data.get('opinion_cids'), list):
+            data['opinion_cids'] = [question_opinions.reference() if isinstance(question_opinions, ShardedMap) else question_opinions
+                                    for question_opinions in data['opinion_cids']]
+
+        return data
+
+    def _prepare_save(self) -> Dict[str, Any] | None:
+        """Prepare the state for saving and create its snapshot if save_snapshots is set.
+
+        :return: The snapshot data, or None if no snapshot is saved
+        :rtype: Dict[str, Any] | None
+        :raises Exception: If the state is read-only
+        """
+        if self._read_only is True:
+            raise Exception('Can not save state: hivemind state is read-only')
+
+        self.previous_cid = self._cid
+        self.snapshot_cid = None
+        if not self.save_snapshots or not isinstance(self._issue, HivemindIssue):
+            return None
+
+        try:
+            return create_snapshot(self)
+        except Exception as ex:
+            LOG.warning('Unable to create snapshot of hivemind state, saving without snapshot: %s' % ex)
+            return None
+
+    def save(self) -> str:
+        """Save the hivemind state to IPFS.
+
+        If save_snapshots is set, a snapshot of the state is saved first, so the state
+        can later be loaded without loading each of its options and opinions separately.
+        A snapshot contains every option and opinion, so it is not saved by default:
+        that would make every save as expensive as storing the whole state.
+
+        :return: The IPFS multihash of the saved state
+        :rtype: str
+        :raises Exception: If the state is read-only
+        """
+        snapshot = self._prepare_save()
+        if snapshot is not None:
+            try:
+                self.snapshot_cid = add_json(data=snapshot)
+                trust_snapshot(self.snapshot_cid)
+            except Exception as ex:
+                LOG.warning('Unable to save snapshot of hivemind state, saving without snapshot: %s' % ex)
+
+        signature_log = self._prepare_signature_log()
+        if signature_log is not None:
+            signature_log.store()
+        for sharded_map in self._sharded_maps():
+            sharded_map.store()
+
+        return super(HivemindState, self).save()
+
+    async def asave(self) -> str:
+        """Save the hivemind state to IPFS without blocking the event loop.
+
+        :return: The IPFS multihash of the saved state
+        :rtype: str
+        :raises Exception: If the state is read-only
+        """
+        snapshot = self._prepare_save()
+        if snapshot is not None:
+            try:
+                self.snapshot_cid = await aadd_json(data=snapshot)
+                trust_snapshot(self.snapshot_cid)
+            except Exception as ex:
+                LOG.warning('Unable to save snapshot of hivemind state, saving without snapshot: %s' % ex)
+
+        signature_log = self._prepare_signature_log()
+        if signature_log is not None:
+            await signature_log.astore()
+        await asyncio.gather(*[sharded_map.astore() for sharded_map in self._sharded_maps()])
+        return await super(HivemindState, self).asave()
+
     def add_option(self, timestamp: int, option_hash: str, address: str = None, signature: str = None) -> None:
         """Add an option to the hivemind state.
 
@@ -172,14 +612,17 @@ class HivemindState(IPFSDictChain):
         if self.final is True:
             raise Exception('Can not add option: hivemind state is finalized')
 
+        if self._read_only is True:
+            raise Exception('Can not add option: hivemind state is read-only')
+
         if not isinstance(self._issue, HivemindIssue):
             return
 
         # If we have address restrictions, require address and signature
-        if self._issue.restrictions is not None and 'addresses' in self._issue.restrictions:
+        if self._issue.has_address_restrictions():
             if address is None or signature is None:
                 raise Exception('Can not add option: no address or signature given')
-            elif address not in self._issue.restrictions['addresses']:
+            elif self._issue.address_weight(address) is None:
                 raise Exception('Can not add option: there are address restrictions on this hivemind issue and address %s is not allowed to add options' % address)
 
         # If address and signature are provided, verify the signature regardless of restrictions
@@ -188,25 +631,28 @@ class HivemindState(IPFSDictChain):
                 raise Exception('Can not add option: Signature is not valid')
 
         if self._issue.restrictions is not None and 'options_per_address' in self._issue.restrictions:
-            number_of_options = len(self.options_by_participant(address=address))
+            number_of_options = self.participant_options().count(address)
             if number_of_options >= self._issue.restrictions['options_per_address']:
                 raise Exception('Can not add option: address %s already added too many options: %s' % (address, number_of_options))
 
+        option_set = self.option_set()
         option = self.get_option(cid=option_hash)
         if isinstance(option, HivemindOption) and option.valid():
-            if option_hash in self.option_cids:
+            if option_set.contains(option_hash):
                 raise Exception("Option already exists")
-                
+
             # Check if an option with the same value already exists
-            for existing_option_cid in self.option_cids:
-                existing_option = self.get_option(cid=existing_option_cid)
-                if existing_option.value == option.value:
-                    raise Exception(f"Option with value '{option.value}' already exists with different text")
-                    
+            if option_set.find_value(option.value) is not None:
+                raise Exception(f"Option with value '{option.value}' already exists with different text")
+
             # Only add signature if both address and signature are provided
             if address is not None and signature is not None:
                 self.add_signature(address=address, timestamp=timestamp, message=option_hash, signature=signature)
+            participant_options = self.participant_options()
             self.option_cids.append(option_hash)
+            self._options.append(option)
+            option_set.add(option_hash, option)
+            participant_options.add_option(option_hash)
             self._results = None  # Invalidate cached results
 
     def options_by_participant(self, address: str) -> List[str]:
@@ -217,14 +663,8 @@ class HivemindState(IPFSDictChain):
         :return: List of option CIDs
         :rtype: List[str]
         """
-        # Track which options were added by this address by checking signatures
-        participant_options = []
-        if address in self.signatures:
-            for option_hash in self.option_cids:
-                # Check if this address has signed this option
-                if option_hash in self.signatures[address]:
-                    participant_options.append(option_hash)
-        return participant_options
+        # The options that were signed by this address, in the order of the options
+        return self.participant_options().options(address)
 
     def add_opinion(self, timestamp: int, opinion_hash: str, address: str, signature: str) -> None:
         """Add an opinion to the hivemind state.
@@ -242,34 +682,34 @@ class HivemindState(IPFSDictChain):
         if self.final is True:
             raise Exception('Can not add opinion: hivemind state is finalized')
 
+        if self._read_only is True:
+            raise Exception('Can not add opinion: hivemind state is read-only')
+
         opinion = self.get_opinion(cid=opinion_hash)
         if not verify_message(address=address, message='%s%s' % (timestamp, opinion_hash), signature=signature):
             raise Exception('Signature is invalid')
 
         # Check address restrictions
-        if self._issue.restrictions is not None and 'addresses' in self._issue.restrictions:
-            if address not in self._issue.restrictions['addresses']:
+        if self._issue.has_address_restrictions():
+            if self._issue.address_weight(address) is None:
                 raise Exception('Can not add opinion: there are address restrictions on this hivemind issue and address %s is not allowed to add opinions' % address)
 
         # Get the ranking as a list of options
         try:
             # For auto rankings, we need to calculate the ranking based on the options
             LOG.info(f"Getting ranking options with {len(self._options)} available options")
-            ranking_options = opinion.ranking.get(options=self._options)
+            ranking_options = opinion.ranking.get(options=self._options, index=self.option_index())
             LOG.info(f"Ranking options: {ranking_options}")
         except Exception as e:
             LOG.error(f"Error getting ranking options: {str(e)}")
             raise Exception(f"Error validating opinion: {str(e)}")
 
-        # Check if all options in the ranking exist in the state
-        # Strip '/ipfs/' prefix from option hashes if present for comparison
-        normalized_ranking_options = [option_hash.replace('/ipfs/', '') for option_hash in ranking_options]
-        normalized_state_options = [option_hash.replace('/ipfs/', '') for option_hash in self.option_cids]
-
-        invalid_options = [option_hash for option_hash in normalized_ranking_options if option_hash not in normalized_state_options]
+        # Check if all options in the ranking exist in the state, the '/ipfs/' prefix is ignored for the comparison
+        option_set = self.option_set()
+        invalid_options = option_set.missing(ranking_options)
         if invalid_options:
             LOG.error(f"Invalid options found: {invalid_options}")
-            LOG.error(f"Available options: {normalized_state_options}")
+            LOG.error(f"Available options: {list(option_set.cids())}")
             raise Exception(f"Opinion is invalid: contains options that do not exist in the hivemind state: {invalid_options}")
 
         if not invalid_options:
@@ -286,6 +726,11 @@ class HivemindState(IPFSDictChain):
 
             while len(self._rankings) <= opinion.question_index:
                 self._rankings.append({})
+            while len(self._opinions) <= opinion.question_index:
+                self._opinions.append([])
+
+            self._opinions[opinion.question_index] = [existing for existing in self._opinions[opinion.question_index] if existing.cid() != opinion.cid()]
+            self._opinions[opinion.question_index].append(opinion)
 
             self._rankings[opinion.question_index][opinion_hash] = ranking_options
             self._results = None  # Invalidate cached results
@@ -298,26 +743,12 @@ class HivemindState(IPFSDictChain):
         :return: The weight of the opinion
         :rtype: float
         """
-        weight = 1.0
-
-        if self._issue.restrictions is not None and 'addresses' in self._issue.restrictions:
-            weight = 0.0  # Default weight if there are addresses in restrictions
-            for address in self._issue.restrictions['addresses']:
-                if address.startswith(opinionator):
-                    weight = 1.0
-                    # Check if the address has a weight specification (e.g., "address@2")
-                    if '@' in address:
-                        parts = address.split('@', 1)
-                        try:
-                            specified_weight = float(parts[1].strip())
-                            if specified_weight >= 0:
-                                weight = specified_weight
-                        except ValueError:
-                            # If weight parsing fails, use default weight
-                            pass
-                    break
-
-        return weight
+        if not self._issue.has_address_restrictions():
+            return 1.0
+
+        # Addresses that are not in the address restrictions have no weight
+        weight = self._issue.address_weight(opinionator)
+        return weight if weight is not None else 0.0
 
     def info(self) -> str:
         """Get the information of the hivemind.
@@ -402,7 +833,8 @@ class HivemindState(IPFSDictChain):
         """
         # if selection mode is 'Exclude', we must exclude previously selected options from the results
         if self._issue.on_selection == 'Exclude':
-            available_options = [option_hash for option_hash in self.option_cids if option_hash not in self.selected]
+            selected = set(self.selected)
+            available_options = [option_hash for option_hash in self.option_cids if option_hash not in selected]
         else:
             available_options = self.option_cids
 
@@ -444,7 +876,7 @@ class HivemindState(IPFSDictChain):
         :rtype: float
         """
         results = self.results()[question_index]
-        return results[option_hash.replace('/ipfs/', '')]['score']
+        return results[CID(option_hash)]['score']
 
     def get_sorted_options(self, question_index: int = 0) -> List[HivemindOption]:
         """Get the sorted list of options.
@@ -473,7 +905,7 @@ class HivemindState(IPFSDictChain):
         elif len(sorted_options) == 1:
             return sorted_options[0].value
         # Make sure the consensus is not tied between the first two options
-        elif len(sorted_options) >= 2 and results[sorted_options[0].cid().replace('/ipfs/', '')]['score'] > results[sorted_options[1].cid().replace('/ipfs/', '')]['score']:
+        elif len(sorted_options) >= 2 and results[CID(sorted_options[0].cid())]['score'] > results[CID(sorted_options[1].cid())]['score']:
             return sorted_options[0].value
         else:
             return None
@@ -505,12 +937,14 @@ class HivemindState(IPFSDictChain):
 
         # if selection mode is 'Exclude', we must exclude previously selected options from the results
         if self._issue.on_selection == 'Exclude':
-            available_options = [option_hash for option_hash in self.option_cids if option_hash not in self.selected]
+            selected = set(self.selected)
+            available_options = [option_hash for option_hash in self.option_cids if option_hash not in selected]
         else:
             available_options = self.option_cids
 
+        available = set(available_options)
         for option_hash, option_result in sorted(results.items(), key=lambda x: x[1]['score'], reverse=True):
-            if option_hash not in available_options:
+            if option_hash not in available:
                 continue
 
             i += 1
@@ -590,6 +1024,9 @@ class HivemindState(IPFSDictChain):
         if self.final:
             raise Exception('Can not add option: hivemind issue is finalized')
 
+        if self._read_only is True:
+            raise Exception('Can not select consensus: hivemind state is read-only')
+
         author = self._issue.author
         if author is not None:
             # If author is specified, verify that the address matches
@@ -615,7 +1052,7 @@ class HivemindState(IPFSDictChain):
             LOG.debug("Hivemind issue has no author specified")
 
         # Get the option hash with highest consensus for each question
-        selection = [self.get_sorted_options(question_index=question_index)[0].cid().replace('/ipfs/', '') for question_index in range(len(self._issue.questions))]
+        selection = [CID(self.get_sorted_options(question_index=question_index)[0].cid()) for question_index in range(len(self._issue.questions))]
 
         if self._issue.on_selection is None:
             return selection
@@ -626,8 +1063,6 @@ class HivemindState(IPFSDictChain):
             # Only add the winner of the first question to self.selected
             if len(selection) > 0:
                 winner = selection[0]
-                # Make sure we normalize the CID by removing the '/ipfs/' prefix if present
-                winner = winner.replace('/ipfs/', '')
                 if winner not in self.selected:
                     self.selected.append(winner)
         elif self._issue.on_selection == 'Reset':
@@ -657,10 +1092,14 @@ class HivemindState(IPFSDictChain):
             if signature in self.signatures[address][message] and timestamp == self.signatures[address][message][signature]:
                 return
 
-        if address not in self.signatures:
-            self.signatures[address] = {message: {signature: timestamp}}
-        elif message not in self.signatures[address]:
-            self.signatures[address].update({message: {signature: timestamp}})
+        if address not in self.signatures or message not in self.signatures[address]:
+            if self._participant_options is not None and self._participant_options.is_current(self.option_cids, self.signatures):
+                self._participant_options.add_signature(address, message)
+
+            if address not in self.signatures:
+                self.signatures[address] = {message: {signature: timestamp}}
+            else:
+                self.signatures[address].update({message: {signature: timestamp}})
         else:
             timestamps = [int(key) for key in self.signatures[address][message].values()]
 
@@ -669,6 +1108,44 @@ class HivemindState(IPFSDictChain):
             else:
                 raise Exception('Invalid timestamp: must be more recent than any previous signature timestamp')
 
+        if self._signature_log is not None and self._signature_log.describes(self.signatures):
+            self._signature_log.append(address, message, signature, timestamp)
+
+    def verify_all_signatures(self, processes: int | None = None) -> List[Tuple[str, str, str]]:
+        """Verify all signatures of the hivemind state, for example before trusting a state that was loaded by CID.
+
+        Signatures of options and opinions were made over the timestamp followed by the
+        CID and signatures of a consensus selection over the message itself. Signatures of
+        participant names were made over the CID of the identification data, which is not
+        part of the state, so those can not be verified and are skipped.
+
+        :param processes: The number of worker processes, see verify_many
+        :type processes: int | None
+        :return: The (address, message, signature) of every invalid signature
+        :rtype: List[Tuple[str, str, str]]
+        """
+        entries = []
+        items = []
+        for address, messages in self.signatures.items():
+            for message, signatures in messages.items():
+                if SELECT_CONSENSUS_MESSAGE.fullmatch(message):
+                    signed = message
+                elif len(message) >= 46 and is_valid_ipfs_hash(CID(message)):
+                    signed = None
+                else:
+                    LOG.debug('Skipping signature of %s for message %s, it can not be verified from the state' % (address, message))
+                    continue
+
+                for signature, timestamp in signatures.items():
+                    entries.append((address, message, signature))
+                    items.append((signed if signed is not None else '%s%s' % (timestamp, message), address, signature))
+
+        invalid = [entry for entry, valid in zip(entries, verify_many(items, processes=processes)) if not valid]
+        if invalid:
+            LOG.warning('State %s has %s invalid signatures' % (self.cid(), len(invalid)))
+
+        return invalid
+
     def update_participant_name(self, timestamp: int, name: str, address: str, signature: str, message: str) -> None:
         """Update the name of a participant.
 
@@ -688,6 +1165,9 @@ class HivemindState(IPFSDictChain):
         if self.final is True:
             raise Exception('Can not update participant name: hivemind state is finalized')
 
+        if self._read_only is True:
+            raise Exception('Can not update participant name: hivemind state is read-only')
+
         # Check if name exceeds maximum length
         max_name_length = 50
         if len(name) > max_name_length:
@@ -708,6 +1188,42 @@ class HivemindState(IPFSDictChain):
             else:
                 raise Exception('Invalid signature')
 
+    @classmethod
+    def diff_cids(cls, cid: str, other_cid: str) -> Dict[str, Any]:
+        """Get the structural diff between two stored states without loading them, see hivemind.state_diff.
+
+        :param cid: The IPFS multihash of the old state
+        :type cid: str
+        :param other_cid: The IPFS multihash of the new state
+        :type other_cid: str
+        :return: The added and removed options, the changed opinions per question, the added and removed signatures, the renamed participants and the other changed values
+        :rtype: Dict[str, Any]
+        :raises Exception: If a state can not be retrieved
+        """
+        reader = cls()
+        data = []
+        for state_cid in (cid, other_cid):
+            state_data = reader._get_previous_data(state_cid)
+            if state_data is None:
+                raise Exception('Can not retrieve state %s' % state_cid)
+            data.append(state_data)
+
+        return diff_state_data(*data)
+
+    def diff(self, other_cid: str) -> Dict[str, Any]:
+        """Get the structural diff from this state, as it was loaded or last saved, to another state.
+
+        :param other_cid: The IPFS multihash of the other state
+        :type other_cid: str
+        :return: The diff, see diff_cids
+        :rtype: Dict[str, Any]
+        :raises Exception: If this state is not saved or a state can not be retrieved
+        """
+        if self.cid() is None:
+            raise Exception('Can not diff a state that is not saved')
+
+        return self.diff_cids(self.cid(), other_cid)
+
     def compare(self, a: str, b: str, opinion_hash: str) -> str | None:
         """Helper function to compare 2 Option objects against each other based on a given Opinion.
 
@@ -744,9 +1260,9 @@ class HivemindState(IPFSDictChain):
         :rtype: HivemindOption
         """
         # Check if the option is already in the state
-        for option in self._options:
-            if cid.replace('/ipfs/', '') in option.cid():
-                return option
+        option = self.option_set().get(cid)
+        if option is not None:
+            return option
 
         return HivemindOption(cid=cid)
 
@@ -759,9 +1275,10 @@ class HivemindState(IPFSDictChain):
         :rtype: HivemindOpinion
         """
         # Check if the opinion is already in the state
+        key = CID(cid)
         for question_index in range(len(self._opinions)):
             for opinion in self._opinions[question_index]:
-                if cid.replace('/ipfs/', '') in opinion.cid():
+                if opinion.cid() is not None and CID(opinion.cid()) == key:
                     return opinion
 
         return HivemindOpinion(cid=cid)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Structural diffs between the stored data of two hivemind states.
+
+Comparing two fully loaded states loads all their options and opinions. A diff only
+compares the top-level maps of the stored data instead, and only fetches what differs:
+
+- options are compared by CID, and only the added and removed options are loaded,
+- opinions are compared by address per question, and only the new opinions of the
+  changed entries are loaded,
+- signatures and participants are compared by address.
+
+Maps that are stored as a ShardedMap are compared tree by tree, skipping the subtrees
+that both states share, and a signature log only fetches the segments that were
+appended since the old state. The result looks like:
+
+    {'options': {'added': [{'cid': ..., 'value': ..., 'text': ...}, ...], 'removed': [...]},
+     'opinions': [[{'address': ..., 'old': entry | None, 'new': entry | None, 'ranking': ...}, ...], ...],
+     'signatures': {'added': [[address, message, signature, timestamp], ...], 'removed': [...]},
+     'participants': {address: {'old': name | None, 'new': name | None}, ...},
+     'changed': {key: {'old': ..., 'new': ...}, ...}}
+
+where changed has the other top-level values that differ, like selected and final.
+"""
+import logging
+from typing import Any, Dict, List, Tuple
+
+from .cid import CID
+from .opinion import HivemindOpinion
+from .option import HivemindOption
+from .sharded_map import ShardedMap, diff_sharded_maps
+from .signature_log import SignatureLog
+from .storage import CHAIN_KEYS, run
+
+LOG = logging.getLogger(__name__)
+
+# The keys of the stored data that are compared as maps or not at all
+MAP_KEYS = ('option_cids', 'opinion_cids', 'signatures', 'participants', 'snapshot_cid')
+
+
+def _load_map(value: Any) -> Dict[str, Any]:
+    """Get a stored map as a dict, loading it if it is stored as a ShardedMap or a SignatureLog.
+
+    :param value: The stored map
+    :type value: Any
+    :return: The map
+    :rtype: Dict[str, Any]
+    """
+    if ShardedMap.is_reference(value):
+        sharded_map = ShardedMap.from_reference(value)
+        sharded_map.load_all()
+        return dict(sharded_map.items())
+    elif SignatureLog.is_reference(value):
+        return run(SignatureLog.aload(value)).signatures
+
+    return value if isinstance(value, dict) else {}
+
+
+def diff_maps(old: Any, new: Any) -> Dict[str, Tuple[Any, Any]]:
+    """Get the entries that differ between two stored maps.
+
+    :param old: The old map, a dict or the reference to a ShardedMap or SignatureLog
+    :type old: Any
+    :param new: The new map, a dict or the reference to a ShardedMap or SignatureLog
+    :type new: Any
+    :return: The old and new value of every key that was added, removed or changed, None for a missing key
+    :rtype: Dict[str, Tuple[Any, Any]]
+    """
+    if old == new:
+        return {}
+    if ShardedMap.is_reference(old) and ShardedMap.is_reference(new):
+        return diff_sharded_maps(old, new)
+
+    old, new = _load_map(old), _load_map(new)
+    return {key: (old.get(key), new.get(key)) for key in list(old) + [key for key in new if key not in old]
+            if old.get(key) != new.get(key)}
+
+
+def _flatten_signatures(address: str, messages: Dict[str, Dict[str, int]] | None) -> Dict[Tuple[str, str, str], int]:
+    """Get the signatures of an address by address, message and signature.
+
+    :param address: The address
+    :type address: str
+    :param messages: The signatures of the address by message, or None
+    :type messages: Dict[str, Dict[str, int]] | None
+    :return: The timestamp of every signature
+    :rtype: Dict[Tuple[str, str, str], int]
+    """
+    return {(address, message, signature): timestamp
+            for message, signatures in (messages or {}).items()
+            for signature, timestamp in signatures.items()}
+
+
+def diff_signatures(old: Any, new: Any) -> Dict[str, List[List[Any]]]:
+    """Get the signatures that were added and removed between two states.
+
+    :param old: The stored signatures of the old state
+    :type old: Any
+    :param new: The stored signatures of the new state
+    :type new: Any
+    :return: The added and removed signatures, as [address, message, signature, timestamp]
+    :rtype: Dict[str, List[List[Any]]]
+    """
+    if SignatureLog.is_reference(old) and SignatureLog.is_reference(new):
+        entries = SignatureLog.entries_since(new, old)
+        if entries is not None:
+            return {'added': entries, 'removed': []}
+
+    added, removed = [], []
+    for address, (old_messages, new_messages) in diff_maps(old, new).items():
+        old_signatures = _flatten_signatures(address, old_messages)
+        new_signatures = _flatten_signatures(address, new_messages)
+        added.extend([*key, timestamp] for key, timestamp in new_signatures.items() if key not in old_signatures)
+        removed.extend([*key, timestamp] for key, timestamp in old_signatures.items() if key not in new_signatures)
+
+    return {'added': added, 'removed': removed}
+
+
+def diff_options(old: List[str], new: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Get the options that were added and removed between two states, loading only those options.
+
+    :param old: The option CIDs of the old state
+    :type old: List[str]
+    :param new: The option CIDs of the new state
+    :type new: List[str]
+    :return: The CID, value and text of the added and removed options
+    :rtype: Dict[str, List[Dict[str, Any]]]
+    """
+    old_cids, new_cids = [CID(cid) for cid in old or []], [CID(cid) for cid in new or []]
+    old_set, new_set = set(old_cids), set(new_cids)
+    added = [cid for cid in new_cids if cid not in old_set]
+    removed = [cid for cid in old_cids if cid not in new_set]
+    options = HivemindOption.load_many(cids=added + removed) if added or removed else []
+
+    details = [{'cid': cid, 'value': option.value, 'text': option.text} for cid, option in zip(added + removed, options)]
+    return {'added': details[:len(added)], 'removed': details[len(added):]}
+
+
+def diff_opinions(old: List[Any], new: List[Any]) -> List[List[Dict[str, Any]]]:
+    """Get the opinions that were added, changed and removed per question, loading only the new opinions.
+
+    :param old: The stored opinions of the old state, per question
+    :type old: List[Any]
+    :param new: The stored opinions of the new state, per question
+    :type new: List[Any]
+    :return: The address, old entry, new entry and new ranking of every changed opinion, per question
+    :rtype: List[List[Dict[str, Any]]]
+    """
+    old, new = old or [], new or []
+    questions = []
+    for question_index in range(max(len(old), len(new))):
+        differences = diff_maps(old[question_index] if question_index < len(old) else {},
+                                new[question_index] if question_index < len(new) else {})
+        questions.append([{'address': address, 'old': old_entry, 'new': new_entry, 'ranking': None}
+                          for address, (old_entry, new_entry) in differences.items()])
+
+    changed = [change for question in questions for change in question if change['new'] is not None]
+    for change, opinion in zip(changed, HivemindOpinion.load_many(cids=[change['new']['opinion_cid'] for change in changed]) if changed else []):
+        change['ranking'] = opinion.ranking.to_dict()
+
+    return questions
+
+
+def diff_state_data(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the structural diff between the stored data of two states, see the module docstring.
+
+    :param old: The data of the old state, rebuilt if it was stored as a delta
+    :type old: Dict[str, Any]
+    :param new: The data of the new state, rebuilt if it was stored as a delta
+    :type new: Dict[str, Any]
+    :return: The diff
+    :rtype: Dict[str, Any]
+    """
+    participants = {address: {'old': (old_entry or {}).get('name'), 'new': (new_entry or {}).get('name')}
+                    for address, (old_entry, new_entry) in diff_maps(old.get('participants', {}), new.get('participants', {})).items()}
+
+    changed = {}
+    for key in list(old) + [key for key in new if key not in old]:
+        if key in MAP_KEYS or key in CHAIN_KEYS or key.startswith('_'):
+            continue
+        if old.get(key) != new.get(key):
+            changed[key] = {'old': old.get(key), 'new': new.get(key)}
+
+    return {
+        'options': diff_options(old.get('option_cids'), new.get('option_cids')),
+        'opinions': diff_opinions(old.get('opinion_cids'), new.get('opinion_cids')),
+        'signatures': diff_signatures(old.get('signatures', {}), new.get('signatures', {})),
+        'participants': participants,
+        'changed': changed,
+    }
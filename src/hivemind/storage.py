@@ -0,0 +1,1043 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Storage access for the Hivemind protocol objects.
+
+Every read and write of a hivemind object (issue, option, opinion and state) goes
+through this module instead of calling ipfs-dict-chain directly. This gives the
+package a single place to coordinate IPFS access, for example to coalesce concurrent
+loads of the same CID into a single fetch.
+
+The IPFS access itself is asynchronous: aget_json and aadd_json talk to the HTTP API
+of the IPFS daemon through a pluggable transport (see hivemind.transport) without
+blocking the event loop. The transport can also be a local backend (see
+hivemind.backends) that computes the same CIDs without an IPFS daemon. The synchronous get_json and
+add_json functions are thin wrappers that run the coroutines on a background event
+loop.
+"""
+import asyncio
+import copy
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Tuple
+
+from ipfs_dict_chain.IPFS import IPFSError
+from ipfs_dict_chain.IPFSDict import IPFSDict
+from ipfs_dict_chain.IPFSDictChain import IPFSDictChain
+
+from .cid import CID
+from .delta import apply_delta, make_delta
+from .transport import KuboTransport, Transport
+
+LOG = logging.getLogger(__name__)
+
+# The keys of a chained state that describe its place in the chain, they are stored
+# at the top level of every state, also of states that are stored as a delta
+CHAIN_KEYS = ('previous_cid', 'sequence', 'timestamp', 'skip_cids')
+
+
+def normalize_cid(cid: str) -> CID:
+    """Strip the '/ipfs/' prefix from a CID if present.
+
+    :param cid: The CID, with or without the '/ipfs/' prefix
+    :type cid: str
+    :return: The interned CID without the '/ipfs/' prefix
+    :rtype: CID
+    """
+    return CID(cid)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into a single call.
+
+    The first caller for a key (the leader) executes the function, every caller that
+    arrives while the leader is still busy waits for the leader and receives the same
+    result (or exception). Once the call has finished the key is forgotten, so later
+    calls execute the function again.
+
+    :ivar calls: Number of calls that executed the function
+    :vartype calls: int
+    :ivar shared: Number of calls that waited for an in-flight call instead
+    :vartype shared: int
+    """
+
+    def __init__(self) -> None:
+        """Initialize a new SingleFlight group.
+
+        :return: None
+        """
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.calls: int = 0
+        self.shared: int = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Execute fn for the given key, unless a call for that key is already in flight.
+
+        :param key: The key identifying the call
+        :type key: str
+        :param fn: The function to execute
+        :type fn: Callable[[], Any]
+        :return: The result of the (possibly shared) call
+        :rtype: Any
+        :raises Exception: Any exception raised by the (possibly shared) call
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._start(key)
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn for the given key, unless a call for that key is already in flight.
+
+        Callers waiting for an in-flight call may run on a different event loop (or
+        thread) than the leader.
+
+        :param key: The key identifying the call
+        :type key: str
+        :param fn: The coroutine function to await
+        :type fn: Callable[[], Awaitable[Any]]
+        :return: The result of the (possibly shared) call
+        :rtype: Any
+        :raises Exception: Any exception raised by the (possibly shared) call
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._start(key)
+            else:
+                self.shared += 1
+
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await fn()
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _start(self, key: str) -> Future:
+        """Register a new in-flight call, the lock must be held by the caller.
+
+        The future is marked as running, so a waiting caller that gets cancelled can
+        not cancel the call for everyone else.
+
+        :param key: The key identifying the call
+        :type key: str
+        :return: The future that will hold the result of the call
+        :rtype: Future
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self._in_flight[key] = future
+        self.calls += 1
+        return future
+
+    def in_flight(self) -> int:
+        """Get the number of calls that are currently in flight.
+
+        :return: The number of in-flight calls
+        :rtype: int
+        """
+        with self._lock:
+            return len(self._in_flight)
+
+    def stats(self) -> Dict[str, int]:
+        """Get the statistics of this group.
+
+        :return: Dictionary with the number of executed, shared and in-flight calls
+        :rtype: Dict[str, int]
+        """
+        return {'calls': self.calls, 'shared': self.shared, 'in_flight': self.in_flight()}
+
+
+class JSONCache:
+    """A thread-safe LRU cache of parsed JSON data, keyed by CID.
+
+    The content of a CID never changes, so entries only leave the cache when it is full.
+
+    :ivar maxsize: The maximum number of entries in the cache
+    :vartype maxsize: int
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """Initialize a new JSONCache.
+
+        :param maxsize: The maximum number of entries in the cache
+        :type maxsize: int
+        :return: None
+        """
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self.maxsize: int = maxsize
+
+    def get(self, cid: str) -> Any | None:
+        """Get the data of a CID from the cache.
+
+        :param cid: The CID, without the '/ipfs/' prefix
+        :type cid: str
+        :return: The cached data, or None if the CID is not in the cache
+        :rtype: Any | None
+        """
+        with self._lock:
+            data = self._entries.get(cid)
+            if data is not None:
+                self._entries.move_to_end(cid)
+
+            return data
+
+    def set(self, cid: str, data: Any) -> None:
+        """Store the data of a CID in the cache.
+
+        :param cid: The CID, without the '/ipfs/' prefix
+        :type cid: str
+        :param data: The data
+        :type data: Any
+        :return: None
+        """
+        with self._lock:
+            self._entries[cid] = data
+            self._entries.move_to_end(cid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """Get the number of entries in the cache.
+
+        :return: The number of entries
+        :rtype: int
+        """
+        with self._lock:
+            return len(self._entries)
+
+
+loads = SingleFlight()
+cache = JSONCache()
+
+_transport: Transport = KuboTransport()
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread: threading.Thread | None = None
+_loop_lock = threading.Lock()
+
+
+def connect(host: str, port: int) -> None:
+    """Use the HTTP API of the IPFS daemon at the given address.
+
+    Without calling this function, the address that was set with
+    ipfs_dict_chain.IPFS.connect is used.
+
+    :param host: The host of the IPFS daemon
+    :type host: str
+    :param port: The port of the HTTP API of the IPFS daemon
+    :type port: int
+    :return: None
+    """
+    set_transport(KuboTransport(base_url='http://%s:%s' % ('[%s]' % host if ':' in host else host, port)))
+
+
+def set_transport(transport: Transport) -> None:
+    """Set the transport used for all IPFS access.
+
+    :param transport: The transport
+    :type transport: Transport
+    :return: None
+    """
+    global _transport
+    _transport = transport
+    cache.clear()
+
+
+def get_transport() -> Transport:
+    """Get the transport used for all IPFS access.
+
+    :return: The transport
+    :rtype: Transport
+    """
+    return _transport
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Get the background event loop of the synchronous API, starting it if needed.
+
+    :return: The background event loop
+    :rtype: asyncio.AbstractEventLoop
+    """
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name='hivemind-storage', daemon=True)
+            _loop_thread.start()
+
+        return _loop
+
+
+def run(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Run a coroutine of the asynchronous API and wait for its result.
+
+    This can be called from any thread, including a thread that is running an event
+    loop, but not from a coroutine that is itself running on the background loop.
+
+    :param coro: The coroutine
+    :type coro: Coroutine[Any, Any, Any]
+    :return: The result of the coroutine
+    :rtype: Any
+    :raises Exception: If called from the background event loop
+    """
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise Exception('Can not use the synchronous storage API from a coroutine of the asynchronous API')
+
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def stats() -> Dict[str, Any]:
+    """Get the statistics of the IPFS access.
+
+    :return: Dictionary with the transport statistics, the coalesced loads and the number of cached objects
+    :rtype: Dict[str, Any]
+    """
+    return {'transport': _transport.stats(), 'loads': loads.stats(), 'cached': len(cache)}
+
+
+async def _fetch_json(cid: str) -> Any:
+    """Fetch and parse the JSON data of a CID from IPFS.
+
+    :param cid: The CID, without the '/ipfs/' prefix
+    :type cid: str
+    :return: The JSON data
+    :rtype: Any
+    :raises IPFSError: If the data can not be retrieved or parsed
+    """
+    try:
+        content = await _transport.cat(cid)
+    except IPFSError as ex:
+        raise IPFSError('Failed to retrieve json data from IPFS hash %s: %s' % (cid, ex))
+
+    try:
+        data = json.loads(content)
+    except ValueError as ex:
+        raise IPFSError('Failed to parse json data from IPFS hash %s: %s' % (cid, ex))
+
+    cache.set(cid, data)
+    return data
+
+
+async def aget_json(cid: str) -> Dict[str, Any]:
+    """Retrieve the JSON data of a CID.
+
+    Concurrent requests for the same CID share a single fetch. Each caller receives its
+    own copy of the data, so callers can freely modify the returned dict.
+
+    :param cid: The CID of the data, with or without the '/ipfs/' prefix
+    :type cid: str
+    :return: The JSON data
+    :rtype: Dict[str, Any]
+    :raises IPFSError: If the data can not be retrieved
+    """
+    cid = normalize_cid(cid)
+    data = cache.get(cid)
+    if data is None:
+        data = await loads.ado(cid, lambda: _fetch_json(cid))
+
+    return copy.deepcopy(data)
+
+
+async def aadd_json(data: Dict[str, Any]) -> str:
+    """Store JSON data and return its CID.
+
+    :param data: The JSON data to store
+    :type data: Dict[str, Any]
+    :return: The CID of the stored data
+    :rtype: str
+    :raises IPFSError: If the data can not be stored
+    """
+    content = json.dumps(data)
+    try:
+        cid = await _transport.add(content.encode())
+    except IPFSError as ex:
+        raise IPFSError('Failed to add JSON data to IPFS: %s' % ex)
+
+    cid = CID(cid)
+    cache.set(cid, json.loads(content))
+    return cid
+
+
+async def aget_many(cids: List[str]) -> List[Dict[str, Any]]:
+    """Retrieve the JSON data of several CIDs concurrently.
+
+    Every CID is fetched at most once, even if it is requested more than once or is
+    already being fetched by another caller.
+
+    :param cids: The CIDs of the data, with or without the '/ipfs/' prefix
+    :type cids: List[str]
+    :return: The JSON data of each CID, in the same order
+    :rtype: List[Dict[str, Any]]
+    :raises IPFSError: If the data of any of the CIDs can not be retrieved
+    """
+    return list(await asyncio.gather(*[aget_json(cid=cid) for cid in cids]))
+
+
+async def aput_many(objects: List[Dict[str, Any]]) -> List[str]:
+    """Store several JSON objects and return their CIDs.
+
+    The objects are handed to the transport together, so a transport that supports it
+    can store them with a single request.
+
+    :param objects: The JSON objects to store
+    :type objects: List[Dict[str, Any]]
+    :return: The CIDs of the stored objects, in the same order
+    :rtype: List[str]
+    :raises IPFSError: If any of the objects can not be stored
+    """
+    contents = [json.dumps(data) for data in objects]
+    if not contents:
+        return []
+
+    try:
+        cids = await _transport.add_many([content.encode() for content in contents])
+    except IPFSError as ex:
+        raise IPFSError('Failed to add JSON data to IPFS: %s' % ex)
+
+    cids = [CID(cid) for cid in cids]
+    for cid, content in zip(cids, contents):
+        cache.set(cid, json.loads(content))
+    return cids
+
+
+def get_json(cid: str) -> Dict[str, Any]:
+    """Retrieve the JSON data of a CID, see aget_json.
+
+    :param cid: The CID of the data, with or without the '/ipfs/' prefix
+    :type cid: str
+    :return: The JSON data
+    :rtype: Dict[str, Any]
+    :raises IPFSError: If the data can not be retrieved
+    """
+    data = cache.get(normalize_cid(cid))
+    if data is not None:
+        return copy.deepcopy(data)
+
+    return run(aget_json(cid=cid))
+
+
+def add_json(data: Dict[str, Any]) -> str:
+    """Store JSON data and return its CID, see aadd_json.
+
+    :param data: The JSON data to store
+    :type data: Dict[str, Any]
+    :return: The CID of the stored data
+    :rtype: str
+    :raises IPFSError: If the data can not be stored
+    """
+    return run(aadd_json(data=data))
+
+
+def get_many(cids: List[str]) -> List[Dict[str, Any]]:
+    """Retrieve the JSON data of several CIDs, see aget_many.
+
+    :param cids: The CIDs of the data, with or without the '/ipfs/' prefix
+    :type cids: List[str]
+    :return: The JSON data of each CID, in the same order
+    :rtype: List[Dict[str, Any]]
+    :raises IPFSError: If the data of any of the CIDs can not be retrieved
+    """
+    return run(aget_many(cids=cids))
+
+
+def put_many(objects: List[Dict[str, Any]]) -> List[str]:
+    """Store several JSON objects and return their CIDs, see aput_many.
+
+    :param objects: The JSON objects to store
+    :type objects: List[Dict[str, Any]]
+    :return: The CIDs of the stored objects, in the same order
+    :rtype: List[str]
+    :raises IPFSError: If any of the objects can not be stored
+    """
+    return run(aput_many(objects=objects))
+
+
+class StorageDict(IPFSDict):
+    """An IPFSDict that loads and saves its data through the hivemind storage functions.
+
+    This is the base class of all hivemind objects that are stored on IPFS. Subclasses
+    that need to load more than their own data override _aload_data and subclasses that
+    store their data differently override _save_data. The synchronous methods run the
+    asynchronous ones on the background event loop.
+    """
+
+    @classmethod
+    async def aload(cls, cid: str) -> 'StorageDict':
+        """Load a new object from the given CID without blocking the event loop.
+
+        :param cid: The IPFS multihash to load
+        :type cid: str
+        :return: The loaded object
+        :rtype: StorageDict
+        :raises TypeError: If the CID is not a string
+        :raises IPFSError: If there is an issue retrieving the data
+        """
+        instance = cls()
+        await instance._aload(cid=cid)
+        return instance
+
+    @classmethod
+    async def aload_many(cls, cids: List[str]) -> List['StorageDict']:
+        """Load new objects from several CIDs, fetching their data concurrently.
+
+        :param cids: The IPFS multihashes to load
+        :type cids: List[str]
+        :return: The loaded objects, in the same order
+        :rtype: List[StorageDict]
+        :raises TypeError: If any of the CIDs is not a string
+        :raises IPFSError: If there is an issue retrieving the data
+        """
+        for cid in cids:
+            if not isinstance(cid, str):
+                raise TypeError('Can not retrieve IPFS data: cid must be a string or unicode, got %s instead' % type(cid))
+
+        try:
+            data = await aget_many(cids=cids)
+        except IPFSError as ex:
+            raise IPFSError('Can not retrieve IPFS data: %s' % ex)
+
+        instances = [cls() for _ in cids]
+        await asyncio.gather(*[instance._aload_data(cid=cid, data=cid_data) for instance, cid, cid_data in zip(instances, cids, data)])
+        return instances
+
+    @classmethod
+    def load_many(cls, cids: List[str]) -> List['StorageDict']:
+        """Load new objects from several CIDs, see aload_many.
+
+        :param cids: The IPFS multihashes to load
+        :type cids: List[str]
+        :return: The loaded objects, in the same order
+        :rtype: List[StorageDict]
+        :raises TypeError: If any of the CIDs is not a string
+        :raises IPFSError: If there is an issue retrieving the data
+        """
+        return run(cls.aload_many(cids=cids))
+
+    def load(self, cid: str) -> None:
+        """Load the data of the given CID.
+
+        :param cid: The IPFS multihash to load
+        :type cid: str
+        :raises TypeError: If the CID is not a string
+        :raises IPFSError: If there is an issue retrieving the data
+        :return: None
+        """
+        run(self._aload(cid=cid))
+
+    async def _aload(self, cid: str) -> None:
+        """Load the data of the given CID into this object.
+
+        :param cid: The IPFS multihash to load
+        :type cid: str
+        :raises TypeError: If the CID is not a string
+        :raises IPFSError: If there is an issue retrieving the data
+        :return: None
+        """
+        if not isinstance(cid, str):
+            raise TypeError('Can not retrieve IPFS data: cid must be a string or unicode, got %s instead' % type(cid))
+
+        try:
+            data = await aget_json(cid=cid)
+        except IPFSError as ex:
+            raise IPFSError('Can not retrieve IPFS data of %s: %s' % (cid, ex))
+
+        await self._aload_data(cid=cid, data=data)
+
+    async def _aload_data(self, cid: str, data: Any) -> None:
+        """Load data that was already retrieved into this object.
+
+        :param cid: The IPFS multihash of the data
+        :type cid: str
+        :param data: The data
+        :type data: Any
+        :raises IPFSError: If the data is not a dict
+        :return: None
+        """
+        if not isinstance(data, dict):
+            raise IPFSError('IPFS cid %s does not contain a dict!' % cid)
+
+        self._populate(cid=cid, data=data)
+
+    def _populate(self, cid: str, data: Dict[str, Any]) -> None:
+        """Replace the data of this object with data that was already retrieved.
+
+        :param cid: The IPFS multihash of the data
+        :type cid: str
+        :param data: The data
+        :type data: Dict[str, Any]
+        :return: None
+        """
+        dict.clear(self)
+        for key, value in data.items():
+            if key != '_cid':
+                dict.__setitem__(self, key, value)
+
+        self._cid = normalize_cid(cid).path
+
+    def _save_data(self) -> Dict[str, Any]:
+        """Get the data to store when this object is saved.
+
+        :return: The data
+        :rtype: Dict[str, Any]
+        """
+        return dict(self.items())
+
+    def save(self) -> str:
+        """Save the data and update the CID.
+
+        :return: The new CID
+        :rtype: str
+        """
+        self._cid = add_json(data=self._save_data())
+        return self._cid
+
+    async def asave(self) -> str:
+        """Save the data and update the CID without blocking the event loop.
+
+        :return: The new CID
+        :rtype: str
+        """
+        self._cid = await aadd_json(data=self._save_data())
+        return self._cid
+
+    @staticmethod
+    async def asave_many(objects: List['StorageDict']) -> List[str]:
+        """Save several objects together and update their CIDs.
+
+        This does not update the previous_cid of chained objects, save those one by one.
+
+        :param objects: The objects to save
+        :type objects: List[StorageDict]
+        :return: The new CIDs, in the same order
+        :rtype: List[str]
+        """
+        cids = await aput_many(objects=[obj._save_data() for obj in objects])
+        for obj, cid in zip(objects, cids):
+            obj._cid = cid
+        return cids
+
+    @staticmethod
+    def save_many(objects: List['StorageDict']) -> List[str]:
+        """Save several objects together and update their CIDs, see asave_many.
+
+        :param objects: The objects to save
+        :type objects: List[StorageDict]
+        :return: The new CIDs, in the same order
+        :rtype: List[str]
+        """
+        return run(StorageDict.asave_many(objects=objects))
+
+
+class StorageDictChain(IPFSDictChain, StorageDict):
+    """An IPFSDictChain that reads its previous states through the hivemind storage functions.
+
+    When checkpoint_interval is larger than 1, a save that directly follows the previous
+    save or load of the same chain stores only the delta to the previous state (see
+    hivemind.delta), and every checkpoint_interval-th state is stored in full. Loading a
+    state rebuilds its data from the nearest full state before it.
+
+    When skip_links is set, every saved state also gets a sequence number, the time it
+    was saved and skip_cids: skip_cids[k] is the CID of the newest earlier state whose
+    sequence number is a multiple of 2**k, so skip_cids[0] is the previous state. The
+    first state of a chain, or the first state after states without a sequence number,
+    gets sequence number 0. get_ancestor and get_state_at use the skip links to reach
+    any earlier state in a logarithmic number of fetches.
+
+    :ivar checkpoint_interval: The number of states per full checkpoint, 1 stores every state in full
+    :vartype checkpoint_interval: int
+    :ivar skip_links: Store the sequence number, timestamp and skip links of every saved state
+    :vartype skip_links: bool
+    """
+
+    checkpoint_interval: int = 1
+    skip_links: bool = False
+
+    # The data and delta depth of the state this object was last loaded from or saved as
+    _base_cid: str | None = None
+    _base_data: Dict[str, Any] | None = None
+    _base_depth: int = 0
+    _pending_base: Tuple[Dict[str, Any], int] | None = None
+    _pending_links: Dict[str, Any] | None = None
+
+    @staticmethod
+    def is_delta(data: Dict[str, Any]) -> bool:
+        """Check if the stored data of a state is a delta to the previous state.
+
+        :param data: The stored data
+        :type data: Dict[str, Any]
+        :return: True if the data is a delta
+        :rtype: bool
+        """
+        return 'delta' in data and 'delta_depth' in data
+
+    @staticmethod
+    def _replay(checkpoint: Dict[str, Any], deltas: List[Dict[str, Any]], link: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply the deltas of a state, most recent first, to the data of a full state.
+
+        :param checkpoint: The data of the full state
+        :type checkpoint: Dict[str, Any]
+        :param deltas: The deltas, most recent first
+        :type deltas: List[Dict[str, Any]]
+        :param link: The stored data of the state, which contains its chain keys
+        :type link: Dict[str, Any]
+        :return: The data of the state
+        :rtype: Dict[str, Any]
+        """
+        data = {key: value for key, value in checkpoint.items() if key not in CHAIN_KEYS}
+        for delta in reversed(deltas):
+            data = apply_delta(data, delta)
+        data['previous_cid'] = link.get('previous_cid')
+        data.update({key: link[key] for key in CHAIN_KEYS if key in link})
+        return data
+
+    async def _aresolve(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuild the full data of a state that may be stored as a delta.
+
+        :param data: The stored data
+        :type data: Dict[str, Any]
+        :return: The full data
+        :rtype: Dict[str, Any]
+        :raises IPFSError: If a previous state can not be retrieved or is not a dict
+        """
+        link = data
+        deltas = []
+        while self.is_delta(data):
+            deltas.append(data['delta'])
+            data = await aget_json(cid=data['previous_cid'])
+            if not isinstance(data, dict):
+                raise IPFSError('Previous state of a delta does not contain a dict!')
+
+        return self._replay(data, deltas, link) if deltas else data
+
+    def _resolve(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuild the full data of a state that may be stored as a delta, see _aresolve.
+
+        :param data: The stored data
+        :type data: Dict[str, Any]
+        :return: The full data
+        :rtype: Dict[str, Any]
+        :raises IPFSError: If a previous state can not be retrieved or is not a dict
+        """
+        link = data
+        deltas = []
+        while self.is_delta(data):
+            deltas.append(data['delta'])
+            data = get_json(cid=data['previous_cid'])
+            if not isinstance(data, dict):
+                raise IPFSError('Previous state of a delta does not contain a dict!')
+
+        return self._replay(data, deltas, link) if deltas else data
+
+    async def _aload_data(self, cid: str, data: Any) -> None:
+        """Load data that was already retrieved into this object, rebuilding it if it is a delta.
+
+        :param cid: The IPFS multihash of the data
+        :type cid: str
+        :param data: The data
+        :type data: Any
+        :raises IPFSError: If the data is not a dict
+        :return: None
+        """
+        if not isinstance(data, dict):
+            raise IPFSError('IPFS cid %s does not contain a dict!' % cid)
+
+        depth = data['delta_depth'] if self.is_delta(data) else 0
+        data = await self._aresolve(data)
+        await super()._aload_data(cid=cid, data=data)
+
+        if self.checkpoint_interval > 1:
+            self._base_cid = normalize_cid(cid)
+            self._base_data = copy.deepcopy({key: value for key, value in data.items() if key not in CHAIN_KEYS})
+            self._base_depth = depth
+
+    def _full_data(self) -> Dict[str, Any]:
+        """Get the full data of this state, which _save_data stores in full or as a delta.
+
+        Subclasses that store their data differently override this instead of _save_data.
+
+        :return: The data
+        :rtype: Dict[str, Any]
+        """
+        return super()._save_data()
+
+    def _next_links(self, previous_cid: str | None) -> Dict[str, Any]:
+        """Get the sequence number, timestamp and skip links of the state that replaces the current one.
+
+        :param previous_cid: The CID of the current state, which becomes the previous state
+        :type previous_cid: str | None
+        :return: The sequence, timestamp and skip_cids of the new state
+        :rtype: Dict[str, Any]
+        """
+        sequence = self.get('sequence')
+        if previous_cid is None or not isinstance(sequence, int):
+            return {'sequence': 0, 'timestamp': int(time.time()), 'skip_cids': []}
+
+        # The newest state before the new one with a sequence number that is a multiple of
+        # 2**k is the current state if its sequence number is one, else the same state as
+        # for the current state. The last level always links to the first state.
+        skip_cids = self.get('skip_cids') or []
+        links = []
+        for k in range(sequence.bit_length() + 1):
+            if sequence % (1 << k) == 0:
+                links.append(previous_cid)
+            else:
+                links.append(skip_cids[k] if k < len(skip_cids) else skip_cids[-1])
+
+        return {'sequence': sequence + 1, 'timestamp': int(time.time()), 'skip_cids': links}
+
+    def _save_data(self) -> Dict[str, Any]:
+        """Get the data to store when this object is saved, a delta if possible.
+
+        :return: The data
+        :rtype: Dict[str, Any]
+        """
+        data = self._full_data()
+        self._pending_links = self._next_links(data.get('previous_cid')) if self.skip_links else None
+        data.update(self._pending_links or {})
+        current = {key: value for key, value in data.items() if key not in CHAIN_KEYS}
+        self._pending_base = None
+        if self.checkpoint_interval <= 1:
+            return data
+
+        depth = 0
+        previous_cid = data.get('previous_cid')
+        if self._base_data is not None and previous_cid is not None and normalize_cid(previous_cid) == self._base_cid \
+                and self._base_depth + 1 < self.checkpoint_interval:
+            depth = self._base_depth + 1
+            links = {key: data[key] for key in CHAIN_KEYS if key in data}
+            data = dict(links, delta_depth=depth, delta=make_delta(self._base_data, current) or {'keys': {}})
+
+        self._pending_base = (copy.deepcopy(current), depth)
+        return data
+
+    def _saved(self, cid: str) -> None:
+        """Remember the chain keys and data of a state that was just saved, the next save can be a delta to it.
+
+        :param cid: The CID of the saved state
+        :type cid: str
+        :return: None
+        """
+        if self._pending_links is not None:
+            for key, value in self._pending_links.items():
+                self[key] = value
+            self._pending_links = None
+
+        if self._pending_base is not None:
+            self._base_data, self._base_depth = self._pending_base
+            self._base_cid = normalize_cid(cid)
+            self._pending_base = None
+
+    def save(self) -> str:
+        """Save the data and update the CID.
+
+        :return: The new CID
+        :rtype: str
+        """
+        cid = super().save()
+        self._saved(cid)
+        return cid
+
+    async def asave(self) -> str:
+        """Save the data and update the CID without blocking the event loop.
+
+        :return: The new CID
+        :rtype: str
+        """
+        cid = await super().asave()
+        self._saved(cid)
+        return cid
+
+    def _get_previous_data(self, cid: str) -> Dict[str, Any] | None:
+        """Get the data of a previous state, rebuilt if it is stored as a delta.
+
+        :param cid: The CID of the previous state
+        :type cid: str
+        :return: The data, or None if it can not be retrieved
+        :rtype: Dict[str, Any] | None
+        """
+        try:
+            data = get_json(cid=cid)
+            return self._resolve(data) if isinstance(data, dict) else None
+        except IPFSError:
+            return None
+
+    def _get_link(self, cid: str) -> Dict[str, Any] | None:
+        """Get the stored data of a state without rebuilding it if it is a delta, for its chain keys.
+
+        :param cid: The CID of the state
+        :type cid: str
+        :return: The stored data, or None if it can not be retrieved
+        :rtype: Dict[str, Any] | None
+        """
+        try:
+            data = get_json(cid=cid)
+        except IPFSError:
+            return None
+
+        return data if isinstance(data, dict) else None
+
+    def get_ancestor(self, sequence: int) -> str | None:
+        """Get the CID of the state of this chain with a sequence number, following the skip links.
+
+        The sequence number and skip links are those of the state this object was last
+        loaded from or saved as.
+
+        :param sequence: The sequence number
+        :type sequence: int
+        :return: The CID of the state, or None if the chain has no state with that sequence number
+        :rtype: str | None
+        """
+        current = self.get('sequence')
+        if not isinstance(current, int) or self.cid() is None or not 0 <= sequence <= current:
+            return None
+
+        cid, links = self.cid(), self.get('skip_cids') or []
+        while current > sequence:
+            if not links:
+                return None
+            # The longest jump that does not pass the wanted state
+            level = max(k for k in range(len(links)) if ((current - 1) >> k) << k >= sequence)
+            cid = links[level]
+            data = self._get_link(cid)
+            if data is None or not isinstance(data.get('sequence'), int) or data['sequence'] >= current:
+                return None
+            current, links = data['sequence'], data.get('skip_cids') or []
+
+        return normalize_cid(cid)
+
+    def get_state_at(self, timestamp: int) -> str | None:
+        """Get the CID of the newest state of this chain that was saved at or before a time, following the skip links.
+
+        :param timestamp: Unix timestamp
+        :type timestamp: int
+        :return: The CID of the state, or None if no state of the chain was saved at or before that time
+        :rtype: str | None
+        """
+        if not isinstance(self.get('timestamp'), int) or self.cid() is None:
+            return None
+        if self.timestamp <= timestamp:
+            return normalize_cid(self.cid())
+
+        links = self.get('skip_cids') or []
+        while links:
+            # Jump to the earliest linked state that is still too new
+            for link in reversed(links):
+                data = self._get_link(link)
+                if data is not None and isinstance(data.get('timestamp'), int) and data['timestamp'] > timestamp:
+                    links = data.get('skip_cids') or []
+                    break
+            else:
+                # All linked states are old enough, so the previous state is the newest one
+                data = self._get_link(links[0])
+                return normalize_cid(links[0]) if data is not None and isinstance(data.get('timestamp'), int) else None
+
+        return None
+
+    def changes(self) -> Dict[str, Dict[str, Any]]:
+        """Get the changes between the current state and the previous state.
+
+        The current state is compared as it would be stored, see _full_data, so maps that
+        are stored by reference are compared by reference.
+
+        :return: A dictionary of changes, with keys as attribute names and values as dictionaries containing the old and new values
+        :rtype: Dict[str, Dict[str, Any]]
+        """
+        current_items = {key: value for key, value in self._full_data().items() if key not in CHAIN_KEYS[1:]}
+        old_data = self._get_previous_data(self.previous_cid) if self.previous_cid is not None else None
+        if old_data is None:
+            return {key: {'new': value} for key, value in current_items.items() if key != 'previous_cid'}
+
+        changes = {}
+        for key, value in old_data.items():
+            if key in CHAIN_KEYS or key.startswith('_'):
+                continue
+            if key not in current_items:
+                changes[key] = {'old': value, 'new': None}
+            elif value != current_items[key]:
+                changes[key] = {'old': value, 'new': current_items[key]}
+
+        for key, value in current_items.items():
+            if key != 'previous_cid' and key not in old_data:
+                changes[key] = {'new': value}
+
+        return changes
+
+    def get_previous_states(self, max_depth: int | None = None) -> List[Dict[str, Any]]:
+        """Get the data of the previous states, most recent first.
+
+        :param max_depth: The maximum number of previous states to return, defaults to None
+        :type max_depth: int | None
+        :return: A list of previous state dictionaries
+        :rtype: List[Dict[str, Any]]
+        """
+        previous_states = []
+        cid = self.previous_cid
+        while cid is not None and (max_depth is None or len(previous_states) < max_depth):
+            data = self._get_previous_data(cid)
+            if data is None:
+                break
+            previous_states.append({key: value for key, value in data.items() if key != '_cid'})
+            cid = data.get('previous_cid')
+
+        return previous_states
+
+    def get_previous_cids(self, max_depth: int | None = None) -> List[str]:
+        """Get the CIDs of the previous states, most recent first.
+
+        :param max_depth: The maximum number of previous CIDs to return, defaults to None
+        :type max_depth: int | None
+        :return: A list of previous CIDs
+        :rtype: List[str]
+        """
+        previous_cids = []
+        cid = self.previous_cid
+        while cid is not None and (max_depth is None or len(previous_cids) < max_depth):
+            previous_cids.append(cid)
+            data = self._get_link(cid)
+            cid = data.get('previous_cid') if data is not None else None
+
+        return previous_cids
@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""The scores of the options of a hivemind over its lifetime.
+
+Loading every state of a hivemind and calling results() on each costs a comparison
+of every pair of options for every opinion, for every state. A Timeline walks the
+state chain once, from the oldest state to the newest, and keeps running pairwise
+tallies per question instead: for every pair of options the total weight of the
+opinions that prefer one option over the other. Each state only changes the
+tallies by the options and opinions it adds or replaces, which are taken from its
+delta, or from a diff of the ShardedMap trees, without comparing every opinion:
+
+- an added option is compared with the existing options for every opinion,
+- an added or replaced opinion is compared for every pair of options, after the
+  pairs of the opinion it replaces are subtracted,
+- auto rankings are ranked again when options are added, and only update the
+  tallies if their ranking changed.
+
+Every pair of options is decided by every opinion, as a win for one of the two
+options or as unknown when the opinion ranks neither of them, so the score of an
+option (see HivemindState.calculate_results) is its total wins divided by the
+number of other available options times the total weight of the opinions.
+
+A timeline yields one snapshot per state, or per time bucket:
+
+    {'cid': ..., 'sequence': ..., 'timestamp': ..., 'options': number_of_options,
+     'opinions': [number_of_opinions, ...], 'selected': [...],
+     'scores': [{option_cid: score, ...}, ...]}
+
+with the scores of every question.
+"""
+import logging
+from itertools import combinations
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from .cid import CID
+from .delta import apply_delta
+from .issue import HivemindIssue
+from .opinion import HivemindOpinion
+from .option import HivemindOption
+from .ranking import OptionIndex
+from .sharded_map import ShardedMap, diff_sharded_maps
+from .storage import CHAIN_KEYS, StorageDictChain, get_json
+
+LOG = logging.getLogger(__name__)
+
+# The number of states of the chain that are read at a time
+BLOCK_SIZE = 64
+
+
+class QuestionTally:
+    """The running pairwise tallies of the opinions on one question.
+
+    :ivar options: The CIDs of the options, in the order they were added
+    :vartype options: List[str]
+    """
+
+    def __init__(self) -> None:
+        """Initialize a new QuestionTally without options and opinions.
+
+        :return: None
+        """
+        self.options: List[str] = []
+        self._wins: Dict[Tuple[str, str], float] = {}
+        self._opinions: Dict[str, Tuple[Dict[str, int], float]] = {}
+        self._total_weight: float = 0.0
+
+    def __len__(self) -> int:
+        """Get the number of opinions.
+
+        :return: The number of opinions
+        :rtype: int
+        """
+        return len(self._opinions)
+
+    @staticmethod
+    def _winner(positions: Dict[str, int], a: str, b: str) -> str | None:
+        """Get the option of a pair that an opinion prefers, see HivemindState.compare.
+
+        :param positions: The positions of the options in the ranking of the opinion
+        :type positions: Dict[str, int]
+        :param a: The CID of the first option
+        :type a: str
+        :param b: The CID of the second option
+        :type b: str
+        :return: The CID of the preferred option, or None if the opinion ranks neither option
+        :rtype: str | None
+        """
+        if a in positions and b in positions:
+            return a if positions[a] < positions[b] else b
+        elif a in positions:
+            return a
+        elif b in positions:
+            return b
+
+        return None
+
+    def _count(self, positions: Dict[str, int], weight: float, pairs: Iterable[Tuple[str, str]]) -> None:
+        """Add the weight of an opinion to the wins of the options it prefers.
+
+        :param positions: The positions of the options in the ranking of the opinion
+        :type positions: Dict[str, int]
+        :param weight: The weight of the opinion, negative to subtract the opinion
+        :type weight: float
+        :param pairs: The pairs of options
+        :type pairs: Iterable[Tuple[str, str]]
+        :return: None
+        """
+        for a, b in pairs:
+            winner = self._winner(positions, a, b)
+            if winner is not None:
+                pair = (winner, b if winner == a else a)
+                self._wins[pair] = self._wins.get(pair, 0.0) + weight
+
+    def add_option(self, option_cid: str) -> None:
+        """Add an option and compare it with the existing options for every opinion.
+
+        :param option_cid: The CID of the option
+        :type option_cid: str
+        :return: None
+        """
+        pairs = [(CID(option_cid), other) for other in self.options]
+        self.options.append(CID(option_cid))
+        for positions, weight in self._opinions.values():
+            self._count(positions, weight, pairs)
+
+    def set_opinion(self, address: str, ranking: List[str], weight: float) -> None:
+        """Add the opinion of a participant, replacing their previous opinion.
+
+        :param address: The address of the participant
+        :type address: str
+        :param ranking: The ranked option CIDs of the opinion
+        :type ranking: List[str]
+        :param weight: The weight of the opinion
+        :type weight: float
+        :return: None
+        """
+        self.remove_opinion(address)
+        positions = {}
+        for position, option_cid in enumerate(ranking):
+            positions.setdefault(CID(option_cid), position)
+
+        self._opinions[address] = (positions, weight)
+        self._total_weight += weight
+        self._count(positions, weight, combinations(self.options, 2))
+
+    def remove_opinion(self, address: str) -> None:
+        """Remove the opinion of a participant, if they have one.
+
+        :param address: The address of the participant
+        :type address: str
+        :return: None
+        """
+        if address in self._opinions:
+            positions, weight = self._opinions.pop(address)
+            self._total_weight -= weight
+            self._count(positions, -weight, combinations(self.options, 2))
+
+    def scores(self, excluded: Iterable[str] = ()) -> Dict[str, float]:
+        """Get the scores of the available options.
+
+        :param excluded: The CIDs of the options that are excluded from the results
+        :type excluded: Iterable[str]
+        :return: The score of every available option
+        :rtype: Dict[str, float]
+        """
+        excluded = {CID(option_cid) for option_cid in excluded}
+        available = [option_cid for option_cid in self.options if option_cid not in excluded]
+        total = (len(available) - 1) * self._total_weight
+
+        scores = {}
+        for a in available:
+            wins = sum(self._wins.get((a, b), 0.0) for b in available if b != a)
+            scores[a] = wins / total if total > 0 else 0
+        return scores
+
+
+class Timeline:
+    """The scores of the options of a hivemind over its lifetime, see the module docstring.
+
+    :ivar state_cid: The CID of the newest state of the timeline
+    :vartype state_cid: str
+    """
+
+    def __init__(self, state_cid: str) -> None:
+        """Initialize a new Timeline that ends at a state.
+
+        :param state_cid: The CID of the newest state
+        :type state_cid: str
+        :return: None
+        """
+        self.state_cid = CID(state_cid)
+
+    @staticmethod
+    def _walk(cid: str | None, count: int | None = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Get the stored data of a state and the states before it, without rebuilding deltas.
+
+        :param cid: The CID of the newest state
+        :type cid: str | None
+        :param count: The number of states, None to walk to the start of the chain
+        :type count: int | None
+        :return: The CID and stored data of each state, oldest first
+        :rtype: List[Tuple[str, Dict[str, Any]]]
+        :raises Exception: If a state does not contain a dict
+        """
+        states = []
+        while cid is not None and (count is None or len(states) < count):
+            data = get_json(cid=cid)
+            if not isinstance(data, dict):
+                raise Exception('State %s does not contain a dict' % cid)
+            states.append((CID(cid), data))
+            cid = data.get('previous_cid')
+
+        states.reverse()
+        return states
+
+    def _chain(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Get the stored data of the states of the chain, oldest first, without rebuilding deltas.
+
+        The chain is walked in blocks of BLOCK_SIZE states: the newest state of each block
+        is found with the skip links of the newest state (see StorageDictChain.get_ancestor),
+        so only one block is held at a time and the first states are yielded before the rest
+        of the chain is read. States that were saved without sequence numbers are walked
+        in one go.
+
+        :return: An iterator over the CID and stored data of each state
+        :rtype: Iterator[Tuple[str, Dict[str, Any]]]
+        :raises Exception: If a state does not contain a dict or can not be found
+        """
+        head = get_json(cid=self.state_cid)
+        if not isinstance(head, dict):
+            raise Exception('State %s does not contain a dict' % self.state_cid)
+
+        sequence = head.get('sequence')
+        chain = StorageDictChain()
+        chain._populate(cid=self.state_cid, data=head)
+        first = chain.get_ancestor(0) if isinstance(sequence, int) else None
+        if first is None:
+            yield from self._walk(self.state_cid)
+            return
+
+        # The states before the first one with a sequence number were saved without skip links
+        yield from self._walk(get_json(cid=first).get('previous_cid'))
+        for start in range(0, sequence + 1, BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, sequence + 1) - 1
+            cid = chain.get_ancestor(end)
+            if cid is None:
+                raise Exception('State %s of the chain of %s can not be found' % (end, self.state_cid))
+            yield from self._walk(cid, count=end - start + 1)
+
+    @staticmethod
+    def _changed_opinions(node: Dict[str, Any] | None, old_references: Dict[int, Dict[str, Any]],
+                          opinion_cids: List[Any]) -> Dict[int, Dict[str, Any] | None]:
+        """Get the opinion entries that a delta changed, per question.
+
+        The addresses come from the delta itself when the opinions of a question are
+        stored inline, and from a diff of the old and new tree when they are stored as
+        a ShardedMap, so unchanged opinions are not looked at.
+
+        :param node: The node of the opinion_cids in the delta, None if the delta does not change them
+        :type node: Dict[str, Any] | None
+        :param old_references: The ShardedMap references of the questions before the delta, by question index
+        :type old_references: Dict[int, Dict[str, Any]]
+        :param opinion_cids: The stored opinions of each question after the delta
+        :type opinion_cids: List[Any]
+        :return: The new entry, or None for a removed opinion, of every changed address by question index, None to compare all opinions of a question
+        :rtype: Dict[int, Dict[str, Any] | None]
+        """
+        if node is None:
+            return {}
+        if 'value' in node:
+            return {question_index: None for question_index in range(len(opinion_cids))}
+
+        changed = {}
+        for index, question_node in node.get('items', {}).items():
+            question_index = int(index)
+            question_opinions = opinion_cids[question_index]
+            if ShardedMap.is_reference(question_opinions) and question_index in old_references:
+                changed[question_index] = {address: new_entry for address, (_, new_entry) in
+                                           diff_sharded_maps(old_references[question_index], question_opinions).items()}
+            elif 'keys' in question_node and isinstance(question_opinions, dict) and not ShardedMap.is_reference(question_opinions) \
+                    and question_index not in old_references:
+                changed[question_index] = {address: question_opinions.get(address)
+                                           for address in list(question_node['keys']) + question_node.get('removed', [])}
+            else:
+                changed[question_index] = None
+
+        for question_index in range(len(opinion_cids) - len(node.get('append', [])), len(opinion_cids)):
+            changed[question_index] = None
+        return changed
+
+    def steps(self) -> Iterator[Dict[str, Any]]:
+        """Replay the states of the chain, oldest first, and get the scores after each state.
+
+        :return: An iterator over the snapshots, one per state
+        :rtype: Iterator[Dict[str, Any]]
+        :raises Exception: If the oldest state is a delta
+        """
+        issue = None
+        options: List[HivemindOption] = []
+        known: set = set()
+        index = OptionIndex(options)
+        tallies: List[QuestionTally] = []
+        entries: List[Dict[str, str]] = []
+        auto: List[Dict[str, Tuple[HivemindOpinion, List[str]]]] = []
+
+        def weight(address: str) -> float:
+            # As HivemindState.get_weight
+            if not issue.has_address_restrictions():
+                return 1.0
+            address_weight = issue.address_weight(address)
+            return address_weight if address_weight is not None else 0.0
+
+        data = None
+        seen = 0
+        for cid, stored in self._chain():
+            if StorageDictChain.is_delta(stored):
+                if data is None:
+                    raise Exception('The oldest state %s of the chain is a delta' % cid)
+                delta_keys = stored['delta'].get('keys', {})
+                old_references = {question_index: dict(question_opinions) for question_index, question_opinions in enumerate(data.get('opinion_cids') or [])
+                                  if ShardedMap.is_reference(question_opinions)}
+                data = apply_delta(data, stored['delta'])
+                changed = self._changed_opinions(delta_keys.get('opinion_cids'), old_references, data.get('opinion_cids') or [])
+                # Options are only appended, a delta that replaces them is checked in full
+                if 'option_cids' in delta_keys and 'append' not in delta_keys['option_cids']:
+                    seen = 0
+            else:
+                data = {key: value for key, value in stored.items() if key not in CHAIN_KEYS}
+                changed = {question_index: None for question_index in range(max(len(data.get('opinion_cids') or []), len(tallies)))}
+                seen = 0
+
+            if data.get('hivemind_id') is not None and (issue is None or CID(issue.cid()) != CID(data['hivemind_id'])):
+                issue = HivemindIssue(cid=data['hivemind_id'])
+
+            option_cids = data.get('option_cids') or []
+            added = [option_cid for option_cid in dict.fromkeys(CID(option_cid) for option_cid in option_cids[seen:]) if option_cid not in known]
+            seen = len(option_cids)
+            if added:
+                options.extend(HivemindOption.load_many(cids=added))
+                known.update(added)
+                index = OptionIndex(options)
+                for tally in tallies:
+                    for option_cid in added:
+                        tally.add_option(option_cid)
+                # Auto rankings depend on the options, only the changed ones are counted again
+                for tally, question_auto in zip(tallies, auto):
+                    for address, (opinion, ranking) in list(question_auto.items()):
+                        new_ranking = opinion.ranking.get(options=options, index=index)
+                        if new_ranking != ranking:
+                            tally.set_opinion(address, new_ranking, weight(address))
+                            question_auto[address] = (opinion, new_ranking)
+
+            opinion_cids = data.get('opinion_cids') or []
+            while len(tallies) < len(opinion_cids):
+                tally = QuestionTally()
+                for option in options:
+                    tally.add_option(option.cid())
+                tallies.append(tally)
+                entries.append({})
+                auto.append({})
+
+            for question_index, question_changed in changed.items():
+                if question_index >= len(tallies):
+                    continue
+                if question_changed is None:
+                    question_opinions = self._load_opinion_map(opinion_cids[question_index]) if question_index < len(opinion_cids) else {}
+                    question_changed = {address: question_opinions.get(address) for address in entries[question_index] if address not in question_opinions}
+                    question_changed.update(question_opinions.items())
+
+                tally = tallies[question_index]
+                updated = {}
+                for address, entry in question_changed.items():
+                    if entry is None:
+                        if address in entries[question_index]:
+                            tally.remove_opinion(address)
+                            del entries[question_index][address]
+                            auto[question_index].pop(address, None)
+                    elif entries[question_index].get(address) != CID(entry['opinion_cid']):
+                        updated[address] = CID(entry['opinion_cid'])
+
+                for (address, opinion_cid), opinion in zip(updated.items(), HivemindOpinion.load_many(cids=list(updated.values())) if updated else []):
+                    ranking = opinion.ranking.get(options=options, index=index)
+                    tally.set_opinion(address, ranking, weight(address))
+                    entries[question_index][address] = opinion_cid
+                    if opinion.ranking.type in ['auto_high', 'auto_low']:
+                        auto[question_index][address] = (opinion, ranking)
+                    else:
+                        auto[question_index].pop(address, None)
+
+            excluded = (data.get('selected') or []) if issue is not None and issue.on_selection == 'Exclude' else []
+            yield {
+                'cid': cid,
+                'sequence': stored.get('sequence'),
+                'timestamp': stored.get('timestamp'),
+                'options': len(options),
+                'opinions': [len(tally) for tally in tallies],
+                'selected': list(data.get('selected') or []),
+                'scores': [tally.scores(excluded=excluded) for tally in tallies],
+            }
+
+    @staticmethod
+    def _load_opinion_map(question_opinions: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the opinions of a question, loading them if they are stored as a ShardedMap.
+
+        :param question_opinions: The stored opinions of the question
+        :type question_opinions: Dict[str, Any]
+        :return: The opinions, by address
+        :rtype: Dict[str, Any]
+        """
+        if ShardedMap.is_reference(question_opinions):
+            sharded_map = ShardedMap.from_reference(question_opinions)
+            sharded_map.load_all()
+            return sharded_map
+
+        return question_opinions
+
+    def snapshots(self, bucket: int | None = None) -> Iterator[Dict[str, Any]]:
+        """Get the scores after each state, or after the last state of each time bucket.
+
+        :param bucket: The length of the time buckets in seconds, None for a snapshot per state
+        :type bucket: int | None
+        :return: An iterator over the snapshots, oldest first, with the start time of their bucket
+        :rtype: Iterator[Dict[str, Any]]
+        :raises Exception: If the bucket length is not positive
+        """
+        if bucket is None:
+            yield from self.steps()
+            return
+
+        if bucket <= 0:
+            raise Exception('Invalid bucket length: %s' % bucket)
+
+        last = None
+        for snapshot in self.steps():
+            # States without a timestamp belong to the bucket of the state before them
+            start = snapshot['timestamp'] - snapshot['timestamp'] % bucket if isinstance(snapshot['timestamp'], int) else None
+            if last is not None and start is not None and start != last['bucket']:
+                yield last
+            snapshot['bucket'] = start if start is not None or last is None else last['bucket']
+            last = snapshot
+
+        if last is not None:
+            yield last
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Transports for the HTTP API of an IPFS daemon.
+
+A transport performs the raw 'cat' and 'add' requests for the storage module. The
+default transport is KuboTransport, which keeps a pooled keep-alive httpx client per
+event loop, applies per-request timeouts and bounds the number of concurrent requests.
+Another transport can be plugged in with hivemind.storage.set_transport.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Tuple
+
+import httpx
+from ipfs_dict_chain import IPFS
+from ipfs_dict_chain.IPFS import IPFSError
+
+LOG = logging.getLogger(__name__)
+
+
+def default_api_url() -> str:
+    """Get the base URL of the HTTP API of the IPFS daemon set in ipfs-dict-chain.
+
+    :return: The base URL, for example 'http://127.0.0.1:5001'
+    :rtype: str
+    """
+    # A multiaddress looks like /ip4/127.0.0.1/tcp/5001
+    parts = str(IPFS.multi_address).split('/')
+    host, port = parts[2], parts[4]
+    return 'http://%s:%s' % ('[%s]' % host if parts[1] == 'ip6' else host, port)
+
+
+class TransportStats:
+    """Thread-safe request statistics of a transport.
+
+    :ivar requests: Number of requests that were sent
+    :vartype requests: int
+    :ivar errors: Number of requests that failed
+    :vartype errors: int
+    :ivar connections: Number of new connections that were opened
+    :vartype connections: int
+    :ivar reused: Number of successful requests that reused an open connection
+    :vartype reused: int
+    """
+
+    def __init__(self) -> None:
+        """Initialize new statistics.
+
+        :return: None
+        """
+        self._lock = threading.Lock()
+        self.requests: int = 0
+        self.errors: int = 0
+        self.connections: int = 0
+        self.reused: int = 0
+        self.in_flight: int = 0
+        self._total_latency: float = 0.0
+        self._max_latency: float = 0.0
+
+    def started(self) -> None:
+        """Record the start of a request.
+
+        :return: None
+        """
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def finished(self, latency: float, new_connection: bool, error: bool) -> None:
+        """Record the end of a request.
+
+        :param latency: The duration of the request in seconds
+        :type latency: float
+        :param new_connection: Whether the request opened a new connection
+        :type new_connection: bool
+        :param error: Whether the request failed
+        :type error: bool
+        :return: None
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            if new_connection:
+                self.connections += 1
+            if error:
+                self.errors += 1
+            elif not new_connection:
+                self.reused += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the statistics as a dict.
+
+        :return: Dictionary with the request counts and the average and maximum latency in milliseconds
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            completed = self.requests - self.in_flight
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'connections': self.connections,
+                'reused': self.reused,
+                'in_flight': self.in_flight,
+                'latency_avg_ms': round(self._total_latency / completed * 1000, 3) if completed else 0.0,
+                'latency_max_ms': round(self._max_latency * 1000, 3),
+            }
+
+
+class Transport(ABC):
+    """Base class of the transports used by the storage module."""
+
+    @abstractmethod
+    async def cat(self, cid: str) -> bytes:
+        """Get the content of a CID.
+
+        :param cid: The CID, without the '/ipfs/' prefix
+        :type cid: str
+        :return: The content
+        :rtype: bytes
+        :raises IPFSError: If the content can not be retrieved
+        """
+
+    @abstractmethod
+    async def add(self, content: bytes) -> str:
+        """Store content and return its CID.
+
+        :param content: The content
+        :type content: bytes
+        :return: The CID of the content
+        :rtype: str
+        :raises IPFSError: If the content can not be stored
+        """
+
+    async def add_many(self, contents: List[bytes]) -> List[str]:
+        """Store several contents and return their CIDs.
+
+        The default implementation adds the contents concurrently, transports that can
+        store several contents with a single request override this method.
+
+        :param contents: The contents
+        :type contents: List[bytes]
+        :return: The CIDs of the contents, in the same order
+        :rtype: List[str]
+        :raises IPFSError: If any of the contents can not be stored
+        """
+        return list(await asyncio.gather(*[self.add(content) for content in contents]))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the request statistics of this transport.
+
+        :return: The statistics
+        :rtype: Dict[str, Any]
+        """
+        return {}
+
+
+class KuboTransport(Transport):
+    """Transport that uses pooled keep-alive connections to the Kubo HTTP API.
+
+    An httpx client can only be used on the event loop it was created on, so every
+    event loop that uses the transport gets its own client and concurrency limit.
+    """
+
+    def __init__(self, base_url: str | None = None, timeout: float = 30.0, connect_timeout: float = 5.0,
+                 max_connections: int = 20, max_keepalive_connections: int = 10, keepalive_expiry: float = 30.0,
+                 max_concurrency: int = 16, max_batch_size: int = 64,
+                 http_transport: httpx.AsyncBaseTransport | None = None) -> None:
+        """Initialize a new KuboTransport.
+
+        :param base_url: The base URL of the API, defaults to the address set in ipfs-dict-chain
+        :type base_url: str | None
+        :param timeout: Timeout of a request in seconds
+        :type timeout: float
+        :param connect_timeout: Timeout for opening a connection in seconds
+        :type connect_timeout: float
+        :param max_connections: Maximum number of open connections per event loop
+        :type max_connections: int
+        :param max_keepalive_connections: Maximum number of idle connections kept open per event loop
+        :type max_keepalive_connections: int
+        :param keepalive_expiry: Time in seconds after which an idle connection is closed
+        :type keepalive_expiry: float
+        :param max_concurrency: Maximum number of concurrent requests per event loop
+        :type max_concurrency: int
+        :param max_batch_size: Maximum number of contents that add_many sends in a single request
+        :type max_batch_size: int
+        :param http_transport: Optional httpx transport, for example to mock the daemon
+        :type http_transport: httpx.AsyncBaseTransport | None
+        :return: None
+        """
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        self.max_concurrency = max_concurrency
+        self.max_batch_size = max_batch_size
+        self.http_transport = http_transport
+        self._stats = TransportStats()
+        self._loops: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _client(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """Get the client and concurrency limit of the running event loop.
+
+        :return: The client and the semaphore that bounds the number of concurrent requests
+        :rtype: Tuple[httpx.AsyncClient, asyncio.Semaphore]
+        """
+        loop = asyncio.get_running_loop()
+        base_url = self.base_url or default_api_url()
+        with self._lock:
+            entry = self._loops.get(loop)
+            if entry is not None and entry[0] == base_url:
+                return entry[1], entry[2]
+
+            if entry is not None:
+                loop.create_task(entry[1].aclose())
+
+            client = httpx.AsyncClient(base_url=base_url, timeout=self.timeout, limits=self.limits, transport=self.http_transport)
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loops[loop] = (base_url, client, semaphore)
+            return client, semaphore
+
+    async def _post(self, path: str, timeout: float | None = None, **kwargs: Any) -> httpx.Response:
+        """Send a request to the API.
+
+        :param path: The path of the API endpoint
+        :type path: str
+        :param timeout: Optional timeout in seconds for this request
+        :type timeout: float | None
+        :return: The response
+        :rtype: httpx.Response
+        :raises httpx.HTTPError: If the request fails
+        """
+        client, semaphore = self._client()
+        new_connection = False
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            nonlocal new_connection
+            if event_name == 'connection.connect_tcp.complete':
+                new_connection = True
+
+        extensions = {'trace': trace}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+
+        async with semaphore:
+            self._stats.started()
+            start = time.perf_counter()
+            error = True
+            try:
+                response = await client.post(path, extensions=extensions, **kwargs)
+                response.raise_for_status()
+                error = False
+                return response
+            finally:
+                self._stats.finished(latency=time.perf_counter() - start, new_connection=new_connection, error=error)
+
+    async def cat(self, cid: str, timeout: float | None = None) -> bytes:
+        """Get the content of a CID.
+
+        :param cid: The CID, without the '/ipfs/' prefix
+        :type cid: str
+        :param timeout: Optional timeout in seconds for this request
+        :type timeout: float | None
+        :return: The content
+        :rtype: bytes
+        :raises IPFSError: If the content can not be retrieved
+        """
+        try:
+            response = await self._post('/api/v0/cat', params={'arg': cid}, timeout=timeout)
+        except httpx.HTTPError as ex:
+            raise IPFSError('%s: %s' % (type(ex).__name__, ex))
+
+        return response.content
+
+    async def add(self, content: bytes, timeout: float | None = None) -> str:
+        """Store content and return its CID.
+
+        :param content: The content
+        :type content: bytes
+        :param timeout: Optional timeout in seconds for this request
+        :type timeout: float | None
+        :return: The CID of the content
+        :rtype: str
+        :raises IPFSError: If the content can not be stored
+        """
+        try:
+            response = await self._post('/api/v0/add', files={'file': ('data.json', content)}, timeout=timeout)
+            cid = json.loads(response.text.strip().splitlines()[-1]).get('Hash')
+        except (httpx.HTTPError, ValueError, IndexError) as ex:
+            raise IPFSError('%s: %s' % (type(ex).__name__, ex))
+
+        if cid is None:
+            raise IPFSError('IPFS response did not contain a Hash/CID')
+
+        return cid
+
+    async def add_many(self, contents: List[bytes], timeout: float | None = None) -> List[str]:
+        """Store several contents and return their CIDs.
+
+        The contents are sent as the files of a multipart request to the add endpoint,
+        so every batch of up to max_batch_size contents takes a single round trip.
+
+        :param contents: The contents
+        :type contents: List[bytes]
+        :param timeout: Optional timeout in seconds for each request
+        :type timeout: float | None
+        :return: The CIDs of the contents, in the same order
+        :rtype: List[str]
+        :raises IPFSError: If any of the contents can not be stored
+        """
+        batches = [contents[i:i + self.max_batch_size] for i in range(0, len(contents), self.max_batch_size)]
+        results = await asyncio.gather(*[self._add_batch(batch, timeout=timeout) for batch in batches])
+        return [cid for batch_cids in results for cid in batch_cids]
+
+    async def _add_batch(self, contents: List[bytes], timeout: float | None = None) -> List[str]:
+        """Store a batch of contents with a single request.
+
+        :param contents: The contents
+        :type contents: List[bytes]
+        :param timeout: Optional timeout in seconds for this request
+        :type timeout: float | None
+        :return: The CIDs of the contents, in the same order
+        :rtype: List[str]
+        :raises IPFSError: If any of the contents can not be stored
+        """
+        files = [('file', ('%s.json' % i, content)) for i, content in enumerate(contents)]
+        try:
+            response = await self._post('/api/v0/add', files=files, timeout=timeout)
+            entries = [json.loads(line) for line in response.text.strip().splitlines()]
+        except (httpx.HTTPError, ValueError) as ex:
+            raise IPFSError('%s: %s' % (type(ex).__name__, ex))
+
+        hashes = {entry.get('Name'): entry.get('Hash') for entry in entries if isinstance(entry, dict)}
+        cids = [hashes.get('%s.json' % i) for i in range(len(contents))]
+        if None in cids:
+            raise IPFSError('IPFS response did not contain a Hash/CID for every file')
+
+        return cids
+
+    async def aclose(self) -> None:
+        """Close the client of the running event loop.
+
+        :return: None
+        """
+        with self._lock:
+            entry = self._loops.pop(asyncio.get_running_loop(), None)
+
+        if entry is not None:
+            await entry[1].aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the request statistics of this transport.
+
+        :return: Dictionary with the request counts and the average and maximum latency in milliseconds
+        :rtype: Dict[str, Any]
+        """
+        return self._stats.as_dict()
@@ -1,13 +1,117 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import atexit
+import os
 import random
-from typing import Tuple
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
 from bitcoin.wallet import CBitcoinSecret, P2PKHBitcoinAddress
-from bitcoin.signmessage import BitcoinMessage, SignMessage, VerifyMessage
 import logging
 
+from .signatures import BACKENDS, create_backend, get_backend, set_backend
+
 LOG = logging.getLogger(__name__)
 
+# Batches smaller than this are verified in the calling process, starting worker processes costs more
+PARALLEL_THRESHOLD = 256
+
+
+class VerificationCache:
+    """A thread-safe LRU set of signed messages that were verified successfully.
+
+    A valid signature stays valid, so a (address, message, signature) triple only needs
+    to be verified once. Entries only leave the cache when it is full.
+
+    :ivar maxsize: The maximum number of entries in the cache
+    :vartype maxsize: int
+    """
+
+    def __init__(self, maxsize: int = 65536) -> None:
+        """Initialize a new VerificationCache.
+
+        :param maxsize: The maximum number of entries in the cache
+        :type maxsize: int
+        :return: None
+        """
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Tuple[str, str, str], None] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self.maxsize: int = maxsize
+
+    def contains(self, address: str, message: str, signature: str) -> bool:
+        """Check if a signed message was verified successfully before.
+
+        :param address: The Bitcoin address that signed the message
+        :type address: str
+        :param message: The message that was signed
+        :type message: str
+        :param signature: The base64-encoded signature
+        :type signature: str
+        :return: True if the signature was verified before
+        :rtype: bool
+        """
+        key = (address, message, signature)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return True
+
+            self._misses += 1
+            return False
+
+    def add(self, address: str, message: str, signature: str) -> None:
+        """Remember a signed message that was verified successfully.
+
+        :param address: The Bitcoin address that signed the message
+        :type address: str
+        :param message: The message that was signed
+        :type message: str
+        :param signature: The base64-encoded signature
+        :type signature: str
+        :return: None
+        """
+        key = (address, message, signature)
+        with self._lock:
+            self._entries[key] = None
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache and reset the counters.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the statistics of the cache.
+
+        :return: Dictionary with the number of hits, misses and cached verifications and the maximum size
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses, 'cached': len(self._entries), 'maxsize': self.maxsize}
+
+    def __len__(self) -> int:
+        """Get the number of entries in the cache.
+
+        :return: The number of entries
+        :rtype: int
+        """
+        with self._lock:
+            return len(self._entries)
+
+
+verifications = VerificationCache()
+
 
 def get_bitcoin_address(private_key: CBitcoinSecret) -> str:
     """Get the Bitcoin address corresponding to a private key.
@@ -46,13 +150,17 @@ def sign_message(message: str, private_key: CBitcoinSecret) -> str:
     :return: The signature in base64 format
     :rtype: str
     """
-    return SignMessage(key=private_key, message=BitcoinMessage(message)).decode()
+    return get_backend().sign(message=message, private_key=private_key)
 
 
 def verify_message(message: str, address: str, signature: str) -> bool:
     """
     Verify a signed message using Bitcoin's message verification.
 
+    The verification is done by the signature backend, see hivemind.signatures.
+    Successful verifications are remembered in the verifications cache, so verifying the
+    same signed message again, for example when a request is retried, is a lookup.
+
     :param message: The message that was signed
     :type message: str
     :param address: The Bitcoin address that signed the message
@@ -62,8 +170,137 @@ def verify_message(message: str, address: str, signature: str) -> bool:
     :return: Whether the signature is valid
     :rtype: bool
     """
+    cacheable = isinstance(address, str) and isinstance(message, str) and isinstance(signature, str)
+    if cacheable and verifications.contains(address, message, signature):
+        return True
+
     try:
-        return VerifyMessage(address, BitcoinMessage(message), signature)
+        valid = get_backend().verify(message=message, address=address, signature=signature)
     except Exception as ex:
         LOG.error('Error verifying message: %s' % ex)
         return False
+
+    if valid and cacheable:
+        verifications.add(address, message, signature)
+    return valid
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_key: Tuple[int, str] | None = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(backend_name: str) -> None:
+    """Use the signature backend of the parent process in a worker process.
+
+    :param backend_name: The name of the signature backend
+    :type backend_name: str
+    :return: None
+    """
+    set_backend(create_backend(backend_name))
+
+
+def _get_pool(processes: int) -> ProcessPoolExecutor | None:
+    """Get the worker process pool, creating it on first use.
+
+    The pool is kept for later calls. It is replaced when a different number of
+    processes or a different signature backend is needed. Only the registered
+    backends can be recreated in the workers, for other backends there is no pool.
+
+    :param processes: The number of worker processes
+    :type processes: int
+    :return: The pool, or None if the signature backend can not be used in worker processes
+    :rtype: ProcessPoolExecutor | None
+    """
+    global _pool, _pool_key
+    backend = get_backend()
+    if BACKENDS.get(backend.name) is not type(backend):
+        return None
+
+    with _pool_lock:
+        if _pool is None or _pool_key != (processes, backend.name):
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+                _pool = None
+            _pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(backend.name,))
+            _pool_key = (processes, backend.name)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes of verify_many, if they were started.
+
+    :return: None
+    """
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool, _pool_key = None, None
+
+
+atexit.register(shutdown_pool)
+
+
+def _verify_chunk(items: List[Tuple[str, str, str]]) -> List[bool]:
+    """Verify a chunk of signed messages in a worker process.
+
+    :param items: The (message, address, signature) tuples
+    :type items: List[Tuple[str, str, str]]
+    :return: Whether each signature is valid
+    :rtype: List[bool]
+    """
+    return [verify_message(message=message, address=address, signature=signature) for message, address, signature in items]
+
+
+def verify_many(items: List[Tuple[str, str, str]], processes: int | None = None) -> List[bool]:
+    """Verify many signed messages, spreading the work over a pool of processes.
+
+    Identical items and items in the verifications cache are verified once. Batches
+    smaller than PARALLEL_THRESHOLD, or any batch when processes is 1, are verified in
+    the calling process. The worker processes are started on first use and kept for
+    later calls, they use the same signature backend as the calling process. If the
+    process pool can not be used the items are verified in the calling process as well.
+
+    :param items: The (message, address, signature) tuples to verify
+    :type items: List[Tuple[str, str, str]]
+    :param processes: The number of worker processes, defaults to the number of CPUs
+    :type processes: int | None
+    :return: Whether each signature is valid, in the same order as the items
+    :rtype: List[bool]
+    """
+    results: Dict[Tuple[str, str, str], bool] = {}
+    unique = []
+    for item in dict.fromkeys(tuple(item) for item in items):
+        message, address, signature = item
+        if isinstance(address, str) and isinstance(message, str) and isinstance(signature, str) and verifications.contains(address, message, signature):
+            results[item] = True
+        else:
+            unique.append(item)
+
+    processes = processes or os.cpu_count() or 1
+    processes = min(processes, len(unique) // PARALLEL_THRESHOLD)
+
+    verdicts: List[bool] | None = None
+    if processes > 1:
+        size = -(-len(unique) // (processes * 4))
+        chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+        try:
+            executor = _get_pool(processes)
+            if executor is not None:
+                verdicts = [verdict for chunk in executor.map(_verify_chunk, chunks) for verdict in chunk]
+        except (OSError, RuntimeError) as ex:
+            LOG.warning('Unable to verify signatures in worker processes, verifying them here: %s' % ex)
+            shutdown_pool()
+
+        if verdicts is not None:
+            # The worker processes have their own cache, remember their results here
+            for (message, address, signature), valid in zip(unique, verdicts):
+                if valid:
+                    verifications.add(address, message, signature)
+
+    if verdicts is None:
+        verdicts = _verify_chunk(unique)
+
+    results.update(zip(unique, verdicts))
+    return [results[tuple(item)] for item in items]
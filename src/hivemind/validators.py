@@ -2,9 +2,13 @@
 
 This module provides functions for validating both legacy and Bech32 Bitcoin addresses.
 It supports validation for both mainnet and testnet addresses.
+
+The address patterns are compiled once and the Bech32 checksum uses a lookup table
+instead of testing the generator bits one by one. validate_addresses validates a
+whole list of addresses, for example the address restrictions of a hivemind issue.
 """
 import re
-from typing import Tuple, List
+from typing import Dict, List, Tuple
 
 # Address validation patterns
 MAINNET_ADDRESS_REGEX = "^[13][a-km-zA-HJ-NP-Z1-9]{25,34}$"
@@ -14,8 +18,35 @@ UPPERCASE_TESTNET_BECH32_ADDRESS_REGEX = '^TB1[AC-HJ-NP-Z02-9]{11,71}$'
 LOWERCASE_MAINNET_BECH32_ADDRESS_REGEX = '^bc1[ac-hj-np-z02-9]{11,71}$'
 UPPERCASE_MAINNET_BECH32_ADDRESS_REGEX = '^BC1[AC-HJ-NP-Z02-9]{11,71}$'
 
+MAINNET_ADDRESS_PATTERN = re.compile(MAINNET_ADDRESS_REGEX)
+TESTNET_ADDRESS_PATTERN = re.compile(TESTNET_ADDRESS_REGEX)
+TESTNET_BECH32_ADDRESS_PATTERNS = (re.compile(LOWERCASE_TESTNET_BECH32_ADDRESS_REGEX), re.compile(UPPERCASE_TESTNET_BECH32_ADDRESS_REGEX))
+MAINNET_BECH32_ADDRESS_PATTERNS = (re.compile(LOWERCASE_MAINNET_BECH32_ADDRESS_REGEX), re.compile(UPPERCASE_MAINNET_BECH32_ADDRESS_REGEX))
+
 # Bech32 character set
 CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+CHARSET_VALUES = {char: value for value, char in enumerate(CHARSET)}
+
+BECH32_GENERATOR = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+
+
+def _bech32_table() -> List[int]:
+    """Compute the generator values to xor for each value of the 5 top bits of a checksum.
+
+    :return: The 32 table entries
+    :rtype: List[int]
+    """
+    table = []
+    for top in range(32):
+        value = 0
+        for i in range(5):
+            if (top >> i) & 1:
+                value ^= BECH32_GENERATOR[i]
+        table.append(value)
+    return table
+
+
+BECH32_TABLE = _bech32_table()
 
 
 def bech32_decode(bech: str) -> Tuple[str | None, List[int] | None]:
@@ -40,10 +71,10 @@ def bech32_decode(bech: str) -> Tuple[str | None, List[int] | None]:
     pos = bech.rfind('1')
     if pos < 1 or pos + 7 > len(bech) or len(bech) > 90:
         return None, None
-    if not all(x in CHARSET for x in bech[pos + 1:]):
+    if not all(x in CHARSET_VALUES for x in bech[pos + 1:]):
         return None, None
     hrp = bech[:pos]
-    data = [CHARSET.find(x) for x in bech[pos + 1:]]
+    data = [CHARSET_VALUES[x] for x in bech[pos + 1:]]
     if not bech32_verify_checksum(hrp, data):
         return None, None
     return hrp, data[:-6]
@@ -71,15 +102,12 @@ def bech32_polymod(values: List[int]) -> int:
     :rtype: int
     
     This is an internal function that implements the Bech32 checksum algorithm
-    using the specified generator polynomial.
+    using the specified generator polynomial, with a lookup table for the top bits.
     """
-    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    table = BECH32_TABLE
     chk = 1
     for value in values:
-        top = chk >> 25
-        chk = (chk & 0x1ffffff) << 5 ^ value
-        for i in range(5):
-            chk ^= generator[i] if ((top >> i) & 1) else 0
+        chk = ((chk & 0x1ffffff) << 5 ^ value) ^ table[chk >> 25]
     return chk
 
 
@@ -114,10 +142,8 @@ def valid_address(address: str, testnet: bool = False) -> bool:
     if not isinstance(address, str):
         return False
 
-    if testnet:
-        return bool(re.match(TESTNET_ADDRESS_REGEX, address)) or valid_bech32_address(address, testnet=True)
-    else:
-        return bool(re.match(MAINNET_ADDRESS_REGEX, address)) or valid_bech32_address(address, testnet=False)
+    pattern = TESTNET_ADDRESS_PATTERN if testnet else MAINNET_ADDRESS_PATTERN
+    return pattern.match(address) is not None or valid_bech32_address(address, testnet=testnet)
 
 
 def valid_bech32_address(address: str, testnet: bool = False) -> bool:
@@ -133,17 +159,41 @@ def valid_bech32_address(address: str, testnet: bool = False) -> bool:
     This function performs both structural validation through regex patterns
     and Bech32 specific validation through bech32_decode().
     It supports both lowercase and uppercase address formats.
+    The checksum is only computed for addresses that match one of the patterns.
     """
     if not isinstance(address, str):
         return False
 
-    hrp, data = bech32_decode(address)
-    if (hrp, data) == (None, None):
+    patterns = TESTNET_BECH32_ADDRESS_PATTERNS if testnet else MAINNET_BECH32_ADDRESS_PATTERNS
+    if not any(pattern.match(address) is not None for pattern in patterns):
         return False
 
-    if testnet:
-        return bool(re.match(LOWERCASE_TESTNET_BECH32_ADDRESS_REGEX, address)) or \
-            bool(re.match(UPPERCASE_TESTNET_BECH32_ADDRESS_REGEX, address))
-    else:
-        return bool(re.match(LOWERCASE_MAINNET_BECH32_ADDRESS_REGEX, address)) or \
-            bool(re.match(UPPERCASE_MAINNET_BECH32_ADDRESS_REGEX, address))
+    hrp, data = bech32_decode(address)
+    return (hrp, data) != (None, None)
+
+
+def validate_addresses(addresses: List[str], testnet: bool = False) -> List[bool]:
+    """Validate a list of Bitcoin addresses (both legacy and Bech32 formats).
+
+    Every distinct address is only validated once, which helps for long lists such
+    as the address restrictions of a hivemind issue.
+
+    :param addresses: The Bitcoin addresses to validate
+    :type addresses: List[str]
+    :param testnet: Whether to validate as testnet addresses
+    :type testnet: bool
+    :return: For each address, True if it is valid, False otherwise
+    :rtype: List[bool]
+    """
+    results: Dict[str, bool] = {}
+    valid = []
+    for address in addresses:
+        if not isinstance(address, str):
+            valid.append(False)
+            continue
+
+        if address not in results:
+            results[address] = valid_address(address, testnet=testnet)
+        valid.append(results[address])
+
+    return valid
@@ -1,14 +1,35 @@
-"""Shared pytest fixtures."""
-from typing import Generator
+"""Shared pytest fixtures.
+
+By default the tests use the IPFS daemon at 127.0.0.1:5001. Set the environment
+variable HIVEMIND_TEST_BACKEND to 'memory' or 'filesystem' to run them against a
+local backend instead.
+"""
+import json
+import os
+import tempfile
+from typing import Any, Dict, Generator, List
+import httpx
 import pytest
 from ipfs_dict_chain.IPFS import connect
+from hivemind import storage
+from hivemind.backends import compute_cid, create_backend
+from hivemind.transport import KuboTransport
+from src.hivemind import storage as src_storage
 from src.hivemind.issue import HivemindIssue
 from src.hivemind.option import HivemindOption
 from src.hivemind.opinion import HivemindOpinion
 
+TEST_BACKEND = os.environ.get('HIVEMIND_TEST_BACKEND', 'ipfs')
+
 
 def pytest_configure():
-    """Configure IPFS connection for tests."""
+    """Configure the storage backend for tests."""
+    if TEST_BACKEND != 'ipfs':
+        backend = create_backend(TEST_BACKEND, directory=tempfile.mkdtemp(prefix='hivemind-test-'))
+        for module in (storage, src_storage):
+            module.set_transport(backend)
+        return
+
     try:
         connect(host='127.0.0.1', port=5001)
     except Exception as e:
@@ -34,3 +55,62 @@ def option(issue: HivemindIssue) -> HivemindOption:
 def opinion() -> HivemindOpinion:
     """Create a basic HivemindOpinion instance."""
     return HivemindOpinion()
+
+
+class FakeIPFS:
+    """In-memory stand-in for the HTTP API of an IPFS daemon."""
+
+    def __init__(self) -> None:
+        self.data: Dict[str, bytes] = {}
+        self.fetched: List[str] = []
+        self.add_requests: int = 0
+
+    def add(self, content: bytes) -> str:
+        """Store content and return its CID."""
+        cid = compute_cid(content)
+        self.data[cid] = content
+        return cid
+
+    def add_json(self, data: Any) -> str:
+        """Store JSON data the same way the storage module does."""
+        return self.add(json.dumps(data).encode())
+
+    def get_json(self, cid: str) -> Any:
+        """Get the stored JSON data of a CID."""
+        return json.loads(self.data[cid.replace('/ipfs/', '')])
+
+    def set_json(self, cid: str, data: Any) -> None:
+        """Replace the stored data of a CID."""
+        self.data[cid.replace('/ipfs/', '')] = json.dumps(data).encode()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        """Handle a request to the HTTP API."""
+        if request.url.path == '/api/v0/cat':
+            cid = request.url.params['arg']
+            self.fetched.append(cid)
+            if cid not in self.data:
+                return httpx.Response(500, json={'Message': 'block not found', 'Code': 0, 'Type': 'error'})
+            return httpx.Response(200, content=self.data[cid])
+
+        if request.url.path == '/api/v0/add':
+            self.add_requests += 1
+            boundary = request.headers['content-type'].split('boundary=')[1].encode()
+            lines = []
+            for part in request.read().split(b'--' + boundary)[1:-1]:
+                headers, content = part.split(b'\r\n\r\n', 1)
+                name = headers.split(b'filename="')[1].split(b'"')[0].decode()
+                cid = self.add(content[:-2])
+                lines.append(json.dumps({'Name': name, 'Hash': cid, 'Size': str(len(content) - 2)}))
+            return httpx.Response(200, content='\n'.join(lines).encode() + b'\n')
+
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def fake_ipfs(monkeypatch: pytest.MonkeyPatch) -> Generator[FakeIPFS, None, None]:
+    """Route all storage access to an in-memory IPFS daemon."""
+    fake = FakeIPFS()
+    monkeypatch.setattr(storage, '_transport', KuboTransport(base_url='http://fake-ipfs:5001', http_transport=httpx.MockTransport(fake.handler)))
+    storage.cache.clear()
+    yield fake
+    storage.cache.clear()
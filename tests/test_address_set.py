@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+from typing import List, Tuple
+
+import pytest
+
+from hivemind import HivemindIssue, HivemindOpinion, HivemindOption, HivemindState, storage
+from hivemind.address_set import BloomFilter, HivemindAddressSet, check_addresses, parse_address_weights
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+from tests.conftest import FakeIPFS
+
+
+@pytest.fixture(scope='module')
+def keypairs() -> List[Tuple[object, str]]:
+    """Generate keypairs for the addresses of the tests."""
+    return [generate_bitcoin_keypair() for _ in range(24)]
+
+
+@pytest.fixture
+def address_set(fake_ipfs: FakeIPFS, keypairs: List[Tuple[object, str]]) -> HivemindAddressSet:
+    """Create and save an address set with a weight for the first address."""
+    address_set = HivemindAddressSet()
+    entries = ['%s@2.5' % keypairs[0][1]] + [address for _, address in keypairs[1:20]]
+    address_set.set_addresses(entries, shard_size=5)
+    address_set.save()
+    return address_set
+
+
+@pytest.mark.unit
+class TestBloomFilter:
+    """Tests for the BloomFilter class."""
+
+    def test_no_false_negatives(self) -> None:
+        """Test that every added address is found."""
+        bloom = BloomFilter.for_capacity(1000)
+        addresses = ['address%s' % i for i in range(1000)]
+        for address in addresses:
+            bloom.add(address)
+
+        assert all(address in bloom for address in addresses)
+
+    def test_false_positive_rate(self) -> None:
+        """Test that the false positive rate is close to the requested rate."""
+        bloom = BloomFilter.for_capacity(1000, false_positive_rate=0.01)
+        for i in range(1000):
+            bloom.add('address%s' % i)
+
+        false_positives = sum('other%s' % i in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_round_trip(self) -> None:
+        """Test that a filter can be stored as JSON data."""
+        bloom = BloomFilter.for_capacity(10)
+        bloom.add('address')
+        loaded = BloomFilter.from_dict(bloom.to_dict())
+
+        assert (loaded.size, loaded.hashes) == (bloom.size, bloom.hashes)
+        assert 'address' in loaded
+
+    @pytest.mark.parametrize('data', [{}, {'size': 64, 'hashes': 3, 'data': 'AAAA'}, {'size': 0, 'hashes': 3, 'data': ''}])
+    def test_invalid_data(self, data: dict) -> None:
+        """Test that invalid filter data raises an exception."""
+        with pytest.raises(Exception, match='Invalid Bloom filter'):
+            BloomFilter.from_dict(data)
+
+
+@pytest.mark.unit
+class TestAddressWeights:
+    """Tests for parsing and checking restricted addresses."""
+
+    def test_parse_address_weights(self) -> None:
+        """Test that weights are parsed and the first entry of an address is used."""
+        weights = parse_address_weights(['a@2.5', 'b', 'c@invalid', 'd@-1', 'a@4'])
+        assert weights == {'a': 2.5, 'b': 1.0, 'c': 1.0, 'd': 1.0}
+
+    def test_check_addresses(self) -> None:
+        """Test that invalid addresses are rejected."""
+        check_addresses(['1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa@2', 'mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn'])
+        with pytest.raises(Exception, match='not a valid Bitcoin address'):
+            check_addresses(['invalid'])
+        with pytest.raises(Exception, match='not a string'):
+            check_addresses([1])
+
+
+@pytest.mark.unit
+class TestHivemindAddressSet:
+    """Tests for the HivemindAddressSet class."""
+
+    def test_shards(self, fake_ipfs: FakeIPFS, address_set: HivemindAddressSet, keypairs: List[Tuple[object, str]]) -> None:
+        """Test that the addresses are spread over shards that are stored separately."""
+        assert address_set.count == 20
+        assert len(address_set.shards) == 4
+        shards = [fake_ipfs.get_json(cid) for cid in address_set.shards]
+        assert sum(len(shard) for shard in shards) == 20
+        assert 'shards' in fake_ipfs.get_json(address_set.cid())
+        assert keypairs[0][1] not in str(fake_ipfs.get_json(address_set.cid()))
+
+    def test_lookup_loads_one_shard(self, fake_ipfs: FakeIPFS, address_set: HivemindAddressSet,
+                                    keypairs: List[Tuple[object, str]]) -> None:
+        """Test that looking up an address only loads its shard."""
+        storage.cache.clear()
+        loaded = HivemindAddressSet(cid=address_set.cid())
+        fake_ipfs.fetched.clear()
+
+        assert loaded.weight(keypairs[0][1]) == 2.5
+        assert len(fake_ipfs.fetched) == 1
+        assert fake_ipfs.fetched[0] in address_set.shards
+
+        assert loaded.contains(keypairs[1][1])
+        assert set(fake_ipfs.fetched) <= set(address_set.shards)
+
+    def test_negative_lookup(self, fake_ipfs: FakeIPFS, address_set: HivemindAddressSet,
+                             keypairs: List[Tuple[object, str]]) -> None:
+        """Test that addresses that are not in the set are not found."""
+        storage.cache.clear()
+        loaded = HivemindAddressSet(cid=address_set.cid())
+        fake_ipfs.fetched.clear()
+        for _, address in keypairs[20:]:
+            assert loaded.weight(address) is None
+        assert loaded.weight(None) is None  # type: ignore
+        assert len(fake_ipfs.fetched) <= 1  # Only a false positive of the Bloom filter loads a shard
+
+    def test_address_weights(self, address_set: HivemindAddressSet, keypairs: List[Tuple[object, str]]) -> None:
+        """Test that all addresses can be loaded."""
+        weights = HivemindAddressSet(cid=address_set.cid()).address_weights()
+        assert len(weights) == 20
+        assert weights[keypairs[0][1]] == 2.5
+
+    def test_empty_set(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that an empty address set contains no addresses."""
+        address_set = HivemindAddressSet()
+        address_set.set_addresses([])
+        loaded = HivemindAddressSet(cid=address_set.save())
+
+        assert len(loaded.shards) == 1
+        assert loaded.weight('1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa') is None
+
+    def test_invalid_addresses(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that invalid addresses and settings are rejected."""
+        with pytest.raises(Exception, match='not a valid Bitcoin address'):
+            HivemindAddressSet().set_addresses(['invalid'])
+        with pytest.raises(Exception, match='must be a list'):
+            HivemindAddressSet().set_addresses('1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa')  # type: ignore
+        with pytest.raises(Exception, match='shard_size'):
+            HivemindAddressSet().set_addresses([], shard_size=0)
+
+
+@pytest.mark.unit
+class TestAddressSetRestrictions:
+    """Tests for hivemind issues that reference an address set."""
+
+    def test_set_restrictions(self, address_set: HivemindAddressSet, keypairs: List[Tuple[object, str]]) -> None:
+        """Test the restrictions of an issue with an address set."""
+        issue = HivemindIssue()
+        issue.set_restrictions({'address_set': address_set.cid().replace('/ipfs/', ''), 'options_per_address': 2})
+
+        assert issue.has_address_restrictions()
+        assert issue.address_weights() is None
+        assert issue.address_weight(keypairs[0][1]) == 2.5
+        assert issue.address_weight(keypairs[23][1]) is None
+        assert issue.address_set() is issue.address_set()
+
+    def test_invalid_restrictions(self, keypairs: List[Tuple[object, str]]) -> None:
+        """Test that invalid address set restrictions are rejected."""
+        issue = HivemindIssue()
+        with pytest.raises(Exception, match='both addresses and address_set'):
+            issue.set_restrictions({'addresses': [keypairs[0][1]], 'address_set': 'QmHash'})
+        with pytest.raises(Exception, match='must be the CID of an address set'):
+            issue.set_restrictions({'address_set': 123})
+
+    def test_state_uses_address_set(self, address_set: HivemindAddressSet, keypairs: List[Tuple[object, str]]) -> None:
+        """Test that options and opinions can only be added by addresses in the address set."""
+        issue = HivemindIssue()
+        issue.name = 'Address Set Issue'
+        issue.add_question('What is the best color?')
+        issue.set_restrictions({'address_set': address_set.cid()})
+        issue_hash = issue.save()
+
+        state = HivemindState()
+        state.set_hivemind_issue(issue_cid=issue_hash)
+        timestamp = int(time.time())
+
+        option = HivemindOption()
+        option.set_issue(hivemind_issue_cid=issue_hash)
+        option.set(value='blue')
+        option_hash = option.save()
+
+        outsider_key, outsider = keypairs[23]
+        with pytest.raises(Exception, match='is not allowed to add options'):
+            state.add_option(timestamp, option_hash, outsider, sign_message('%s%s' % (timestamp, option_hash), outsider_key))
+
+        private_key, address = keypairs[0]
+        state.add_option(timestamp, option_hash, address, sign_message('%s%s' % (timestamp, option_hash), private_key))
+
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = issue_hash
+        opinion.set_question_index(0)
+        opinion.ranking.set_fixed([option_hash])
+        opinion_hash = opinion.save()
+        with pytest.raises(Exception, match='is not allowed to add opinions'):
+            state.add_opinion(timestamp, opinion_hash, outsider, sign_message('%s%s' % (timestamp, opinion_hash), outsider_key))
+        state.add_opinion(timestamp, opinion_hash, address, sign_message('%s%s' % (timestamp, opinion_hash), private_key))
+
+        assert state.get_weight(address) == 2.5
+        assert state.get_weight(keypairs[1][1]) == 1.0
+        assert state.get_weight(outsider) == 0.0
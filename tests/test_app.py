@@ -6,7 +6,7 @@ import pytest
 import tempfile
 import shutil
 import pytest
-from unittest.mock import patch, MagicMock, mock_open, PropertyMock
+from unittest.mock import patch, AsyncMock, MagicMock, mock_open, PropertyMock
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any
@@ -469,7 +469,7 @@ class TestEndpoints:
         mock_opinion.ranking = ["option1", "option2"]
 
         # Configure the mock classes to return our mock instances
-        mock_hivemind_state_class.return_value = mock_state
+        mock_hivemind_state_class.aload = AsyncMock(return_value=mock_state)
         mock_hivemind_issue_class.return_value = mock_issue
         mock_hivemind_option_class.return_value = mock_option
         mock_hivemind_opinion_class.return_value = mock_opinion
@@ -525,7 +525,7 @@ class TestEndpoints:
     def test_fetch_state_exception(self, mock_hivemind_state):
         """Test the fetch_state endpoint when an exception occurs."""
         # Configure mock to raise an exception
-        mock_hivemind_state.side_effect = Exception("IPFS error")
+        mock_hivemind_state.aload = AsyncMock(side_effect=Exception("IPFS error"))
 
         # Test the endpoint
         response = self.client.post(
@@ -621,7 +621,7 @@ class TestEndpoints:
         mock_issue_instance.__getitem__.side_effect = lambda key: getattr(mock_issue_instance, key)
 
         # Return our prepared mock
-        mock_hivemind_issue.return_value = mock_issue_instance
+        mock_hivemind_issue.aload = AsyncMock(return_value=mock_issue_instance)
 
         # Patch the endpoint to return a simple HTML response instead of using the template
         with patch("app.templates.TemplateResponse", return_value=HTMLResponse("<title>Add Option - Hivemind Protocol</title>")):
@@ -633,7 +633,7 @@ class TestEndpoints:
             assert "<title>" in response.text
 
             # Verify the HivemindIssue was loaded with the correct ID
-            mock_hivemind_issue.assert_called_once_with(cid="test_hivemind_id")
+            mock_hivemind_issue.aload.assert_awaited_once_with(cid="test_hivemind_id")
 
     @patch("app.HivemindOption")
     @patch("app.HivemindState")
@@ -643,7 +643,7 @@ class TestEndpoints:
         """Test the create_option endpoint."""
         # Setup mock option instance
         mock_option_instance = MagicMock()
-        mock_option_instance.save.return_value = "test_option_cid"
+        mock_option_instance.asave = AsyncMock(return_value="test_option_cid")
         mock_option_instance._answer_type = "string"
         mock_hivemind_option.return_value = mock_option_instance
 
@@ -660,7 +660,7 @@ class TestEndpoints:
         mock_state = MagicMock()
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.add_option = MagicMock()
         mock_state.hivemind_issue.return_value = mock_issue  # Set up hivemind_issue method
 
@@ -670,7 +670,7 @@ class TestEndpoints:
 
         mock_state.add_option.side_effect = side_effect_add_option
 
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock state mapping
         mock_load_state_mapping.return_value = {
@@ -728,7 +728,7 @@ class TestEndpoints:
             {"id": "option1", "value": "value1", "text": "Option 1"},
             {"id": "option2", "value": "value2", "text": "Option 2"}
         ]
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Test the endpoint
         response = self.client.get("/add_opinion?cid=test_state_cid")
@@ -739,7 +739,7 @@ class TestEndpoints:
         assert "<title>" in response.text
 
         # Verify the HivemindState was loaded with the correct CID
-        mock_hivemind_state.assert_called_once_with(cid="test_state_cid")
+        mock_hivemind_state.aload.assert_awaited_once_with(cid="test_state_cid")
 
     @patch("app.load_state_mapping")
     @patch("builtins.open")
@@ -884,7 +884,7 @@ class TestEndpoints:
         mock_issue.answer_type = "ranked"
 
         # Configure the mock classes to return our mock instances
-        mock_hivemind_state_class.return_value = mock_state
+        mock_hivemind_state_class.aload = AsyncMock(return_value=mock_state)
         mock_hivemind_issue_class.return_value = mock_issue
 
         # Configure get_option to raise an exception
@@ -914,7 +914,7 @@ class TestEndpoints:
     def test_fetch_state_exception(self, mock_hivemind_state):
         """Test the fetch_state endpoint when an exception occurs."""
         # Configure mock to raise an exception
-        mock_hivemind_state.side_effect = Exception("IPFS error")
+        mock_hivemind_state.aload = AsyncMock(side_effect=Exception("IPFS error"))
 
         # Test the endpoint
         response = self.client.post(
@@ -984,7 +984,7 @@ class TestEndpoints:
         mock_issue.tags = ["test"]
 
         # Configure the mock classes to return our mock instances
-        mock_hivemind_state_class.return_value = mock_state
+        mock_hivemind_state_class.aload = AsyncMock(return_value=mock_state)
         mock_hivemind_issue_class.return_value = mock_issue
         mock_hivemind_option_class.side_effect = lambda cid=None: option1 if cid == "/ipfs/option1" else option2
 
@@ -1058,7 +1058,7 @@ class TestEndpoints:
         mock_opinion.ranking = ["option1", "option2"]
 
         # Configure the mock classes to return our mock instances
-        mock_hivemind_state_class.return_value = mock_state
+        mock_hivemind_state_class.aload = AsyncMock(return_value=mock_state)
         mock_hivemind_issue_class.return_value = mock_issue
         mock_hivemind_option_class.return_value = mock_option
         mock_hivemind_opinion_class.return_value = mock_opinion
@@ -70,7 +70,7 @@ class TestAddressRestrictions:
         # Setup mock option
         mock_option = MagicMock()
         mock_option.valid.return_value = True
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_hivemind_option.return_value = mock_option
 
         # Setup mock issue with address restrictions
@@ -82,7 +82,7 @@ class TestAddressRestrictions:
         # Setup mock state
         mock_state = MagicMock()
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args, **kwargs):
@@ -47,6 +47,99 @@ class TestAPIEndpoints:
         """Set up test client for each test."""
         self.client = TestClient(app.app)
 
+    def test_get_storage_stats(self):
+        """Test the storage_stats endpoint."""
+        response = self.client.get("/api/storage_stats")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"transport", "loads", "cached"}
+        assert "requests" in data["transport"]
+
+    def test_get_history(self):
+        """Test the history endpoints with states recorded in the chain index."""
+        mapping = {"QmHistoryIssue": {"state_hash": "QmState1"}}
+        for sequence in range(2):
+            link = {"previous_cid": "QmState0" if sequence else None, "sequence": sequence, "timestamp": 100 + sequence}
+            app.get_chain_index().record("QmHistoryIssue", "QmState%s" % sequence, operation="add_option", address="addr", link=link)
+
+        with patch("app.load_state_mapping", return_value=mapping):
+            response = self.client.get("/api/history/QmHistoryIssue", params={"start": 101})
+            assert response.status_code == 200
+            assert [state["cid"] for state in response.json()["states"]] == ["QmState1"]
+
+            response = self.client.get("/api/history/QmHistoryIssue/QmState0")
+            assert response.status_code == 200
+            assert response.json()["operation"] == "add_option"
+
+            assert self.client.get("/api/history/QmHistoryIssue/QmUnknown").status_code == 404
+            assert self.client.get("/api/history/QmUnknownIssue").status_code == 404
+
+    def test_get_timeline(self):
+        """Test that the timeline endpoint streams one JSON line per snapshot."""
+        snapshots = [{"cid": "QmState0", "timestamp": 100, "scores": [{}]}, {"cid": "QmState1", "timestamp": 110, "scores": [{"QmOption": 1.0}]}]
+        mapping = {"QmTimelineIssue": {"state_hash": "QmState1"}}
+        with patch("app.load_state_mapping", return_value=mapping), \
+                patch("app.Timeline") as mock_timeline:
+            mock_timeline.return_value.snapshots.return_value = iter(snapshots)
+            response = self.client.get("/api/timeline/QmTimelineIssue", params={"bucket": 60})
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/x-ndjson"
+            assert [json.loads(line) for line in response.text.splitlines()] == snapshots
+            mock_timeline.assert_called_once_with("QmState1")
+            mock_timeline.return_value.snapshots.assert_called_once_with(bucket=60)
+
+            assert self.client.get("/api/timeline/QmTimelineIssue", params={"bucket": 0}).status_code == 400
+            assert self.client.get("/api/timeline/QmUnknownIssue").status_code == 404
+
+    def test_get_timeline_errors(self):
+        """Test that a state that can not be loaded fails the request and a later error ends the stream with an error line."""
+        mapping = {"QmTimelineIssue": {"state_hash": "QmState1"}}
+
+        def unloadable_snapshots(bucket=None):
+            raise Exception("Unable to load QmState1")
+            yield
+
+        def failing_snapshots(bucket=None):
+            yield {"cid": "QmState0", "timestamp": 100, "scores": [{}]}
+            raise Exception("State QmState1 does not contain a dict")
+
+        with patch("app.load_state_mapping", return_value=mapping), \
+                patch("app.Timeline") as mock_timeline:
+            mock_timeline.return_value.snapshots.side_effect = unloadable_snapshots
+            response = self.client.get("/api/timeline/QmTimelineIssue")
+            assert response.status_code == 500
+            assert "Unable to load QmState1" in response.json()["detail"]
+
+            mock_timeline.return_value.snapshots.side_effect = failing_snapshots
+            response = self.client.get("/api/timeline/QmTimelineIssue")
+            assert response.status_code == 200
+            lines = [json.loads(line) for line in response.text.splitlines()]
+            assert lines[0]["cid"] == "QmState0"
+            assert lines[-1] == {"error": "State QmState1 does not contain a dict"}
+
+    def test_get_state_diff(self):
+        """Test the diff endpoint."""
+        diff = {"options": {"added": [], "removed": []}, "opinions": [[]], "signatures": {"added": [], "removed": []},
+                "participants": {}, "changed": {"final": {"old": False, "new": True}}}
+        with patch("app.HivemindState.diff_cids", return_value=diff) as mock_diff:
+            response = self.client.get("/api/diff/QmOld/QmNew")
+            assert response.status_code == 200
+            assert response.json() == {"state_cid": "QmOld", "other_cid": "QmNew", **diff}
+            mock_diff.assert_called_once_with("QmOld", "QmNew")
+
+        with patch("app.HivemindState.diff_cids", side_effect=Exception("Can not retrieve state QmOld")):
+            response = self.client.get("/api/diff/QmOld/QmNew")
+            assert response.status_code == 500
+            assert "Can not retrieve state" in response.json()["detail"]
+
+    def test_get_signature_stats(self):
+        """Test the signature_stats endpoint."""
+        response = self.client.get("/api/signature_stats")
+
+        assert response.status_code == 200
+        assert set(response.json()) == {"hits", "misses", "cached", "maxsize"}
+
     @patch("app.HivemindState")
     @patch("app.HivemindOpinion")
     def test_submit_opinion_success(self, mock_hivemind_opinion, mock_hivemind_state):
@@ -5,7 +5,7 @@ import pytest
 import tempfile
 import shutil
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 from fastapi import HTTPException
 
@@ -52,7 +52,7 @@ class TestErrorHandling:
     def test_add_opinion_page_exception(self, mock_hivemind_issue, mock_hivemind_state):
         """Test the add_opinion_page endpoint when an exception occurs."""
         # Configure mock to raise an exception
-        mock_hivemind_state.side_effect = Exception("Test error message")
+        mock_hivemind_state.aload = AsyncMock(side_effect=Exception("Test error message"))
 
         # Test the endpoint
         response = self.client.get("/add_opinion?cid=test_state_cid")
@@ -65,7 +65,7 @@ class TestErrorHandling:
         # Verify the logger was called with the error message
         with patch("app.logger") as mock_logger:
             # Re-run the test with the logger patched
-            mock_hivemind_state.side_effect = Exception("Test error message")
+            mock_hivemind_state.aload = AsyncMock(side_effect=Exception("Test error message"))
             response = self.client.get("/add_opinion?cid=test_state_cid")
 
             # Verify logger.error was called with the expected message
@@ -93,7 +93,7 @@ class TestErrorHandling:
         mock_option2.value = "test_value2"
         mock_option2.text = "Test Option 2"
         mock_state.get_option.side_effect = [mock_option1, Exception("Failed to load option")]
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Test the endpoint
         response = self.client.get("/add_opinion?cid=test_state_cid")
@@ -186,11 +186,12 @@ class TestErrorHandling:
 
         # Make HivemindOption constructor work but then cause an exception later
         mock_option = MagicMock()
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_hivemind_option.return_value = mock_option
         
-        # Make HivemindState constructor work
+        # Make HivemindState loading work
         mock_state = MagicMock()
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
         
         # Make the state.add_option method raise an exception
         test_exception = Exception("Test error in create_and_save")
@@ -229,11 +230,12 @@ class TestErrorHandling:
 
         # Make HivemindOption constructor work
         mock_option = MagicMock()
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_hivemind_option.return_value = mock_option
         
-        # Make HivemindState constructor work
+        # Make HivemindState loading work
         mock_state = MagicMock()
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
         
         # Make the state.add_option method raise an HTTPException
         http_exception = HTTPException(status_code=422, detail="Validation error in create_and_save")
@@ -296,7 +298,7 @@ class TestErrorHandling:
         
         # Mock HivemindOption to work normally
         mock_option = MagicMock()
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_hivemind_option.return_value = mock_option
         
         # Configure load_state_mapping to return a dict that has the hivemind_id but with None value
@@ -116,7 +116,7 @@ class TestPrepareNameUpdate:
         mock_issue.get_identification_cid.return_value = VALID_IDENTIFICATION_CID
 
         # Patch HivemindIssue
-        with patch("app.HivemindIssue", return_value=mock_issue):
+        with patch("app.HivemindIssue", aload=AsyncMock(return_value=mock_issue)):
             # Test request data
             request_data = {
                 "name": "Test User",
@@ -171,7 +171,7 @@ class TestPrepareNameUpdate:
         mock_issue.get_identification_cid.side_effect = Exception("Test exception")
 
         # Patch HivemindIssue
-        with patch("app.HivemindIssue", return_value=mock_issue):
+        with patch("app.HivemindIssue", aload=AsyncMock(return_value=mock_issue)):
             # Test request data
             request_data = {
                 "name": "Test User",
@@ -200,14 +200,13 @@ class TestSignNameUpdate:
         app.name_update_connections["Test User"] = [AsyncMock()]
 
     @patch("app.asyncio.to_thread", mock_to_thread)
-    @patch("app.connect")
-    @patch("app.IPFSDict")
+    @patch("app.StorageDict")
     @patch("app.load_state_mapping")
     @patch("app.HivemindState")
     @patch("app.HivemindIssue")
     @patch("app.update_state")
     def test_sign_name_update_success(self, mock_update_state, mock_issue, mock_state,
-                                      mock_load_state_mapping, mock_ipfs_dict, mock_connect):
+                                      mock_load_state_mapping, mock_ipfs_dict):
         """Test successful name update with a signed message."""
         # Create a timestamp and test data
         timestamp = int(time.time())
@@ -221,7 +220,7 @@ class TestSignNameUpdate:
             "hivemind_id": VALID_HIVEMIND_ID,
             "name": test_name
         }.get(key)
-        mock_ipfs_dict.return_value = mock_ipfs_dict_instance
+        mock_ipfs_dict.aload = AsyncMock(return_value=mock_ipfs_dict_instance)
 
         # Mock state mapping
         mock_load_state_mapping.return_value = {
@@ -231,10 +230,10 @@ class TestSignNameUpdate:
         # Mock HivemindState
         mock_state_instance = MagicMock()
         mock_state_instance.update_participant_name.return_value = None
-        mock_state_instance.save.return_value = "new_state_cid"
+        mock_state_instance.asave = AsyncMock(return_value="new_state_cid")
         mock_state_instance.options = ["option1", "option2"]
         mock_state_instance.opinions = [[{"address": "addr1"}, {"address": "addr2"}]]
-        mock_state.return_value = mock_state_instance
+        mock_state.aload = AsyncMock(return_value=mock_state_instance)
 
         # Mock HivemindIssue
         mock_issue_instance = MagicMock()
@@ -317,15 +316,14 @@ class TestSignNameUpdate:
         assert "Invalid message format" in data["detail"]
 
     @patch("app.asyncio.to_thread", mock_to_thread)
-    @patch("app.connect")
-    @patch("app.IPFSDict")
-    def test_sign_name_update_ipfs_error(self, mock_ipfs_dict, mock_connect):
+    @patch("app.StorageDict")
+    def test_sign_name_update_ipfs_error(self, mock_ipfs_dict):
         """Test sign_name_update with IPFS error."""
         # Create a timestamp and test data
         timestamp = int(time.time())
 
         # Mock IPFS Dict to raise an exception
-        mock_ipfs_dict.side_effect = Exception("IPFS connection error")
+        mock_ipfs_dict.aload = AsyncMock(side_effect=Exception("IPFS connection error"))
 
         # Create test request data
         message = f"{timestamp:010d}{VALID_IDENTIFICATION_CID}"
@@ -345,9 +343,8 @@ class TestSignNameUpdate:
         assert "Failed to load identification data" in data["detail"]
 
     @patch("app.asyncio.to_thread", mock_to_thread)
-    @patch("app.connect")
-    @patch("app.IPFSDict")
-    def test_sign_name_update_missing_hivemind_id(self, mock_ipfs_dict, mock_connect):
+    @patch("app.StorageDict")
+    def test_sign_name_update_missing_hivemind_id(self, mock_ipfs_dict):
         """Test sign_name_update with missing hivemind ID in identification data."""
         # Create a timestamp and test data
         timestamp = int(time.time())
@@ -358,7 +355,7 @@ class TestSignNameUpdate:
             "name": "Test User"
             # Missing hivemind_id
         }.get(key)
-        mock_ipfs_dict.return_value = mock_ipfs_dict_instance
+        mock_ipfs_dict.aload = AsyncMock(return_value=mock_ipfs_dict_instance)
 
         # Create test request data
         message = f"{timestamp:010d}{VALID_IDENTIFICATION_CID}"
@@ -378,10 +375,9 @@ class TestSignNameUpdate:
         assert "Missing hivemind ID in identification data" in data["detail"]
 
     @patch("app.asyncio.to_thread", mock_to_thread)
-    @patch("app.connect")
-    @patch("app.IPFSDict")
+    @patch("app.StorageDict")
     @patch("app.load_state_mapping")
-    def test_sign_name_update_no_state_found(self, mock_load_state_mapping, mock_ipfs_dict, mock_connect):
+    def test_sign_name_update_no_state_found(self, mock_load_state_mapping, mock_ipfs_dict):
         """Test sign_name_update with no state found for hivemind ID."""
         # Create a timestamp and test data
         timestamp = int(time.time())
@@ -392,7 +388,7 @@ class TestSignNameUpdate:
             "hivemind_id": VALID_HIVEMIND_ID,
             "name": "Test User"
         }.get(key)
-        mock_ipfs_dict.return_value = mock_ipfs_dict_instance
+        mock_ipfs_dict.aload = AsyncMock(return_value=mock_ipfs_dict_instance)
 
         # Mock state mapping to return empty dict (no state found)
         mock_load_state_mapping.return_value = {}
@@ -415,12 +411,11 @@ class TestSignNameUpdate:
         assert f"No state found for hivemind ID: {VALID_HIVEMIND_ID}" in data["detail"]
 
     @patch("app.asyncio.to_thread", mock_to_thread)
-    @patch("app.connect")
-    @patch("app.IPFSDict")
+    @patch("app.StorageDict")
     @patch("app.load_state_mapping")
     @patch("app.HivemindState")
     def test_sign_name_update_state_exception(self, mock_state, mock_load_state_mapping,
-                                              mock_ipfs_dict, mock_connect):
+                                              mock_ipfs_dict):
         """Test sign_name_update with exception during state update."""
         # Create a timestamp and test data
         timestamp = int(time.time())
@@ -431,7 +426,7 @@ class TestSignNameUpdate:
             "hivemind_id": VALID_HIVEMIND_ID,
             "name": "Test User"
         }.get(key)
-        mock_ipfs_dict.return_value = mock_ipfs_dict_instance
+        mock_ipfs_dict.aload = AsyncMock(return_value=mock_ipfs_dict_instance)
 
         # Mock state mapping
         mock_load_state_mapping.return_value = {
@@ -441,7 +436,7 @@ class TestSignNameUpdate:
         # Mock HivemindState to raise an exception
         mock_state_instance = MagicMock()
         mock_state_instance.update_participant_name.side_effect = Exception("Signature verification failed")
-        mock_state.return_value = mock_state_instance
+        mock_state.aload = AsyncMock(return_value=mock_state_instance)
 
         # Create test request data
         message = f"{timestamp:010d}{VALID_IDENTIFICATION_CID}"
@@ -461,10 +456,9 @@ class TestSignNameUpdate:
         assert "Signature verification failed" in data["detail"]
 
     @patch("app.asyncio.to_thread", mock_to_thread)
-    @patch("app.connect")
-    @patch("app.IPFSDict")
+    @patch("app.StorageDict")
     @patch("app.load_state_mapping")
-    def test_sign_name_update_no_state_hash(self, mock_load_state_mapping, mock_ipfs_dict, mock_connect):
+    def test_sign_name_update_no_state_hash(self, mock_load_state_mapping, mock_ipfs_dict):
         """Test sign_name_update with no state hash found for hivemind ID (line 1299)."""
         # Create a timestamp and test data
         timestamp = int(time.time())
@@ -475,7 +469,7 @@ class TestSignNameUpdate:
             "hivemind_id": VALID_HIVEMIND_ID,
             "name": "Test User"
         }.get(key)
-        mock_ipfs_dict.return_value = mock_ipfs_dict_instance
+        mock_ipfs_dict.aload = AsyncMock(return_value=mock_ipfs_dict_instance)
 
         # Mock state mapping to return a dict with the hivemind ID but no state_hash
         mock_load_state_mapping.return_value = {
@@ -500,9 +494,8 @@ class TestSignNameUpdate:
         assert f"No state hash found for hivemind ID: {VALID_HIVEMIND_ID}" in data["detail"]
 
     @patch("app.asyncio.to_thread", mock_to_thread)
-    @patch("app.connect")
-    @patch("app.IPFSDict")
-    def test_sign_name_update_missing_name(self, mock_ipfs_dict, mock_connect):
+    @patch("app.StorageDict")
+    def test_sign_name_update_missing_name(self, mock_ipfs_dict):
         """Test sign_name_update with missing name in identification data."""
         # Create a timestamp and test data
         timestamp = int(time.time())
@@ -513,7 +506,7 @@ class TestSignNameUpdate:
             "hivemind_id": VALID_HIVEMIND_ID
             # Missing name
         }.get(key)
-        mock_ipfs_dict.return_value = mock_ipfs_dict_instance
+        mock_ipfs_dict.aload = AsyncMock(return_value=mock_ipfs_dict_instance)
 
         # Create test request data
         message = f"{timestamp:010d}{VALID_IDENTIFICATION_CID}"
@@ -550,15 +543,14 @@ class TestSignNameUpdate:
         assert "Invalid JSON data" in data["detail"]
 
     @patch("app.asyncio.to_thread", mock_to_thread)
-    @patch("app.connect")
-    @patch("app.IPFSDict")
+    @patch("app.StorageDict")
     @patch("app.load_state_mapping")
     @patch("app.HivemindState")
     @patch("app.HivemindIssue")
     @patch("app.update_state")
     @patch("app.logger")
     def test_websocket_notification_exception(self, mock_logger, mock_update_state, mock_issue, mock_state,
-                                              mock_load_state_mapping, mock_ipfs_dict, mock_connect):
+                                              mock_load_state_mapping, mock_ipfs_dict):
         """Test exception handling when sending WebSocket notifications (lines 1344-1346)."""
         # Create a timestamp and test data
         timestamp = int(time.time())
@@ -572,7 +564,7 @@ class TestSignNameUpdate:
             "hivemind_id": VALID_HIVEMIND_ID,
             "name": test_name
         }.get(key)
-        mock_ipfs_dict.return_value = mock_ipfs_dict_instance
+        mock_ipfs_dict.aload = AsyncMock(return_value=mock_ipfs_dict_instance)
 
         # Mock state mapping
         mock_load_state_mapping.return_value = {
@@ -582,10 +574,10 @@ class TestSignNameUpdate:
         # Mock HivemindState
         mock_state_instance = MagicMock()
         mock_state_instance.update_participant_name.return_value = None
-        mock_state_instance.save.return_value = "new_state_cid"
+        mock_state_instance.asave = AsyncMock(return_value="new_state_cid")
         mock_state_instance.options = ["option1", "option2"]
         mock_state_instance.opinions = [[{"address": "addr1"}, {"address": "addr2"}]]
-        mock_state.return_value = mock_state_instance
+        mock_state.aload = AsyncMock(return_value=mock_state_instance)
 
         # Mock HivemindIssue
         mock_issue_instance = MagicMock()
@@ -107,7 +107,7 @@ class TestOptionTypeConversion:
         # Setup mock option with property setter that converts string to int
         mock_option = MagicMock()
         mock_option.valid.return_value = True
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_option.hivemind_id = "test_issue_cid"  # Set hivemind_id for the mapping lookup
         mock_option._answer_type = "Integer"
         
@@ -134,12 +134,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args):
@@ -200,7 +200,7 @@ class TestOptionTypeConversion:
         assert mock_option.value == 42
 
         # Verify save was called
-        mock_option.save.assert_called_once()
+        mock_option.asave.assert_awaited_once()
 
     @patch('app.update_state')
     @patch('app.get_latest_state')
@@ -240,7 +240,7 @@ class TestOptionTypeConversion:
         # Setup mock option with property setter that converts string to float
         mock_option = MagicMock()
         mock_option.valid.return_value = True
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_option.hivemind_id = "test_issue_cid"  # Set hivemind_id for the mapping lookup
         mock_option._answer_type = "Float"
         
@@ -267,12 +267,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args):
@@ -339,7 +339,7 @@ class TestOptionTypeConversion:
         assert mock_option.value == 3.14
 
         # Verify save was called
-        mock_option.save.assert_called_once()
+        mock_option.asave.assert_awaited_once()
 
     @patch('app.update_state')
     @patch('app.get_latest_state')
@@ -379,7 +379,7 @@ class TestOptionTypeConversion:
         # Setup mock option with property setter that maintains string value
         mock_option = MagicMock()
         mock_option.valid.return_value = True
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_option.hivemind_id = "test_issue_cid"  # Set hivemind_id for the mapping lookup
         mock_option._answer_type = "String"
         
@@ -403,12 +403,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
     
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args):
@@ -472,7 +472,7 @@ class TestOptionTypeConversion:
         assert mock_option.value == "test_value"
     
         # Verify save was called
-        mock_option.save.assert_called_once()
+        mock_option.asave.assert_awaited_once()
 
     @patch('app.update_state')
     @patch('app.get_latest_state')
@@ -512,7 +512,7 @@ class TestOptionTypeConversion:
         # Setup mock option with property setter that handles JSON parsing
         mock_option = MagicMock()
         mock_option.valid.return_value = True
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_option.hivemind_id = "test_issue_cid"  # Set hivemind_id for the mapping lookup
         mock_option._answer_type = "Complex"
         
@@ -542,12 +542,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
     
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args):
@@ -611,7 +611,7 @@ class TestOptionTypeConversion:
         assert mock_option.value == {"key1": "value1", "key2": 42, "key3": True}
     
         # Verify save was called
-        mock_option.save.assert_called_once()
+        mock_option.asave.assert_awaited_once()
 
     @patch('app.update_state')
     @patch('app.get_latest_state')
@@ -655,7 +655,7 @@ class TestOptionTypeConversion:
         # Setup mock option that will raise ValueError on float conversion
         mock_option = MagicMock()
         mock_option.valid.return_value = True
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_option.hivemind_id = "test_issue_cid"  # Set hivemind_id for the mapping lookup
         mock_option._answer_type = "Complex"
         
@@ -684,12 +684,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
     
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args):
@@ -787,7 +787,7 @@ class TestOptionTypeConversion:
         # Setup mock option that will raise ValueError on integer conversion
         mock_option = MagicMock()
         mock_option.valid.return_value = True
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         mock_option.hivemind_id = "test_issue_cid"  # Set hivemind_id for the mapping lookup
         mock_option._answer_type = "Integer"
         
@@ -817,12 +817,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args):
@@ -881,7 +881,7 @@ class TestOptionTypeConversion:
         assert "invalid literal for int()" in error_data["detail"]
 
         # Verify save was not called
-        mock_option.save.assert_not_called()
+        mock_option.asave.assert_not_awaited()
 
     @patch('app.update_state')
     @patch('app.get_latest_state')
@@ -924,7 +924,7 @@ class TestOptionTypeConversion:
         mock_option._answer_type = "String"
         
         # Make save raise an exception to simulate validation failure
-        mock_option.save.side_effect = Exception("Option validation failed")
+        mock_option.asave = AsyncMock(side_effect=Exception("Option validation failed"))
         
         mock_option.hivemind_id = "test_issue_cid"
         
@@ -948,12 +948,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args):
@@ -1051,7 +1051,7 @@ class TestOptionTypeConversion:
         mock_option._value = "test_value"  # Initialize the value
         
         # Make the save method raise a validation exception
-        mock_option.save.side_effect = ValueError("Custom validation error")
+        mock_option.asave = AsyncMock(side_effect=ValueError("Custom validation error"))
         
         mock_hivemind_option.return_value = mock_option
 
@@ -1060,12 +1060,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock for asyncio.to_thread
         async def mock_to_thread_return(func, *args):
@@ -1111,7 +1111,7 @@ class TestOptionTypeConversion:
         assert "Custom validation error" in error_data["detail"]
 
         # Verify save was attempted but failed
-        assert mock_option.save.call_count > 0
+        assert mock_option.asave.await_count > 0
 
     @patch('app.update_state')
     @patch('app.get_latest_state')
@@ -1184,12 +1184,12 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.issue = mock_issue
-        mock_state.save.return_value = "new_state_cid"
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
         mock_state.load.return_value = None  # Mock load method
         
         # Important: Set up the hivemind_issue method to return our mock_issue
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_hivemind_state.return_value = mock_state
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock for get_latest_state
         mock_get_latest_state.return_value = {
@@ -1281,7 +1281,7 @@ class TestOptionTypeConversion:
         # Set up the value property with our getter and setter
         type(mock_option).value = property(get_value, set_value)
         mock_option._value = None  # Initialize with None
-        mock_option.save.return_value = "test_option_cid"
+        mock_option.asave = AsyncMock(return_value="test_option_cid")
         
         # Return our mock option
         mock_hivemind_option.return_value = mock_option
@@ -1291,8 +1291,8 @@ class TestOptionTypeConversion:
         mock_state.option_cids = ["existing_option"]
         mock_state.opinion_cids = [[]]  # Empty list of opinions
         mock_state.hivemind_issue.return_value = mock_issue
-        mock_state.save.return_value = "new_state_cid"
-        mock_hivemind_state.return_value = mock_state
+        mock_state.asave = AsyncMock(return_value="new_state_cid")
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state)
 
         # Setup mock for get_latest_state
         mock_get_latest_state.return_value = {
@@ -1335,7 +1335,7 @@ class TestOptionTypeConversion:
         assert "Object of type 'int' is not JSON serializable" in error_data["detail"]
 
         # Verify save was not called
-        mock_option.save.assert_not_called()
+        mock_option.asave.assert_not_awaited()
 
     def _mock_thread(self, target, args, kwargs):
         """Helper method to mock threading.Thread by executing the target function immediately."""
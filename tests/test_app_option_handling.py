@@ -5,7 +5,7 @@ import pytest
 import tempfile
 import shutil
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 from fastapi import HTTPException
 
@@ -49,19 +49,12 @@ class TestOptionHandling:
         self.client = TestClient(app.app)
 
     @patch("app.HivemindIssue")
-    @patch("app.asyncio.to_thread")
     @patch("app.logger")
-    def test_add_option_page_exception(self, mock_logger, mock_to_thread, mock_hivemind_issue):
+    def test_add_option_page_exception(self, mock_logger, mock_hivemind_issue):
         """Test the add_option_page endpoint when an exception occurs loading the issue."""
-        # Configure to_thread to raise an exception when called
+        # Configure the issue loading to raise an exception
         test_exception = Exception("Test error loading issue")
-
-        # Configure the mock to pass the exception through the to_thread call
-        def side_effect_function(func, *args, **kwargs):
-            # This simulates the lambda function raising an exception
-            raise test_exception
-
-        mock_to_thread.side_effect = side_effect_function
+        mock_hivemind_issue.aload = AsyncMock(side_effect=test_exception)
 
         # Test the endpoint
         response = self.client.get("/options/add?hivemind_id=test_issue_cid")
@@ -113,7 +113,7 @@ class TestSelectConsensus:
         mock_state.option_cids = [VALID_OPTION_CID]
         mock_state.calculate_results.return_value = {VALID_OPTION_CID: 1.0}
         mock_state.select_consensus.return_value = [VALID_OPTION_CID]
-        mock_state.save.return_value = VALID_STATE_CID
+        mock_state.asave = AsyncMock(return_value=VALID_STATE_CID)
         mock_state.hivemind_issue.return_value = mock_issue
         mock_state._hivemind_issue = mock_issue
         mock_state.hivemind_id = VALID_HIVEMIND_ID
@@ -129,7 +129,7 @@ class TestSelectConsensus:
         with patch("app.verify_message", return_value=True):
             with patch("app.load_state_mapping", return_value=mock_mapping):
                 with patch("app.save_state_mapping", return_value=None):
-                    with patch("app.HivemindState", return_value=mock_state):
+                    with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                         # Test the endpoint
                         response = self.client.post("/api/select_consensus", json=request_data)
 
@@ -179,7 +179,7 @@ class TestSelectConsensus:
         # Patch necessary functions
         with patch("app.verify_message", return_value=True):  # This doesn't matter as the state will raise the error
             with patch("app.load_state_mapping", return_value=mock_mapping):
-                with patch("app.HivemindState", return_value=mock_state):
+                with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                     # Test the endpoint
                     response = self.client.post("/api/select_consensus", json=request_data)
 
@@ -283,7 +283,7 @@ class TestSelectConsensus:
         # Patch all necessary functions
         with patch("app.verify_message", return_value=True):
             with patch("app.load_state_mapping", return_value=mock_mapping):
-                with patch("app.HivemindState", return_value=mock_state):
+                with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                     # Test the endpoint
                     response = self.client.post("/api/select_consensus", json=request_data)
 
@@ -313,7 +313,7 @@ class TestSelectConsensus:
         # Patch necessary functions
         with patch("app.verify_message", return_value=True):
             with patch("app.load_state_mapping", return_value=mock_mapping):
-                with patch("app.HivemindState", side_effect=Exception("Error loading state")):
+                with patch("app.HivemindState", aload=AsyncMock(side_effect=Exception("Error loading state"))):
                     # Test the endpoint
                     response = self.client.post("/api/select_consensus", json=request_data)
 
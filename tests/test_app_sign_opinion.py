@@ -88,7 +88,7 @@ class TestSignOpinion:
         mock_state = MagicMock()
         mock_state.options = [VALID_OPTION1_CID, VALID_OPTION2_CID]
         mock_state.opinions = [[]]  # Empty list for each question
-        mock_state.save.return_value = VALID_STATE_CID
+        mock_state.asave = AsyncMock(return_value=VALID_STATE_CID)
         mock_state.calculate_results.return_value = {VALID_OPTION1_CID: {"score": 0.8}}
         mock_state.add_opinion.return_value = None
 
@@ -115,8 +115,8 @@ class TestSignOpinion:
             return None
 
         # Patch HivemindOpinion, HivemindState, and update_state
-        with patch("app.HivemindOpinion", return_value=mock_opinion):
-            with patch("app.HivemindState", return_value=mock_state):
+        with patch("app.HivemindOpinion", aload=AsyncMock(return_value=mock_opinion)):
+            with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                 with patch("app.update_state", side_effect=mock_update_state):
                     # Create test data
                     timestamp = int(time.time())
@@ -170,8 +170,8 @@ class TestSignOpinion:
         mock_state = MagicMock()
 
         # Patch HivemindOpinion and HivemindState
-        with patch("app.HivemindOpinion", return_value=mock_opinion):
-            with patch("app.HivemindState", return_value=mock_state):
+        with patch("app.HivemindOpinion", aload=AsyncMock(return_value=mock_opinion)):
+            with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                 # Create test data
                 timestamp = int(time.time())
                 opinion_hash = VALID_OPINION_CID
@@ -256,7 +256,7 @@ class TestSignOpinion:
         mock_opinion.hivemind_id = None
 
         # Patch HivemindOpinion
-        with patch("app.HivemindOpinion", return_value=mock_opinion):
+        with patch("app.HivemindOpinion", aload=AsyncMock(return_value=mock_opinion)):
             # Create test data
             timestamp = int(time.time())
             opinion_hash = VALID_OPINION_CID
@@ -294,7 +294,7 @@ class TestSignOpinion:
         mock_opinion.hivemind_id = "test_hivemind_id"
 
         # Patch HivemindOpinion
-        with patch("app.HivemindOpinion", return_value=mock_opinion):
+        with patch("app.HivemindOpinion", aload=AsyncMock(return_value=mock_opinion)):
             # Create test data
             timestamp = int(time.time())
             opinion_hash = VALID_OPINION_CID
@@ -349,7 +349,7 @@ class TestSignOpinion:
         mock_state = MagicMock()
         mock_state.options = [VALID_OPTION1_CID, VALID_OPTION2_CID]
         mock_state.opinions = [[]]  # Empty list for each question
-        mock_state.save.return_value = VALID_STATE_CID
+        mock_state.asave = AsyncMock(return_value=VALID_STATE_CID)
         mock_state.calculate_results.return_value = {VALID_OPTION1_CID: {"score": 0.8}}
         # Set up the hivemind_issue method to return the mock issue
         mock_state.hivemind_issue.return_value = mock_issue
@@ -370,8 +370,8 @@ class TestSignOpinion:
         app.active_connections[opinion_hash] = [mock_websocket]
 
         # Patch HivemindOpinion and HivemindState
-        with patch("app.HivemindOpinion", return_value=mock_opinion):
-            with patch("app.HivemindState", return_value=mock_state):
+        with patch("app.HivemindOpinion", aload=AsyncMock(return_value=mock_opinion)):
+            with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                 # Create test data
                 timestamp = int(time.time())
                 message = f"{timestamp}{opinion_hash}"
@@ -430,7 +430,7 @@ class TestSignOpinion:
         mock_state = MagicMock()
         mock_state.options = [VALID_OPTION1_CID, VALID_OPTION2_CID]
         mock_state.opinions = [[]]  # Empty list for each question
-        mock_state.save.return_value = VALID_STATE_CID
+        mock_state.asave = AsyncMock(return_value=VALID_STATE_CID)
         mock_state.calculate_results.return_value = {VALID_OPTION1_CID: {"score": 0.8}}
         # Set up the hivemind_issue method to return the mock issue
         mock_state.hivemind_issue.return_value = mock_issue
@@ -459,8 +459,8 @@ class TestSignOpinion:
             return None
 
         # Patch HivemindOpinion, HivemindState, and update_state
-        with patch("app.HivemindOpinion", return_value=mock_opinion):
-            with patch("app.HivemindState", return_value=mock_state):
+        with patch("app.HivemindOpinion", aload=AsyncMock(return_value=mock_opinion)):
+            with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                 with patch("app.update_state", side_effect=mock_update_state):
                     # Create test data
                     timestamp = int(time.time())
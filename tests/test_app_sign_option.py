@@ -88,7 +88,7 @@ class TestSignOption:
         # Mock HivemindState
         mock_state = MagicMock()
         mock_state.option_cids = [VALID_OPTION_CID]
-        mock_state.save.return_value = VALID_STATE_CID
+        mock_state.asave = AsyncMock(return_value=VALID_STATE_CID)
         mock_state.add_option.return_value = None
 
         # Mock HivemindIssue
@@ -107,8 +107,8 @@ class TestSignOption:
             return None
 
         # Patch HivemindOption, HivemindState, and update_state
-        with patch("app.HivemindOption", return_value=mock_option):
-            with patch("app.HivemindState", return_value=mock_state):
+        with patch("app.HivemindOption", aload=AsyncMock(return_value=mock_option)):
+            with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                 with patch("app.update_state", side_effect=mock_update_state):
                     # Create test data
                     timestamp = int(time.time())
@@ -168,8 +168,8 @@ class TestSignOption:
         mock_state = MagicMock()
 
         # Patch HivemindOption and HivemindState
-        with patch("app.HivemindOption", return_value=mock_option):
-            with patch("app.HivemindState", return_value=mock_state):
+        with patch("app.HivemindOption", aload=AsyncMock(return_value=mock_option)):
+            with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                 # Create test data
                 timestamp = int(time.time())
                 option_hash = VALID_OPTION_CID
@@ -260,7 +260,7 @@ class TestSignOption:
         mock_option._answer_type = "String"
 
         # Patch HivemindOption
-        with patch("app.HivemindOption", return_value=mock_option):
+        with patch("app.HivemindOption", aload=AsyncMock(return_value=mock_option)):
             # Create test data
             timestamp = int(time.time())
             option_hash = VALID_OPTION_CID
@@ -300,7 +300,7 @@ class TestSignOption:
         mock_option._answer_type = "String"
 
         # Patch HivemindOption
-        with patch("app.HivemindOption", return_value=mock_option):
+        with patch("app.HivemindOption", aload=AsyncMock(return_value=mock_option)):
             # Create test data
             timestamp = int(time.time())
             option_hash = VALID_OPTION_CID
@@ -348,7 +348,7 @@ class TestSignOption:
         # Mock HivemindState
         mock_state = MagicMock()
         mock_state.option_cids = [VALID_OPTION_CID]
-        mock_state.save.return_value = VALID_STATE_CID
+        mock_state.asave = AsyncMock(return_value=VALID_STATE_CID)
         mock_state.add_option.return_value = None
 
         # Mock HivemindIssue
@@ -372,8 +372,8 @@ class TestSignOption:
             return None
 
         # Patch HivemindOption, HivemindState, and update_state
-        with patch("app.HivemindOption", return_value=mock_option):
-            with patch("app.HivemindState", return_value=mock_state):
+        with patch("app.HivemindOption", aload=AsyncMock(return_value=mock_option)):
+            with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                 with patch("app.update_state", side_effect=mock_update_state):
                     # Create test data
                     timestamp = int(time.time())
@@ -430,7 +430,7 @@ class TestSignOption:
         # Mock HivemindState
         mock_state = MagicMock()
         mock_state.option_cids = [VALID_OPTION_CID]
-        mock_state.save.return_value = VALID_STATE_CID
+        mock_state.asave = AsyncMock(return_value=VALID_STATE_CID)
         mock_state.add_option.return_value = None
 
         # Mock HivemindIssue
@@ -459,8 +459,8 @@ class TestSignOption:
             return None
 
         # Patch HivemindOption, HivemindState, and update_state
-        with patch("app.HivemindOption", return_value=mock_option):
-            with patch("app.HivemindState", return_value=mock_state):
+        with patch("app.HivemindOption", aload=AsyncMock(return_value=mock_option)):
+            with patch("app.HivemindState", aload=AsyncMock(return_value=mock_state)):
                 with patch("app.update_state", side_effect=mock_update_state):
                     # Create test data
                     timestamp = int(time.time())
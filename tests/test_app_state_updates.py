@@ -6,7 +6,7 @@ import pytest
 import tempfile
 import shutil
 from pathlib import Path
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, AsyncMock, MagicMock, mock_open
 from fastapi.testclient import TestClient
 
 # Add the project root to the Python path
@@ -104,7 +104,7 @@ class TestStateUpdateFunctionality:
         mock_opinion_instance.ranking = ["option1", "option2"]
 
         # Configure the mock classes to return our mock instances
-        mock_hivemind_state.return_value = mock_state_instance
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state_instance)
         mock_hivemind_issue.return_value = mock_issue_instance
         mock_hivemind_option.return_value = mock_option_instance
         mock_hivemind_opinion.return_value = mock_opinion_instance
@@ -201,7 +201,7 @@ class TestStateUpdateFunctionality:
         mock_opinion_instance.ranking = ["option1", "option2"]
 
         # Configure the mock classes to return our mock instances
-        mock_hivemind_state.return_value = mock_state_instance
+        mock_hivemind_state.aload = AsyncMock(return_value=mock_state_instance)
         mock_hivemind_issue.return_value = mock_issue_instance
         mock_hivemind_option.return_value = mock_option_instance
         mock_hivemind_opinion.return_value = mock_opinion_instance
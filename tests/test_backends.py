@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+from typing import Generator
+
+import pytest
+from bitcoin.base58 import encode as b58encode
+
+from hivemind import HivemindIssue, HivemindState, storage
+from hivemind.backends import (CHUNK_SIZE, FileSystemBackend, MemoryBackend, _dag_node, _unixfs_file, compute_cid,
+                               create_backend, valid_cid)
+from hivemind.storage import IPFSError
+from hivemind.transport import KuboTransport
+
+
+@pytest.fixture
+def memory_backend(monkeypatch: pytest.MonkeyPatch) -> Generator[MemoryBackend, None, None]:
+    """Route all storage access to a MemoryBackend."""
+    backend = MemoryBackend()
+    monkeypatch.setattr(storage, '_transport', backend)
+    storage.cache.clear()
+    yield backend
+    storage.cache.clear()
+
+
+@pytest.mark.unit
+class TestComputeCID:
+    """Tests for computing CIDs locally."""
+
+    @pytest.mark.parametrize('content,cid', [
+        (b'hello world\n', 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o'),
+        (b'', 'QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH'),
+    ])
+    def test_same_cid_as_ipfs_add(self, content: bytes, cid: str) -> None:
+        """Test that the CID matches the one of 'ipfs add'."""
+        assert compute_cid(content) == cid
+
+    def test_large_content(self) -> None:
+        """Test that content larger than one chunk gets a different, valid CID."""
+        content = os.urandom(CHUNK_SIZE) + b'x'
+        cid = compute_cid(content)
+        assert valid_cid(cid)
+        assert cid != compute_cid(content[:CHUNK_SIZE])
+        assert cid == compute_cid(content)
+
+    def test_later_leaves_are_raw(self) -> None:
+        """Test that only the first leaf of a multi-chunk file is a File node and the later leaves are Raw nodes."""
+        chunks = [b'a' * CHUNK_SIZE, b'b' * CHUNK_SIZE, b'c']
+        leaves = []
+        for i, chunk in enumerate(chunks):
+            data = _unixfs_file(data=chunk, filesize=len(chunk), blocksizes=[], raw=i > 0)
+            assert data[:2] == (b'\x08\x00' if i > 0 else b'\x08\x02')
+            multihash, block = _dag_node(links=[], data=data)
+            leaves.append((multihash, len(block), len(chunk)))
+
+        sizes = [size for _, _, size in leaves]
+        root, _ = _dag_node(links=[(multihash, tsize) for multihash, tsize, _ in leaves],
+                            data=_unixfs_file(data=b'', filesize=sum(sizes), blocksizes=sizes))
+        assert compute_cid(b''.join(chunks)) == b58encode(root)
+
+    @pytest.mark.skipif(shutil.which('ipfs') is None, reason='ipfs is not installed')
+    def test_multi_chunk_same_cid_as_ipfs_add(self, tmp_path) -> None:
+        """Test that the CID of a multi-chunk file matches the one of 'ipfs add'."""
+        content = bytes(range(256)) * (3 * CHUNK_SIZE // 256) + b'tail'
+        path = tmp_path / 'content'
+        path.write_bytes(content)
+        result = subprocess.run(['ipfs', 'add', '--only-hash', '--quiet', '--cid-version=0', str(path)],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            pytest.skip('ipfs add failed: %s' % result.stderr.strip())
+
+        assert compute_cid(content) == result.stdout.strip()
+
+    @pytest.mark.parametrize('cid,expected', [
+        ('QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o', True),
+        ('QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5', False),
+        ('../../etc/passwd', False),
+        ('', False),
+    ])
+    def test_valid_cid(self, cid: str, expected: bool) -> None:
+        """Test recognizing CIDs that a local backend can have stored."""
+        assert valid_cid(cid) is expected
+
+
+@pytest.mark.unit
+class TestMemoryBackend:
+    """Tests for the MemoryBackend class."""
+
+    @pytest.mark.asyncio
+    async def test_add_and_cat(self) -> None:
+        """Test storing and retrieving content."""
+        backend = MemoryBackend()
+        cid = await backend.add(b'hello world\n')
+
+        assert cid == 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o'
+        assert await backend.cat(cid) == b'hello world\n'
+        assert len(backend) == 1
+        assert backend.stats() == {'requests': 2, 'reads': 1, 'writes': 1, 'errors': 0}
+
+    @pytest.mark.asyncio
+    async def test_missing_cid(self) -> None:
+        """Test that retrieving an unknown CID raises an IPFSError."""
+        backend = MemoryBackend()
+        with pytest.raises(IPFSError, match='block not found'):
+            await backend.cat('QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o')
+        assert backend.stats()['errors'] == 1
+
+
+@pytest.mark.unit
+class TestFileSystemBackend:
+    """Tests for the FileSystemBackend class."""
+
+    @pytest.mark.asyncio
+    async def test_add_and_cat(self, tmp_path) -> None:
+        """Test that content is stored in a file and can be read by another backend instance."""
+        cid = await FileSystemBackend(directory=str(tmp_path)).add(b'hello world\n')
+
+        assert cid == 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o'
+        assert os.path.isfile(tmp_path / cid[-2:] / cid)
+        assert await FileSystemBackend(directory=str(tmp_path)).cat(cid) == b'hello world\n'
+
+    @pytest.mark.asyncio
+    async def test_concurrent_adds(self, tmp_path) -> None:
+        """Test adding the same content concurrently."""
+        backend = FileSystemBackend(directory=str(tmp_path))
+        cids = await asyncio.gather(*[backend.add(b'{"a": 1}') for _ in range(10)])
+
+        assert len(set(cids)) == 1
+        assert os.listdir(tmp_path / cids[0][-2:]) == [cids[0]]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('cid', ['QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o', '../secret'])
+    async def test_missing_or_invalid_cid(self, tmp_path, cid: str) -> None:
+        """Test that retrieving an unknown or invalid CID raises an IPFSError."""
+        backend = FileSystemBackend(directory=str(tmp_path))
+        with pytest.raises(IPFSError):
+            await backend.cat(cid)
+        assert backend.stats()['errors'] == 1
+
+
+@pytest.mark.unit
+class TestCreateBackend:
+    """Tests for the create_backend function."""
+
+    def test_create_backend(self, tmp_path) -> None:
+        """Test creating each backend by name."""
+        assert isinstance(create_backend('ipfs'), KuboTransport)
+        assert isinstance(create_backend('memory'), MemoryBackend)
+        assert create_backend('filesystem', directory=str(tmp_path)).directory == str(tmp_path)
+
+    def test_invalid_backend(self) -> None:
+        """Test that an unknown name or a missing directory raises an exception."""
+        with pytest.raises(Exception, match='Unknown storage backend'):
+            create_backend('s3')
+        with pytest.raises(Exception, match='needs a directory'):
+            create_backend('filesystem')
+
+
+@pytest.mark.unit
+class TestStorageWithBackend:
+    """Tests for hivemind objects stored in a local backend."""
+
+    def test_same_cid_as_storage(self, memory_backend: MemoryBackend) -> None:
+        """Test that the CID of saved data is the CID of its JSON encoding."""
+        cid = storage.add_json({'name': 'test'})
+        assert cid == compute_cid(json.dumps({'name': 'test'}).encode())
+        assert memory_backend.data[cid] == b'{"name": "test"}'
+
+    def test_state_history(self, memory_backend: MemoryBackend) -> None:
+        """Test reading the previous states of a state chain."""
+        issue = HivemindIssue()
+        issue.name = 'Backend Issue'
+        issue.add_question('Which backend?')
+        issue.answer_type = 'String'
+        issue_hash = issue.save()
+
+        state = HivemindState()
+        first_hash = state.save()
+        state.set_hivemind_issue(issue_cid=issue_hash)
+        second_hash = state.save()
+
+        storage.cache.clear()
+        loaded = HivemindState(cid=second_hash)
+        assert loaded.hivemind_id == issue_hash
+        assert loaded.get_previous_cids() == [first_hash]
+        assert [previous['hivemind_id'] for previous in loaded.get_previous_states()] == [None]
+
+        loaded.final = True
+        assert loaded.changes()['final'] == {'old': False, 'new': True}
+        assert loaded.changes()['hivemind_id'] == {'old': None, 'new': issue_hash}
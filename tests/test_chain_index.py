@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+from pathlib import Path
+
+import pytest
+
+from hivemind import HivemindState
+from hivemind.chain_index import ChainIndex
+from tests.conftest import FakeIPFS
+
+HIVEMIND_ID = 'QmHivemindIssue'
+
+
+@pytest.mark.unit
+class TestChainIndex:
+    """Tests for the ChainIndex class."""
+
+    def test_record_and_query(self, tmp_path: Path) -> None:
+        """Test recording states and querying them by CID and time range."""
+        index = ChainIndex(directory=tmp_path)
+        for sequence in range(5):
+            link = {'previous_cid': '/ipfs/QmState%s' % (sequence - 1) if sequence else None, 'sequence': sequence, 'timestamp': 100 + 10 * sequence}
+            index.record(HIVEMIND_ID, 'QmState%s' % sequence, operation='add_opinion', address='addr%s' % sequence, link=link)
+
+        assert index.get(HIVEMIND_ID, '/ipfs/QmState2') == {'cid': 'QmState2', 'previous_cid': 'QmState1', 'sequence': 2, 'timestamp': 120,
+                                                            'operation': 'add_opinion', 'address': 'addr2'}
+        assert index.get(HIVEMIND_ID, 'QmUnknown') is None
+        assert [entry['cid'] for entry in index.history(HIVEMIND_ID, start=110, end=130)] == ['QmState1', 'QmState2', 'QmState3']
+        assert [entry['sequence'] for entry in index.history(HIVEMIND_ID, start=125)] == [3, 4]
+        assert len(index.history(HIVEMIND_ID)) == 5
+        assert index.history('QmOther') == []
+        assert index.hivemind_ids() == [HIVEMIND_ID]
+
+    def test_unknown_hivemind_is_not_cached(self, tmp_path: Path) -> None:
+        """Test that querying hiveminds without an index file does not grow the cache."""
+        index = ChainIndex(directory=tmp_path)
+        assert index.history('QmOther') == []
+        assert index.get('QmOther', 'QmState0') is None
+        assert index._entries == {} and index._by_cid == {}
+
+        index.record('QmOther', 'QmState0', link={'previous_cid': None, 'sequence': 0, 'timestamp': 100})
+        assert [entry['cid'] for entry in index.history('QmOther')] == ['QmState0']
+        assert list(index._entries) == ['QmOther']
+
+    def test_history_out_of_timestamp_order(self, tmp_path: Path) -> None:
+        """Test that the time range keeps states that were recorded out of timestamp order."""
+        index = ChainIndex(directory=tmp_path)
+        for sequence, timestamp in enumerate([100, 130, 110, 140, 120]):
+            index.record(HIVEMIND_ID, 'QmState%s' % sequence, link={'previous_cid': None, 'sequence': sequence, 'timestamp': timestamp})
+
+        assert [entry['cid'] for entry in index.history(HIVEMIND_ID, start=110, end=125)] == ['QmState2', 'QmState4']
+
+    def test_append_only_file(self, tmp_path: Path) -> None:
+        """Test that each state is appended once and that the file is read back by a new index."""
+        index = ChainIndex(directory=tmp_path)
+        link = {'previous_cid': None, 'sequence': 0, 'timestamp': 100}
+        index.record(HIVEMIND_ID, 'QmState0', operation='create_issue', link=link)
+        index.record(HIVEMIND_ID, 'QmState0', operation='create_issue', link=link)
+
+        path = tmp_path / ('%s.jsonl' % HIVEMIND_ID)
+        with open(path, 'a') as f:
+            f.write('not json\n')
+        assert len(path.read_text().splitlines()) == 2
+
+        assert ChainIndex(directory=tmp_path).history(HIVEMIND_ID) == [json.loads(path.read_text().splitlines()[0])]
+
+    def test_record_saved_state(self, tmp_path: Path, fake_ipfs: FakeIPFS) -> None:
+        """Test that the chain keys of a saved state are read from the state or from IPFS."""
+        state = HivemindState()
+        first = state.save()
+        second = state.save()
+
+        index = ChainIndex(directory=tmp_path)
+        assert index.record(HIVEMIND_ID, first, operation='create_issue')['sequence'] == 0
+        entry = index.record(HIVEMIND_ID, second, operation='add_option', link=state)
+        assert entry['sequence'] == 1 and entry['previous_cid'] == first
+        assert entry['timestamp'] == state.timestamp
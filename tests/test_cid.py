@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import copy
+import json
+import pickle
+
+import pytest
+
+from hivemind import CID, HivemindOption, storage
+from hivemind.cid import clear_interned
+from tests.conftest import FakeIPFS
+
+HASH = 'QmXhyyMDuvnwMmbJrQpYHGKfmHeVPTGqZgGTYTymDAxHBr'
+
+
+@pytest.mark.unit
+class TestCID:
+    """Tests for the CID class."""
+
+    def test_normalize(self) -> None:
+        """Test that both spellings of a CID give the same interned CID."""
+        cid = CID(HASH)
+        assert cid == HASH
+        assert type(cid) is CID
+        assert CID('/ipfs/%s' % HASH) is cid
+        assert CID(cid) is cid
+        assert CID(''.join(HASH)) is cid
+        assert cid.path == '/ipfs/%s' % HASH
+
+    def test_behaves_like_str(self) -> None:
+        """Test that a CID can be used wherever a plain CID string is used."""
+        cid = CID('/ipfs/%s' % HASH)
+        assert {HASH: 1}[cid] == 1
+        assert {cid: 1}[HASH] == 1
+        assert json.dumps({'cid': cid, 'list': [cid]}) == json.dumps({'cid': HASH, 'list': [HASH]})
+        assert repr(cid) == repr(HASH)
+
+    def test_copy_and_pickle(self) -> None:
+        """Test that copies of a CID are the interned CID."""
+        cid = CID(HASH)
+        assert copy.deepcopy(cid) is cid
+        assert pickle.loads(pickle.dumps(cid)) is cid
+
+    def test_clear_interned(self) -> None:
+        """Test that CIDs stay equal when the interned CIDs are forgotten."""
+        cid = CID(HASH)
+        clear_interned()
+        assert CID(HASH) == cid
+        assert CID(HASH) is CID('/ipfs/%s' % HASH)
+
+    def test_invalid(self) -> None:
+        """Test that a CID must be a string."""
+        with pytest.raises(Exception, match='CID must be a string'):
+            CID(None)  # type: ignore
+
+
+@pytest.mark.unit
+class TestCanonicalCIDs:
+    """Tests for the use of canonical CIDs in the hivemind package."""
+
+    def test_storage_returns_cids(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that stored data and loaded objects use the interned CIDs."""
+        cid = storage.add_json({'value': 1})
+        assert type(cid) is CID
+        assert storage.normalize_cid('/ipfs/%s' % cid) is cid
+        assert all(type(cid) is CID for cid in storage.put_many([{'value': 2}, {'value': 3}]))
+
+    def test_loaded_object(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that loaded objects keep the '/ipfs/' prefix in their cid and have a canonical repr."""
+        option = HivemindOption()
+        option.value = 'blue'
+        cid = option.save()
+
+        loaded = HivemindOption(cid=cid)
+        assert loaded.cid() == '/ipfs/%s' % cid
+        assert repr(loaded) is cid
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import copy
+import time
+from typing import Any, List
+
+import pytest
+
+from hivemind import HivemindIssue, HivemindOption, HivemindState, storage
+from hivemind.delta import apply_delta, make_delta
+from hivemind.storage import CHAIN_KEYS
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+from tests.conftest import FakeIPFS
+
+
+@pytest.mark.unit
+class TestDelta:
+    """Tests for the make_delta and apply_delta functions."""
+
+    @pytest.mark.parametrize('old, new', [
+        ({'a': 1, 'b': [1, 2]}, {'a': 1, 'b': [1, 2, 3]}),
+        ({'a': {'x': 1, 'y': 2}}, {'a': {'x': 1}, 'c': None}),
+        ({'a': [{'x': 1}, {'y': 2}]}, {'a': [{'x': 1}, {'y': 3}, {'z': 4}]}),
+        ({'a': [1, 2, 3]}, {'a': [1]}),
+        ({'a': 1}, {'a': 1.5}),
+        ({'a': {}}, {'a': []}),
+        ({'a': True}, {'a': 1}),
+        ([1, 2], {'a': 1}),
+    ])
+    def test_round_trip(self, old: Any, new: Any) -> None:
+        """Test that applying the delta of two values to the old value gives the new value."""
+        delta = make_delta(old, new)
+        result = apply_delta(copy.deepcopy(old), delta)
+        assert result == new
+        assert type(result) is type(new)
+
+    def test_equal_values(self) -> None:
+        """Test that equal values have no delta."""
+        assert make_delta({'a': [1, {'b': 2}]}, {'a': [1, {'b': 2}]}) is None
+
+    def test_delta_only_contains_changes(self) -> None:
+        """Test that a delta only contains the changed parts of a value."""
+        old = {'options': ['QmA', 'QmB'], 'signatures': {'addr1': {'QmA': {'1': 'sig'}}}, 'final': False}
+        new = copy.deepcopy(old)
+        new['options'].append('QmC')
+        new['signatures']['addr1']['QmC'] = {'2': 'sig'}
+
+        assert make_delta(old, new) == {'keys': {
+            'options': {'append': ['QmC']},
+            'signatures': {'keys': {'addr1': {'keys': {'QmC': {'value': {'2': 'sig'}}}}}},
+        }}
+
+    def test_invalid_delta(self) -> None:
+        """Test that a delta that does not fit the value is rejected."""
+        with pytest.raises(Exception, match='no key b'):
+            apply_delta({'a': 1}, {'keys': {'b': {'keys': {}}}})
+        with pytest.raises(Exception, match='no item 3'):
+            apply_delta([1], {'items': {'3': {'value': 2}}})
+        with pytest.raises(Exception, match='expected a list'):
+            apply_delta({'a': 1}, {'append': [2]})
+
+
+@pytest.mark.unit
+class TestDeltaChain:
+    """Tests for states that are stored as deltas with periodic checkpoints."""
+
+    @pytest.fixture
+    def state(self, fake_ipfs: FakeIPFS) -> HivemindState:
+        """Create a saved state for a basic issue."""
+        issue = HivemindIssue()
+        issue.name = 'Delta Issue'
+        issue.add_question('What is the best value?')
+        issue.answer_type = 'String'
+        state = HivemindState()
+        state.set_hivemind_issue(issue.save())
+        state.save()
+        return state
+
+    def add_options(self, state: HivemindState, count: int) -> List[str]:
+        """Add options to a state, saving the state after each option."""
+        cids = []
+        for i in range(count):
+            option = HivemindOption()
+            option.set_issue(state.hivemind_id)
+            option.set(value='value %s %s' % (len(state.option_cids), i))
+            option_hash = option.save()
+            private_key, address = generate_bitcoin_keypair()
+            timestamp = int(time.time())
+            state.add_option(timestamp, option_hash, address, sign_message('%s%s' % (timestamp, option_hash), private_key))
+            cids.append(state.save())
+        return cids
+
+    def test_states_are_stored_as_deltas(self, state: HivemindState, fake_ipfs: FakeIPFS) -> None:
+        """Test that a checkpoint is stored every checkpoint_interval states and deltas in between."""
+        cids = self.add_options(state, HivemindState.checkpoint_interval + 1)
+
+        depths = [fake_ipfs.get_json(cid).get('delta_depth', 0) for cid in cids]
+        assert depths == list(range(1, HivemindState.checkpoint_interval)) + [0, 1]
+
+        full = fake_ipfs.get_json(cids[-2])
+        delta = fake_ipfs.get_json(cids[-3])
+        assert 'option_cids' in full and 'delta' not in full
+        assert set(delta) == {'delta_depth', 'delta'} | set(CHAIN_KEYS)
+        assert len(fake_ipfs.data[cids[-3]]) < len(fake_ipfs.data[cids[-2]])
+
+    @pytest.mark.parametrize('position', [1, 5, 14, 15, 16])
+    def test_load_rebuilds_state(self, state: HivemindState, position: int) -> None:
+        """Test that loading a state stored as a delta gives the same data as the saved state."""
+        cids = self.add_options(state, HivemindState.checkpoint_interval + 1)
+        storage.cache.clear()
+
+        loaded = HivemindState(cid=cids[position])
+        assert loaded.option_cids == state.option_cids[:position + 1]
+        assert loaded.previous_cid == cids[position - 1]
+        assert len(loaded.signatures) == position + 1
+        assert 'delta' not in loaded and 'delta_depth' not in loaded
+
+    def test_save_after_load(self, state: HivemindState, fake_ipfs: FakeIPFS) -> None:
+        """Test that a loaded state continues the chain of deltas."""
+        cids = self.add_options(state, 2)
+        loaded = HivemindState(cid=cids[-1])
+        cid = self.add_options(loaded, 1)[0]
+
+        data = fake_ipfs.get_json(cid)
+        assert data['delta_depth'] == fake_ipfs.get_json(cids[-1])['delta_depth'] + 1
+        assert HivemindState(cid=cid).option_cids == loaded.option_cids
+
+    def test_previous_states(self, state: HivemindState) -> None:
+        """Test that the history of a state contains the full data of each state."""
+        self.add_options(state, 3)
+
+        previous = state.get_previous_states()
+        assert [len(data['option_cids']) for data in previous[:3]] == [2, 1, 0]
+        assert all('delta' not in data for data in previous)
+        assert set(state.changes()) == {'option_cids', 'signatures'}
+
+    def test_checkpoint_interval_one(self, state: HivemindState, fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that every state is stored in full with a checkpoint interval of 1."""
+        monkeypatch.setattr(HivemindState, 'checkpoint_interval', 1)
+        cids = self.add_options(state, 2)
+        assert all('delta' not in fake_ipfs.get_json(cid) for cid in cids)
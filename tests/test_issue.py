@@ -346,11 +346,16 @@ class TestHivemindIssue:
         hivemind_issue.name = "Test"
         hivemind_issue.add_question("Question?")
 
-        # Test valid addresses list
-        restrictions = {"addresses": ["addr1", "addr2"]}
+        # Test valid addresses list, with a weight and a testnet address
+        restrictions = {"addresses": ["1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa@2.5", "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4",
+                                      "mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn"]}
         hivemind_issue.set_restrictions(restrictions)
         assert hivemind_issue.restrictions == restrictions
 
+        # Test invalid addresses
+        with pytest.raises(Exception, match='addr2 in restrictions is not a valid Bitcoin address'):
+            hivemind_issue.set_restrictions({"addresses": ["1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", "addr2"]})
+
         # Test invalid address type
         with pytest.raises(Exception):
             hivemind_issue.set_restrictions({"addresses": [123, 456]})
@@ -420,3 +425,25 @@ class TestHivemindIssue:
         # Then set to None
         issue.set_constraints(None)
         assert issue.constraints is None
+
+    def test_address_weights(self, issue: HivemindIssue) -> None:
+        """Test the map of restricted addresses to their weights"""
+        assert issue.address_weights() is None
+
+        issue.restrictions = {'options_per_address': 3}
+        assert issue.address_weights() is None
+
+        issue.restrictions = {'addresses': ['addr1@2.5', 'addr2', 'addr3@invalid', 'addr4@-1', 'addr1@4']}
+        assert issue.address_weights() == {'addr1': 2.5, 'addr2': 1.0, 'addr3': 1.0, 'addr4': 1.0}
+
+    def test_address_weights_rebuilt(self, issue: HivemindIssue) -> None:
+        """Test that the address weights are cached and rebuilt when the addresses change"""
+        issue.restrictions = {'addresses': ['addr1@2']}
+        weights = issue.address_weights()
+        assert issue.address_weights() is weights
+
+        issue.restrictions['addresses'].append('addr2@3')
+        assert issue.address_weights() == {'addr1': 2.0, 'addr2': 3.0}
+
+        issue.restrictions = {'addresses': ['addr3']}
+        assert issue.address_weights() == {'addr3': 1.0}
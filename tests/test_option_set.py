@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+from typing import Any, List
+
+import pytest
+
+from hivemind import HivemindIssue, HivemindOpinion, HivemindOption, HivemindState
+from hivemind.option_set import OptionSet, ParticipantOptions, canonical_value
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+from tests.conftest import FakeIPFS
+
+
+def make_option(cid: str, value: Any) -> HivemindOption:
+    """Create an option with a CID without storing it."""
+    option = HivemindOption()
+    option.value = value
+    option._cid = '/ipfs/%s' % cid
+    return option
+
+
+@pytest.mark.unit
+class TestCanonicalValue:
+    """Tests for the canonical_value function."""
+
+    @pytest.mark.parametrize('a, b', [
+        ({'a': 1, 'b': [1, 2]}, {'b': [1, 2], 'a': 1}),
+        ({'a': {'x': 1, 'y': 2}}, {'a': {'y': 2, 'x': 1}}),
+        (1, 1.0),
+        ('text', 'text'),
+    ])
+    def test_equal_values(self, a: Any, b: Any) -> None:
+        """Test that equal values get the same key."""
+        assert canonical_value(a) == canonical_value(b)
+        assert hash(canonical_value(a)) == hash(canonical_value(b))
+
+    @pytest.mark.parametrize('a, b', [
+        ({'a': 1}, {'a': 2}),
+        ({'a': 1}, [('a', 1)]),
+        ([1, 2], [2, 1]),
+        ({'a': 1}, "('dict', (('a', 1),))"),
+    ])
+    def test_different_values(self, a: Any, b: Any) -> None:
+        """Test that different values get different keys."""
+        assert canonical_value(a) != canonical_value(b)
+
+
+@pytest.mark.unit
+class TestOptionSet:
+    """Tests for the OptionSet class."""
+
+    def test_lookups(self) -> None:
+        """Test looking up options by CID and value."""
+        options = [make_option('QmA', {'x': 1, 'y': 2}), make_option('QmB', 5)]
+        option_set = OptionSet(['QmA', '/ipfs/QmB'], options)
+
+        assert option_set.contains('/ipfs/QmA')
+        assert option_set.contains('QmB')
+        assert not option_set.contains('QmC')
+        assert option_set.get('QmB') is options[1]
+        assert option_set.find_value({'y': 2, 'x': 1}) == 'QmA'
+        assert option_set.find_value(5.0) == 'QmB'
+        assert option_set.find_value(6) is None
+
+    def test_missing(self) -> None:
+        """Test finding the CIDs that are not in the set."""
+        option_set = OptionSet(['QmA', '/ipfs/QmB'], [])
+
+        assert option_set.missing(['/ipfs/QmB', 'QmA']) == []
+        assert option_set.missing(['QmA', '/ipfs/QmC', 'QmD']) == ['QmC', 'QmD']
+        assert set(option_set.cids()) == {'QmA', 'QmB'}
+
+    def test_add(self) -> None:
+        """Test that an added option keeps the set current."""
+        option_cids: List[str] = ['QmA']
+        options = [make_option('QmA', 1)]
+        option_set = OptionSet(option_cids, options)
+
+        option = make_option('QmB', 2)
+        option_cids.append('QmB')
+        options.append(option)
+        assert not option_set.is_current(option_cids, options)
+
+        option_set.add('QmB', option)
+        assert option_set.is_current(option_cids, options)
+        assert option_set.find_value(2) == 'QmB'
+        assert not option_set.is_current(list(option_cids), options)
+
+    def test_unloaded_options_are_loaded_for_values(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that the values of options that are not loaded are loaded once."""
+        cid = fake_ipfs.add_json({'value': 'stored', 'text': '', 'hivemind_id': None})
+        option_set = OptionSet([cid], [])
+
+        assert option_set.contains(cid)
+        assert option_set.get(cid) is None
+        assert option_set.find_value('stored') == cid
+        fetched = len(fake_ipfs.fetched)
+        assert option_set.find_value('other') is None
+        assert len(fake_ipfs.fetched) == fetched
+
+
+@pytest.mark.unit
+class TestParticipantOptions:
+    """Tests for the ParticipantOptions class."""
+
+    def test_build(self) -> None:
+        """Test that the options are listed in the order of the options of the state."""
+        signatures = {'addr1': {'QmB': {}, 'QmOpinion': {}, 'QmA': {}}, 'addr2': {'QmC': {}}}
+        index = ParticipantOptions(['QmA', 'QmB', 'QmC'], signatures)
+
+        assert index.options('addr1') == ['QmA', 'QmB']
+        assert index.count('addr2') == 1
+        assert index.options('addr3') == []
+
+    def test_add_signature_and_option(self) -> None:
+        """Test that signatures and options that are added keep the index up to date."""
+        option_cids = ['QmA', 'QmB']
+        signatures = {'addr1': {'QmB': {}}}
+        index = ParticipantOptions(option_cids, signatures)
+
+        # A signature of an option that is added afterwards, like in add_option
+        index.add_signature('addr1', 'QmC')
+        signatures['addr1']['QmC'] = {}
+        assert index.options('addr1') == ['QmB']
+        option_cids.append('QmC')
+        assert not index.is_current(option_cids, signatures)
+        index.add_option('QmC')
+        assert index.is_current(option_cids, signatures)
+        assert index.options('addr1') == ['QmB', 'QmC']
+
+        # A signature of an existing option is inserted in the order of the options
+        index.add_signature('addr1', 'QmA')
+        assert index.options('addr1') == ['QmA', 'QmB', 'QmC']
+
+    def test_options_returns_copy(self) -> None:
+        """Test that the returned list can be changed without changing the index."""
+        index = ParticipantOptions(['QmA'], {'addr1': {'QmA': {}}})
+        index.options('addr1').append('QmB')
+        assert index.options('addr1') == ['QmA']
+
+
+@pytest.mark.unit
+class TestStateDuplicateOptions:
+    """Tests for the duplicate checks of HivemindState.add_option."""
+
+    @pytest.fixture
+    def complex_state(self, fake_ipfs: FakeIPFS) -> HivemindState:
+        """Create a state for an issue with Complex options."""
+        issue = HivemindIssue()
+        issue.name = 'Complex Issue'
+        issue.add_question('What is the best point?')
+        issue.answer_type = 'Complex'
+        issue.set_constraints({'specs': {'x': 'Integer', 'y': 'Integer'}})
+        state = HivemindState()
+        state.set_hivemind_issue(issue.save())
+        return state
+
+    def add_option(self, state: HivemindState, value: Any, text: str = '') -> str:
+        """Create, save and add an option."""
+        option = HivemindOption()
+        option.set_issue(state.hivemind_id)
+        option.set(value=value)
+        option.text = text
+        option_hash = option.save()
+        private_key, address = generate_bitcoin_keypair()
+        timestamp = int(time.time())
+        state.add_option(timestamp, option_hash, address, sign_message('%s%s' % (timestamp, option_hash), private_key))
+        return option_hash
+
+    def test_duplicate_cid(self, complex_state: HivemindState) -> None:
+        """Test that the same option can not be added twice."""
+        option_hash = self.add_option(complex_state, {'x': 1, 'y': 2})
+        with pytest.raises(Exception, match='Option already exists'):
+            self.add_option(complex_state, {'x': 1, 'y': 2})
+        assert complex_state.option_cids == [option_hash]
+
+    def test_duplicate_complex_value(self, complex_state: HivemindState) -> None:
+        """Test that a Complex value with the keys in another order is a duplicate."""
+        self.add_option(complex_state, {'x': 1, 'y': 2}, text='first')
+        with pytest.raises(Exception, match='already exists with different text'):
+            self.add_option(complex_state, {'y': 2, 'x': 1}, text='second')
+
+        self.add_option(complex_state, {'x': 2, 'y': 1})
+        assert len(complex_state.option_cids) == 2
+
+    def test_options_set_directly(self, complex_state: HivemindState) -> None:
+        """Test that the duplicate checks see option lists that were replaced."""
+        option_hash = self.add_option(complex_state, {'x': 1, 'y': 2}, text='first')
+        complex_state.option_cids = []
+        complex_state._options = []
+        assert self.add_option(complex_state, {'x': 1, 'y': 2}, text='first') == option_hash
+
+    def test_opinion_with_unknown_option(self, complex_state: HivemindState) -> None:
+        """Test that an opinion is only accepted if all options in its ranking exist in the state."""
+        option_hash = self.add_option(complex_state, {'x': 1, 'y': 2})
+        private_key, address = generate_bitcoin_keypair()
+        timestamp = int(time.time())
+
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = complex_state.hivemind_id
+        opinion.set_question_index(0)
+        opinion.ranking.set_fixed([option_hash, 'QmUnknownOption'])
+        opinion_hash = opinion.save()
+        with pytest.raises(Exception, match='QmUnknownOption'):
+            complex_state.add_opinion(timestamp, opinion_hash, address, sign_message('%s%s' % (timestamp, opinion_hash), private_key))
+
+        opinion.ranking.set_fixed(['/ipfs/%s' % option_hash.replace('/ipfs/', '')])
+        opinion_hash = opinion.save()
+        complex_state.add_opinion(timestamp, opinion_hash, address, sign_message('%s%s' % (timestamp, opinion_hash), private_key))
+        assert complex_state.opinion_cids[0][address]['opinion_cid'] == opinion_hash
+
+    def test_options_by_participant(self, complex_state: HivemindState) -> None:
+        """Test that the options of a participant are tracked while options are added."""
+        private_key, address = generate_bitcoin_keypair()
+        option_hashes = []
+        for x in range(3):
+            option = HivemindOption()
+            option.set_issue(complex_state.hivemind_id)
+            option.set(value={'x': x, 'y': 0})
+            option_hash = option.save()
+            timestamp = int(time.time())
+            complex_state.add_option(timestamp, option_hash, address, sign_message('%s%s' % (timestamp, option_hash), private_key))
+            option_hashes.append(option_hash)
+            self.add_option(complex_state, {'x': x, 'y': 1})
+
+        assert complex_state.options_by_participant(address) == option_hashes
+
+        complex_state.signatures = {address: {option_hashes[1]: {}}}
+        assert complex_state.options_by_participant(address) == [option_hashes[1]]
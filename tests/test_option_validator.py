@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import re
+from typing import Any, Generator
+
+import pytest
+
+from hivemind import HivemindIssue
+from hivemind import option_validator
+from hivemind.option_validator import OptionValidator, clear_validators, compile_validator, is_valid_ipfs_hash
+
+
+@pytest.fixture(autouse=True)
+def empty_cache() -> Generator[None, None, None]:
+    """Start every test with an empty validator cache."""
+    clear_validators()
+    yield
+    clear_validators()
+
+
+def make_issue(answer_type: str, constraints: Any, cid: str | None = 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o') -> HivemindIssue:
+    """Create an issue with a CID without storing it."""
+    issue = HivemindIssue()
+    issue.answer_type = answer_type
+    issue.constraints = constraints
+    if cid is not None:
+        issue._cid = '/ipfs/%s' % cid
+    return issue
+
+
+@pytest.mark.unit
+class TestCompileValidator:
+    """Tests for compiling and caching validators."""
+
+    def test_validator_is_cached_per_cid(self) -> None:
+        """Test that issues with the same CID share a compiled validator."""
+        validator = compile_validator(make_issue('String', {'regex': '^[a-z]+$'}))
+
+        assert compile_validator(make_issue('String', {'regex': '^[a-z]+$'})) is validator
+        assert compile_validator(make_issue('String', {'regex': '^[a-z]+$'}, cid='QmOther')) is not validator
+
+    def test_changed_issue_is_recompiled(self) -> None:
+        """Test that an issue that is changed in memory after it got its CID gets a new validator."""
+        issue = make_issue('String', {'choices': [{'value': 'a'}]})
+        validator = compile_validator(issue)
+        assert validator('a')
+
+        issue.constraints['choices'].append({'value': 'b'})
+        changed = compile_validator(issue)
+        assert changed is not validator
+        assert changed('b')
+        with pytest.raises(Exception):
+            validator('b')
+
+        issue.answer_type = 'Integer'
+        issue.constraints = None
+        assert compile_validator(issue)(1)
+
+    def test_unsaved_issue_is_not_cached(self) -> None:
+        """Test that the validator of an issue without CID is not cached."""
+        compile_validator(make_issue('String', None, cid=None))
+        assert len(option_validator._validators) == 0
+
+    def test_cache_is_bounded(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the least recently used validators are evicted."""
+        monkeypatch.setattr(option_validator, 'MAX_VALIDATORS', 2)
+        for cid in ['QmA', 'QmB', 'QmC']:
+            compile_validator(make_issue('String', None, cid=cid))
+
+        assert [key[0] for key in option_validator._validators] == ['QmB', 'QmC']
+
+
+@pytest.mark.unit
+class TestOptionValidator:
+    """Tests for the OptionValidator class."""
+
+    def test_choices(self) -> None:
+        """Test that values are checked against the hashed set of choices."""
+        validator = OptionValidator('Complex', {'choices': [{'value': 1}, {'value': 'a'}, {'value': {'x': 1}}, {'text': 'no value'}]})
+
+        assert validator.is_valid_choice(1)
+        assert validator.is_valid_choice(1.0)
+        assert validator.is_valid_choice({'x': 1})
+        assert validator.is_valid_choice(None)
+        assert not validator.is_valid_choice('b')
+        with pytest.raises(Exception, match='not in the allowed choices'):
+            validator('b')
+
+    def test_string_constraints(self) -> None:
+        """Test the length and regex constraints of string options."""
+        validator = OptionValidator('String', {'min_length': 2, 'max_length': 4, 'regex': '^[a-z]+$'})
+
+        assert validator('abc')
+        assert not validator('a')
+        assert not validator('abcde')
+        assert not validator('AB1')
+        assert not validator(12)
+
+    def test_invalid_regex_raises_on_validation(self) -> None:
+        """Test that an invalid regex only raises when an option is validated."""
+        validator = OptionValidator('String', {'regex': '['})
+        with pytest.raises(re.error):
+            validator('a')
+
+    @pytest.mark.parametrize('value, expected', [(1.25, True), (1.255, False), (0.5, False), (3.0, False), (2, False)])
+    def test_float_constraints(self, value: Any, expected: bool) -> None:
+        """Test the value and decimals constraints of float options."""
+        validator = OptionValidator('Float', {'min_value': 1, 'max_value': 2.5, 'decimals': 2})
+        assert validator(value) is expected
+
+    @pytest.mark.parametrize('value, text, expected', [(True, 'Yes', True), (True, 'No', False), (False, 'No', True), ('yes', 'Yes', False)])
+    def test_bool_constraints(self, value: Any, text: str, expected: bool) -> None:
+        """Test that the text of a bool option must match its constraint."""
+        validator = OptionValidator('Bool', {'true_value': 'Yes', 'false_value': 'No'})
+        assert validator(value, text) is expected
+
+    def test_complex_specs(self) -> None:
+        """Test the specs of complex options."""
+        validator = OptionValidator('Complex', {'specs': {'name': 'String', 'count': 'Integer'}})
+
+        assert validator({'name': 'a', 'count': 1})
+        assert not validator({'name': 'a'})
+        assert not validator({'name': 'a', 'count': 1.5})
+        assert OptionValidator('Complex', None)({'anything': 1})
+
+    def test_unknown_answer_type(self) -> None:
+        """Test that options of an unknown answer type are invalid."""
+        assert OptionValidator('Unknown', None)('a') is False
+
+    @pytest.mark.parametrize('hash_str, expected', [
+        ('QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o', True),
+        ('QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff0O', False),
+        ('bafybeigdyrzt5sfp7udm7hu76uh7y26nf3efuylqabf3oclgtqy55fbzdi', True),
+        ('bafybeigdyrzt5sfp7udm7hu76uh7y26nf3efuylqabf3oclgtqy55fbzd!', False),
+        ('b', False),
+        ('', False),
+    ])
+    def test_is_valid_ipfs_hash(self, hash_str: str, expected: bool) -> None:
+        """Test the precompiled IPFS hash check."""
+        assert is_valid_ipfs_hash(hash_str) is expected
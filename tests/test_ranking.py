@@ -1,6 +1,8 @@
 from typing import List, Dict, Any
+import random
 import pytest
-from hivemind import Ranking
+from hivemind import HivemindOption, Ranking
+from hivemind.ranking import OptionIndex
 
 
 @pytest.fixture
@@ -190,3 +192,63 @@ class TestRanking:
 
         # Verify the exception message contains the original error
         assert "Error during auto ranking calculation" in str(exc_info.value)
+
+
+def make_option(cid: str, value: Any) -> HivemindOption:
+    """Create an option with a CID without storing it."""
+    option = HivemindOption()
+    option.value = value
+    option._cid = '/ipfs/%s' % cid
+    return option
+
+
+@pytest.mark.unit
+class TestOptionIndex:
+    """Tests for expanding auto rankings with the value-sorted option index."""
+
+    @pytest.mark.parametrize('seed', range(20))
+    @pytest.mark.parametrize('ranking_type', ['auto_high', 'auto_low'])
+    def test_same_ranking_as_sorting(self, seed: int, ranking_type: str) -> None:
+        """Test that the index gives the same ranking as sorting, including ties and duplicate values."""
+        rng = random.Random(seed)
+        values = [rng.choice([rng.randint(-5, 5), rng.randint(-5, 5) / 2, True, False]) for _ in range(rng.randint(1, 30))]
+        options = [make_option('option%s' % i, value) for i, value in enumerate(values)]
+        index = OptionIndex(options)
+        assert index.numeric
+
+        for choice in options:
+            ranking = Ranking.from_dict({ranking_type: choice.cid()})
+            expected = ranking.get(options=options)
+            assert ranking.get(options=options, index=index) == expected
+            assert ranking.get(options=options, index=index) == expected
+
+    def test_memoized_ranking_is_a_copy(self) -> None:
+        """Test that modifying a returned ranking does not change the memoized one."""
+        options = [make_option('option%s' % i, i) for i in range(3)]
+        index = OptionIndex(options)
+        ranking = Ranking.from_dict({'auto_high': 'option1'})
+
+        first = ranking.get(options=options, index=index)
+        first.reverse()
+        assert ranking.get(options=options, index=index) == ['option1', 'option2', 'option0']
+
+    def test_index_is_rebuilt_after_adding_options(self) -> None:
+        """Test that a stale index is not used."""
+        options = [make_option('option%s' % i, i) for i in range(3)]
+        index = OptionIndex(options)
+        ranking = Ranking.from_dict({'auto_low': 'option1'})
+        assert ranking.get(options=options, index=index) == ['option1', 'option0', 'option2']
+
+        options.append(make_option('option3', 1))
+        assert not index.is_current(options)
+        assert ranking.get(options=options, index=index) == ['option1', 'option3', 'option0', 'option2']
+
+    def test_non_numeric_options(self) -> None:
+        """Test that options without numeric values are not indexed."""
+        options = [make_option('option0', 'a'), make_option('option1', 1)]
+        index = OptionIndex(options)
+
+        assert not index.numeric
+        assert index.find('/ipfs/option0') is options[0]
+        with pytest.raises(Exception, match='Error during auto ranking calculation'):
+            Ranking.from_dict({'auto_high': 'option1'}).get(options=options, index=index)
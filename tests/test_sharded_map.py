@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from hivemind import HivemindIssue, HivemindOpinion, HivemindOption, HivemindState, storage
+from hivemind.sharded_map import ShardedMap
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+from tests.conftest import FakeIPFS
+
+
+@pytest.mark.unit
+class TestShardedMap:
+    """Tests for the ShardedMap class."""
+
+    def test_mapping(self) -> None:
+        """Test that a sharded map behaves like a dict while it splits into shards."""
+        entries = {'key%s' % i: {'value': i} for i in range(50)}
+        sharded_map = ShardedMap(entries, bucket_size=4)
+
+        assert len(sharded_map) == 50
+        assert sharded_map == entries
+        assert sharded_map['key7'] == {'value': 7}
+        assert 'key7' in sharded_map and 'key50' not in sharded_map and 7 not in sharded_map
+
+        sharded_map['key7']['value'] = 70
+        sharded_map['key50'] = {'value': 50}
+        del sharded_map['key0']
+        with pytest.raises(KeyError):
+            del sharded_map['key0']
+        with pytest.raises(KeyError):
+            _ = sharded_map['key0']
+        assert len(sharded_map) == 50
+        assert sorted(sharded_map) == sorted(['key%s' % i for i in range(1, 51)])
+
+    def test_store_and_load_lazily(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that a stored map loads only the nodes that a lookup needs."""
+        entries = {'key%s' % i: i for i in range(200)}
+        reference = ShardedMap(entries, bucket_size=8).store()
+        assert reference['count'] == 200
+        storage.cache.clear()
+
+        loaded = ShardedMap.from_reference(reference, bucket_size=8)
+        assert len(loaded) == 200 and fake_ipfs.fetched == []
+        assert loaded['key123'] == 123
+        assert 1 < len(fake_ipfs.fetched) < 5
+
+        assert dict(loaded.items()) == entries
+
+    def test_store_only_changed_shards(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that storing a changed map only stores the path to the changed leaf."""
+        sharded_map = ShardedMap({'key%s' % i: i for i in range(500)}, bucket_size=8)
+        root = sharded_map.store()['hamt']
+        stored = len(fake_ipfs.data)
+
+        assert sharded_map.store()['hamt'] == root
+        assert len(fake_ipfs.data) == stored
+
+        loaded = ShardedMap.from_reference(sharded_map.reference(), bucket_size=8)
+        loaded['key42'] = 'changed'
+        reference = loaded.store()
+        assert reference['hamt'] != root
+        assert 1 < len(fake_ipfs.data) - stored <= 4
+
+        sharded_map['key42'] = 'changed'
+        assert sharded_map.store() == reference
+
+    def test_invalid_node(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that a reference to something that is not a node is rejected."""
+        sharded_map = ShardedMap.from_reference({'hamt': fake_ipfs.add_json({'foo': 'bar'}), 'count': 1})
+        with pytest.raises(Exception, match='Invalid sharded map node'):
+            _ = sharded_map['foo']
+
+    def test_reference_before_store(self) -> None:
+        """Test that a map that was never stored has no reference."""
+        with pytest.raises(Exception, match='not stored'):
+            ShardedMap({'a': 1}).reference()
+        assert ShardedMap.is_reference({'hamt': 'Qm', 'count': 1})
+        assert not ShardedMap.is_reference({'hamt': 'Qm'})
+
+
+@pytest.mark.unit
+class TestStateShardedMaps:
+    """Tests for states whose opinions and signatures are stored as sharded maps."""
+
+    @pytest.fixture
+    def state(self, fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> HivemindState:
+        """Create a state with an option that shards its maps above 3 entries."""
+        monkeypatch.setattr(HivemindState, 'shard_threshold', 3)
+        issue = HivemindIssue()
+        issue.name = 'Sharded Issue'
+        issue.add_question('What is the best value?')
+        issue.answer_type = 'String'
+        state = HivemindState()
+        state.set_hivemind_issue(issue.save())
+
+        option = HivemindOption()
+        option.set_issue(state.hivemind_id)
+        option.set(value='value')
+        option_hash = option.save()
+        private_key, address = generate_bitcoin_keypair()
+        timestamp = int(time.time())
+        state.add_option(timestamp, option_hash, address, sign_message('%s%s' % (timestamp, option_hash), private_key))
+        return state
+
+    def add_opinion(self, state: HivemindState) -> str:
+        """Add an opinion of a new participant."""
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = state.hivemind_id
+        opinion.set_question_index(0)
+        opinion.ranking.set_fixed(state.option_cids)
+        opinion_hash = opinion.save()
+        private_key, address = generate_bitcoin_keypair()
+        timestamp = int(time.time())
+        state.add_opinion(timestamp, opinion_hash, address, sign_message('%s%s' % (timestamp, opinion_hash), private_key))
+        return address
+
+    def test_save_and_load(self, state: HivemindState, fake_ipfs: FakeIPFS) -> None:
+        """Test that large maps are stored as references and loaded back."""
+        addresses = [self.add_opinion(state) for _ in range(5)]
+        state_cid = state.save()
+
+        data = fake_ipfs.get_json(state_cid)
+        assert ShardedMap.is_reference(data['signatures']) and data['signatures']['count'] == 6
+        assert ShardedMap.is_reference(data['opinion_cids'][0]) and data['opinion_cids'][0]['count'] == 5
+        assert isinstance(state.signatures, ShardedMap)
+
+        storage.cache.clear()
+        loaded = HivemindState(cid=state_cid)
+        assert isinstance(loaded.signatures, ShardedMap)
+        assert set(loaded.opinion_cids[0]) == set(addresses)
+        assert loaded.signatures == state.signatures
+        assert loaded.results() == state.results()
+
+        self.add_opinion(loaded)
+        assert HivemindState(cid=loaded.save()).opinion_cids[0] == loaded.opinion_cids[0]
+
+    def test_save_only_stores_changed_shards(self, state: HivemindState, fake_ipfs: FakeIPFS) -> None:
+        """Test that saving one more opinion only stores the state and the changed shards, no snapshot."""
+        for _ in range(5):
+            self.add_opinion(state)
+        state.save()
+
+        self.add_opinion(state)
+        stored = set(fake_ipfs.data)
+        state.save()
+
+        # The state, the changed leaf of the opinions and the changed leaf of the signatures
+        assert len(set(fake_ipfs.data) - stored) == 3
+        assert state.snapshot_cid is None
+
+    def test_unchanged_save_has_no_changes(self, state: HivemindState) -> None:
+        """Test that changes compares sharded maps by reference."""
+        for _ in range(5):
+            self.add_opinion(state)
+        state.save()
+        state.save()
+        assert state.changes() == {}
+
+        self.add_opinion(state)
+        state.save()
+        changes = state.changes()
+        assert set(changes) == {'opinion_cids', 'signatures'}
+        assert ShardedMap.is_reference(changes['signatures']['new']) and changes['signatures']['new']['count'] == 7
+        assert ShardedMap.is_reference(changes['opinion_cids']['new'][0])
+
+    def test_small_maps_are_stored_inline(self, state: HivemindState, fake_ipfs: FakeIPFS) -> None:
+        """Test that maps up to the threshold keep the plain format."""
+        self.add_opinion(state)
+        data = fake_ipfs.get_json(state.save())
+        assert isinstance(data['signatures'], dict) and not ShardedMap.is_reference(data['signatures'])
+        assert isinstance(state.signatures, dict)
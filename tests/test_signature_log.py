@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from hivemind import HivemindIssue, HivemindOption, HivemindState, storage
+from hivemind.signature_log import SignatureLog, compact_signatures
+from hivemind.storage import run
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+from tests.conftest import FakeIPFS
+
+
+@pytest.mark.unit
+class TestSignatureLog:
+    """Tests for the SignatureLog class."""
+
+    def test_compact_signatures(self) -> None:
+        """Test that only the newest signature of each address and message is kept."""
+        signatures = {'addr1': {'msg1': {'sig1': 1, 'sig2': 3, 'sig3': 2}, 'msg2': {'sig4': 5}}}
+        assert compact_signatures(signatures) == 2
+        assert signatures == {'addr1': {'msg1': {'sig2': 3}, 'msg2': {'sig4': 5}}}
+
+    def test_append_store_and_load(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that each store writes one segment with the new entries and loading replays them."""
+        log = SignatureLog({'addr1': {'msg1': {'sig1': 1}}})
+        first = log.store()
+        assert first['count'] == 1 and first['segments'] == 1
+        assert log.store() == first
+
+        log.signatures['addr1']['msg1']['sig2'] = 2
+        log.append('addr1', 'msg1', 'sig2', 2)
+        with pytest.raises(Exception, match='not stored'):
+            log.reference()
+        reference = log.store()
+        assert reference == {'log': reference['log'], 'count': 2, 'segments': 2}
+        assert fake_ipfs.get_json(reference['log']) == {'previous': first['log'], 'entries': [['addr1', 'msg1', 'sig2', 2]]}
+
+        storage.cache.clear()
+        loaded = run(SignatureLog.aload(reference))
+        assert loaded.signatures == {'addr1': {'msg1': {'sig1': 1, 'sig2': 2}}}
+        assert loaded.reference() == reference
+
+    def test_compact(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that a compacted log is stored as a single segment."""
+        log = SignatureLog({'addr1': {'msg1': {'sig1': 1, 'sig2': 2}}, 'addr2': {'msg1': {'sig3': 1}}})
+        log.store()
+        assert log.compact() == 1
+        reference = log.store()
+        assert reference['count'] == 2 and reference['segments'] == 1
+        assert fake_ipfs.get_json(reference['log'])['previous'] is None
+
+    def test_invalid_segment(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that a reference to something that is not a segment is rejected."""
+        with pytest.raises(Exception, match='Invalid signature log segment'):
+            run(SignatureLog.aload({'log': fake_ipfs.add_json({'foo': 'bar'}), 'count': 1, 'segments': 1}))
+
+
+@pytest.mark.unit
+class TestStateSignatureLog:
+    """Tests for states that store their signatures in a signature log."""
+
+    @pytest.fixture
+    def state(self, fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> HivemindState:
+        """Create a state that logs its signatures."""
+        monkeypatch.setattr(HivemindState, 'log_signatures', True)
+        issue = HivemindIssue()
+        issue.name = 'Logged Issue'
+        issue.add_question('What is the best value?')
+        issue.answer_type = 'String'
+        state = HivemindState()
+        state.set_hivemind_issue(issue.save())
+        return state
+
+    def add_option(self, state: HivemindState, value: str) -> None:
+        """Add a signed option to a state."""
+        option = HivemindOption()
+        option.set_issue(state.hivemind_id)
+        option.set(value=value)
+        option_hash = option.save()
+        private_key, address = generate_bitcoin_keypair()
+        timestamp = int(time.time())
+        state.add_option(timestamp, option_hash, address, sign_message('%s%s' % (timestamp, option_hash), private_key))
+
+    def test_save_and_load(self, state: HivemindState, fake_ipfs: FakeIPFS) -> None:
+        """Test that the state only stores a reference and each save appends a segment."""
+        self.add_option(state, 'first')
+        data = fake_ipfs.get_json(state.save())
+        assert SignatureLog.is_reference(data['signatures'])
+        self.add_option(state, 'second')
+        state_cid = state.save()
+
+        storage.cache.clear()
+        loaded = HivemindState(cid=state_cid)
+        assert loaded.signatures == state.signatures
+        reference = loaded._signature_log.reference()
+        assert reference['count'] == 2 and reference['segments'] == 2
+        assert loaded.verify_all_signatures() == []
+
+    def test_changes_compare_the_log(self, state: HivemindState) -> None:
+        """Test that changes compares the reference to the signature log."""
+        self.add_option(state, 'first')
+        state.save()
+        state.save()
+        assert state.changes() == {}
+
+        self.add_option(state, 'second')
+        state.save()
+        assert state.changes()['signatures']['new'] == state._signature_log.reference()
+
+    def test_replaced_signatures_start_a_new_log(self, state: HivemindState) -> None:
+        """Test that signatures that were set directly are stored as a new log."""
+        self.add_option(state, 'first')
+        state.save()
+        state.signatures = {'addr1': {'msg1': {'sig1': 1}}}
+        loaded = HivemindState(cid=state.save())
+        assert loaded.signatures == {'addr1': {'msg1': {'sig1': 1}}}
+        assert loaded._signature_log.segments == 1
+
+    def test_compaction(self, state: HivemindState, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the log is compacted when it reaches signature_log_compaction segments."""
+        monkeypatch.setattr(HivemindState, 'signature_log_compaction', 2)
+        self.add_option(state, 'first')
+        state.save()
+        state.add_signature('addr1', 1, 'name', 'sig1')
+        state.save()
+        state.add_signature('addr1', 2, 'name', 'sig2')
+        loaded = HivemindState(cid=state.save())
+
+        assert loaded.signatures['addr1'] == {'name': {'sig2': 2}}
+        assert loaded._signature_log.segments == 1
+
+    def test_compact_inline_signatures(self) -> None:
+        """Test compacting the signatures of a state that stores them inline."""
+        state = HivemindState()
+        state.add_signature('addr1', 1, 'name', 'sig1')
+        state.add_signature('addr1', 2, 'name', 'sig2')
+        assert state.compact_signatures() == 1
+        assert state.signatures == {'addr1': {'name': {'sig2': 2}}}
+        with pytest.raises(Exception, match='Invalid timestamp'):
+            state.add_signature('addr1', 1, 'name', 'sig1')
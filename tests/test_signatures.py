@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from typing import List, Tuple
+
+import pytest
+
+from hivemind import signatures, utils
+from hivemind.signatures import BitcoinlibBackend, CoincurveBackend, SignatureBackend, create_backend, default_backend, get_backend, set_backend
+from hivemind.utils import generate_bitcoin_keypair, sign_message, verify_message
+
+
+@pytest.fixture(scope='module')
+def keypairs() -> List[Tuple[object, str]]:
+    """Generate keypairs for the signatures of the tests."""
+    return [generate_bitcoin_keypair() for _ in range(3)]
+
+
+def available_backends() -> List[SignatureBackend]:
+    """Create all signature backends that can be used here."""
+    backends: List[SignatureBackend] = [BitcoinlibBackend()]
+    if signatures.coincurve is not None:
+        backends.append(CoincurveBackend())
+    return backends
+
+
+@pytest.mark.unit
+class TestSignatureBackends:
+    """Tests for the signature backends."""
+
+    @pytest.mark.parametrize('backend', available_backends(), ids=lambda backend: backend.name)
+    def test_sign_and_verify(self, backend: SignatureBackend, keypairs: List[Tuple[object, str]]) -> None:
+        """Test that a backend accepts its own signatures and rejects other messages and addresses."""
+        private_key, address = keypairs[0]
+        signature = backend.sign('1700000000QmMessage', private_key)
+
+        assert backend.verify('1700000000QmMessage', address, signature)
+        assert not backend.verify('1700000000QmOther', address, signature)
+        assert not backend.verify('1700000000QmMessage', keypairs[1][1], signature)
+
+    def test_backends_are_compatible(self, keypairs: List[Tuple[object, str]]) -> None:
+        """Test that every backend accepts the signatures of every other backend."""
+        backends = available_backends()
+        for private_key, address in keypairs:
+            for signer in backends:
+                signature = signer.sign('message', private_key)
+                assert all(verifier.verify('message', address, signature) for verifier in backends)
+
+    def test_create_backend(self) -> None:
+        """Test creating backends by name."""
+        assert isinstance(create_backend('bitcoinlib'), BitcoinlibBackend)
+        with pytest.raises(Exception, match='Unknown signature backend'):
+            create_backend('unknown')
+
+    def test_backend_is_abstract(self) -> None:
+        """Test that a backend must implement signing and verification."""
+        class PartialBackend(SignatureBackend):
+            def sign(self, message: str, private_key: object) -> str:
+                return ''
+
+        with pytest.raises(TypeError):
+            SignatureBackend()
+        with pytest.raises(TypeError):
+            PartialBackend()
+
+    def test_default_backend(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that coincurve is used when it is installed."""
+        expected = CoincurveBackend if signatures.coincurve is not None else BitcoinlibBackend
+        assert isinstance(default_backend(), expected)
+
+        monkeypatch.setattr(signatures, 'coincurve', None)
+        assert isinstance(default_backend(), BitcoinlibBackend)
+        with pytest.raises(Exception, match='needs the coincurve package'):
+            CoincurveBackend()
+
+    @pytest.mark.parametrize('backend', available_backends(), ids=lambda backend: backend.name)
+    def test_utils_use_backend(self, backend: SignatureBackend, keypairs: List[Tuple[object, str]], monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that sign_message and verify_message use the selected backend."""
+        monkeypatch.setattr(signatures, '_backend', get_backend())
+        set_backend(backend)
+        utils.verifications.clear()
+        private_key, address = keypairs[2]
+
+        signature = sign_message('message', private_key)
+        assert get_backend() is backend
+        assert verify_message('message', address, signature)
+        assert not verify_message('message', address, 'invalid signature')
+        assert not verify_message('message', address, signature[:-8] + 'AAAAAAA=')
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from hivemind import CID, HivemindState, storage
+from tests.conftest import FakeIPFS
+
+N_STATES = 40
+
+
+@pytest.mark.unit
+class TestSkipLinks:
+    """Tests for the sequence numbers and skip links of a state chain."""
+
+    @pytest.fixture
+    def chain(self, fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> List[str]:
+        """Save a state N_STATES times, the state with sequence number n is saved at time 1000 + 10 * n."""
+        clock = iter(range(1000, 1000 + 10 * N_STATES, 10))
+        monkeypatch.setattr(storage, 'time', SimpleNamespace(time=lambda: next(clock)))
+        state = HivemindState()
+        return [state.save() for _ in range(N_STATES)]
+
+    def test_links(self, chain: List[str], fake_ipfs: FakeIPFS) -> None:
+        """Test that skip_cids[k] links to the newest earlier state with a sequence number that is a multiple of 2**k."""
+        for sequence, cid in enumerate(chain):
+            data = fake_ipfs.get_json(cid)
+            assert data['sequence'] == sequence
+            assert data['timestamp'] == 1000 + 10 * sequence
+            expected = [chain[((sequence - 1) >> k) << k] for k in range((sequence - 1).bit_length() + 1)] if sequence > 0 else []
+            assert data['skip_cids'] == expected
+
+    def test_get_ancestor(self, chain: List[str], fake_ipfs: FakeIPFS) -> None:
+        """Test that every earlier state is reached in a logarithmic number of fetches."""
+        state = HivemindState(cid=chain[-1])
+        for sequence in range(N_STATES):
+            storage.cache.clear()
+            fetched = len(fake_ipfs.fetched)
+            assert state.get_ancestor(sequence) == chain[sequence]
+            assert len(fake_ipfs.fetched) - fetched <= 2 * N_STATES.bit_length()
+
+        assert state.get_ancestor(N_STATES) is None
+        assert state.get_ancestor(-1) is None
+
+    @pytest.mark.parametrize('timestamp, sequence', [(1000, 0), (1005, 0), (1010, 1), (1234, 23), (1390, 39), (2000, 39)])
+    def test_get_state_at(self, chain: List[str], timestamp: int, sequence: int) -> None:
+        """Test finding the newest state that was saved at or before a time."""
+        assert HivemindState(cid=chain[-1]).get_state_at(timestamp) == chain[sequence]
+
+    def test_get_state_before_chain(self, chain: List[str]) -> None:
+        """Test that there is no state before the first state of the chain."""
+        assert HivemindState(cid=chain[-1]).get_state_at(999) is None
+
+    def test_states_without_sequence(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that a chain continues from a state that has no sequence number with sequence number 0."""
+        old_cid = fake_ipfs.add_json({'hivemind_id': None, 'option_cids': [], 'opinion_cids': [{}], 'signatures': {}, 'participants': {},
+                                      'selected': [], 'final': False, 'previous_cid': None})
+        state = HivemindState(cid=old_cid)
+        assert state.get_ancestor(0) is None
+
+        first = state.save()
+        second = state.save()
+        assert fake_ipfs.get_json(first)['sequence'] == 0
+        assert CID(fake_ipfs.get_json(first)['previous_cid']) == old_cid
+        assert state.get_ancestor(0) == first and state.get_ancestor(1) == second
+        assert [CID(cid) for cid in state.get_previous_cids()] == [first, old_cid]
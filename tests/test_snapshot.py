@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import time
+from typing import Any
+
+import pytest
+
+from hivemind import HivemindState, HivemindIssue, HivemindOption, HivemindOpinion, storage
+from hivemind.ranking import Ranking
+from hivemind import state as state_module
+from hivemind.snapshot import SNAPSHOT_VERSION, SnapshotError, create_snapshot, read_snapshot, snapshot_matches
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+from tests.conftest import FakeIPFS
+
+
+@pytest.fixture
+def saved_state(fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> HivemindState:
+    """Create and save a state with snapshots, two options, a fixed and an auto ranking."""
+    monkeypatch.setattr(HivemindState, 'save_snapshots', True)
+    issue = HivemindIssue()
+    issue.name = 'Snapshot Issue'
+    issue.add_question('What is the best number?')
+    issue.answer_type = 'Integer'
+    issue_hash = issue.save()
+
+    state = HivemindState()
+    state.set_hivemind_issue(issue_cid=issue_hash)
+
+    private_key, address = generate_bitcoin_keypair()
+    option_hashes = []
+    for value in [10, 20]:
+        option = HivemindOption()
+        option.set_issue(hivemind_issue_cid=issue_hash)
+        option.set(value=value)
+        option.text = 'Option %s' % value
+        option_hash = option.save()
+        timestamp = int(time.time())
+        state.add_option(timestamp=timestamp, option_hash=option_hash, address=address,
+                         signature=sign_message('%s%s' % (timestamp, option_hash), private_key))
+        option_hashes.append(option_hash)
+
+    for ranking in [{'fixed': option_hashes[::-1]}, {'auto_high': option_hashes[0]}]:
+        private_key, address = generate_bitcoin_keypair()
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = issue_hash
+        opinion.set_question_index(0)
+        opinion.ranking = Ranking.from_dict(ranking)
+        opinion_hash = opinion.save()
+        timestamp = int(time.time())
+        state.add_opinion(timestamp=timestamp, opinion_hash=opinion_hash, address=address,
+                          signature=sign_message('%s%s' % (timestamp, opinion_hash), private_key))
+
+    state.save()
+    return state
+
+
+@pytest.mark.unit
+class TestSnapshotFormat:
+    """Tests for creating and reading snapshots."""
+
+    def test_create_and_read_snapshot(self, saved_state: HivemindState) -> None:
+        """Test that a snapshot describes the options and opinions of the state."""
+        data = create_snapshot(saved_state)
+        assert data['snapshot_version'] == SNAPSHOT_VERSION
+        assert len(data['cids']) == len(set(data['cids']))
+
+        snapshot = read_snapshot(json.loads(json.dumps(data)))
+        assert snapshot['hivemind_id'] == saved_state.hivemind_id
+        assert [option['cid'] for option in snapshot['options']] == saved_state.option_cids
+        assert [option['value'] for option in snapshot['options']] == [10, 20]
+        assert snapshot_matches(snapshot, saved_state.option_cids, saved_state.opinion_cids)
+
+        resolved = {opinion['opinion_cid']: opinion['resolved'] for opinion in snapshot['opinions'][0]}
+        assert resolved == saved_state._rankings[0]
+
+    def test_snapshot_does_not_match_other_opinions(self, saved_state: HivemindState) -> None:
+        """Test that a snapshot does not match a state with different opinions."""
+        snapshot = read_snapshot(create_snapshot(saved_state))
+        opinion_cids = [dict(saved_state.opinion_cids[0])]
+        address = next(iter(opinion_cids[0]))
+        opinion_cids[0][address] = {'opinion_cid': 'QmOther', 'timestamp': 0}
+        assert not snapshot_matches(snapshot, saved_state.option_cids, opinion_cids)
+        assert not snapshot_matches(snapshot, saved_state.option_cids[:1], saved_state.opinion_cids)
+
+    @pytest.mark.parametrize('data', [None, {}, {'snapshot_version': 999}, {'snapshot_version': SNAPSHOT_VERSION, 'cids': []}])
+    def test_read_invalid_snapshot(self, data: Any) -> None:
+        """Test that invalid snapshots are rejected."""
+        with pytest.raises(SnapshotError):
+            read_snapshot(data)
+
+
+@pytest.mark.unit
+class TestSnapshotLoading:
+    """Tests for loading states through their snapshot."""
+
+    def test_save_stores_snapshot(self, fake_ipfs: FakeIPFS, saved_state: HivemindState) -> None:
+        """Test that saving a state stores a snapshot and references it."""
+        assert saved_state.snapshot_cid in fake_ipfs.data
+        assert fake_ipfs.get_json(saved_state.cid())['snapshot_cid'] == saved_state.snapshot_cid
+
+    def test_snapshots_are_opt_in(self, fake_ipfs: FakeIPFS, saved_state: HivemindState, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that a state is saved without a snapshot unless save_snapshots is set."""
+        monkeypatch.setattr(HivemindState, 'save_snapshots', False)
+        stored = len(fake_ipfs.data)
+        saved_state.final = True
+        saved_state.save()
+
+        assert saved_state.snapshot_cid is None
+        assert len(fake_ipfs.data) == stored + 1
+        assert [option.value for option in HivemindState(cid=saved_state.cid()).get_options()] == [10, 20]
+
+    def test_load_uses_single_snapshot_read(self, fake_ipfs: FakeIPFS, saved_state: HivemindState) -> None:
+        """Test that loading a state with a snapshot only reads the state and the snapshot."""
+        storage.cache.clear()
+        fake_ipfs.fetched.clear()
+        state = HivemindState(cid=saved_state.cid())
+
+        assert fake_ipfs.fetched == [saved_state.cid().replace('/ipfs/', ''), saved_state.snapshot_cid]
+        assert state.hivemind_issue().name == 'Snapshot Issue'
+        assert [option.value for option in state.get_options()] == [10, 20]
+        assert state._rankings == saved_state._rankings
+        assert state.calculate_results() == saved_state.calculate_results()
+
+    def test_load_falls_back_to_object_graph(self, fake_ipfs: FakeIPFS, saved_state: HivemindState) -> None:
+        """Test that a state whose snapshot does not match is loaded from its object graph."""
+        snapshot = fake_ipfs.get_json(saved_state.snapshot_cid)
+        snapshot['options'] = snapshot['options'][:1]
+        fake_ipfs.set_json(saved_state.snapshot_cid, snapshot)
+
+        storage.cache.clear()
+        fake_ipfs.fetched.clear()
+        state = HivemindState(cid=saved_state.cid())
+
+        assert len(fake_ipfs.fetched) > 2
+        assert [option.value for option in state.get_options()] == [10, 20]
+        assert state._rankings == saved_state._rankings
+
+    def test_untrusted_snapshot_is_not_used(self, fake_ipfs: FakeIPFS, saved_state: HivemindState) -> None:
+        """Test that a state that references a snapshot this process did not save is loaded from its object graph."""
+        snapshot = fake_ipfs.get_json(saved_state.snapshot_cid)
+        snapshot['options'][0][2] = 999
+        data = fake_ipfs.get_json(saved_state.cid())
+        data['snapshot_cid'] = fake_ipfs.add_json(snapshot)
+        state_hash = fake_ipfs.add_json(data)
+
+        state = HivemindState(cid=state_hash)
+        assert [option.value for option in state.get_options()] == [10, 20]
+
+        state_module.trust_snapshot(data['snapshot_cid'])
+        assert state_module.is_trusted_snapshot(data['snapshot_cid'])
+        assert [option.value for option in HivemindState(cid=state_hash).get_options()] == [999, 20]
+
+    def test_load_without_snapshot(self, fake_ipfs: FakeIPFS, saved_state: HivemindState) -> None:
+        """Test loading a state that was saved without a snapshot."""
+        data = fake_ipfs.get_json(saved_state.cid())
+        del data['snapshot_cid']
+        state_hash = fake_ipfs.add_json(data)
+
+        state = HivemindState(cid=state_hash)
+        assert [option.value for option in state.get_options()] == [10, 20]
+
+    def test_from_snapshot_is_read_only(self, fake_ipfs: FakeIPFS, saved_state: HivemindState) -> None:
+        """Test that a state loaded directly from a snapshot can not be modified."""
+        storage.cache.clear()
+        fake_ipfs.fetched.clear()
+        state = HivemindState.from_snapshot(saved_state.snapshot_cid)
+
+        assert fake_ipfs.fetched == [saved_state.snapshot_cid]
+        assert state.option_cids == saved_state.option_cids
+        assert state.opinion_cids == saved_state.opinion_cids
+        assert state.calculate_results() == saved_state.calculate_results()
+
+        with pytest.raises(Exception, match='read-only'):
+            state.save()
+        with pytest.raises(Exception, match='read-only'):
+            state.add_option(timestamp=0, option_hash=saved_state.option_cids[0])
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+from typing import Tuple
+
+import pytest
+
+from hivemind import CID, HivemindIssue, HivemindOpinion, HivemindOption, HivemindState, storage
+from hivemind.sharded_map import ShardedMap, diff_sharded_maps
+from hivemind.signature_log import SignatureLog
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+from tests.conftest import FakeIPFS
+
+
+@pytest.mark.unit
+class TestDiffShardedMaps:
+    """Tests for diff_sharded_maps."""
+
+    def test_only_changed_subtrees_are_fetched(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that the diff of two versions of a map only fetches the paths to the changed leaves."""
+        sharded_map = ShardedMap({'key%s' % i: i for i in range(500)}, bucket_size=8)
+        old = sharded_map.store()
+        sharded_map['key42'] = 'changed'
+        sharded_map['key500'] = 500
+        del sharded_map['key7']
+        new = sharded_map.store()
+
+        storage.cache.clear()
+        assert diff_sharded_maps(old, new) == {'key42': (42, 'changed'), 'key500': (None, 500), 'key7': (7, None)}
+        assert len(fake_ipfs.fetched) <= 2 * 3 * 4
+        assert diff_sharded_maps(new, new) == {}
+
+    def test_different_shapes(self, fake_ipfs: FakeIPFS) -> None:
+        """Test the diff of a leaf and a split tree."""
+        old = ShardedMap({'a': 1, 'b': 2}, bucket_size=8).store()
+        new = ShardedMap({'key%s' % i: i for i in range(20)} | {'a': 1}, bucket_size=8).store()
+        differences = diff_sharded_maps(old, new)
+        assert differences['b'] == (2, None) and 'a' not in differences
+        assert len(differences) == 21
+
+
+@pytest.mark.unit
+class TestStateDiff:
+    """Tests for the structural diff between two states."""
+
+    @pytest.fixture
+    def state(self, fake_ipfs: FakeIPFS) -> HivemindState:
+        """Create a state of a new issue with one question."""
+        issue = HivemindIssue()
+        issue.name = 'Diff Issue'
+        issue.add_question('What is the best colour?')
+        issue.answer_type = 'String'
+        state = HivemindState()
+        state.set_hivemind_issue(issue.save())
+        return state
+
+    def add_option(self, state: HivemindState, value: str) -> str:
+        """Add an option to a state."""
+        option = HivemindOption()
+        option.set_issue(state.hivemind_id)
+        option.set(value=value)
+        option_hash = option.save()
+        state.add_option(int(time.time()), option_hash)
+        return option_hash
+
+    def add_opinion(self, state: HivemindState, keypair: Tuple[str, str]) -> str:
+        """Add an opinion that ranks the options in order."""
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = state.hivemind_id
+        opinion.set_question_index(0)
+        opinion.ranking.set_fixed(state.option_cids)
+        opinion_hash = opinion.save()
+        private_key, address = keypair
+        timestamp = int(time.time())
+        state.add_opinion(timestamp, opinion_hash, address, sign_message('%s%s' % (timestamp, opinion_hash), private_key))
+        return opinion_hash
+
+    def test_diff(self, state: HivemindState, fake_ipfs: FakeIPFS) -> None:
+        """Test the diff of added options, opinions, signatures and participant names."""
+        red = self.add_option(state, 'red')
+        keypair = generate_bitcoin_keypair()
+        old_opinion_hash = self.add_opinion(state, keypair)
+        old_cid = state.save()
+
+        green = self.add_option(state, 'green')
+        opinion_hash = self.add_opinion(state, keypair)
+        state.participants[keypair[1]] = {'name': 'Alice'}
+        state.final = True
+        new_cid = state.save()
+
+        storage.cache.clear()
+        fake_ipfs.fetched.clear()
+        diff = HivemindState.diff_cids(old_cid, new_cid)
+        assert diff['options'] == {'added': [{'cid': green, 'value': 'green', 'text': ''}], 'removed': []}
+        assert len(diff['opinions']) == 1 and len(diff['opinions'][0]) == 1
+        change = diff['opinions'][0][0]
+        assert change['address'] == keypair[1] and change['new']['opinion_cid'] == opinion_hash
+        assert change['ranking'] == {'fixed': [red, green]}
+        assert [signature[:2] for signature in diff['signatures']['added']] == [[keypair[1], opinion_hash]]
+        assert diff['signatures']['removed'] == []
+        assert diff['participants'] == {keypair[1]: {'old': None, 'new': 'Alice'}}
+        assert diff['changed'] == {'final': {'old': False, 'new': True}}
+        # The option that did not change and the old opinion are not fetched
+        assert CID(red) not in fake_ipfs.fetched and CID(old_opinion_hash) not in fake_ipfs.fetched
+
+        assert HivemindState(cid=old_cid).diff(new_cid) == diff
+        assert HivemindState(cid=new_cid).diff(new_cid)['opinions'] == [[]]
+        with pytest.raises(Exception, match='not saved'):
+            HivemindState().diff(new_cid)
+
+    def test_signature_log(self, state: HivemindState, fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the diff of two states with a signature log only reads the new segments."""
+        monkeypatch.setattr(HivemindState, 'log_signatures', True)
+        self.add_option(state, 'red')
+        keypair = generate_bitcoin_keypair()
+        self.add_opinion(state, keypair)
+        old_cid = state.save()
+        state.add_signature('addr1', 1, 'message', 'sig1')
+        new_cid = state.save()
+
+        old_reference = fake_ipfs.get_json(old_cid)['signatures']
+        assert SignatureLog.is_reference(old_reference)
+        storage.cache.clear()
+        fake_ipfs.fetched.clear()
+        assert HivemindState.diff_cids(old_cid, new_cid)['signatures'] == {'added': [['addr1', 'message', 'sig1', 1]], 'removed': []}
+        assert CID(old_reference['log']) not in fake_ipfs.fetched
@@ -114,3 +114,31 @@ class TestHivemindStateRestrictions:
         # Should still return default weight
         weight = state.get_weight("test_address")
         assert weight == 1.0
+
+    def test_weighted_addresses_are_allowed(self, state: HivemindState, basic_issue: HivemindIssue) -> None:
+        """Test that addresses with a weight in the address restrictions can add options and opinions."""
+        private_key, address = generate_bitcoin_keypair()
+        _, other_address = generate_bitcoin_keypair()
+        basic_issue.set_restrictions({'addresses': ['%s@2.5' % address, other_address]})
+        issue_hash = basic_issue.save()
+        state.set_hivemind_issue(issue_hash)
+        timestamp = int(time.time())
+
+        option = HivemindOption()
+        option.set_issue(issue_hash)
+        option.set('weighted option')
+        option_hash = option.save()
+        state.add_option(timestamp, option_hash, address, sign_message(f"{timestamp}{option_hash}", private_key))
+        assert option_hash in state.option_cids
+
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = issue_hash
+        opinion.set_question_index(0)
+        opinion.ranking.set_fixed([option_hash])
+        opinion_hash = opinion.save()
+        state.add_opinion(timestamp, opinion_hash, address, sign_message(f"{timestamp}{opinion_hash}", private_key))
+        assert state.opinion_cids[0][address]['opinion_cid'] == opinion_hash
+
+        assert state.get_weight(address) == 2.5
+        assert state.get_weight(other_address) == 1.0
+        assert state.get_weight(address[:10]) == 0.0
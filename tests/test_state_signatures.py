@@ -94,3 +94,23 @@ class TestHivemindStateSignatures:
         # Verify still no null entries
         assert None not in state.signatures
         assert len(state.signatures) == 0
+
+    def test_verify_all_signatures(self, fake_ipfs, basic_issue: HivemindIssue) -> None:
+        """Test that all verifiable signatures of a state are verified."""
+        issue_hash = basic_issue.save()
+        state = HivemindState()
+        state.set_hivemind_issue(issue_hash)
+        private_key, address = generate_bitcoin_keypair()
+        timestamp = int(time.time())
+
+        option_hash = TestHelper.create_and_sign_option(state, issue_hash, 'red', 'Red', private_key, address, timestamp)
+        opinion_hash = TestHelper.create_and_sign_opinion(state, issue_hash, [option_hash], private_key, address, timestamp)
+        state.add_signature(address, timestamp, 'Alice', 'unverifiable name signature')
+        consensus_message = '%s:select_consensus:%s' % (timestamp, issue_hash)
+        state.add_signature(address, timestamp, consensus_message, sign_message(consensus_message, private_key))
+        assert state.verify_all_signatures(processes=1) == []
+
+        # A signature of another option is invalid
+        forged = state.signatures[address][opinion_hash]
+        state.signatures[address][option_hash] = {next(iter(forged)): timestamp}
+        assert state.verify_all_signatures(processes=1) == [(address, option_hash, next(iter(forged)))]
@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from hivemind import HivemindIssue, HivemindOpinion, HivemindOption, HivemindState, storage
+from hivemind.storage import JSONCache, SingleFlight, StorageDict, normalize_cid
+from tests.conftest import FakeIPFS
+
+CID = 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o'
+
+
+def run_concurrently(target, count: int):
+    """Run target in count threads that start at the same time and return their results."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index: int) -> None:
+        barrier.wait()
+        try:
+            results[index] = target()
+        except Exception as ex:
+            results[index] = ex
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+@pytest.mark.unit
+class TestSingleFlight:
+    """Tests for the SingleFlight class."""
+
+    def test_concurrent_calls_are_coalesced(self) -> None:
+        """Test that concurrent calls for the same key execute the function once."""
+        group = SingleFlight()
+        executions = []
+
+        def fetch():
+            executions.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+
+        results = run_concurrently(lambda: group.do('key', fetch), 8)
+
+        assert len(executions) == 1
+        assert all(result == {'value': 42} for result in results)
+        assert group.calls == 1
+        assert group.shared == 7
+        assert group.in_flight() == 0
+
+    def test_different_keys_are_not_coalesced(self) -> None:
+        """Test that calls for different keys each execute the function."""
+        group = SingleFlight()
+        assert group.do('a', lambda: 1) == 1
+        assert group.do('b', lambda: 2) == 2
+        assert group.stats() == {'calls': 2, 'shared': 0, 'in_flight': 0}
+
+    def test_sequential_calls_execute_again(self) -> None:
+        """Test that a key is forgotten once its call has finished."""
+        group = SingleFlight()
+        counter = []
+        group.do('key', lambda: counter.append(1))
+        group.do('key', lambda: counter.append(1))
+        assert len(counter) == 2
+
+    def test_exception_is_shared(self) -> None:
+        """Test that an exception of the leader is raised for every waiting caller."""
+        group = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('fetch failed')
+
+        results = run_concurrently(lambda: group.do('key', fail), 4)
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert group.in_flight() == 0
+
+    @pytest.mark.asyncio
+    async def test_concurrent_async_calls_are_coalesced(self) -> None:
+        """Test that concurrent coroutines for the same key await the function once."""
+        group = SingleFlight()
+        executions = []
+
+        async def fetch():
+            executions.append(1)
+            await asyncio.sleep(0.1)
+            return {'value': 42}
+
+        results = await asyncio.gather(*[group.ado('key', fetch) for _ in range(5)])
+
+        assert len(executions) == 1
+        assert results == [{'value': 42}] * 5
+        assert group.stats() == {'calls': 1, 'shared': 4, 'in_flight': 0}
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_call(self) -> None:
+        """Test that cancelling a waiting coroutine does not affect the leader."""
+        group = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.1)
+            return 'done'
+
+        leader = asyncio.ensure_future(group.ado('key', fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(group.ado('key', fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+
+        assert await leader == 'done'
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+
+@pytest.mark.unit
+class TestJSONCache:
+    """Tests for the JSONCache class."""
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        """Test that the cache evicts the least recently used entry when it is full."""
+        cache = JSONCache(maxsize=2)
+        cache.set('a', {'a': 1})
+        cache.set('b', {'b': 2})
+        assert cache.get('a') == {'a': 1}
+
+        cache.set('c', {'c': 3})
+
+        assert cache.get('b') is None
+        assert cache.get('a') == {'a': 1}
+        assert len(cache) == 2
+
+
+@pytest.mark.unit
+class TestStorageFunctions:
+    """Tests for the module level storage functions."""
+
+    def test_normalize_cid(self) -> None:
+        """Test stripping the '/ipfs/' prefix."""
+        assert normalize_cid('/ipfs/%s' % CID) == CID
+        assert normalize_cid(CID) == CID
+
+    def test_add_and_get_json(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that stored data is posted as JSON and can be retrieved again."""
+        cid = storage.add_json(data={'name': 'test', 'values': [1, 2]})
+
+        assert fake_ipfs.data[cid] == b'{"name": "test", "values": [1, 2]}'
+        storage.cache.clear()
+        assert storage.get_json(cid) == {'name': 'test', 'values': [1, 2]}
+        assert storage.get_json('/ipfs/%s' % cid) == {'name': 'test', 'values': [1, 2]}
+        assert fake_ipfs.fetched == [cid]
+
+    def test_get_json_missing_cid(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that a failed fetch raises an IPFSError."""
+        with pytest.raises(storage.IPFSError, match='Failed to retrieve json data'):
+            storage.get_json(CID)
+
+    def test_get_json_coalesces_concurrent_loads(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that concurrent loads of the same CID, with or without prefix, share one fetch."""
+        fetched = []
+
+        async def slow_fetch_json(cid):
+            fetched.append(cid)
+            await asyncio.sleep(0.2)
+            return {'option_cids': ['a', 'b']}
+
+        with patch('hivemind.storage._fetch_json', side_effect=slow_fetch_json):
+            results = run_concurrently(lambda: storage.get_json(CID), 3)
+            prefixed = run_concurrently(lambda: storage.get_json('/ipfs/%s' % CID), 3)
+
+        assert fetched == [CID, CID]
+        assert all(result == {'option_cids': ['a', 'b']} for result in results + prefixed)
+
+    def test_get_json_returns_independent_copies(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that callers sharing a load can not modify each other's data."""
+        cid = fake_ipfs.add_json({'option_cids': ['a']})
+        first, second = run_concurrently(lambda: storage.get_json(cid), 2)
+
+        first['option_cids'].append('b')
+        assert second['option_cids'] == ['a']
+        assert storage.get_json(cid)['option_cids'] == ['a']
+
+    @pytest.mark.asyncio
+    async def test_aget_json_coalesces_with_sync_loads(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that coroutines and synchronous callers share a single fetch."""
+        cid = fake_ipfs.add_json({'name': 'shared'})
+
+        results = await asyncio.gather(storage.aget_json(cid), asyncio.to_thread(storage.get_json, cid), storage.aget_json(cid))
+
+        assert results == [{'name': 'shared'}] * 3
+        assert fake_ipfs.fetched == [cid]
+
+    def test_sync_api_can_not_be_used_from_background_loop(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that using the synchronous API from the background loop raises instead of deadlocking."""
+        async def nested():
+            return storage.get_json(CID)
+
+        with pytest.raises(Exception, match='synchronous storage API'):
+            storage.run(nested())
+
+
+@pytest.mark.unit
+class TestStorageDict:
+    """Tests for the StorageDict class."""
+
+    def test_load(self, fake_ipfs: FakeIPFS) -> None:
+        """Test loading data through the storage functions."""
+        cid = fake_ipfs.add_json({'name': 'test', '_cid': 'ignored'})
+        data = StorageDict(cid=cid)
+
+        assert data['name'] == 'test'
+        assert '_cid' not in dict(data)
+        assert data.cid() == '/ipfs/%s' % cid
+
+    def test_load_invalid_data(self, fake_ipfs: FakeIPFS) -> None:
+        """Test loading a CID that does not contain a dict."""
+        cid = fake_ipfs.add_json(['not', 'a', 'dict'])
+        with pytest.raises(Exception, match='does not contain a dict'):
+            StorageDict(cid=cid)
+
+    def test_load_invalid_cid_type(self) -> None:
+        """Test loading with a CID that is not a string."""
+        with pytest.raises(TypeError):
+            StorageDict().load(cid=123)
+
+    def test_save(self, fake_ipfs: FakeIPFS) -> None:
+        """Test saving data through the storage functions."""
+        data = StorageDict()
+        data['name'] = 'test'
+        cid = data.save()
+
+        assert fake_ipfs.get_json(cid) == {'name': 'test'}
+        assert data.cid() == cid
+
+    @pytest.mark.asyncio
+    async def test_aload_and_asave(self, fake_ipfs: FakeIPFS) -> None:
+        """Test the asynchronous counterparts of load and save."""
+        data = StorageDict()
+        data['name'] = 'test'
+        cid = await data.asave()
+
+        loaded = await StorageDict.aload(cid)
+        assert isinstance(loaded, StorageDict)
+        assert loaded['name'] == 'test'
+        assert loaded.cid() == '/ipfs/%s' % cid
+
+
+@pytest.mark.unit
+class TestBatchedStorage:
+    """Tests for the batched multi-get and multi-put functions."""
+
+    def test_put_many_uses_single_request(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that several objects are stored with a single add request, in order."""
+        objects = [{'value': i} for i in range(5)] + [{'value': 0}]
+        cids = storage.put_many(objects)
+
+        assert fake_ipfs.add_requests == 1
+        assert cids == [fake_ipfs.add_json(data) for data in objects]
+        assert cids[0] == cids[-1]
+        assert storage.put_many([]) == []
+
+    def test_put_many_is_split_in_batches(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that add_many sends at most max_batch_size contents per request."""
+        storage._transport.max_batch_size = 2
+        cids = storage.put_many([{'value': i} for i in range(5)])
+
+        assert fake_ipfs.add_requests == 3
+        assert [fake_ipfs.get_json(cid) for cid in cids] == [{'value': i} for i in range(5)]
+
+    def test_get_many(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that several CIDs are fetched in order, each only once."""
+        cids = [fake_ipfs.add_json({'value': i}) for i in range(3)]
+
+        assert storage.get_many(cids + ['/ipfs/%s' % cids[0]]) == [{'value': 0}, {'value': 1}, {'value': 2}, {'value': 0}]
+        assert sorted(fake_ipfs.fetched) == sorted(cids)
+
+    def test_get_many_missing_cid(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that a missing CID raises an IPFSError."""
+        cid = fake_ipfs.add_json({'value': 1})
+        with pytest.raises(storage.IPFSError, match='Failed to retrieve json data from IPFS hash %s' % CID):
+            storage.get_many([cid, CID])
+
+    def test_load_many_and_save_many(self, fake_ipfs: FakeIPFS) -> None:
+        """Test loading and saving several objects together."""
+        opinions = []
+        for value in ['a', 'b']:
+            opinion = HivemindOpinion()
+            opinion.ranking.set_fixed([value])
+            opinions.append(opinion)
+
+        cids = HivemindOpinion.save_many(opinions)
+        assert fake_ipfs.add_requests == 1
+        assert [opinion.cid() for opinion in opinions] == cids
+
+        storage.cache.clear()
+        loaded = HivemindOpinion.load_many(cids)
+        assert all(isinstance(opinion, HivemindOpinion) for opinion in loaded)
+        assert [opinion.ranking.fixed for opinion in loaded] == [['a'], ['b']]
+
+    def test_load_many_invalid_cid_type(self) -> None:
+        """Test loading several objects with a CID that is not a string."""
+        with pytest.raises(TypeError):
+            StorageDict.load_many([CID, 123])
+
+    def test_add_predefined_options_uses_single_request(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that the predefined options of an issue are saved with a single add request."""
+        issue = HivemindIssue()
+        issue.name = 'Batch Issue'
+        issue.add_question('Which color?')
+        issue.answer_type = 'String'
+        issue.set_constraints({'choices': [{'value': color, 'text': color.title()} for color in ['red', 'green', 'blue']]})
+
+        state = HivemindState()
+        state.set_hivemind_issue(issue_cid=issue.save())
+        fake_ipfs.add_requests = 0
+        options = state.add_predefined_options()
+
+        assert fake_ipfs.add_requests == 1
+        assert [option['value'] for option in options.values()] == ['red', 'green', 'blue']
+        assert state.option_cids == list(options)
+
+
+@pytest.mark.unit
+class TestAsyncObjects:
+    """Tests for the asynchronous API of the hivemind objects."""
+
+    @pytest.mark.asyncio
+    async def test_aload_state_fetches_children_concurrently(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that a state without snapshot loads its options concurrently, each issue only once."""
+        issue = HivemindIssue()
+        issue.name = 'Async Issue'
+        issue.add_question('Which one?')
+        issue.answer_type = 'String'
+        issue_hash = await issue.asave()
+
+        option_hashes = []
+        for value in ['a', 'b', 'c']:
+            option = HivemindOption()
+            option.hivemind_id = issue_hash
+            option.value = value
+            option_hashes.append(await option.asave())
+
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = issue_hash
+        opinion.ranking.set_fixed(option_hashes)
+        opinion_hash = await opinion.asave()
+
+        state_hash = fake_ipfs.add_json({'hivemind_id': issue_hash, 'option_cids': option_hashes,
+                                         'opinion_cids': [{'address': {'opinion_cid': opinion_hash, 'timestamp': 0}}],
+                                         'signatures': {}, 'participants': {}, 'selected': [], 'final': False, 'previous_cid': None})
+        storage.cache.clear()
+
+        state = await HivemindState.aload(state_hash)
+
+        assert state.hivemind_issue().name == 'Async Issue'
+        assert [option.value for option in state.get_options()] == ['a', 'b', 'c']
+        assert state._rankings == [{opinion_hash: option_hashes}]
+        assert sorted(fake_ipfs.fetched) == sorted([state_hash, issue_hash, opinion_hash] + option_hashes)
+        assert state.consensus() == 'a'
+
+    @pytest.mark.asyncio
+    async def test_asave_state(self, fake_ipfs: FakeIPFS) -> None:
+        """Test saving a state and loading it again with the asynchronous API."""
+        issue = HivemindIssue()
+        issue.name = 'Async Issue'
+        issue.add_question('Which one?')
+        issue_hash = await issue.asave()
+
+        state = HivemindState()
+        state.hivemind_id = issue_hash
+        state._issue = await HivemindIssue.aload(issue_hash)
+        state_hash = await state.asave()
+
+        loaded = await HivemindState.aload(state_hash)
+        assert loaded.hivemind_id == issue_hash
+        assert loaded.snapshot_cid == state.snapshot_cid
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+from types import SimpleNamespace
+from typing import List, Tuple
+
+import pytest
+
+from hivemind import HivemindIssue, HivemindOpinion, HivemindOption, HivemindState, storage, timeline
+from hivemind.timeline import QuestionTally, Timeline
+from hivemind.utils import generate_bitcoin_keypair, sign_message
+from tests.conftest import FakeIPFS
+
+
+@pytest.mark.unit
+class TestQuestionTally:
+    """Tests for the QuestionTally class."""
+
+    def test_scores(self) -> None:
+        """Test that adding options and replacing opinions keeps the pairwise tallies up to date."""
+        tally = QuestionTally()
+        tally.add_option('QmA')
+        tally.add_option('QmB')
+        tally.set_opinion('addr1', ['QmA', 'QmB'], 1.0)
+        assert tally.scores() == {'QmA': 1.0, 'QmB': 0.0}
+
+        tally.add_option('QmC')
+        tally.set_opinion('addr2', ['QmC'], 1.0)
+        assert tally.scores() == {'QmA': 0.5, 'QmB': 0.25, 'QmC': 0.5}
+        assert tally.scores(excluded=['QmA']) == {'QmB': 0.5, 'QmC': 0.5}
+
+        tally.set_opinion('addr1', ['QmB', 'QmA'], 1.0)
+        tally.remove_opinion('addr2')
+        assert len(tally) == 1
+        assert tally.scores() == {'QmA': 0.5, 'QmB': 1.0, 'QmC': 0.0}
+
+
+@pytest.mark.unit
+class TestTimeline:
+    """Tests for the Timeline class."""
+
+    def create_state(self, answer_type: str, on_selection: str | None = None) -> HivemindState:
+        """Create a state of a new issue with two questions."""
+        issue = HivemindIssue()
+        issue.name = 'Timeline Issue'
+        issue.add_question('What is the best value?')
+        issue.add_question('What is the cheapest value?')
+        issue.answer_type = answer_type
+        issue.on_selection = on_selection
+        state = HivemindState()
+        state.set_hivemind_issue(issue.save())
+        return state
+
+    def add_option(self, state: HivemindState, value) -> str:
+        """Add an option to a state."""
+        option = HivemindOption()
+        option.set_issue(state.hivemind_id)
+        option.set(value=value)
+        option_hash = option.save()
+        state.add_option(int(time.time()), option_hash)
+        return option_hash
+
+    def add_opinion(self, state: HivemindState, keypair: Tuple[str, str], question_index: int = 0,
+                    fixed: List[str] | None = None, auto_high: str | None = None) -> None:
+        """Add the opinion of a participant to a state."""
+        opinion = HivemindOpinion()
+        opinion.hivemind_id = state.hivemind_id
+        opinion.set_question_index(question_index)
+        if fixed is not None:
+            opinion.ranking.set_fixed(fixed)
+        else:
+            opinion.ranking.set_auto_high(auto_high)
+        opinion_hash = opinion.save()
+        private_key, address = keypair
+        timestamp = int(time.time())
+        state.add_opinion(timestamp, opinion_hash, address, sign_message('%s%s' % (timestamp, opinion_hash), private_key))
+
+    def assert_matches_results(self, state_cids: List[str]) -> None:
+        """Assert that the timeline of the last state has the scores of the results of every state."""
+        snapshots = list(Timeline(state_cids[-1]).steps())
+        assert [snapshot['cid'] for snapshot in snapshots] == state_cids
+        for snapshot, state_cid in zip(snapshots, state_cids):
+            state = HivemindState(cid=state_cid)
+            expected = [{option_cid: results['score'] for option_cid, results in question_results.items()}
+                        for question_results in state.results()]
+            assert snapshot['scores'] == [pytest.approx(scores) for scores in expected]
+            assert snapshot['opinions'] == [len(question_opinions) for question_opinions in state.opinion_cids]
+            assert snapshot['options'] == len(state.option_cids)
+
+    def test_fixed_rankings(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that every step of a chain with deltas, replaced opinions and exclusions has the scores of its state."""
+        state = self.create_state('String', on_selection='Exclude')
+        keypairs = [generate_bitcoin_keypair() for _ in range(4)]
+        state_cids = [state.save()]
+        options = []
+        for value in ['red', 'green', 'blue', 'yellow']:
+            options.append(self.add_option(state, value))
+            state_cids.append(state.save())
+
+        for i, keypair in enumerate(keypairs):
+            self.add_opinion(state, keypair, fixed=options[i:] + options[:i])
+            state_cids.append(state.save())
+            self.add_opinion(state, keypair, question_index=1, fixed=options[::-1][:i + 1])
+            state_cids.append(state.save())
+
+        options.append(self.add_option(state, 'purple'))
+        state_cids.append(state.save())
+        self.add_opinion(state, keypairs[0], fixed=[options[-1]])
+        state_cids.append(state.save())
+        state.select_consensus()
+        state_cids.append(state.save())
+
+        assert any(HivemindState.is_delta(fake_ipfs.get_json(cid)) for cid in state_cids)
+        assert state.selected
+        self.assert_matches_results(state_cids)
+
+    def test_auto_rankings(self, fake_ipfs: FakeIPFS) -> None:
+        """Test that auto rankings are counted again when options are added."""
+        state = self.create_state('Integer')
+        options = [self.add_option(state, value) for value in [10, 20]]
+        state_cids = [state.save()]
+        self.add_opinion(state, generate_bitcoin_keypair(), auto_high=options[1])
+        self.add_opinion(state, generate_bitcoin_keypair(), fixed=[options[0]])
+        state_cids.append(state.save())
+        for value in [5, 30, 15]:
+            self.add_option(state, value)
+            state_cids.append(state.save())
+
+        storage.cache.clear()
+        self.assert_matches_results(state_cids)
+
+    def test_sharded_opinions(self, fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that only the changed opinions of a sharded question are loaded again."""
+        monkeypatch.setattr(HivemindState, 'shard_threshold', 2)
+        state = self.create_state('String')
+        options = [self.add_option(state, value) for value in ['a', 'b', 'c']]
+        keypairs = [generate_bitcoin_keypair() for _ in range(5)]
+        state_cids = [state.save()]
+        for i, keypair in enumerate(keypairs):
+            self.add_opinion(state, keypair, fixed=options[i % 3:] + options[:i % 3])
+            state_cids.append(state.save())
+        self.add_opinion(state, keypairs[0], fixed=options[::-1])
+        state_cids.append(state.save())
+        assert 'hamt' in fake_ipfs.get_json(state_cids[-2])['delta']['keys']['opinion_cids']['items']['0']['keys']
+
+        self.assert_matches_results(state_cids)
+        loaded = []
+        load_many = HivemindOpinion.load_many
+        monkeypatch.setattr(HivemindOpinion, 'load_many', staticmethod(lambda cids: loaded.extend(cids) or load_many(cids=cids)))
+        list(Timeline(state_cids[-1]).steps())
+        assert len(loaded) == len(keypairs) + 1
+
+    def test_lazy_chain(self, fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the first steps are yielded before the whole chain is read."""
+        monkeypatch.setattr(timeline, 'BLOCK_SIZE', 2)
+        state = self.create_state('String')
+        state_cids = [state.save()]
+        for value in range(16):
+            self.add_option(state, str(value))
+            state_cids.append(state.save())
+
+        storage.cache.clear()
+        fake_ipfs.fetched.clear()
+        steps = Timeline(state_cids[-1]).steps()
+        assert next(steps)['cid'] == state_cids[0]
+        assert len(set(state_cids) & set(fake_ipfs.fetched)) < len(state_cids) / 2
+        self.assert_matches_results(state_cids)
+
+    def test_buckets(self, fake_ipfs: FakeIPFS, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that a bucketed timeline has the last snapshot of each time bucket."""
+        clock = iter([1000, 1010, 1030, 1070, 1250])
+        monkeypatch.setattr(storage, 'time', SimpleNamespace(time=lambda: next(clock)))
+        state = self.create_state('String')
+        state_cids = [state.save()]
+        for value in ['a', 'b', 'c', 'd']:
+            self.add_option(state, value)
+            state_cids.append(state.save())
+
+        snapshots = list(Timeline(state_cids[-1]).snapshots(bucket=60))
+        assert [(snapshot['bucket'], snapshot['cid'], snapshot['options']) for snapshot in snapshots] == [
+            (960, state_cids[1], 1), (1020, state_cids[3], 3), (1200, state_cids[4], 4)]
+        assert len(list(Timeline(state_cids[-1]).snapshots())) == 5
+        with pytest.raises(Exception, match='Invalid bucket length'):
+            list(Timeline(state_cids[-1]).snapshots(bucket=0))
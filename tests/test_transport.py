@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Generator
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from hivemind.storage import IPFSError
+from hivemind.transport import KuboTransport, Transport, TransportStats, default_api_url
+
+
+class KuboHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive imitation of the Kubo cat and add endpoints."""
+
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        time.sleep(self.delay)
+
+        if self.path.startswith('/api/v0/cat'):
+            body = b'{"name": "test"}'
+        elif self.path.startswith('/api/v0/add'):
+            body = b'{"Name": "data.json", "Hash": "QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o", "Size": "20"}\n'
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class KuboServer(ThreadingHTTPServer):
+    """HTTP server that ignores connections closed by the client."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        pass
+
+
+@pytest.fixture
+def kubo_server() -> Generator[str, None, None]:
+    """Run a local imitation of the Kubo API and return its base URL."""
+    server = KuboServer(('127.0.0.1', 0), KuboHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%s' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+    KuboHandler.delay = 0.0
+
+
+@pytest.mark.unit
+class TestTransportStats:
+    """Tests for the TransportStats class."""
+
+    def test_stats(self) -> None:
+        """Test counting requests, connections and latency."""
+        stats = TransportStats()
+        for new_connection, error in [(True, False), (False, False), (False, True)]:
+            stats.started()
+            stats.finished(latency=0.01, new_connection=new_connection, error=error)
+
+        result = stats.as_dict()
+        assert result['requests'] == 3
+        assert result['connections'] == 1
+        assert result['reused'] == 1
+        assert result['errors'] == 1
+        assert result['in_flight'] == 0
+        assert result['latency_avg_ms'] == pytest.approx(10.0)
+
+
+@pytest.mark.unit
+class TestTransport:
+    """Tests for the Transport base class."""
+
+    def test_transport_is_abstract(self) -> None:
+        """Test that a transport must implement cat and add."""
+        class PartialTransport(Transport):
+            async def cat(self, cid: str) -> bytes:
+                return b''
+
+        with pytest.raises(TypeError):
+            Transport()
+        with pytest.raises(TypeError):
+            PartialTransport()
+
+
+@pytest.mark.unit
+class TestKuboTransport:
+    """Tests for the KuboTransport class."""
+
+    def test_default_api_url(self) -> None:
+        """Test deriving the API URL from the ipfs-dict-chain multiaddress."""
+        with patch('hivemind.transport.IPFS.multi_address', '/ip4/10.0.0.5/tcp/5002'):
+            assert default_api_url() == 'http://10.0.0.5:5002'
+
+    @pytest.mark.asyncio
+    async def test_connections_are_reused(self, kubo_server: str) -> None:
+        """Test that sequential requests reuse one keep-alive connection."""
+        transport = KuboTransport(base_url=kubo_server)
+
+        for _ in range(5):
+            assert await transport.cat('QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o') == b'{"name": "test"}'
+        assert await transport.add(b'{"name": "test"}') == 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o'
+        await transport.aclose()
+
+        stats = transport.stats()
+        assert stats['requests'] == 6
+        assert stats['connections'] == 1
+        assert stats['reused'] == 5
+        assert stats['errors'] == 0
+
+    @pytest.mark.asyncio
+    async def test_timeout(self, kubo_server: str) -> None:
+        """Test that a request that takes too long raises an IPFSError."""
+        KuboHandler.delay = 0.5
+        transport = KuboTransport(base_url=kubo_server)
+
+        with pytest.raises(IPFSError, match='ReadTimeout'):
+            await transport.cat('QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o', timeout=0.1)
+        await transport.aclose()
+
+        assert transport.stats()['errors'] == 1
+
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency(self) -> None:
+        """Test that no more than max_concurrency requests are sent at the same time."""
+        active = 0
+        max_active = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return httpx.Response(200, content=b'{}')
+
+        transport = KuboTransport(base_url='http://fake-ipfs:5001', max_concurrency=3, http_transport=httpx.MockTransport(handler))
+        await asyncio.gather(*[transport.cat('cid%s' % i) for i in range(12)])
+
+        assert max_active == 3
+        assert transport.stats()['requests'] == 12
+
+    @pytest.mark.asyncio
+    async def test_http_error(self) -> None:
+        """Test that an error response of the daemon raises an IPFSError."""
+        transport = KuboTransport(base_url='http://fake-ipfs:5001', http_transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+
+        with pytest.raises(IPFSError, match='HTTPStatusError'):
+            await transport.cat('QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o')
+
+    @pytest.mark.asyncio
+    async def test_add_without_hash(self) -> None:
+        """Test that an add response without a hash raises an IPFSError."""
+        transport = KuboTransport(base_url='http://fake-ipfs:5001', http_transport=httpx.MockTransport(lambda request: httpx.Response(200, json={})))
+
+        with pytest.raises(IPFSError, match='did not contain a Hash'):
+            await transport.add(b'{}')
+
+    @pytest.mark.asyncio
+    async def test_add_many_without_every_hash(self) -> None:
+        """Test that a batched add response without a hash for every file raises an IPFSError."""
+        response = b'{"Name": "0.json", "Hash": "QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o", "Size": "2"}\n'
+        transport = KuboTransport(base_url='http://fake-ipfs:5001', http_transport=httpx.MockTransport(lambda request: httpx.Response(200, content=response)))
+
+        with pytest.raises(IPFSError, match='for every file'):
+            await transport.add_many([b'{}', b'[]'])
@@ -3,7 +3,9 @@
 import pytest
 from bitcoin.wallet import CBitcoinSecret, P2PKHBitcoinAddress
 from bitcoin.signmessage import BitcoinMessage, VerifyMessage
-from hivemind.utils import generate_bitcoin_keypair, sign_message
+from hivemind import signatures, utils
+from hivemind.signatures import BitcoinlibBackend
+from hivemind.utils import generate_bitcoin_keypair, sign_message, verify_many, verify_message
 
 
 def test_generate_bitcoin_keypair():
@@ -100,3 +102,123 @@ def test_sign_message_invalid_message():
     private_key, _ = generate_bitcoin_keypair()
     with pytest.raises(AttributeError, match="'int' object has no attribute 'encode'"):
         sign_message(123, private_key)  # Non-string message
+
+
+@pytest.fixture(scope='module')
+def signed_items():
+    """Create signed messages, the last one with a signature of another message."""
+    items = []
+    for i in range(6):
+        private_key, address = generate_bitcoin_keypair()
+        message = 'message %s' % i
+        items.append((message, address, sign_message(message, private_key)))
+    items.append(('tampered', items[0][1], items[0][2]))
+    return items
+
+
+@pytest.fixture(autouse=True)
+def clear_verifications():
+    """Start every test without remembered verifications and worker processes."""
+    utils.verifications.clear()
+    yield
+    utils.verifications.clear()
+    utils.shutdown_pool()
+
+
+def test_verify_many(signed_items):
+    """Test that verify_many returns a verdict for every item in order."""
+    verdicts = verify_many(signed_items + [signed_items[0], ('message', 'invalid address', 'invalid signature')], processes=1)
+    assert verdicts == [True] * 6 + [False, True, False]
+    assert verify_many([]) == []
+
+
+def test_verify_many_processes(signed_items, monkeypatch):
+    """Test that verify_many gives the same verdicts when the work is spread over processes."""
+    monkeypatch.setattr(utils, 'PARALLEL_THRESHOLD', 2)
+    assert verify_many(signed_items, processes=2) == [True] * 6 + [False]
+    assert len(utils.verifications) == 6
+
+
+def test_verify_many_reuses_pool(signed_items, monkeypatch):
+    """Test that the worker processes are kept for later calls with the same backend."""
+    monkeypatch.setattr(utils, 'PARALLEL_THRESHOLD', 2)
+    verify_many(signed_items, processes=2)
+    pool = utils._pool
+    utils.verifications.clear()
+
+    assert verify_many(signed_items, processes=2) == [True] * 6 + [False]
+    assert utils._pool is pool
+    assert utils._pool_key == (2, signatures.get_backend().name)
+
+
+def test_verify_many_custom_backend(signed_items, monkeypatch):
+    """Test that a backend that can not be recreated in the workers verifies in the calling process."""
+    calls = []
+
+    class CountingBackend(BitcoinlibBackend):
+        name = 'counting'
+
+        def verify(self, message, address, signature):
+            calls.append((message, address, signature))
+            return super().verify(message, address, signature)
+
+    monkeypatch.setattr(utils, 'PARALLEL_THRESHOLD', 2)
+    monkeypatch.setattr(signatures, '_backend', CountingBackend())
+    assert verify_many(signed_items, processes=2) == [True] * 6 + [False]
+    assert len(calls) == 7
+    assert utils._pool is None
+
+
+def test_init_worker_sets_backend(monkeypatch):
+    """Test that a worker process uses the backend of the parent process."""
+    monkeypatch.setattr(signatures, '_backend', signatures.default_backend())
+    utils._init_worker('bitcoinlib')
+    assert type(signatures.get_backend()) is BitcoinlibBackend
+
+
+def test_verify_many_pool_unavailable(signed_items, monkeypatch):
+    """Test that verify_many verifies in the calling process if no process pool can be started."""
+    class BrokenExecutor:
+        def __init__(self, max_workers, **kwargs):
+            raise OSError('no processes')
+
+    monkeypatch.setattr(utils, 'PARALLEL_THRESHOLD', 2)
+    monkeypatch.setattr(utils, 'ProcessPoolExecutor', BrokenExecutor)
+    assert verify_many(signed_items, processes=2) == [True] * 6 + [False]
+
+
+def test_verify_message_remembers_valid_signatures(signed_items, monkeypatch):
+    """Test that a valid signature is only verified once and an invalid one every time."""
+    calls = []
+
+    class CountingBackend(BitcoinlibBackend):
+        def verify(self, message, address, signature):
+            calls.append((message, address, signature))
+            return super().verify(message, address, signature)
+
+    monkeypatch.setattr(signatures, '_backend', CountingBackend())
+    message, address, signature = signed_items[0]
+    assert verify_message(message, address, signature) is True
+    assert verify_message(message, address, signature) is True
+    assert len(calls) == 1
+    assert verify_many([signed_items[0]], processes=1) == [True]
+    assert len(calls) == 1
+
+    tampered = signed_items[-1]
+    assert verify_message(*tampered) is False
+    assert verify_message(*tampered) is False
+    assert len(calls) == 3
+    assert utils.verifications.stats() == {'hits': 2, 'misses': 3, 'cached': 1, 'maxsize': utils.verifications.maxsize}
+
+
+def test_verification_cache_is_bounded():
+    """Test that the least recently used verifications are forgotten when the cache is full."""
+    cache = utils.VerificationCache(maxsize=2)
+    cache.add('a', 'm1', 's')
+    cache.add('a', 'm2', 's')
+    assert cache.contains('a', 'm1', 's')
+    cache.add('a', 'm3', 's')
+
+    assert not cache.contains('a', 'm2', 's')
+    assert cache.contains('a', 'm1', 's') and cache.contains('a', 'm3', 's')
+    assert len(cache) == 2
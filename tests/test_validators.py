@@ -1,8 +1,12 @@
 """Test suite for Bitcoin address validation functions."""
+import random
+
 import pytest
+from hivemind import validators
 from hivemind.validators import (
     valid_address,
     valid_bech32_address,
+    validate_addresses,
     bech32_decode,
     bech32_verify_checksum,
     bech32_polymod,
@@ -122,3 +126,47 @@ def test_bech32_hrp_expand():
     expanded = bech32_hrp_expand(hrp)
     assert isinstance(expanded, list)
     assert len(expanded) == len(hrp) * 2 + 1  # Each char splits into 2 values + separator
+
+
+def test_bech32_polymod_table():
+    """Test that the table-driven checksum matches the bitwise reference implementation."""
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+
+    def reference(values):
+        chk = 1
+        for value in values:
+            top = chk >> 25
+            chk = (chk & 0x1ffffff) << 5 ^ value
+            for i in range(5):
+                chk ^= generator[i] if ((top >> i) & 1) else 0
+        return chk
+
+    rng = random.Random(0)
+    for _ in range(200):
+        values = [rng.randrange(32) for _ in range(rng.randrange(0, 90))]
+        assert bech32_polymod(values) == reference(values)
+
+
+def test_valid_bech32_address_skips_checksum_for_invalid_pattern(monkeypatch):
+    """Test that the checksum is not computed for addresses that do not match the pattern."""
+    calls = []
+    monkeypatch.setattr(validators, 'bech32_decode', lambda bech: calls.append(bech) or (None, None))
+
+    assert not valid_bech32_address("1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2")
+    assert not valid_bech32_address("tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx", testnet=False)
+    assert calls == []
+
+
+def test_validate_addresses():
+    """Test validating a list of addresses."""
+    addresses = [
+        "1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2",
+        "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4",
+        "invalid_address",
+        None,
+        "1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2",
+        "mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn",
+    ]
+    assert validate_addresses(addresses) == [True, True, False, False, True, False]
+    assert validate_addresses(addresses, testnet=True) == [False, False, False, False, False, True]
+    assert validate_addresses([]) == []